@@ -2,7 +2,8 @@ from .load_model import load_models
 from .llm_client import BaseOpenai
 from .dispatcher_control import dispatcher_with_repair
 from .dispatcher import ModelDispatcher
+from .async_dispatcher import AsyncModelDispatcher
 from .prompt_manager import PromptManager
 
 __all__ = ['load_models', 'dispatcher_with_repair',
-            'BaseOpenai', 'ModelDispatcher', 'PromptManager']
+            'BaseOpenai', 'ModelDispatcher', 'AsyncModelDispatcher', 'PromptManager']
@@ -0,0 +1,297 @@
+"""
+异步模型调度器 - 基于 asyncio 的 ModelDispatcher
+
+与 ModelDispatcher.execute_task 保持相同的故障转移、validate_func、format_json
+以及 ExecutionResult 语义，网络请求使用 AsyncOpenAI，单个事件循环即可同时
+承载大量 LLM 调用，不再需要为每个请求占用一个线程。
+"""
+
+import time
+import asyncio
+from typing import List, Dict, Any, Optional, Callable, Union, Sequence
+from .dispatcher import ModelDispatcher, ExecutionResult, _TaskContext
+from .utils.bulkhead import BulkheadTimeoutError
+from .utils.deadline import Deadline, DeadlineExceededError
+from .utils.hedging import HedgePolicy
+from .utils.stream_validator import StreamAbortedError, StreamCheck, StreamValidator
+
+
+class AsyncModelDispatcher(ModelDispatcher):
+    """
+    异步模型调度器，模型组、密钥状态和统计信息与 ModelDispatcher 完全一致
+
+    Example:
+        >>> dispatcher = AsyncModelDispatcher('config/models_config.yaml', 'config/keys_config.yaml')
+        >>> results = await asyncio.gather(
+        ...     *(dispatcher.execute_with_group_async(info, "generate_title") for info in message_infos)
+        ... )
+    """
+
+    async def _call_model_async(self, ctx: _TaskContext, idx: int) -> tuple[Any, int]:
+        """_call_model 的异步版本：响应缓存、请求合并，最后才真正发出请求"""
+        self._check_deadline(ctx, idx)
+        cached = self._get_cached_response(ctx, idx)
+        if cached is not None:
+            return cached
+
+        singleflight = self.singleflight
+        flight_key = self._coalesce_key(ctx, idx)
+        if singleflight is None or flight_key is None:
+            return await self._invoke_model_async(ctx, idx)
+
+        future, is_leader = singleflight.join(flight_key)
+        if not is_leader:
+            try:
+                timeout = ctx.deadline.remaining() if ctx.deadline is not None else None
+                return_message, _ = await asyncio.wait_for(singleflight.wait_async(future), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise ctx.deadline.exceeded(*ctx.model_identity(idx))  # type: ignore[union-attr]
+            except DeadlineExceededError:
+                # 发起方的时限比本次调用短，本次调用仍有剩余时间时自行发出请求
+                if ctx.deadline is None or ctx.deadline.expired():
+                    raise
+                return await self._invoke_model_async(ctx, idx)
+            except Exception:
+                ctx.shared_failures.add(idx)
+                raise
+            return return_message, 0
+
+        try:
+            result = await self._invoke_model_async(ctx, idx)
+        except BaseException as e:
+            # 包括任务被取消的情况，保证等待方不会一直挂起
+            singleflight.complete(flight_key, future, error=e)
+            raise
+        singleflight.complete(flight_key, future, result=result)
+        return result
+
+    async def _invoke_model_async(self, ctx: _TaskContext, idx: int) -> tuple[Any, int]:
+        """异步调用模型，模型未实现 send_message_async 时退回到线程中执行"""
+        model = ctx.llm_models[idx]["model"]
+        self._acquire_circuit(ctx, idx)
+        start_time = time.monotonic()
+
+        try:
+            send_message_async = getattr(model, "send_message_async", None)
+            if send_message_async is not None:
+                result = await send_message_async([], ctx.message_info, **self._send_kwargs(ctx))
+            else:
+                result = await asyncio.to_thread(
+                    model.send_message, [], ctx.message_info, **self._send_kwargs(ctx)
+                )
+        except DeadlineExceededError:
+            raise
+        except StreamAbortedError:
+            self._record_call_stats(ctx, idx, time.monotonic() - start_time, True)
+            raise
+        except Exception:
+            self._record_call_stats(ctx, idx, time.monotonic() - start_time, False)
+            raise
+
+        total_seconds = time.monotonic() - start_time
+        self._record_call_stats(ctx, idx, total_seconds, True, result[1])
+        if self.warning_time:
+            self._log_slow_call(ctx, idx, round(total_seconds, 2))
+        return result
+
+    async def _attempt_async(self, ctx: _TaskContext, idx: int) -> Optional[ExecutionResult]:
+        """_attempt 的异步版本"""
+        with self._attempt_span(ctx, idx) as span:
+            try:
+                return_message, total_tokens = await self._call_model_async(ctx, idx)
+                span.set_attribute("llmakits.tokens", total_tokens)
+                result = self._settle_response(ctx, idx, return_message, total_tokens)
+            except Exception as e:
+                span.record_exception(e)
+                result = self._handle_model_error(ctx, idx, e)
+            span.set_attribute("llmakits.success", result is not None and result.success)
+            return result
+
+    async def _call_model_observed_async(self, ctx: _TaskContext, idx: int, policy: HedgePolicy) -> tuple[Any, int]:
+        """_call_model_observed 的异步版本"""
+        start_time = time.monotonic()
+        with self._attempt_span(ctx, idx) as span:
+            result = await self._call_model_async(ctx, idx)
+            span.set_attribute("llmakits.tokens", result[1])
+        policy.observe(time.monotonic() - start_time)
+        return result
+
+    @staticmethod
+    def _abandon_tasks(policy: HedgePolicy, tasks) -> None:
+        """取消落败的请求；已经完成的请求把它消耗的 token 计入浪费统计"""
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is None:
+                policy.stats.add_wasted_tokens(task.result()[1])
+
+    async def _run_task_hedged_async(self, ctx: _TaskContext, policy: HedgePolicy) -> ExecutionResult:
+        """
+        _run_task_hedged 的异步版本：当前模型超过对冲延迟仍未返回时，在同一个事件循环中并行请求下一个模型，
+        先通过校验的结果胜出，仍在进行中的请求随即取消（关闭连接，不再等待其完成）
+        """
+        pending: Dict[asyncio.Task, int] = {}
+        attempt_order = ctx.attempt_order
+        next_position = 0  # attempt_order 中下一个待发出的位置
+        first_idx = attempt_order[0]
+        hedges_fired = 0
+        fallback_result: Optional[ExecutionResult] = None
+
+        def launch() -> bool:
+            nonlocal next_position
+            if next_position >= len(attempt_order) or ctx.is_unknown_model(attempt_order[next_position]):
+                next_position = len(attempt_order)
+                return False
+            idx = attempt_order[next_position]
+            task = asyncio.ensure_future(self._call_model_observed_async(ctx, idx, policy))
+            pending[task] = idx
+            next_position += 1
+            return True
+
+        def finish(result: ExecutionResult) -> ExecutionResult:
+            self._abandon_tasks(policy, pending)
+            pending.clear()
+            hedge_won = result.success and result.last_tried_index != first_idx
+            policy.stats.record_request(hedges_fired, hedge_won)
+            if hedge_won:
+                self.metrics.inc("llmakits_hedge_wins_total", group=ctx.group_name)
+            return result
+
+        launch()
+        try:
+            while pending:
+                delay = policy.get_delay() if next_position < len(attempt_order) else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 超过对冲延迟仍未返回，把请求发给下一个模型
+                    if launch():
+                        hedges_fired += 1
+                        self.metrics.inc("llmakits_hedges_total", group=ctx.group_name)
+                    continue
+
+                for task in done:
+                    idx = pending.pop(task)
+                    try:
+                        return_message, total_tokens = task.result()
+                        result = self._settle_response(ctx, idx, return_message, total_tokens)
+                    except Exception as e:
+                        try:
+                            result = self._handle_model_error(ctx, idx, e)
+                        except Exception:
+                            finish(ExecutionResult(success=False, last_tried_index=idx))
+                            raise
+
+                    if result is not None and result.success:
+                        return finish(result)
+                    if result is not None:
+                        # 失败结果（详细模式下的JSON解析失败 / 全部失败）：其他请求仍在进行时先保留
+                        fallback_result = result
+
+                if not pending and not launch():
+                    break
+        except asyncio.CancelledError:
+            # 调用方取消（如外层 wait_for 超时）：一并取消所有在途请求
+            self._abandon_tasks(policy, pending)
+            raise
+
+        if fallback_result is None:
+            fallback_result = ExecutionResult(
+                success=False, error=Exception("All models failed."), last_tried_index=ctx.models_num - 1
+            )
+        return finish(fallback_result)
+
+    async def _run_task_async(self, ctx: _TaskContext, start_index: int) -> ExecutionResult:
+        """_run_task 的异步版本"""
+        invalid_result = self._check_start_index(start_index, ctx.models_num)
+        if invalid_result is not None:
+            return invalid_result
+
+        ctx.attempt_order = self._route(ctx, start_index)
+        if not ctx.attempt_order:
+            return self._build_all_circuits_open_result(ctx)
+
+        policy = self.hedge_policies.get(ctx.group_name) if ctx.group_name else None
+        if policy is not None and not ctx.debug_mode:
+            return await self._run_task_hedged_async(ctx, policy)
+
+        for idx in ctx.attempt_order:
+            if ctx.is_unknown_model(idx):
+                break
+
+            result = await self._attempt_async(ctx, idx)
+            if result is not None:
+                return result
+
+        return ExecutionResult(success=False, error=Exception("All models failed."), last_tried_index=ctx.models_num - 1)
+
+    async def execute_task_async(
+        self,
+        message_info: Dict[str, Any],
+        llm_models: List[Dict[str, Any]],
+        format_json: bool = False,
+        validate_func: Optional[Callable[[str], tuple[bool, Any]]] = None,
+        start_index: int = 0,
+        return_detailed: bool = False,
+        deadline: Union[Deadline, float, None] = None,
+        timeout_budget: Optional[float] = None,
+        stream_validator: Union[StreamValidator, StreamCheck, None] = None,
+        stream_json: Union[bool, Sequence[str]] = False,
+    ) -> Union[tuple[Any, int], ExecutionResult]:
+        """
+        执行任务（异步） - 参数和返回值与 execute_task 相同
+
+        注意：validate_func 在事件循环中同步执行，应保持轻量（只做解析和校验）。
+        """
+        ctx = self._build_task_context(
+            message_info,
+            llm_models,
+            format_json,
+            validate_func,
+            return_detailed,
+            deadline=Deadline.resolve(deadline, timeout_budget),
+            stream_validator=stream_validator,
+            stream_json=stream_json,
+        )
+        result = await self._run_task_async(ctx, start_index)
+        return self._unwrap_result(result, return_detailed)
+
+    async def execute_with_group_async(
+        self,
+        message_info: Dict[str, Any],
+        group_name: str,
+        format_json: bool = False,
+        validate_func: Optional[Callable[[str], tuple[bool, Any]]] = None,
+        start_index: int = 0,
+        return_detailed: bool = False,
+        deadline: Union[Deadline, float, None] = None,
+        timeout_budget: Optional[float] = None,
+        stream_validator: Union[StreamValidator, StreamCheck, None] = None,
+        stream_json: Union[bool, Sequence[str]] = False,
+    ) -> Union[tuple[Any, int], ExecutionResult]:
+        """
+        使用内部model_groups执行任务（异步） - 参数和返回值与 execute_with_group 相同
+        """
+        llm_models = self._get_group_models(group_name)
+
+        ctx = self._build_task_context(
+            message_info,
+            llm_models,
+            format_json,
+            validate_func,
+            return_detailed,
+            group_name=group_name,
+            deadline=Deadline.resolve(deadline, timeout_budget),
+            stream_validator=stream_validator,
+            stream_json=stream_json,
+        )
+        bulkhead = self.bulkheads.get(group_name)
+        if bulkhead is None:
+            result = await self._run_task_async(ctx, start_index)
+        else:
+            try:
+                async with bulkhead.slot_async(self._queue_timeout(ctx)):
+                    result = await self._run_task_async(ctx, start_index)
+            except BulkheadTimeoutError as e:
+                raise self._queue_deadline_error(ctx, e) from None
+        return self._unwrap_result(result, return_detailed)
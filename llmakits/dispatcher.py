@@ -2,16 +2,60 @@
 模型调度器 - 支持索引控制和详细状态返回
 """
 
+import time
+import atexit
+import threading
+from functools import partial
+from weakref import WeakSet
 from .utils.debug_utils import trigger_breakpoint
-from typing import List, Dict, Any, Optional, Callable, Union, NamedTuple
-from funcguard import print_line, time_monitor, setup_logger
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+from typing import (
+    List, Dict, Any, Optional, Callable, Union, NamedTuple, Iterable, Iterator, Sequence, Tuple, Generator,
+)
+from funcguard import time_monitor, setup_logger
 from filekits.base_io import save_json
 from .message import convert_to_json
 from .load_model import load_models
 from .utils.image_cache import ImageBase64Cache
-from .utils.retry_state import get_retry_state, get_retry_state_snapshot
+from .utils.retry_state import get_retry_state, get_retry_state_lock, get_retry_state_snapshot
+from .utils.state_store import StateStore, fingerprint_key
+from .utils.shared_state import SharedStateBackend, create_shared_state, set_shared_state
 from .utils.normalize_error import ResponseError
 from .utils.model_fallback import should_stop_model_fallback
+from .utils.hedging import HedgePolicy
+from .utils.model_stats import ModelStatsRegistry
+from .utils.circuit_breaker import CircuitBreakerRegistry
+from .utils.rate_limiter import get_rate_limiter_stats
+from .utils.key_quota import get_key_quota_stats
+from .utils.http_pool import get_http_pool_stats
+from .utils.response_cache import ResponseCache, make_cache_key
+from .utils.singleflight import SingleFlight
+from .utils.bulkhead import Bulkhead, BulkheadTimeoutError
+from .utils.deadline import Deadline, DeadlineExceededError
+from .utils.metrics import MetricsRegistry, get_metrics_registry, start_metrics_server
+from .utils.tracing import start_span, tracing_enabled
+from .utils.event_log import log_event, log_console, log_separator
+from .utils.routing import RoutingPolicy, get_routing_policy, get_model_key
+from .utils.cost import CostTracker, compute_cost, current_kit, get_model_price
+from .utils.stream_validator import (
+    StreamAbortedError,
+    StreamCheck,
+    StreamValidator,
+    as_stream_validator,
+    get_stream_abort_stats,
+)
+from .utils.stream_json import normalize_json_fields
+from .utils.stream_timing import StreamTiming
+
+# 启用了状态持久化的调度器（弱引用，不会因为注册了退出保存而一直存活）
+_PERSISTENT_DISPATCHERS: "WeakSet[ModelDispatcher]" = WeakSet()
+
+
+@atexit.register
+def _save_states_at_exit() -> None:
+    """进程退出时保存所有启用了持久化的调度器的状态（只注册一次）"""
+    for dispatcher in list(_PERSISTENT_DISPATCHERS):
+        dispatcher._save_state_at_exit()
 
 
 class ExecutionResult(NamedTuple):
@@ -22,11 +66,111 @@ class ExecutionResult(NamedTuple):
     last_tried_index: int = -1  # 最后尝试的模型索引
     success: bool = False  # 是否成功
     error: Optional[Exception] = None  # 错误信息（失败时保留）
+    stream_timing: Optional[StreamTiming] = None  # 流式请求的首 token 耗时、块间隔和解码吞吐（非流式为 None）
+
+
+class GroupStream:
+    """
+    stream_with_group 返回的文本增量迭代器
+
+    迭代结束后 result 为 ExecutionResult（完整文本、带计时的 token 用量、最终使用的模型索引）；
+    提前停止迭代时调用 close()（或使用 with 语句）关闭底层的流，服务端随即停止生成。
+    """
+
+    def __init__(self, deltas: Generator[str, None, ExecutionResult]):
+        self._deltas = deltas
+        self.result: Optional[ExecutionResult] = None
+
+    def __iter__(self) -> "GroupStream":
+        return self
+
+    def __next__(self) -> str:
+        try:
+            return next(self._deltas)
+        except StopIteration as stop:
+            if stop.value is not None:
+                self.result = stop.value
+            raise
+
+    def close(self) -> None:
+        self._deltas.close()
+
+    def __enter__(self) -> "GroupStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _TaskContext:
+    """单次 execute_task 调用的上下文（仅内部使用）"""
+
+    def __init__(
+        self,
+        message_info: Dict[str, Any],
+        llm_models: List[Dict[str, Any]],
+        format_json: bool,
+        validate_func: Optional[Callable[[str], tuple[bool, Any]]],
+        return_detailed: bool,
+        debug_mode: bool,
+        group_name: str = "",
+        deadline: Optional[Deadline] = None,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+    ):
+        self.message_info = message_info
+        self.group_name = group_name
+        self.llm_models = llm_models
+        self.models_num = len(llm_models)
+        self.format_json = format_json
+        self.validate_func = validate_func
+        self.return_detailed = return_detailed
+        self.debug_mode = debug_mode
+        # 用于跟踪已打印过"下一个模型"信息的模型索引
+        self.printed_model_indices: set = set()
+        # 本次调用的模型尝试顺序（由路由策略决定，默认按配置顺序）
+        self.attempt_order: List[int] = list(range(self.models_num))
+        # 响应缓存：各模型的缓存 key，以及命中缓存的模型索引
+        self.cache_keys: Dict[int, str] = {}
+        self.cache_hits: set = set()
+        # 请求合并：等待他人请求结果时失败的模型索引（失败只由发起方计入熔断和重试计数）
+        self.shared_failures: set = set()
+        # 调用时限：贯穿模型切换、send_message 重试和限流等待，None 表示不限时
+        self.deadline = deadline
+        # 成本统计的 kit 标签（在调用线程中读取，对冲请求的工作线程也计入同一个 kit）
+        self.kit = current_kit()
+        # 流式输出的增量校验器，None 表示接收完毕后才校验
+        self.stream_validator = stream_validator
+        # 流式输出时，包含这些字段的 JSON 对象完整后即结束接收，None 表示接收全部输出
+        self.stream_json_fields = stream_json_fields
+
+    def next_index(self, idx: int) -> Optional[int]:
+        """按尝试顺序返回 idx 之后的下一个模型索引，不存在时返回 None"""
+        position = self.attempt_order.index(idx)
+        if position + 1 < len(self.attempt_order):
+            return self.attempt_order[position + 1]
+        return None
+
+    def model_identity(self, idx: int) -> tuple[str, str]:
+        model_info = self.llm_models[idx]
+        return model_info.get('sdk_name', 'unknown_sdk'), model_info.get('model_name', 'unknown_model')
+
+    def is_unknown_model(self, idx: int) -> bool:
+        sdk_name, model_name = self.model_identity(idx)
+        return sdk_name == 'unknown_sdk' or model_name == 'unknown_model'
+
+    def base_model_info(self, idx: int) -> str:
+        sdk_name, model_name = self.model_identity(idx)
+        return f"{idx+1}/{self.models_num} Model {sdk_name} : {model_name}"
 
 
 class ModelDispatcher:
     """
     模型调度器类，负责管理模型切换次数和执行任务
+
+    线程安全：同一个实例可以在多个线程间共享。切换计数、耗尽模型列表、
+    重试失败计数和模型组的增删都在 _state_lock 保护下进行；模型组列表采用
+    写时复制，正在遍历旧列表的线程不受影响。
     """
 
     # 类级别的全局缓存，所有实例共享
@@ -41,11 +185,25 @@ class ModelDispatcher:
     ):
         self.model_switch_count = 0
         self.exhausted_models = []
-        self.retry_exhausted_models = []  # 记录达到最大重试次数3次的模型
+        self.retry_exhausted_models = []  # 记录因超时/重试触发过熔断的模型
         self._retry_fail_count: Dict[str, int] = {}  # 记录模型达到最大重试次数的错误计数
+        self.circuit_breakers = CircuitBreakerRegistry()  # 各模型的熔断器，代替永久移除模型
         self.warning_time = None  # 用于 显示超时警告的阈值，单位秒
         self.logger = setup_logger("dispatcher")  # 新增：日志记录器
         self.debug = debug
+        self._state_lock = threading.RLock()  # 保护调度器的共享可变状态
+        self.hedge_policies: Dict[str, HedgePolicy] = {}  # 按模型组配置的对冲策略
+        self.model_stats = ModelStatsRegistry()  # 各模型的 EWMA 耗时、错误率、校验通过率
+        self.routing_policies: Dict[str, RoutingPolicy] = {}  # 按模型组配置的路由策略，默认静态顺序
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self.response_cache: Optional[ResponseCache] = None  # 响应缓存，默认关闭
+        self.singleflight: Optional[SingleFlight] = None  # 相同请求合并，默认关闭
+        self.bulkheads: Dict[str, Bulkhead] = {}  # 按模型组配置的并发限制（舱壁）
+        self.metrics: MetricsRegistry = get_metrics_registry()  # 进程级指标注册表（与模型客户端共用）
+        self.cost_tracker = CostTracker()  # 按模型组、kit 和模型汇总的调用成本
+        self.state_store: Optional[StateStore] = None  # 运行状态持久化，默认关闭
+        self.state_autosave_interval = 10.0
+        self._state_saved_at = 0.0
 
         if models_config and model_keys:
             self.model_groups, self.model_keys = load_models(models_config, model_keys, global_config)
@@ -107,8 +265,436 @@ class ModelDispatcher:
         force_domains = retry_snapshot["force_base64_domains"]
         if force_domains:
             print(f"Force base64 domains ({len(force_domains)}): {force_domains}")
+
+        for group_name, stats in self.get_hedge_stats().items():
+            if stats["requests"] > 0:
+                print(
+                    f"Hedge [{group_name}]: rate {stats['hedge_rate']:.2%}, fired {stats['hedges_fired']}, "
+                    f"wins {stats['hedge_wins']}, wasted tokens {stats['wasted_tokens']}"
+                )
+
+        for model_key, state in self.get_circuit_states().items():
+            if state["state"] != "closed":
+                print(f"Circuit [{model_key}]: {state['state']}, cooldown remaining {state['cooldown_remaining']}s")
+
+        if self.response_cache is not None:
+            cache_stats = self.response_cache.stats()
+            print(
+                f"Response cache: hits {cache_stats['hits']}, misses {cache_stats['misses']}, "
+                f"hit rate {cache_stats['hit_rate']:.2%}"
+            )
+
+        for group_name, stats in self.get_bulkhead_stats().items():
+            if stats["queued"] > 0:
+                print(
+                    f"Bulkhead [{group_name}]: queued {stats['queued']}, max depth {stats['max_queue_depth']}, "
+                    f"avg wait {stats['avg_wait']:.2f}s, timeouts {stats['timeouts']}"
+                )
+
+        if self.singleflight is not None:
+            flight_stats = self.singleflight.stats()
+            if flight_stats["coalesced"] > 0:
+                print(f"Coalesced requests: {flight_stats['coalesced']} (issued {flight_stats['leaders']})")
+
+        for key_label, stats in get_rate_limiter_stats().items():
+            if stats["throttled"] > 0:
+                print(f"Rate limit [{key_label}]: throttled {stats['throttled']}, total wait {stats['total_wait']:.2f}s")
+
+        for key_label, quota in self.get_key_quotas().items():
+            print(
+                f"Key quota [{key_label}]: requests {quota['requests_used']} (remaining {quota['requests_remaining']}), "
+                f"tokens {quota['tokens_used']} (remaining {quota['tokens_remaining']})"
+            )
+
+        for model_key, stats in self.get_stream_abort_stats().items():
+            if stats["aborts"] > 0 or stats["early_stops"] > 0:
+                print(
+                    f"Stream cuts [{model_key}]: aborts {stats['aborts']}, early stops {stats['early_stops']}, "
+                    f"saved tokens ~{stats['saved_tokens']}, saved seconds ~{stats['saved_seconds']:.2f}s"
+                )
+
+        cost_report = self.get_cost_report()
+        for dimension, label in (("groups", "group"), ("kits", "kit")):
+            for name, stats in cost_report[dimension].items():
+                if stats["cost"] > 0:
+                    print(f"Cost [{label} {name or '-'}]: {stats['cost']:.4f}, calls {stats['calls']}, tokens {stats['tokens']}")
+
+        if self.routing_policies:
+            for model_key, stats in self.get_model_stats().items():
+                print(
+                    f"Model stats [{model_key}]: calls {stats['calls']}, latency {stats['ewma_latency']:.2f}s, "
+                    f"error rate {stats['error_rate']:.2%}, validation pass {stats['validation_pass_rate']:.2%}"
+                )
         return
 
+    def enable_hedging(
+        self,
+        group_name: str,
+        delay: Optional[float] = None,
+        percentile: Optional[float] = None,
+        min_samples: int = 20,
+    ) -> HedgePolicy:
+        """
+        为模型组开启对冲请求：第 i 个模型超过延迟仍未返回时，把同一请求发给第 i+1 个模型，
+        先通过 format_json / validate_func 的结果胜出，较慢的请求结果被忽略
+
+        Args:
+            group_name: 模型组名称
+            delay: 固定对冲延迟（秒）；与 percentile 同时指定时作为样本不足时的后备延迟
+            percentile: 按该组最近成功响应耗时的百分位数计算延迟，如 95
+            min_samples: 使用百分位延迟所需的最少样本数
+
+        Returns:
+            HedgePolicy: 该组的对冲策略（包含统计信息 stats）
+        """
+        policy = HedgePolicy(delay=delay, percentile=percentile, min_samples=min_samples)
+        self.hedge_policies[group_name] = policy
+        return policy
+
+    def disable_hedging(self, group_name: str) -> None:
+        """关闭模型组的对冲请求"""
+        self.hedge_policies.pop(group_name, None)
+
+    def set_routing_policy(self, group_name: str, policy: Union[str, RoutingPolicy]) -> RoutingPolicy:
+        """
+        设置模型组的路由策略，决定每次调用时组内模型的尝试顺序
+
+        Args:
+            group_name: 模型组名称
+            policy: "static"（默认，按配置顺序）、"score"（按耗时和成功率得分排序）、
+                "p2c"（随机二选一取更优者）、"cost"（满足 SLO 的模型中单价最低者优先，
+                可传入 CostRouting(max_latency=..., min_success_rate=...) 指定该组的 SLO），
+                或自定义的 RoutingPolicy 实例
+
+        Returns:
+            RoutingPolicy: 生效的路由策略
+        """
+        routing_policy = get_routing_policy(policy)
+        self.routing_policies[group_name] = routing_policy
+        return routing_policy
+
+    def enable_response_cache(
+        self, max_size: int = 1000, ttl: Optional[float] = None, sqlite_path: Optional[str] = None
+    ) -> ResponseCache:
+        """
+        启用响应缓存：相同模型、相同消息、相同采样参数的请求直接使用缓存的响应，不再发出网络请求
+
+        命中缓存的响应同样会经过 format_json 和 validate_func；只有通过校验的响应才会写入缓存。
+
+        Args:
+            max_size: 内存层最多缓存的响应数量（LRU 淘汰）
+            ttl: 缓存有效期（秒），None 表示不过期
+            sqlite_path: SQLite 文件路径，指定后启用磁盘层，可在多个进程间共享
+
+        Returns:
+            ResponseCache: 缓存实例
+        """
+        self.response_cache = ResponseCache(max_size=max_size, ttl=ttl, sqlite_path=sqlite_path)
+        return self.response_cache
+
+    def disable_response_cache(self) -> None:
+        """关闭响应缓存"""
+        self.response_cache = None
+
+    def get_response_cache_stats(self) -> Dict[str, Any]:
+        """获取响应缓存统计：命中数、未命中数、命中率等，未启用时返回空字典"""
+        return self.response_cache.stats() if self.response_cache is not None else {}
+
+    def set_group_concurrency(
+        self, group_name: str, max_concurrency: int, queue_timeout: Optional[float] = None
+    ) -> Bulkhead:
+        """
+        限制模型组同时执行的调用数（舱壁），超出的调用排队等待
+
+        慢的模型组（如多模态 with_image）因此无法占满所有工作线程和连接。
+
+        Args:
+            group_name: 模型组名称
+            max_concurrency: 该组同时执行的最大调用数
+            queue_timeout: 排队超时时间（秒），超时抛出 BulkheadTimeoutError；None 表示一直等待
+
+        Returns:
+            Bulkhead: 该组的舱壁
+        """
+        bulkhead = Bulkhead(group_name, max_concurrency, queue_timeout, self.metrics)
+        self.bulkheads[group_name] = bulkhead
+        return bulkhead
+
+    def remove_group_concurrency(self, group_name: str) -> None:
+        """取消模型组的并发限制"""
+        self.bulkheads.pop(group_name, None)
+
+    def get_bulkhead_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各模型组舱壁的统计：在途调用数、排队深度、排队等待时间、排队超时次数"""
+        return {group_name: bulkhead.snapshot() for group_name, bulkhead in self.bulkheads.items()}
+
+    def enable_request_coalescing(self) -> SingleFlight:
+        """
+        启用相同请求合并：相同缓存 key（模型 + 消息 + 采样参数）的请求正在进行时，
+        其他调用方（线程或 asyncio 任务）等待这次请求的结果，而不是各自再发出请求。
+
+        等待方拿到的响应同样会经过各自的 format_json 和 validate_func，返回的 token 数为 0。
+        不依赖响应缓存，可以单独使用。
+        """
+        if self.singleflight is None:
+            self.singleflight = SingleFlight()
+        return self.singleflight
+
+    def disable_request_coalescing(self) -> None:
+        """关闭相同请求合并"""
+        self.singleflight = None
+
+    @staticmethod
+    def get_stream_abort_stats() -> Dict[str, Dict[str, Any]]:
+        """获取各模型的流式接收统计：完整接收的平均长度和耗时、提前终止 / 提前结束次数、估算节省的 token 和秒数"""
+        return get_stream_abort_stats()
+
+    @staticmethod
+    def get_key_quotas() -> Dict[str, Dict[str, Any]]:
+        """
+        获取配置了每日额度（daily_tokens / daily_requests）的密钥当天的用量和剩余额度
+
+        Returns:
+            {"平台:***密钥末4位": {"tokens_used", "tokens_remaining", "requests_used", "requests_remaining", "has_quota", "day"}}
+        """
+        return get_key_quota_stats()
+
+    @staticmethod
+    def get_http_pools() -> Dict[str, Dict[str, Any]]:
+        """
+        获取各 base_url 共享的 HTTP 连接池
+
+        Returns:
+            {"base_url": {"max_connections", "max_keepalive_connections", "keepalive_expiry", "http2",
+            "http2_enabled", "sync_client", "async_loops"}}
+        """
+        return get_http_pool_stats()
+
+    def get_cost_report(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        获取调用成本汇总（单价来自 global_model_config 的 input_price / output_price，每百万 token）
+
+        Returns:
+            {"groups": {...}, "kits": {...}, "models": {...}}，每项包含 calls、tokens、prompt_tokens、
+            completion_tokens 和 cost；未标记 kit 的调用计入空字符串
+        """
+        return self.cost_tracker.snapshot()
+
+    def enable_state_persistence(self, path: str, autosave_interval: float = 10.0) -> Dict[str, int]:
+        """
+        启用运行状态持久化：立即恢复当天保存的状态，之后在模型出错时（至多每 autosave_interval 秒一次）
+        和进程退出时自动保存
+
+        持久化的状态：用尽的密钥（只保存哈希指纹）、因密钥用尽移除的模型、重试失败计数、
+        强制 base64 的图片域名和域名失败统计。每条记录按本地日期每日过期。
+
+        Args:
+            path: JSON 文件路径，或 .db / .sqlite 后缀的 SQLite 文件路径
+            autosave_interval: 自动保存的最小间隔（秒）
+
+        Returns:
+            Dict[str, int]: 各类状态恢复的条目数
+        """
+        self.state_store = StateStore(path)
+        self.state_autosave_interval = autosave_interval
+        restored = self.restore_state()
+        _PERSISTENT_DISPATCHERS.add(self)
+        return restored
+
+    def disable_state_persistence(self) -> None:
+        """关闭运行状态持久化（已保存的文件保留）"""
+        self.state_store = None
+        _PERSISTENT_DISPATCHERS.discard(self)
+
+    @staticmethod
+    def enable_shared_state(backend: Union[str, SharedStateBackend]) -> SharedStateBackend:
+        """
+        启用跨进程共享状态：用尽的密钥、强制 base64 的图片域名（及域名累计失败次数）和模型熔断状态
+        在所有使用同一后端的进程间共享，任何一个进程发现后，其他进程的下一次请求立即生效
+
+        设置是进程级的（对所有调度器和模型实例生效），每个工作进程启动时调用一次。
+
+        Args:
+            backend: "memory"（进程内替身）、SQLite 文件路径（WAL 模式，同一台机器上的多个进程共享），
+                或自定义的 SharedStateBackend 实例（如 Redis 实现）
+
+        Returns:
+            SharedStateBackend: 生效的后端
+        """
+        shared_state = create_shared_state(backend)
+        set_shared_state(shared_state)
+        return shared_state
+
+    @staticmethod
+    def disable_shared_state() -> None:
+        """关闭跨进程共享状态，各进程恢复独立维护状态"""
+        set_shared_state(None)
+
+    def _save_state_at_exit(self) -> None:
+        if self.state_store is not None:
+            self.save_state()
+
+    def _model_clients(self) -> List[Any]:
+        """所有模型组中带密钥池的模型实例（去重）"""
+        clients: Dict[int, Any] = {}
+        for group_models in self.model_groups.values():
+            for model_info in group_models:
+                model = model_info.get("model")
+                if getattr(model, "key_pool", None) is not None:
+                    clients[id(model)] = model
+        return list(clients.values())
+
+    def _collect_state(self) -> Dict[str, Dict[str, Any]]:
+        """收集需要持久化的运行状态"""
+        exhausted_keys = {}
+        for model in self._model_clients():
+            for api_key in model.key_pool.exhausted_keys():
+                exhausted_keys[f"{model.platform}:{fingerprint_key(api_key)}"] = True
+        with self._state_lock:
+            exhausted_models = {model_key: True for model_key in self.exhausted_models}
+            retry_fail_count = dict(self._retry_fail_count)
+        retry_snapshot = get_retry_state_snapshot()
+        return {
+            "exhausted_keys": exhausted_keys,
+            "exhausted_models": exhausted_models,
+            "retry_fail_count": retry_fail_count,
+            "force_base64_domains": {domain: True for domain in retry_snapshot["force_base64_domains"]},
+            "domain_failure_stats": retry_snapshot["domain_failure_stats"],
+        }
+
+    def _apply_state(self, state: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+        """把恢复的运行状态合并到当前调度器和进程级重试状态中"""
+        exhausted_keys = set(state.get("exhausted_keys", {}))
+        restored_keys = 0
+        for model in self._model_clients():
+            keys = [key for key in model.key_pool.keys if f"{model.platform}:{fingerprint_key(key)}" in exhausted_keys]
+            if keys:
+                restored_keys += model.restore_exhausted_keys(keys)
+
+        exhausted_models = state.get("exhausted_models", {})
+        with self._state_lock:
+            for group_models in list(self.model_groups.values()):
+                for model_info in group_models:
+                    sdk_name, model_name = model_info.get("sdk_name"), model_info.get("model_name")
+                    if f"{sdk_name}_{model_name}" in exhausted_models:
+                        self._remove_model(sdk_name, model_name)
+            for model_key in exhausted_models:
+                if model_key not in self.exhausted_models:
+                    self.exhausted_models.append(model_key)
+            for model_key, count in state.get("retry_fail_count", {}).items():
+                self._retry_fail_count[model_key] = max(self._retry_fail_count.get(model_key, 0), int(count))
+
+        # 重试处理器持有这些集合和字典的引用，只能原地更新
+        retry_state = get_retry_state()
+        with get_retry_state_lock():
+            retry_state["force_base64_domains"].update(state.get("force_base64_domains", {}))
+            for domain, stats in state.get("domain_failure_stats", {}).items():
+                current = retry_state["domain_failure_stats"].setdefault(domain, {"consecutive": 0, "cumulative": 0})
+                for field in ("consecutive", "cumulative"):
+                    current[field] = max(current.get(field, 0), int(stats.get(field, 0)))
+
+        return {
+            "exhausted_keys": restored_keys,
+            "exhausted_models": len(exhausted_models),
+            "retry_fail_count": len(state.get("retry_fail_count", {})),
+            "force_base64_domains": len(state.get("force_base64_domains", {})),
+            "domain_failure_stats": len(state.get("domain_failure_stats", {})),
+        }
+
+    def save_state(self, path: Optional[str] = None) -> None:
+        """
+        保存运行状态
+
+        Args:
+            path: 保存路径，默认使用 enable_state_persistence 配置的路径
+        """
+        store = StateStore(path) if path else self.state_store
+        if store is None:
+            raise ValueError("未指定保存路径，请传入 path 或先调用 enable_state_persistence")
+        store.save(self._collect_state())
+        self._state_saved_at = time.monotonic()
+
+    def restore_state(self, path: Optional[str] = None) -> Dict[str, int]:
+        """
+        恢复当天保存的运行状态（非当天的记录会被丢弃）
+
+        Args:
+            path: 保存路径，默认使用 enable_state_persistence 配置的路径
+
+        Returns:
+            Dict[str, int]: 各类状态恢复的条目数
+        """
+        store = StateStore(path) if path else self.state_store
+        if store is None:
+            raise ValueError("未指定保存路径，请传入 path 或先调用 enable_state_persistence")
+        restored = self._apply_state(store.load())
+        if any(restored.values()):
+            log_event("state_restored", f"已恢复运行状态: {restored}", path=store.path, **restored)
+        return restored
+
+    def _autosave_state(self) -> None:
+        """模型出错后保存运行状态（按 state_autosave_interval 限制频率）"""
+        if self.state_store is None:
+            return
+        if time.monotonic() - self._state_saved_at < self.state_autosave_interval:
+            return
+        try:
+            self.save_state()
+        except Exception as e:
+            log_event("state_save_failed", f"保存运行状态失败: {e}", "warning", path=self.state_store.path)
+
+    def export_metrics(self) -> str:
+        """以 Prometheus 文本格式导出指标（按模型组、模型和密钥）"""
+        return self.metrics.render_prometheus()
+
+    def start_metrics_server(self, port: int = 9464, host: str = "127.0.0.1"):
+        """
+        在后台线程启动本地 HTTP 端点，供 Prometheus 抓取 /metrics
+
+        Returns:
+            ThreadingHTTPServer，调用 shutdown() 停止
+        """
+        return start_metrics_server(port, host, self.metrics)
+
+    def configure_circuit_breaker(
+        self, failure_threshold: int = 3, failure_window: float = 600.0, cooldown: float = 60.0
+    ) -> None:
+        """
+        配置模型熔断器
+
+        Args:
+            failure_threshold: 失败窗口内触发熔断的 超时/重试 失败次数
+            failure_window: 失败窗口（秒）
+            cooldown: 熔断冷却时间（秒），之后放行一个探测请求，成功则恢复该模型
+        """
+        self.circuit_breakers.configure(failure_threshold, failure_window, cooldown)
+
+    def get_circuit_states(self) -> Dict[str, Dict[str, Any]]:
+        """获取各模型熔断器的状态：closed / open / half_open"""
+        return self.circuit_breakers.snapshot()
+
+    def get_model_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各模型的运行统计：调用次数、EWMA 耗时、错误率、校验通过率"""
+        return self.model_stats.snapshot()
+
+    def _route(self, ctx: "_TaskContext", start_index: int) -> List[int]:
+        """按模型组的路由策略计算本次调用的尝试顺序"""
+        # 跳过处于熔断状态的模型
+        candidates = [
+            idx
+            for idx in range(start_index, ctx.models_num)
+            if ctx.is_unknown_model(idx)
+            or self.circuit_breakers.get(get_model_key(ctx.llm_models[idx])).is_available()
+        ]
+        policy = self.routing_policies.get(ctx.group_name) if ctx.group_name else None
+        if policy is None or len(candidates) < 2:
+            return candidates
+        return policy.order(candidates, ctx.llm_models, self.model_stats)
+
+    def get_hedge_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各模型组的对冲统计：对冲率、对冲次数、对冲胜出次数、浪费的 token 数"""
+        return {group_name: policy.stats.snapshot() for group_name, policy in self.hedge_policies.items()}
+
     def _remove_model(self, sdk_name: str, model_name: str):
         """
         从模型组中删除指定模型
@@ -117,17 +703,28 @@ class ModelDispatcher:
             sdk_name: 模型的SDK名称
             model_name: 模型的名称
         """
-        # 从当前列表中删除匹配的模型
-        for group_name, group_models in self.model_groups.items():
-            new_group_models = []
-            for model in group_models:
-                if model['sdk_name'] != sdk_name or model['model_name'] != model_name:
-                    new_group_models.append(model)
-            self.model_groups[group_name] = new_group_models
+        # 从当前列表中删除匹配的模型（写时复制：为每个组构建新列表后整体替换）
+        with self._state_lock:
+            for group_name, group_models in list(self.model_groups.items()):
+                new_group_models = []
+                for model in group_models:
+                    if model['sdk_name'] != sdk_name or model['model_name'] != model_name:
+                        new_group_models.append(model)
+                self.model_groups[group_name] = new_group_models
         return
 
+    def _increment_switch_count(self) -> None:
+        """线程安全地增加模型切换次数"""
+        with self._state_lock:
+            self.model_switch_count += 1
+
     def _print_next_model_info(
-        self, llm_models: List[Dict[str, Any]], current_idx: int, models_num: int, printed_model_indices: set
+        self,
+        llm_models: List[Dict[str, Any]],
+        current_idx: int,
+        models_num: int,
+        printed_model_indices: set,
+        next_idx: Optional[int] = None,
     ):
         """
         打印下一个模型的信息
@@ -137,9 +734,11 @@ class ModelDispatcher:
             current_idx: 当前模型索引
             models_num: 模型总数
             printed_model_indices: 已打印过的模型索引集合
+            next_idx: 下一个模型索引（路由策略调整顺序时传入），默认为 current_idx + 1
         """
-        if current_idx < models_num - 1:
+        if next_idx is None and current_idx < models_num - 1:
             next_idx = current_idx + 1
+        if next_idx is not None:
             next_model_info = llm_models[next_idx]
             next_sdk_name = next_model_info.get('sdk_name', 'unknown_sdk')
             next_model_name = next_model_info.get('model_name', 'unknown_model')
@@ -147,7 +746,13 @@ class ModelDispatcher:
                 f"Next model : \n{next_idx + 1}/{models_num} Model {next_sdk_name} : {next_model_name}"
             )
             # print_line(".")
-            self.logger.debug(next_base_model_info)
+            log_event(
+                "next_model",
+                next_base_model_info,
+                level="debug",
+                console_logger=self.logger,
+                model=get_model_key(next_model_info),
+            )
             printed_model_indices.add(next_idx)
 
     @staticmethod
@@ -168,258 +773,1000 @@ class ModelDispatcher:
         )
         return all_failed_error
 
-    # 执行任务 - 多模型调度器支持故障转移和重试
-    def execute_task(
+    def _build_task_context(
         self,
         message_info: Dict[str, Any],
         llm_models: List[Dict[str, Any]],
-        format_json: bool = False,
-        validate_func: Optional[Callable[[str], tuple[bool, Any]]] = None,
-        start_index: int = 0,  # 新增：起始索引
-        return_detailed: bool = False,  # 是否返回详细结果
-    ) -> Union[tuple[Any, int], ExecutionResult]:
-        """
-        执行任务 - 多模型调度器支持故障转移和重试
-
-        Args:
-            message_info: 消息信息字典
-            llm_models: LLM模型列表
-            format_json: 是否格式化为JSON
-            validate_func: 结果验证函数
-            start_index: 从第N个模型开始执行（默认0，即第一个）
-            return_detailed: 是否返回详细结果（ExecutionResult对象）
+        format_json: bool,
+        validate_func: Optional[Callable[[str], tuple[bool, Any]]],
+        return_detailed: bool,
+        group_name: str = "",
+        deadline: Optional[Deadline] = None,
+        stream_validator: Union[StreamValidator, StreamCheck, None] = None,
+        stream_json: Union[bool, Sequence[str]] = False,
+    ) -> "_TaskContext":
+        """构建单次任务调用的上下文"""
+        debug_mode = bool(self.debug) or bool((message_info or {}).get("debug", False))
+        message_info_to_use = dict(message_info or {})
+        if debug_mode:
+            message_info_to_use["debug"] = True
 
-        Returns:
-            如果 return_detailed=False: (返回消息, token总数)
-            如果 return_detailed=True: ExecutionResult对象
-        """
-        models_num = len(llm_models)
+        return _TaskContext(
+            message_info=message_info_to_use,
+            llm_models=llm_models,
+            format_json=format_json,
+            validate_func=validate_func,
+            return_detailed=return_detailed,
+            debug_mode=debug_mode,
+            group_name=group_name,
+            deadline=deadline,
+            stream_validator=as_stream_validator(stream_validator),
+            stream_json_fields=normalize_json_fields(stream_json),
+        )
 
-        # 验证起始索引
+    @staticmethod
+    def _check_start_index(start_index: int, models_num: int) -> Optional[ExecutionResult]:
+        """校验起始索引，超出范围时返回失败结果"""
         if start_index < 0 or start_index >= models_num:
             error_tag = "model索引超出范围"
             exception = ValueError(f"起始索引 {start_index} 超出范围 [0, {models_num - 1}]")
             response_error = ResponseError("", "", exception=exception, error_tag=error_tag)
+            return ExecutionResult(success=False, error=response_error)
+        return None
 
-            if return_detailed:
-                return ExecutionResult(success=False, error=response_error)
+    @staticmethod
+    def _unwrap_result(result: ExecutionResult, return_detailed: bool) -> Union[tuple[Any, int], ExecutionResult]:
+        """按调用模式返回结果：详细模式直接返回，传统模式失败时抛出异常"""
+        if return_detailed:
+            return result
+        if not result.success:
+            raise result.error if result.error is not None else Exception("All models failed.")
+        return result.return_message, result.total_tokens
+
+    def _record_switch(self, ctx: "_TaskContext", idx: int) -> None:
+        """记录一次模型切换，并打印下一个模型信息"""
+        self._increment_switch_count()
+        self._print_next_model_info(
+            ctx.llm_models, idx, ctx.models_num, ctx.printed_model_indices, next_idx=ctx.next_index(idx)
+        )
 
+    def _print_attempt_failure(self, ctx: "_TaskContext", idx: int, content: str) -> None:
+        """输出当前模型的失败原因（模型信息只打印一次）"""
+        message = content
+        if idx not in ctx.printed_model_indices:
+            message = f"{ctx.base_model_info(idx)}\n{content}"
+            ctx.printed_model_indices.add(idx)
+        log_event(
+            "attempt_rejected",
+            message,
+            level="warning",
+            group=ctx.group_name,
+            model=get_model_key(ctx.llm_models[idx]),
+            reason=content,
+        )
+
+    def _log_slow_call(self, ctx: "_TaskContext", idx: int, total_seconds: float) -> None:
+        """耗时超过 warning_time 时记录警告"""
+        if self.warning_time and total_seconds > self.warning_time:
+            content = f"Time-consuming: execute_task took {total_seconds}s"
+            log_content = f"{ctx.base_model_info(idx)}\n{content}"
+            log_event(
+                "slow_call",
+                log_content,
+                level="warning",
+                console_logger=self.logger,
+                group=ctx.group_name,
+                model=get_model_key(ctx.llm_models[idx]),
+                latency=total_seconds,
+            )
+            ctx.printed_model_indices.add(idx)
+
+    def _check_deadline(self, ctx: "_TaskContext", idx: int) -> None:
+        """调用时限已用完时抛出 DeadlineExceededError，不再尝试当前模型"""
+        if ctx.deadline is not None:
+            ctx.deadline.check(*ctx.model_identity(idx))
+
+    def _send_kwargs(self, ctx: "_TaskContext") -> Dict[str, Any]:
+        """send_message 的额外参数：只传入设置了的调用时限、增量校验器和 JSON 提前结束字段"""
+        kwargs: Dict[str, Any] = {}
+        if ctx.deadline is not None:
+            kwargs["deadline"] = ctx.deadline
+        if ctx.stream_validator is not None:
+            kwargs["stream_validator"] = ctx.stream_validator
+        if ctx.stream_json_fields is not None:
+            kwargs["stream_json_fields"] = ctx.stream_json_fields
+        return kwargs
+
+    def _record_call_stats(
+        self, ctx: "_TaskContext", idx: int, latency: float, success: bool, total_tokens: int = 0
+    ) -> None:
+        """记录模型调用的耗时、成败和 token，用于路由策略和指标；正常返回的调用会让半开的熔断器恢复"""
+        model_key = get_model_key(ctx.llm_models[idx])
+        self.model_stats.get(model_key).record_call(latency, success)
+        status = "success" if success else "error"
+        cost = compute_cost(total_tokens, *get_model_price(ctx.llm_models[idx])) if success else 0.0
+        stream_timing = getattr(total_tokens, "stream_timing", None)
+        stream_fields: Dict[str, Any] = {}
+        if stream_timing is not None and stream_timing.ttft is not None:
+            stream_fields["ttft"] = round(stream_timing.ttft, 4)
+            stream_fields["tokens_per_second"] = round(stream_timing.tokens_per_second, 2)
+        log_event(
+            "model_call",
+            level="debug",
+            group=ctx.group_name,
+            kit=ctx.kit,
+            model=model_key,
+            status=status,
+            latency=round(latency, 4),
+            tokens=int(total_tokens),
+            cost=cost,
+            **stream_fields,
+        )
+        self.metrics.inc("llmakits_requests_total", group=ctx.group_name, model=model_key, status=status)
+        self.metrics.observe("llmakits_request_latency_seconds", latency, group=ctx.group_name, model=model_key)
+        if success:
+            if total_tokens:
+                self.metrics.inc("llmakits_tokens_total", total_tokens, group=ctx.group_name, model=model_key)
+                self.cost_tracker.record(ctx.group_name, ctx.kit, model_key, total_tokens, cost)
+            if cost:
+                self.metrics.inc("llmakits_cost_total", cost, group=ctx.group_name, kit=ctx.kit, model=model_key)
+            self.circuit_breakers.get(model_key).record_success()
+
+    def _acquire_circuit(self, ctx: "_TaskContext", idx: int) -> None:
+        """请求发出前检查熔断器，熔断中（或半开状态的探测名额已被占用）时快速失败"""
+        breaker = self.circuit_breakers.get(get_model_key(ctx.llm_models[idx]))
+        if not breaker.allow_request():
+            sdk_name, model_name = ctx.model_identity(idx)
+            response_error = ResponseError(sdk_name, model_name, exception=Exception("CIRCUIT_OPEN"), error_tag="")
+            response_error.skip_report = True
             raise response_error
 
-        # 用于跟踪已打印过"下一个模型"信息的模型索引
-        printed_model_indices = set()
+    def _get_cached_response(self, ctx: "_TaskContext", idx: int) -> Optional[tuple[Any, int]]:
+        """
+        查询响应缓存，命中时返回 (原始响应, 0)，命中的请求不消耗 token
 
-        debug_mode = bool(self.debug) or bool((message_info or {}).get("debug", False))
-        message_info_to_use = dict(message_info or {})
-        if debug_mode:
-            message_info_to_use["debug"] = True
+        调试模式下不使用缓存，保证每次都真实请求模型。
+        """
+        cache = self.response_cache
+        if cache is None or ctx.debug_mode:
+            return None
+        cached = cache.get(self._cache_key(ctx, idx))
+        model_key = get_model_key(ctx.llm_models[idx])
+        if cached is None:
+            self.metrics.inc("llmakits_cache_misses_total", group=ctx.group_name, model=model_key)
+            return None
+        self.metrics.inc("llmakits_cache_hits_total", group=ctx.group_name, model=model_key)
+        ctx.cache_hits.add(idx)
+        return cached[0], 0
+
+    def _store_cached_response(self, ctx: "_TaskContext", idx: int, return_message: Any, total_tokens: int) -> None:
+        """通过校验的响应写入缓存（命中缓存得到的响应不重复写入）"""
+        cache = self.response_cache
+        cache_key = ctx.cache_keys.get(idx)
+        if cache is None or cache_key is None or idx in ctx.cache_hits:
+            return
+        cache.put(cache_key, return_message, total_tokens)
 
-        # 从指定索引开始遍历
-        for idx in range(start_index, models_num):
-            model_info = llm_models[idx]
-            sdk_name = model_info.get('sdk_name', 'unknown_sdk')
-            model_name = model_info.get('model_name', 'unknown_model')
+    @staticmethod
+    def _cache_key(ctx: "_TaskContext", idx: int) -> str:
+        """响应缓存 key（stream_json 只返回 JSON 对象，字段不同的调用不共用缓存）"""
+        cache_key = ctx.cache_keys.get(idx)
+        if cache_key is None:
+            cache_key = make_cache_key(ctx.llm_models[idx], ctx.message_info, ctx.stream_json_fields)
+            ctx.cache_keys[idx] = cache_key
+        return cache_key
+
+    def _coalesce_key(self, ctx: "_TaskContext", idx: int) -> Optional[str]:
+        """
+        请求合并使用的 key，未启用或调试模式下返回 None
 
-            # 如果是未知模型，直接结束循环
-            if sdk_name == 'unknown_sdk' or model_name == 'unknown_model':
-                break
+        在响应缓存 key 的基础上加入增量校验器的标识：校验器会提前终止流，
+        只有使用同一个校验器的调用才能共享结果（包括它抛出的 StreamAbortedError）。
+        """
+        if self.singleflight is None or ctx.debug_mode:
+            return None
+        cache_key = self._cache_key(ctx, idx)
+        if ctx.stream_validator is not None:
+            cache_key = f"{cache_key}:validator-{id(ctx.stream_validator)}"
+        return cache_key
+
+    def _call_model(self, ctx: "_TaskContext", idx: int) -> tuple[Any, int]:
+        """调用单个模型：依次尝试响应缓存、合并进行中的相同请求，最后才真正发出请求"""
+        self._check_deadline(ctx, idx)
+        cached = self._get_cached_response(ctx, idx)
+        if cached is not None:
+            return cached
+
+        singleflight = self.singleflight
+        flight_key = self._coalesce_key(ctx, idx)
+        if singleflight is None or flight_key is None:
+            return self._invoke_model(ctx, idx)
+
+        future, is_leader = singleflight.join(flight_key)
+        if not is_leader:
+            try:
+                timeout = ctx.deadline.remaining() if ctx.deadline is not None else None
+                return_message, _ = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                raise ctx.deadline.exceeded(*ctx.model_identity(idx))  # type: ignore[union-attr]
+            except DeadlineExceededError:
+                # 发起方的时限比本次调用短，本次调用仍有剩余时间时自行发出请求
+                if ctx.deadline is None or ctx.deadline.expired():
+                    raise
+                return self._invoke_model(ctx, idx)
+            except Exception:
+                ctx.shared_failures.add(idx)
+                raise
+            return return_message, 0
+
+        try:
+            result = self._invoke_model(ctx, idx)
+        except BaseException as e:
+            singleflight.complete(flight_key, future, error=e)
+            raise
+        singleflight.complete(flight_key, future, result=result)
+        return result
+
+    def _invoke_model(self, ctx: "_TaskContext", idx: int) -> tuple[Any, int]:
+        """真正调用模型的 send_message（经过熔断检查，并记录耗时统计）"""
+        model = ctx.llm_models[idx]["model"]
+        self._acquire_circuit(ctx, idx)
+        start_time = time.monotonic()
+        try:
+            if self.warning_time:
+                result, total_seconds = time_monitor(
+                    self.warning_time,
+                    0,  # 0：不打印警告信息
+                    partial(model.send_message, **self._send_kwargs(ctx)),
+                    [],
+                    ctx.message_info,
+                )
+                self._log_slow_call(ctx, idx, total_seconds)
+            else:
+                result = model.send_message([], ctx.message_info, **self._send_kwargs(ctx))
+        except DeadlineExceededError:
+            # 时限用完不代表模型变慢，不计入模型统计
+            raise
+        except StreamAbortedError:
+            # 增量校验提前终止：模型本身正常响应，按成功调用计入统计
+            self._record_call_stats(ctx, idx, time.monotonic() - start_time, True)
+            raise
+        except Exception:
+            self._record_call_stats(ctx, idx, time.monotonic() - start_time, False)
+            raise
+        self._record_call_stats(ctx, idx, time.monotonic() - start_time, True, result[1])
+        return result
+
+    def _settle_response(
+        self, ctx: "_TaskContext", idx: int, return_message: Any, total_tokens: int
+    ) -> Optional[ExecutionResult]:
+        """
+        处理模型返回的结果：JSON格式化 + 条件校验
 
-            base_model_info = f"{idx+1}/{models_num} Model {sdk_name} : {model_name}"
+        Returns:
+            ExecutionResult: 任务结束（成功，或详细模式下的JSON解析失败）
+            None: 当前模型结果不可用，需要尝试下一个模型
+        """
+        sdk_name, model_name = ctx.model_identity(idx)
+        model_stats = self.model_stats.get(get_model_key(ctx.llm_models[idx]))
+        raw_message = return_message
 
+        if ctx.format_json:
             try:
-                if self.warning_time:
-                    result, total_seconds = time_monitor(
-                        self.warning_time,
-                        0,  # 0：不打印警告信息
-                        model_info["model"].send_message,
-                        [],
-                        message_info_to_use,
-                    )
-                    return_message, total_tokens = result
-                    if total_seconds > self.warning_time:
-                        content = f"Time-consuming: execute_task took {total_seconds}s"
-                        log_content = f"{base_model_info}\n{content}"
-                        self.logger.warning(log_content)
-                        printed_model_indices.add(idx)
-                else:
-                    return_message, total_tokens = model_info["model"].send_message([], message_info_to_use)
-
-                if format_json:
-                    try:
-                        return_message = convert_to_json(return_message)
-                    except Exception as json_error:
-                        if debug_mode:
-                            trigger_breakpoint(json_error)
-                            raise
-                        response_error = ResponseError(sdk_name, model_name, exception=json_error, error_tag="")
-
-                        if return_detailed:
-                            # 返回详细结果，包含原始消息和错误信息
-                            return ExecutionResult(
-                                return_message=return_message,
-                                total_tokens=total_tokens,
-                                last_tried_index=idx,
-                                error=response_error,
-                            )
-                        else:
-                            # 传统模式：继续尝试下一个模型
-                            content = "JSON解析失败, trying next model..."
-                            # 只有当当前模型信息未被打印过时才打印
-                            if idx not in printed_model_indices:
-                                print(base_model_info, content, sep="\n")
-                                printed_model_indices.add(idx)
-                            else:
-                                print(content)
-                            self.model_switch_count += 1
-                            self._print_next_model_info(llm_models, idx, models_num, printed_model_indices)
-                            continue
-
-                # 验证逻辑
-                if validate_func is not None:
-                    is_valid, validated_value = validate_func(return_message)
-
-                    if is_valid:
-                        if return_detailed:
-                            return ExecutionResult(
-                                return_message=validated_value,
-                                total_tokens=total_tokens,
-                                last_tried_index=idx,
-                                success=True,
-                            )
-                        return validated_value, total_tokens
-                    else:
-                        content = "输出结果：条件校验失败, trying next model ..."
-                        # 只有当当前模型信息未被打印过时才打印
-                        if idx not in printed_model_indices:
-                            print(base_model_info, content, sep="\n")
-                            printed_model_indices.add(idx)
-                        else:
-                            print(content)
-                        self.model_switch_count += 1
-                        # 打印下一个模型的信息
-                        self._print_next_model_info(llm_models, idx, models_num, printed_model_indices)
-                        continue
-
-                # 成功返回
-                if return_detailed:
+                with start_span("llmakits.convert_to_json") as span:
+                    if span.is_recording():
+                        span.set_attribute("llmakits.bytes", len(str(return_message).encode("utf-8")))
+                    return_message = convert_to_json(return_message)
+            except Exception as json_error:
+                model_stats.record_validation(False)
+                if ctx.debug_mode:
+                    trigger_breakpoint(json_error)
+                    raise
+                response_error = ResponseError(sdk_name, model_name, exception=json_error, error_tag="")
+
+                if ctx.return_detailed:
+                    # 返回详细结果，包含原始消息和错误信息
                     return ExecutionResult(
                         return_message=return_message,
                         total_tokens=total_tokens,
                         last_tried_index=idx,
-                        success=True,
+                        error=response_error,
                     )
-                return return_message, total_tokens
+                # 传统模式：继续尝试下一个模型
+                self._print_attempt_failure(ctx, idx, "JSON解析失败, trying next model...")
+                self._record_switch(ctx, idx)
+                return None
 
-            except Exception as e:
-                if debug_mode:
-                    trigger_breakpoint(e)
-                    raise
-                if not isinstance(e, ResponseError):
-                    response_error = ResponseError(sdk_name, model_name, exception=e, error_tag="")
-                else:
-                    response_error = e
-
-                # 只有当当前模型信息未被打印过时才打印
-                if (
-                    idx not in printed_model_indices
-                    and response_error.reported == False
-                    and not response_error.skip_report
-                ):
-                    print_line("=")
-                    print(base_model_info)
-                    printed_model_indices.add(idx)
-
-                error_message = response_error.get_error_message()
-                if self._should_stop_model_fallback(response_error, error_message):
-                    raise response_error
-
-                # 检查是否是API密钥用尽异常或达到最大重试次数
-                error_msg = response_error.get_error_message()
-                model_key = f"{sdk_name}_{model_name}"
-
-                if error_msg == 'API_KEY_EXHAUSTED':
-                    # API密钥用尽，直接删除模型
-                    self.logger.error(f"{model_key} API密钥 已用完")
-                    self._remove_model(sdk_name, model_name)
+        # 验证逻辑
+        if ctx.validate_func is not None:
+            try:
+                with start_span("llmakits.validate") as span:
+                    is_valid, validated_value = ctx.validate_func(return_message)
+                    span.set_attribute("llmakits.valid", bool(is_valid))
+            except Exception:
+                model_stats.record_validation(False)
+                raise
+            model_stats.record_validation(bool(is_valid))
+
+            if not is_valid:
+                self._print_attempt_failure(ctx, idx, "输出结果：条件校验失败, trying next model ...")
+                # 打印下一个模型的信息
+                self._record_switch(ctx, idx)
+                return None
+            return_message = validated_value
+        elif ctx.format_json:
+            model_stats.record_validation(True)
+
+        # 成功返回
+        self._store_cached_response(ctx, idx, raw_message, total_tokens)
+        return ExecutionResult(
+            return_message=return_message,
+            total_tokens=total_tokens,
+            last_tried_index=idx,
+            success=True,
+            stream_timing=getattr(total_tokens, "stream_timing", None),
+        )
+
+    def _handle_model_error(self, ctx: "_TaskContext", idx: int, e: Exception) -> Optional[ExecutionResult]:
+        """
+        处理单个模型调用中的异常
+
+        Returns:
+            ExecutionResult: 最后一个模型也失败时的失败结果
+            None: 继续尝试下一个模型
+        """
+        if isinstance(e, StreamAbortedError):
+            # 与接收完毕后的条件校验失败相同：记录校验失败，切换到下一个模型
+            self.model_stats.get(get_model_key(ctx.llm_models[idx])).record_validation(False)
+            self._print_attempt_failure(ctx, idx, f"流式输出：增量校验失败（{e.reason}）, trying next model ...")
+            self._record_switch(ctx, idx)
+            return None
+        if ctx.debug_mode:
+            trigger_breakpoint(e)
+            raise e
+        sdk_name, model_name = ctx.model_identity(idx)
+        if not isinstance(e, ResponseError):
+            response_error = ResponseError(sdk_name, model_name, exception=e, error_tag="")
+        else:
+            response_error = e
+
+        # 只有当当前模型信息未被打印过时才打印
+        if (
+            idx not in ctx.printed_model_indices
+            and response_error.reported == False
+            and not response_error.skip_report
+        ):
+            log_separator("=")
+            log_console(ctx.base_model_info(idx))
+            ctx.printed_model_indices.add(idx)
+
+        error_message = response_error.get_error_message()
+        if self._should_stop_model_fallback(response_error, error_message):
+            raise response_error
+
+        # 检查是否是API密钥用尽异常或达到最大重试次数
+        error_msg = response_error.get_error_message()
+        model_key = f"{sdk_name}_{model_name}"
+        error_label = self._error_label(response_error, error_msg)
+        event_fields = {"group": ctx.group_name, "model": get_model_key(ctx.llm_models[idx]), "error_tag": error_label}
+        self.metrics.inc("llmakits_errors_total", **event_fields)
+
+        if error_msg == 'API_KEY_EXHAUSTED':
+            # API密钥用尽，直接删除模型
+            log_event("api_key_exhausted", f"{model_key} API密钥 已用完", "error", self.logger, **event_fields)
+            with self._state_lock:
+                self._remove_model(sdk_name, model_name)
+                if model_key not in self.exhausted_models:
                     self.exhausted_models.append(model_key)
 
-                elif 'API_RETRY_REACHED' in error_msg or '执行时间超过' in error_msg:
-                    # 达到最大重试次数，计数达到3次才删除
+        elif error_msg == 'CIRCUIT_OPEN':
+            # 熔断中的模型未发出请求，直接尝试下一个模型
+            log_event("circuit_open", f"{model_key} 处于熔断状态，跳过", "warning", self.logger, **event_fields)
+
+        elif error_msg == 'API_KEY_QUOTA_RESERVED':
+            # 密钥都已接近当天额度（主动预留），只跳过本次调用，不移出模型组，跨天后自动恢复
+            log_event(
+                "api_key_quota_reserved", f"{model_key} API密钥 已接近当天额度，跳过", "warning", self.logger,
+                **event_fields,
+            )
+
+        elif 'API_RETRY_REACHED' in error_msg or '执行时间超过' in error_msg:
+            # 达到最大重试次数，失败窗口内累计达到阈值后熔断，冷却后放行探测请求
+            if idx in ctx.shared_failures:
+                # 合并请求的失败已由发起方计入熔断和重试计数，这里只切换模型
+                log_event(
+                    "retry_exhausted", f"{model_key} (合并的请求 触发 超时/重试)", "error", self.logger,
+                    coalesced=True, **event_fields,
+                )
+            else:
+                breaker = self.circuit_breakers.get(get_model_key(ctx.llm_models[idx]))
+                tripped = breaker.record_failure()
+                with self._state_lock:
                     self._retry_fail_count[model_key] = self._retry_fail_count.get(model_key, 0) + 1
                     fail_count = self._retry_fail_count[model_key]
-                    self.logger.error(f"{model_key} (第 {fail_count} 次 触发 超时/重试)")
-
-                    if fail_count >= 3:
-                        self._remove_model(sdk_name, model_name)
+                    if tripped and model_key not in self.retry_exhausted_models:
                         self.retry_exhausted_models.append(model_key)
-                        self.logger.error(f"{model_key} 已3次 触发 超时/重试，已从模型组中移除这个模型")
-                else:
-                    # 打印详细的错误信息
-                    if response_error.reported == False and not response_error.skip_report:
-                        self.logger.error(f"错误详情: {response_error.error_tag}\n{error_msg}")
-
-                if response_error.reported == False and not response_error.skip_report:
-                    print_line("=")
-                    response_error.reported = True
-
-                if idx < models_num - 1:
-                    print("model failed, trying next model ...")
-                    # 打印下一个模型的信息
-                    self._print_next_model_info(llm_models, idx, models_num, printed_model_indices)
-                    self.model_switch_count += 1
-                    continue
-                else:
-                    # 最后一个模型也失败了
-                    all_failed_error = self._build_all_models_failed_error(response_error)
-                    if return_detailed:
-                        return ExecutionResult(success=False, error=all_failed_error, last_tried_index=idx)
-                    raise all_failed_error
+                log_event(
+                    "retry_exhausted", f"{model_key} (第 {fail_count} 次 触发 超时/重试)", "error", self.logger,
+                    fail_count=fail_count, **event_fields,
+                )
+
+                if tripped:
+                    log_event(
+                        "circuit_tripped", f"{model_key} 多次 触发 超时/重试，已熔断 {breaker.cooldown} 秒", "error",
+                        self.logger, cooldown=breaker.cooldown, **event_fields,
+                    )
+        else:
+            # 打印详细的错误信息（已打印过的错误只写入结构化日志）
+            if response_error.reported == False and not response_error.skip_report:
+                content = f"错误详情: {response_error.error_tag}\n{error_msg}"
+            else:
+                content = None
+            log_event("model_error", content, "error", self.logger, error_message=error_msg, **event_fields)
+
+        if response_error.reported == False and not response_error.skip_report:
+            log_separator("=")
+            response_error.reported = True
+
+        # 密钥用尽、重试失败、图片域名策略等状态通常随模型出错而变化
+        self._autosave_state()
+
+        next_idx = ctx.next_index(idx)
+        if next_idx is not None:
+            log_event("model_switch", "model failed, trying next model ...", **event_fields)
+            # 打印下一个模型的信息
+            self._print_next_model_info(
+                ctx.llm_models, idx, ctx.models_num, ctx.printed_model_indices, next_idx=next_idx
+            )
+            self._increment_switch_count()
+            return None
+
+        # 最后一个模型也失败了
+        all_failed_error = self._build_all_models_failed_error(response_error)
+        return ExecutionResult(success=False, error=all_failed_error, last_tried_index=idx)
+
+    @staticmethod
+    def _attempt_span(ctx: "_TaskContext", idx: int):
+        """打开一次模型尝试的 span（未启用追踪时为空 span）"""
+        if not tracing_enabled():
+            return start_span("llmakits.attempt")
+        return start_span(
+            "llmakits.attempt",
+            {
+                "llmakits.group": ctx.group_name,
+                "llmakits.model": get_model_key(ctx.llm_models[idx]),
+                "llmakits.attempt": ctx.attempt_order.index(idx),
+            },
+        )
+
+    def _attempt(self, ctx: "_TaskContext", idx: int) -> Optional[ExecutionResult]:
+        """尝试一个模型：调用 + 结果处理，失败时交给 _handle_model_error"""
+        with self._attempt_span(ctx, idx) as span:
+            try:
+                return_message, total_tokens = self._call_model(ctx, idx)
+                span.set_attribute("llmakits.tokens", total_tokens)
+                result = self._settle_response(ctx, idx, return_message, total_tokens)
+            except Exception as e:
+                span.record_exception(e)
+                result = self._handle_model_error(ctx, idx, e)
+            span.set_attribute("llmakits.success", result is not None and result.success)
+            return result
+
+    @staticmethod
+    def _error_label(response_error: ResponseError, error_msg: str) -> str:
+        """错误类型标签：优先使用调度器识别的错误，其次是 error_tag，最后是原始异常类型"""
+        if error_msg in ("API_KEY_EXHAUSTED", "API_KEY_QUOTA_RESERVED", "CIRCUIT_OPEN"):
+            return error_msg
+        if "API_RETRY_REACHED" in error_msg:
+            return "API_RETRY_REACHED"
+        if "执行时间超过" in error_msg:
+            return "TimeoutError"
+        return response_error.error_tag or type(response_error.original_exception).__name__
+
+    @staticmethod
+    def _build_all_circuits_open_result(ctx: "_TaskContext") -> ExecutionResult:
+        """候选模型全部处于熔断状态时的失败结果"""
+        return ExecutionResult(
+            success=False,
+            error=Exception("All models failed. 所有候选模型均处于熔断状态"),
+            last_tried_index=ctx.models_num - 1,
+        )
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """对冲请求共用的线程池（按需创建）"""
+        with self._state_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=128, thread_name_prefix="llmakits-hedge")
+            return self._hedge_executor
+
+    def _call_model_observed(self, ctx: "_TaskContext", idx: int, policy: HedgePolicy) -> tuple[Any, int]:
+        """调用模型，并把成功响应的耗时记录到对冲策略中"""
+        start_time = time.monotonic()
+        with self._attempt_span(ctx, idx) as span:
+            result = self._call_model(ctx, idx)
+            span.set_attribute("llmakits.tokens", result[1])
+        policy.observe(time.monotonic() - start_time)
+        return result
+
+    @staticmethod
+    def _count_wasted_tokens(policy: HedgePolicy, future) -> None:
+        """被放弃的请求完成后，把它消耗的 token 计入浪费统计"""
+
+        def on_done(done_future):
+            if done_future.cancelled() or done_future.exception() is not None:
+                return
+            _, total_tokens = done_future.result()
+            policy.stats.add_wasted_tokens(total_tokens)
+
+        future.add_done_callback(on_done)
+
+    def _run_task_hedged(self, ctx: "_TaskContext", policy: HedgePolicy) -> ExecutionResult:
+        """
+        对冲模式执行任务：当前模型超过对冲延迟仍未返回时，并行请求下一个模型，
+        先通过校验的结果胜出；失败的模型按常规逻辑处理并立即尝试下一个模型
+        """
+        executor = self._get_hedge_executor()
+        pending: Dict[Any, int] = {}
+        attempt_order = ctx.attempt_order
+        next_position = 0  # attempt_order 中下一个待发出的位置
+        first_idx = attempt_order[0]
+        hedges_fired = 0
+        fallback_result: Optional[ExecutionResult] = None
+
+        def launch() -> bool:
+            nonlocal next_position
+            if next_position >= len(attempt_order) or ctx.is_unknown_model(attempt_order[next_position]):
+                next_position = len(attempt_order)
+                return False
+            idx = attempt_order[next_position]
+            future = executor.submit(self._call_model_observed, ctx, idx, policy)
+            pending[future] = idx
+            next_position += 1
+            return True
+
+        def finish(result: ExecutionResult) -> ExecutionResult:
+            # 放弃仍在进行中的请求，完成后统计其浪费的 token
+            for future in pending:
+                self._count_wasted_tokens(policy, future)
+            pending.clear()
+            hedge_won = result.success and result.last_tried_index != first_idx
+            policy.stats.record_request(hedges_fired, hedge_won)
+            if hedge_won:
+                self.metrics.inc("llmakits_hedge_wins_total", group=ctx.group_name)
+            return result
+
+        launch()
+        while pending:
+            delay = policy.get_delay() if next_position < len(attempt_order) else None
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # 超过对冲延迟仍未返回，把请求发给下一个模型
+                if launch():
+                    hedges_fired += 1
+                    self.metrics.inc("llmakits_hedges_total", group=ctx.group_name)
+                continue
+
+            for future in done:
+                idx = pending.pop(future)
+                try:
+                    return_message, total_tokens = future.result()
+                    result = self._settle_response(ctx, idx, return_message, total_tokens)
+                except Exception as e:
+                    try:
+                        result = self._handle_model_error(ctx, idx, e)
+                    except Exception:
+                        finish(ExecutionResult(success=False, last_tried_index=idx))
+                        raise
+
+                if result is not None and result.success:
+                    return finish(result)
+                if result is not None:
+                    # 失败结果（详细模式下的JSON解析失败 / 全部失败）：其他请求仍在进行时先保留
+                    fallback_result = result
+
+            if not pending and not launch():
+                break
+
+        if fallback_result is None:
+            fallback_result = ExecutionResult(
+                success=False, error=Exception("All models failed."), last_tried_index=ctx.models_num - 1
+            )
+        return finish(fallback_result)
+
+    def _run_task(self, ctx: "_TaskContext", start_index: int) -> ExecutionResult:
+        """按顺序尝试模型，始终返回 ExecutionResult（停止故障转移的异常除外）"""
+        invalid_result = self._check_start_index(start_index, ctx.models_num)
+        if invalid_result is not None:
+            return invalid_result
+
+        ctx.attempt_order = self._route(ctx, start_index)
+        if not ctx.attempt_order:
+            return self._build_all_circuits_open_result(ctx)
+
+        policy = self.hedge_policies.get(ctx.group_name) if ctx.group_name else None
+        if policy is not None and not ctx.debug_mode:
+            return self._run_task_hedged(ctx, policy)
+
+        # 从指定索引开始，按路由策略给出的顺序遍历
+        for idx in ctx.attempt_order:
+            # 如果是未知模型，直接结束循环
+            if ctx.is_unknown_model(idx):
+                break
+
+            result = self._attempt(ctx, idx)
+            if result is not None:
+                return result
 
         # 如果所有模型都失败（理论上不会到这里）
-        error = Exception("All models failed.")
-        if return_detailed:
-            return ExecutionResult(success=False, error=error, last_tried_index=models_num - 1)
-        raise error
+        return ExecutionResult(success=False, error=Exception("All models failed."), last_tried_index=ctx.models_num - 1)
 
-    def execute_with_group(
+    # 执行任务 - 多模型调度器支持故障转移和重试
+    def execute_task(
         self,
         message_info: Dict[str, Any],
-        group_name: str,
+        llm_models: List[Dict[str, Any]],
         format_json: bool = False,
         validate_func: Optional[Callable[[str], tuple[bool, Any]]] = None,
-        start_index: int = 0,
+        start_index: int = 0,  # 新增：起始索引
         return_detailed: bool = False,  # 是否返回详细结果
+        deadline: Union[Deadline, float, None] = None,
+        timeout_budget: Optional[float] = None,
+        stream_validator: Union[StreamValidator, StreamCheck, None] = None,
+        stream_json: Union[bool, Sequence[str]] = False,
     ) -> Union[tuple[Any, int], ExecutionResult]:
         """
-        使用内部model_groups执行任务
+        执行任务 - 多模型调度器支持故障转移和重试
 
         Args:
             message_info: 消息信息字典
-            group_name: 模型组名称
+            llm_models: LLM模型列表
             format_json: 是否格式化为JSON
             validate_func: 结果验证函数
-            start_index: 从第N个模型开始执行
+            start_index: 从第N个模型开始执行（默认0，即第一个）
+            return_detailed: 是否返回详细结果（ExecutionResult对象）
+            deadline: 调用时限，Deadline 对象或绝对时间戳（time.time()），到期后抛出 DeadlineExceededError
+            timeout_budget: 本次调用的总时间预算（秒），与 deadline 同时指定时取更早的一个
+            stream_validator: 流式输出的增量校验函数或 StreamValidator（仅 stream=True 的模型生效），
+                接收过程中判定输出不合格时提前终止，并切换到下一个模型
+            stream_json: 流式输出时，顶层 JSON 对象完整后即结束接收（仅 stream=True 的模型生效），
+                True 表示第一个完整的 JSON 对象，字段名列表表示包含这些字段的对象
 
         Returns:
             如果 return_detailed=False: (返回消息, token总数)
             如果 return_detailed=True: ExecutionResult对象
         """
+        ctx = self._build_task_context(
+            message_info,
+            llm_models,
+            format_json,
+            validate_func,
+            return_detailed,
+            deadline=Deadline.resolve(deadline, timeout_budget),
+            stream_validator=stream_validator,
+            stream_json=stream_json,
+        )
+        result = self._run_task(ctx, start_index)
+        return self._unwrap_result(result, return_detailed)
+
+    def _get_group_models(self, group_name: str) -> List[Dict[str, Any]]:
+        """获取模型组的模型列表（这些是缓存的模型实例，保持API密钥切换状态）"""
         if not self.model_groups:
             raise Exception("没有可用的模型组，请先初始化dispatcher")
 
-        # 获取模型列表（这些是缓存的模型实例，保持API密钥切换状态）
         llm_models = self.model_groups.get(group_name, [])
         if not llm_models:
             raise Exception(f"未找到模型组: {group_name}")
+        return llm_models
 
-        return self.execute_task(
+    def execute_with_group(
+        self,
+        message_info: Dict[str, Any],
+        group_name: str,
+        format_json: bool = False,
+        validate_func: Optional[Callable[[str], tuple[bool, Any]]] = None,
+        start_index: int = 0,
+        return_detailed: bool = False,  # 是否返回详细结果
+        deadline: Union[Deadline, float, None] = None,
+        timeout_budget: Optional[float] = None,
+        stream_validator: Union[StreamValidator, StreamCheck, None] = None,
+        stream_json: Union[bool, Sequence[str]] = False,
+    ) -> Union[tuple[Any, int], ExecutionResult]:
+        """
+        使用内部model_groups执行任务
+
+        Args:
+            message_info: 消息信息字典
+            group_name: 模型组名称
+            format_json: 是否格式化为JSON
+            validate_func: 结果验证函数
+            start_index: 从第N个模型开始执行
+            deadline: 调用时限，Deadline 对象或绝对时间戳（time.time()）
+            timeout_budget: 本次调用的总时间预算（秒），包括排队、重试、限流等待和模型切换
+            stream_validator: 流式输出的增量校验函数或 StreamValidator（仅 stream=True 的模型生效）
+            stream_json: 流式输出时，顶层 JSON 对象完整后即结束接收（True 或所需字段名列表）
+
+        Returns:
+            如果 return_detailed=False: (返回消息, token总数)
+            如果 return_detailed=True: ExecutionResult对象
+        """
+        llm_models = self._get_group_models(group_name)
+
+        ctx = self._build_task_context(
             message_info,
             llm_models,
             format_json,
             validate_func,
-            start_index=start_index,
-            return_detailed=return_detailed,
+            return_detailed,
+            group_name=group_name,
+            deadline=Deadline.resolve(deadline, timeout_budget),
+            stream_validator=stream_validator,
+            stream_json=stream_json,
+        )
+        result = self._run_group_task(ctx, start_index)
+        return self._unwrap_result(result, return_detailed)
+
+    def _run_group_task(self, ctx: "_TaskContext", start_index: int) -> ExecutionResult:
+        """在模型组舱壁内执行任务（未配置并发限制时直接执行）"""
+        bulkhead = self.bulkheads.get(ctx.group_name)
+        if bulkhead is None:
+            return self._run_task(ctx, start_index)
+        try:
+            with bulkhead.slot(self._queue_timeout(ctx)):
+                return self._run_task(ctx, start_index)
+        except BulkheadTimeoutError as e:
+            raise self._queue_deadline_error(ctx, e) from None
+
+    def stream_with_group(
+        self,
+        message_info: Dict[str, Any],
+        group_name: str,
+        start_index: int = 0,
+        deadline: Union[Deadline, float, None] = None,
+        timeout_budget: Optional[float] = None,
+        first_token_timeout: Optional[float] = 30.0,
+    ) -> GroupStream:
+        """
+        使用内部model_groups真流式执行任务，逐块产出文本增量
+
+        模型在首个 token 之前出错或卡住（first_token_timeout 内没有收到首个 token）时，关闭连接并切换到下一个模型，
+        调用方感知不到；首个 token 产出后不再切换模型，之后的错误直接抛出。迭代结束后 result 中有完整文本、
+        token 用量和计时（stream_timing）。
+
+        Args:
+            message_info: 消息信息字典
+            group_name: 模型组名称
+            start_index: 从第N个模型开始执行
+            deadline: 调用时限，Deadline 对象或绝对时间戳（time.time()）
+            timeout_budget: 本次调用的总时间预算（秒），包括排队、模型切换和接收全部输出
+            first_token_timeout: 每个模型等待首个 token 的最长时间（秒），None 表示不单独限制
+
+        Returns:
+            GroupStream: 文本增量迭代器；所有模型都失败时，第一次迭代抛出异常
+
+        Example:
+            >>> with dispatcher.stream_with_group(message_info, "chat") as stream:
+            ...     for delta in stream:
+            ...         print(delta, end="", flush=True)
+            >>> stream.result.stream_timing.ttft
+        """
+        llm_models = self._get_group_models(group_name)
+        ctx = self._build_task_context(
+            message_info,
+            llm_models,
+            False,
+            None,
+            False,
+            group_name=group_name,
+            deadline=Deadline.resolve(deadline, timeout_budget),
         )
+        return GroupStream(self._stream_group_task(ctx, start_index, first_token_timeout))
+
+    def _stream_group_task(
+        self, ctx: "_TaskContext", start_index: int, first_token_timeout: Optional[float]
+    ) -> Generator[str, None, ExecutionResult]:
+        """在模型组舱壁内真流式执行任务（舱壁名额保持到流结束）"""
+        bulkhead = self.bulkheads.get(ctx.group_name)
+        if bulkhead is None:
+            return (yield from self._stream_task(ctx, start_index, first_token_timeout))
+        try:
+            bulkhead.acquire(self._queue_timeout(ctx))
+        except BulkheadTimeoutError as e:
+            raise self._queue_deadline_error(ctx, e) from None
+        try:
+            return (yield from self._stream_task(ctx, start_index, first_token_timeout))
+        finally:
+            bulkhead.release()
+
+    def _stream_task(
+        self, ctx: "_TaskContext", start_index: int, first_token_timeout: Optional[float]
+    ) -> Generator[str, None, ExecutionResult]:
+        """按顺序尝试模型，首个 token 之前失败的模型交给 _handle_model_error 并切换到下一个模型"""
+        invalid_result = self._check_start_index(start_index, ctx.models_num)
+        if invalid_result is not None:
+            raise invalid_result.error  # type: ignore[misc]
+
+        ctx.attempt_order = self._route(ctx, start_index)
+        if not ctx.attempt_order:
+            raise self._build_all_circuits_open_result(ctx).error  # type: ignore[misc]
+
+        stream_start = time.monotonic()
+        send_kwargs = self._send_kwargs(ctx)
+        for idx in ctx.attempt_order:
+            if ctx.is_unknown_model(idx):
+                break
+
+            start_time = None
+            try:
+                self._check_deadline(ctx, idx)
+                self._acquire_circuit(ctx, idx)
+                start_time = time.monotonic()
+                deltas = ctx.llm_models[idx]["model"].stream_message(
+                    [], ctx.message_info, first_token_timeout=first_token_timeout, **send_kwargs
+                )
+                first_delta = next(deltas)
+            except DeadlineExceededError:
+                raise
+            except Exception as e:
+                if isinstance(e, StopIteration):
+                    sdk_name, model_name = ctx.model_identity(idx)
+                    e = ResponseError(
+                        sdk_name, model_name, exception=ValueError("empty stream"), error_tag="流式响应_内容为空"
+                    )
+                if start_time is not None:
+                    self._record_call_stats(ctx, idx, time.monotonic() - start_time, False)
+                result = self._handle_model_error(ctx, idx, e)
+                if result is not None:
+                    raise result.error  # type: ignore[misc]
+                continue
+
+            # 首个 token 已产出，之后不再切换模型
+            self.metrics.observe(
+                "llmakits_group_stream_ttft_seconds", time.monotonic() - stream_start, group=ctx.group_name
+            )
+            yield first_delta
+            try:
+                # 调用方提前关闭时 GeneratorExit 传给 deltas 关闭连接，不计入模型统计
+                return_message, total_tokens = yield from deltas
+            except Exception:
+                self._record_call_stats(ctx, idx, time.monotonic() - start_time, False)
+                raise
+            total_seconds = time.monotonic() - start_time
+            self._record_call_stats(ctx, idx, total_seconds, True, total_tokens)
+            if self.warning_time:
+                self._log_slow_call(ctx, idx, round(total_seconds, 2))
+            return ExecutionResult(
+                return_message=return_message,
+                total_tokens=total_tokens,
+                last_tried_index=idx,
+                success=True,
+                stream_timing=getattr(total_tokens, "stream_timing", None),
+            )
+
+        raise Exception("All models failed.")
+
+    @staticmethod
+    def _queue_timeout(ctx: "_TaskContext") -> Optional[float]:
+        """舱壁排队的超时时间：设置了调用时限时不超过剩余时间（None 表示使用舱壁自身的配置）"""
+        return ctx.deadline.remaining() if ctx.deadline is not None else None
+
+    @staticmethod
+    def _queue_deadline_error(ctx: "_TaskContext", error: BulkheadTimeoutError) -> Exception:
+        """排队超时是因为调用时限用完时，转换为 DeadlineExceededError"""
+        if ctx.deadline is not None and ctx.deadline.expired():
+            return ctx.deadline.exceeded()
+        return error
+
+    @staticmethod
+    def _default_batch_workers(llm_models: List[Dict[str, Any]]) -> int:
+        """默认并发数：模型组内不同 API 密钥的数量（至少1，最多64）"""
+        api_keys = set()
+        for model_info in llm_models:
+            model_client = model_info.get("model", None)
+            for api_key in getattr(model_client, "api_keys", None) or []:
+                api_keys.add((model_info.get("sdk_name", ""), api_key))
+        return min(max(len(api_keys), 1), 64)
+
+    def _run_batch_item(
+        self,
+        message_info: Dict[str, Any],
+        group_name: str,
+        format_json: bool,
+        validate_func: Optional[Callable[[str], tuple[bool, Any]]],
+    ) -> ExecutionResult:
+        """执行批量任务中的单个条目，任何异常都包装为失败的 ExecutionResult"""
+        try:
+            llm_models = self._get_group_models(group_name)
+            # 与 return_detailed=False 相同的故障转移策略（JSON解析失败也会切换模型），但保留详细结果
+            ctx = self._build_task_context(
+                message_info, llm_models, format_json, validate_func, False, group_name=group_name
+            )
+            return self._run_group_task(ctx, 0)
+        except Exception as e:
+            return ExecutionResult(success=False, error=e)
+
+    def imap_with_group(
+        self,
+        message_infos: Iterable[Dict[str, Any]],
+        group_name: str,
+        format_json: bool = False,
+        validate_func: Optional[Callable[[str], tuple[bool, Any]]] = None,
+        max_workers: Optional[int] = None,
+        ordered: bool = True,
+    ) -> Iterator[tuple[int, ExecutionResult]]:
+        """
+        使用线程池并发执行一批任务，逐个产出结果
+
+        Args:
+            message_infos: 消息信息字典的可迭代对象（按需读取，不会一次性全部提交）
+            group_name: 模型组名称
+            format_json: 是否格式化为JSON
+            validate_func: 结果验证函数
+            max_workers: 最大并发数，默认为模型组内不同 API 密钥的数量
+            ordered: True 按输入顺序产出；False 按完成顺序产出
+
+        Yields:
+            (输入索引, ExecutionResult)，单个条目失败不会中断整个批次
+        """
+        if max_workers is None:
+            max_workers = self._default_batch_workers(self._get_group_models(group_name))
+        max_workers = max(int(max_workers), 1)
+        max_pending = max_workers * 2  # 限制已提交未完成的任务数，避免大批量时占用过多内存
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llmakits-batch")
+        pending: Dict[Any, int] = {}
+        finished: Dict[int, ExecutionResult] = {}
+        next_index = 0  # ordered 模式下，下一个需要产出的输入索引
+        items = enumerate(message_infos)
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    try:
+                        index, message_info = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = executor.submit(self._run_batch_item, message_info, group_name, format_json, validate_func)
+                    pending[future] = index
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    if ordered:
+                        finished[index] = future.result()
+                    else:
+                        yield index, future.result()
+
+                while next_index in finished:
+                    yield next_index, finished.pop(next_index)
+                    next_index += 1
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def execute_batch(
+        self,
+        message_infos: Iterable[Dict[str, Any]],
+        group_name: str,
+        format_json: bool = False,
+        validate_func: Optional[Callable[[str], tuple[bool, Any]]] = None,
+        max_workers: Optional[int] = None,
+    ) -> List[ExecutionResult]:
+        """
+        并发执行一批任务，按输入顺序返回每个条目的 ExecutionResult
+
+        参数含义同 imap_with_group，单个条目失败时对应结果 success=False，error 保留异常。
+        """
+        return [
+            result
+            for _, result in self.imap_with_group(
+                message_infos, group_name, format_json, validate_func, max_workers=max_workers, ordered=True
+            )
+        ]
 
     def export_config(self, file_path: str = "dispatcher_config.json") -> None:
         """
@@ -13,11 +13,12 @@ JSON 错误 → 继续下一个模型
 """
 
 from .dispatcher import ModelDispatcher
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, Union
 from .utils.debug_utils import trigger_breakpoint
-from funcguard import print_line, print_block
+from .utils.event_log import log_event, log_console, log_separator
 from .utils.normalize_error import ResponseError
 from .utils.model_fallback import should_stop_model_fallback
+from .utils.deadline import Deadline
 
 
 def _get_model_info(dispatcher: ModelDispatcher, group_name: str, index: int) -> tuple[str, str, int]:
@@ -55,10 +56,10 @@ def _print_next_model_info(dispatcher: ModelDispatcher, group_name: str, current
 
     if current_idx + 1 < models_num:
         next_base_model_info = f"Next model : \n{current_idx+2}/{models_num} Model {next_sdk_name} : {next_model_name}"
-        print_line(".")
-        print(next_base_model_info)
+        log_separator(".")
+        log_event("next_model", next_base_model_info, group=group_name, model=f"{next_sdk_name}:{next_model_name}")
     else:
-        print("Next model does not exist.")
+        log_event("next_model", "Next model does not exist.", group=group_name)
 
 
 def _print_current_model_info(dispatcher: ModelDispatcher, group_name: str, current_idx: int) -> str:
@@ -83,6 +84,8 @@ def dispatcher_with_repair(
     group_name: str,
     validate_func: Optional[Callable[[str], tuple[bool, Any]]] = None,
     fix_json_config: Dict[str, Any] = {},
+    deadline: Union[Deadline, float, None] = None,
+    timeout_budget: Optional[float] = None,
 ) -> tuple[Any, int]:
     """
     任务执行与修复策略
@@ -104,6 +107,8 @@ def dispatcher_with_repair(
                 "system_prompt": "你是JSON修复专家...",
                 "example_json": '{"key": "value"}'  # 可选：JSON示例
             }
+        deadline: 调用时限，Deadline 对象或绝对时间戳（time.time()）
+        timeout_budget: 总时间预算（秒），主模型、重试和 JSON 修复共用同一个时限
 
     Returns:
         (返回消息, token总数)
@@ -123,9 +128,13 @@ def dispatcher_with_repair(
         message_info = dict(message_info or {})
         message_info["debug"] = True
 
+    deadline = Deadline.resolve(deadline, timeout_budget)
     current_index = 0
 
     while True:
+        if deadline is not None:
+            deadline.check()
+
         # 每次循环都重新获取模型总数，因为模型可能被删除
         total_models_main = len(dispatcher.model_groups[group_name])
 
@@ -141,6 +150,7 @@ def dispatcher_with_repair(
             validate_func=validate_func,
             start_index=current_index,
             return_detailed=True,
+            deadline=deadline,
         )
 
         # 成功！
@@ -162,7 +172,7 @@ def dispatcher_with_repair(
 
         # 失败处理，尝试修复（仅限 JSON 错误且有原始消息）
         if result.return_message and fix_json_config and "json_error" in error_message:
-            print("尝试修复JSON……")
+            log_event("json_repair_started", "尝试修复JSON……", group=group_name, repair_group=fix_json_config["group_name"])
             # 构造修复消息
             user_text = f"以下是一个格式错误的JSON字符串，请修复它：\n\n{result.return_message}"
 
@@ -196,13 +206,19 @@ def dispatcher_with_repair(
                     fix_json_config["group_name"],
                     format_json=True,
                     return_detailed=False,
+                    deadline=deadline,
                 )
                 fixed_message = repair_result[0]
                 repair_tokens = repair_result[1]
 
                 # 检查修复后的结果
-                print("修复后的JSON ：")
-                print(fixed_message)
+                log_event(
+                    "json_repaired",
+                    f"修复后的JSON ：\n{fixed_message}",
+                    group=group_name,
+                    repair_group=fix_json_config["group_name"],
+                    tokens=repair_tokens,
+                )
 
                 # 重要：修复后的结果需要再次验证，确保符合要求
                 if validate_func:
@@ -211,12 +227,14 @@ def dispatcher_with_repair(
                         return validated_result, repair_tokens
                     else:
                         current_model_info = _print_current_model_info(dispatcher, group_name, current_index)
-                        print_line("=")
-                        print(current_model_info)
+                        log_separator("=")
+                        log_console(current_model_info)
                         content = "修复后的JSON未通过验证, trying next model..."
-                        print_block(current_model_info, content)
+                        log_separator()
+                        log_event("json_repair_rejected", f"{current_model_info} :\n{content}", "warning", group=group_name)
+                        log_separator()
                         _print_next_model_info(dispatcher, group_name, current_index)
-                        print_line("=")
+                        log_separator("=")
                         # 验证失败，继续尝试下一个模型
                         current_index = result.last_tried_index + 1
                         continue
@@ -228,22 +246,29 @@ def dispatcher_with_repair(
                     trigger_breakpoint(e)
                     raise
                 current_model_info = _print_current_model_info(dispatcher, group_name, current_index)
-                print_line("=")
-                print(current_model_info)
-                print(f"修复JSON失败: {e}")
+                log_separator("=")
+                log_console(current_model_info)
+                log_event(
+                    "json_repair_failed", f"修复JSON失败: {e}", "warning", group=group_name, error_tag=type(e).__name__
+                )
                 _print_next_model_info(dispatcher, group_name, current_index)
-                print_line("=")
+                log_separator("=")
                 # 修复失败，自动 移动到下一个模型
                 current_index = result.last_tried_index + 1
                 continue
 
         elif "All models failed" not in error_message:
             current_model_info = _print_current_model_info(dispatcher, group_name, current_index)
-            print_line("=")
-            print(current_model_info)
-            print("model failed, trying next model ...")
+            log_separator("=")
+            log_console(current_model_info)
+            log_event(
+                "model_switch",
+                "model failed, trying next model ...",
+                group=group_name,
+                error_tag=response_error.error_tag,
+            )
             _print_next_model_info(dispatcher, group_name, current_index)
-            print_line("=")
+            log_separator("=")
             next_index = result.last_tried_index + 1
             # 防御性保护：避免 last_tried_index 异常导致回退到已尝试过的索引，进而进入无限循环
             current_index = next_index if next_index > current_index else current_index + 1
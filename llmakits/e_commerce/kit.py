@@ -2,8 +2,10 @@ from typing import List
 from .validators.string_validator import contains_chinese
 from ..message import extract_field
 from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.cost import track_kit
 
 
+@track_kit("translate_options")
 def translate_options(
     dispatcher: ModelDispatcher, title: str, options: List[str], to_lang: str, group_name: str, system_prompt: str
 ):
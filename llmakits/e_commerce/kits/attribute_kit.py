@@ -2,6 +2,7 @@ from typing import Callable, Any, Tuple
 from llmakits.dispatcher import ModelDispatcher
 from llmakits.message import extract_field
 from ..validators.value_validator import auto_validate
+from ...utils.cost import track_kit
 
 
 def _create_validate_func(choices: list) -> Callable[[str], Tuple[bool, Any]]:
@@ -51,6 +52,7 @@ def _create_validate_func(choices: list) -> Callable[[str], Tuple[bool, Any]]:
     return validate_func
 
 
+@track_kit("fill_attr")
 def fill_attr(dispatcher: ModelDispatcher, message_info: dict, group: str, choices: list):
     """
     填充属性值
@@ -65,5 +67,7 @@ def fill_attr(dispatcher: ModelDispatcher, message_info: dict, group: str, choic
         执行结果
     """
     validate_func = _create_validate_func(choices)
-    result, _ = dispatcher.execute_with_group(message_info, group, format_json=True, validate_func=validate_func)  # type: ignore
+    result, _ = dispatcher.execute_with_group(  # type: ignore
+        message_info, group, format_json=True, validate_func=validate_func, stream_json=["values"]
+    )
     return result
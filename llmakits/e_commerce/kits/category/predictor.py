@@ -4,6 +4,7 @@
 
 from typing import Any, Dict, List, Optional, Union
 from ....dispatcher import ModelDispatcher
+from ....utils.cost import track_kit
 from ...validators.value_validator import validate_dict
 from .utils import (
     standardize_category_format,
@@ -14,8 +15,10 @@ from .utils import (
 )
 from .validator import create_category_validate_func
 from ....utils.retry_handler import is_image_error
+from ....utils.event_log import log_event
 
 
+@track_kit("predict_cat")
 def predict_cat_direct(
     dispatcher: ModelDispatcher,
     product: dict,
@@ -65,13 +68,14 @@ def predict_cat_direct(
     except Exception as e:
         error_message = str(e)
         if image_url and is_image_error(error_message) and retry_without_image:
-            print("预测失败，尝试去掉图片后预测……")
+            log_event("category_retry_without_image", "预测失败，尝试去掉图片后预测……", "warning")
             message_info["include_img"] = False
             message_info["img_list"] = []
             return execute_prediction(dispatcher, message_info, "without_image", validate_func, fix_json_config)
         raise e
 
 
+@track_kit("predict_cat")
 def predict_cat_gradual(
     dispatcher: ModelDispatcher,
     product: dict,
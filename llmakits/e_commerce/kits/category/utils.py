@@ -5,6 +5,7 @@
 from typing import Any, Dict, List, Optional
 from ....dispatcher import ModelDispatcher
 from ....dispatcher_control import dispatcher_with_repair
+from ....utils.event_log import log_event
 
 
 def standardize_category_format(cat_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -14,7 +15,7 @@ def standardize_category_format(cat_data: List[Dict[str, Any]]) -> List[Dict[str
 
     # 处理字符串类型的情况（可能是从JSON解析失败后的字符串）
     if isinstance(cat_data, str):
-        print(f"警告: standardize_category_format接收到字符串而非列表: {cat_data[:50]}...")
+        log_event("category_format_invalid", f"警告: standardize_category_format接收到字符串而非列表: {cat_data[:50]}...", "warning")
         return []
 
     first_item = cat_data[0]
@@ -152,7 +153,7 @@ def execute_prediction(
     
     # 检查预测结果是否为空
     if not predict_results:
-        print("警告: 预测结果为空列表")
+        log_event("category_empty", "警告: 预测结果为空列表", "warning")
     
     return predict_results
 
@@ -178,7 +179,7 @@ def match_recall(
             if word.lower() in cat_name.lower():
                 matched_results.append(category)
                 break
-    print(f"通过split分割，匹配到 {len(matched_results)} 个类目")
+    log_event("category_split_matched", f"通过split分割，匹配到 {len(matched_results)} 个类目", matched=len(matched_results))
     return matched_results
 
 
@@ -208,6 +209,6 @@ def match_recall_merge(
         if cat_id and cat_id not in seen_ids:
             seen_ids.add(cat_id)
             category_all.append(cat)
-    print(f"通过 match_recall_merge 合并，总计召回类目：{len(category_all)}")
+    log_event("category_recalled", f"通过 match_recall_merge 合并，总计召回类目：{len(category_all)}", recalled=len(category_all))
 
     return category_all
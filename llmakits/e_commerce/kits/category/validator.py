@@ -6,6 +6,7 @@ from typing import Any, Callable, Dict, List, Tuple
 
 from ...validators.value_validator import validate_dict
 from .utils import standardize_category_format
+from ....utils.event_log import log_event
 
 
 def create_category_validate_func(category_all: List[Dict[str, Any]]) -> Callable[[str], Tuple[bool, Any]]:
@@ -51,8 +52,12 @@ def create_category_validate_func(category_all: List[Dict[str, Any]]) -> Callabl
         else:
             # 如果标准化后的消息不为空，但没有验证通过的类目，则验证失败
             if standardized_message:
-                print("警告: 预测结果中，没有任何一个验证通过，以下是标准化后的预测结果（standardized_message）: ")
-                print(standardized_message)
+                log_event(
+                    "category_validation_failed",
+                    f"警告: 预测结果中，没有任何一个验证通过，以下是标准化后的预测结果（standardized_message）: \n{standardized_message}",
+                    "warning",
+                    candidates=len(standardized_message),
+                )
             return False, predict_results
 
     return validate_func
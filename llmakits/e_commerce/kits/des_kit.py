@@ -1,9 +1,12 @@
 from llmakits.dispatcher import ModelDispatcher
 from ..validators.html_validator import validate_html_fix
-from ..validators.string_validator import contains_chinese, remove_chinese
+from ..validators.string_validator import contains_chinese, remove_chinese, chinese_stream_check
 from ...message import extract_field
+from ...utils.event_log import log_event
+from ...utils.cost import track_kit
 
 
+@track_kit("generate_html")
 def generate_html(
     dispatcher: ModelDispatcher,
     product_info: str,
@@ -36,14 +39,22 @@ def generate_html(
                 if chinese_count > 5:
                     return False, None
                 else:
-                    print(f"移除中文字符……")
+                    log_event("description_remove_chinese", "移除中文字符……")
                     html_string = remove_chinese(html_string)
         des_html = validate_html_fix(dispatcher, html_string, allowed_tags, fix_group, fix_prompt)  # type: ignore
         return True, des_html
 
+    # 流式输出时，html 中的中文超过 5 个（validate_func 必然判定失败）就提前终止，不再等待生成结束
+    stream_validator = None if allow_chinese else chinese_stream_check(max_count=5, field="html")
+
     message_info = {"system_prompt": generate_prompt, "user_text": product_info}
     des_html, _ = dispatcher.execute_with_group(  # pyright: ignore[reportAssignmentType]
-        message_info, generate_group, format_json=True, validate_func=validate_func
+        message_info,
+        generate_group,
+        format_json=True,
+        validate_func=validate_func,
+        stream_validator=stream_validator,
+        stream_json=["html"],
     )
 
     return des_html
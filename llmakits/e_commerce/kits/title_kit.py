@@ -1,6 +1,8 @@
 from ...message import extract_field
 from ...dispatcher import ModelDispatcher
 from ..validators import remove_chinese
+from ...utils.event_log import log_event
+from ...utils.cost import track_kit
 
 
 def check_title(title: str, max_length: int, min_length: int = 10, min_word: int = 2) -> bool:
@@ -37,6 +39,7 @@ def shorten_title(title, target_length=100, split_char=" "):
     return " ".join(words)
 
 
+@track_kit("generate_title")
 def generate_title(
     dispatcher: ModelDispatcher,
     title: str,
@@ -64,7 +67,7 @@ def generate_title(
     :param allow_chinese: 是否允许中文标题
     :return: 符合要求的标题
     """
-    print("检测商品标题……")
+    log_event("title_check", "检测商品标题……", max_length=max_length)
     if not allow_chinese:
         title = remove_chinese(title)
     if title and check_title(title, max_length, min_length, min_word):
@@ -87,18 +90,20 @@ def generate_title(
     try_max_length = max_length  # 在循环前初始化
     for attempt in range(1, max_attempts + 1):
 
-        print(f"第 {attempt} 次修改中……")
+        log_event("title_rewrite", f"第 {attempt} 次修改中……", attempt=attempt)
         title_length = len(best_title)
         if title_length > max_length:
             try_max_length -= 5  # 每次尝试减少最大长度限制
         else:
             try_max_length = max_length
         message_info = build_message_info(best_title, title_length, try_max_length)
-        best_title, _ = dispatcher.execute_with_group(message_info, group_name, format_json=True, validate_func=validate_func)  # type: ignore
+        best_title, _ = dispatcher.execute_with_group(  # type: ignore
+            message_info, group_name, format_json=True, validate_func=validate_func, stream_json=["title"]
+        )
         if not allow_chinese:
             best_title = remove_chinese(best_title)
         if check_title(best_title, max_length, min_length, min_word):  # type: ignore
             return best_title  # type: ignore
 
-    print("程序性缩减标题……")
+    log_event("title_shorten", "程序性缩减标题……", max_length=max_length)
     return shorten_title(best_title, max_length)
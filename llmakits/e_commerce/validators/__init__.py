@@ -3,16 +3,24 @@
 包含HTML验证、字符串验证、值验证等功能
 """
 
-from .html_validator import check_allowed_tags
-from .string_validator import contains_chinese, remove_chinese, contains_special_symbols, remove_special_symbols
+from .html_validator import check_allowed_tags, allowed_tags_stream_check
+from .string_validator import (
+    contains_chinese,
+    remove_chinese,
+    contains_special_symbols,
+    remove_special_symbols,
+    chinese_stream_check,
+)
 from .value_validator import validate_dict, validate_string
 
 __all__ = [
     'check_allowed_tags',
+    'allowed_tags_stream_check',
     'contains_chinese',
     'remove_chinese',
     'contains_special_symbols',
     'remove_special_symbols',
+    'chinese_stream_check',
     'validate_dict',
     'validate_string',
 ]
@@ -1,5 +1,8 @@
 import re
+from typing import Optional
 from ...dispatcher import ModelDispatcher
+from ...utils.event_log import log_event
+from ...utils.stream_validator import partial_json_string
 
 
 def check_allowed_tags(html_string: str, allowed_tags: set[str]):
@@ -26,6 +29,29 @@ def check_allowed_tags(html_string: str, allowed_tags: set[str]):
     return unallowed_tags
 
 
+def allowed_tags_stream_check(allowed_tags: set[str], field: Optional[str] = None):
+    """
+    构建流式输出的增量校验函数，已生成的内容中出现未被允许的标签时判定不合格。
+
+    Args:
+        allowed_tags: 允许使用的标签集合
+        field: JSON 字段名，指定时只检查该字段已生成的部分
+
+    Returns:
+        校验函数，可作为 execute_with_group 的 stream_validator
+    """
+
+    def check(html_string: str):
+        if field:
+            html_string = partial_json_string(html_string, field)
+        unallowed_tags = check_allowed_tags(html_string, allowed_tags)
+        if unallowed_tags:
+            return False, f"发现未被允许的标签: {', '.join(sorted(unallowed_tags))}"
+        return True
+
+    return check
+
+
 def check_tag_closing(html_string: str):
     """
     检查HTML字符串中的标签是否正确闭合。
@@ -112,7 +138,7 @@ def validate_html(html_string: str, allowed_tags: set[str]):
 
     # 返回结果
     if error_messages:
-        print(error_messages)
+        log_event("html_invalid", str(error_messages), "warning", errors=len(error_messages))
         return False, '; '.join(error_messages)
 
     return True, ""
@@ -1,4 +1,7 @@
 import regex
+from typing import Optional
+from ...utils.event_log import log_event
+from ...utils.stream_validator import partial_json_string
 
 
 # 判断字符串中是否包含汉字
@@ -24,7 +27,7 @@ def contains_chinese(text, simple_check=True):
         matches = regex.findall(r'\p{IsHan}', text)
         chinese_count = len(matches)
         if chinese_count > 0:
-            print(f"发现中文字符: {repr(''.join(matches))} (数量: {chinese_count})")
+            log_event("chinese_found", f"发现中文字符: {repr(''.join(matches))} (数量: {chinese_count})", count=chinese_count)
             # print(f"字符详情: {[(i, repr(char), ord(char)) for i, char in enumerate(matches)]}")
         return chinese_count
 
@@ -70,7 +73,7 @@ def contains_special_symbols(text, simple_check=True, support_multilingual=True)
     else:
         # 查找所有特殊符号并返回数量
         matches = regex.findall(pattern, text)
-        print(f"发现特殊符号: {''.join(matches)}")
+        log_event("special_symbols_found", f"发现特殊符号: {''.join(matches)}", count=len(matches))
         return len(matches)
 
 
@@ -95,3 +98,27 @@ def remove_special_symbols(text, support_multilingual=True):
         # 排除：.,!?;:'"()[]{}<>-_=+*/\|@#$%^&`~
         pattern = r'[^\w\s.,!?;:\'"()\[\]{}<>\-_=+*/\\|@#$%^&`~]'
     return regex.sub(pattern, '', text)
+
+
+# 流式输出的增量校验：中文字符过多时提前终止
+def chinese_stream_check(max_count=0, field: Optional[str] = None):
+    """
+    构建流式输出的增量校验函数，已生成的内容中汉字超过 max_count 个时判定不合格。
+
+    参数:
+        max_count: 允许的汉字数量，默认为0
+        field: JSON 字段名，指定时只检查该字段已生成的部分（避免把 JSON 之外的说明文字计入）
+
+    返回:
+        校验函数，可作为 execute_with_group 的 stream_validator
+    """
+
+    def check(text):
+        if field:
+            text = partial_json_string(text, field)
+        chinese_count = len(regex.findall(r'\p{IsHan}', text))
+        if chinese_count > max_count:
+            return False, f"中文字符数量 {chinese_count} 超过 {max_count}"
+        return True
+
+    return check
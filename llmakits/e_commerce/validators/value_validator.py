@@ -1,4 +1,12 @@
 from typing import Any, Dict, List, Union
+from ...utils.event_log import log_event
+
+
+def _log_no_match(search_data: Any, choices: List[Any]) -> None:
+    """记录未找到匹配项（choices 较少时一并输出）"""
+    log_event("choice_not_found", f"未找到匹配项: {search_data}", "warning", choices=len(choices))
+    if len(choices) < 30:
+        log_event("choice_candidates", f"choices: {choices}", "debug")
 
 
 def validate_dict(choices: List[Dict[str, Any]], search_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -33,9 +41,7 @@ def validate_dict(choices: List[Dict[str, Any]], search_data: Dict[str, Any]) ->
                 return item
 
     # 未找到匹配项
-    print(f"未找到匹配项: {search_data}")
-    if len(choices) < 30:
-        print(f"choices: {choices}")
+    _log_no_match(search_data, choices)
 
     return {}
 
@@ -53,9 +59,7 @@ def validate_string(choices: List[str], search_value: str):
         return search_value
 
     # 未找到匹配项
-    print(f"未找到匹配项: {search_value}")
-    if len(choices) < 30:
-        print(f"choices: {choices}")
+    _log_no_match(search_value, choices)
     return None
 
 
@@ -71,7 +75,7 @@ def auto_validate(choices: List[Any], search_data: Any) -> Union[Dict[str, Any],
         匹配到的值：字典验证返回Dict，字符串验证返回str，未找到返回None
     """
     if not choices:
-        print("choices 为空列表")
+        log_event("choices_empty", "choices 为空列表", "warning")
         return None
 
     # 根据列表第一个元素的类型选择验证器
@@ -80,17 +84,17 @@ def auto_validate(choices: List[Any], search_data: Any) -> Union[Dict[str, Any],
     if isinstance(first_item, dict):
         # 字典类型验证
         if not isinstance(search_data, dict):
-            print(f"字典类型验证需要search_data为字典，实际类型: {type(search_data)}")
+            log_event("search_data_type_error", f"字典类型验证需要search_data为字典，实际类型: {type(search_data)}", "warning")
             return None
         return validate_dict(choices, search_data)
 
     elif isinstance(first_item, str):
         # 字符串类型验证
         if not isinstance(search_data, str):
-            print(f"字符串类型验证需要search_data为字符串，实际类型: {type(search_data)}")
+            log_event("search_data_type_error", f"字符串类型验证需要search_data为字符串，实际类型: {type(search_data)}", "warning")
             return None
         return validate_string(choices, search_data)
 
     else:
-        print(f"不支持的列表元素类型: {type(first_item)}")
+        log_event("choices_type_error", f"不支持的列表元素类型: {type(first_item)}", "warning")
         return None
@@ -1,14 +1,51 @@
+import time
+import asyncio
+import inspect
+import threading
 import httpx
 import pandas as pd
-from typing import Optional, Union, Any, Tuple
+from typing import Optional, Union, Any, Tuple, Dict, Generator
 from .utils.debug_utils import trigger_breakpoint
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from zai import ZhipuAiClient
 
 from .utils.retry_handler import RetryHandler
+from .utils.key_pool import KeyPool
+from .utils.key_quota import KeyQuota, get_key_quota, pick_quota_limits
+from .utils.shared_state import EXHAUSTED_KEYS, get_shared_state, seconds_until_midnight
+from .utils.state_store import fingerprint_key
+from .utils.deadline import Deadline, DeadlineExceededError
+from .utils.metrics import get_metrics_registry, mask_key
+from .utils.tracing import start_span
+from .utils.event_log import log_event
+from .utils.cost import TokenUsage
+from .utils.stream_validator import StreamAbortedError, StreamValidator, get_stream_stats
+from .utils.stream_json import JsonObjectScanner
+from .utils.stream_timing import StreamAccumulator
+from .utils.http_timeouts import (
+    HttpTimeouts,
+    TotalTimeout,
+    default_timeout,
+    make_http_timeouts,
+    request_timeouts,
+    timeout_message,
+    timeout_phase,
+)
+from .utils.http_pool import HttpPoolOptions, get_async_http_client, get_http_client, make_pool_options
+from .utils.rate_limiter import (
+    KeyRateLimiter,
+    RatePermit,
+    estimate_tokens,
+    get_rate_limiter,
+    normalize_api_keys,
+    pick_rate_limits,
+)
 from .utils.normalize_error import ResponseError
 from .message import prepare_request_data
-from funcguard import print_line, timeout_handler
+from funcguard import print_line
+
+# 已知支持 stream_options.include_usage 的平台，其余平台需要在配置中设置 stream_usage 才会发送
+STREAM_USAGE_PLATFORMS = ("openai", "dashscope", "dashscope_openai")
 
 
 def _get_delta_content(delta: Any) -> Any:
@@ -28,89 +65,588 @@ class BaseClient:
         self.top_p = 0.1
         self.stream = False  # 是否流式输出，默认为 False，可选为 True
         self.stream_real = False  # 是否真的流式输出
+        self.stream_usage = False  # 流式请求是否通过 stream_options.include_usage 请求返回 usage
         self.client: Optional[Union[OpenAI, ZhipuAiClient]] = None  # 由子类初始化
+        self.async_client: Optional[AsyncOpenAI] = None  # 异步客户端，首次异步调用时创建
         self.extra_body = {}  # 额外的参数
+        self.timeouts = HttpTimeouts()  # 请求的连接 / 首字节 / 读取 / 总超时，由 httpx 传输层执行
+        self.input_price: Optional[float] = None  # 输入单价（每百万 token），来自 global_model_config
+        self.output_price: Optional[float] = None  # 输出单价（每百万 token）
         self.debug = False
 
         # 初始化重试处理器
         self.retry_handler = RetryHandler(self.platform, self.model_name)
 
-    def switch_api_key(self):
+    def switch_api_key(self, failed_key: Optional[str] = None):
         """切换API密钥（子类可覆盖）"""
         return False
 
-    def send_message(self, messages, message_info=None):
-        """发送消息的主方法"""
-        debug = bool(self.debug) or bool((message_info or {}).get("debug", False))
+    def _current_client(self) -> Tuple[Optional[str], Any]:
+        """返回本次请求使用的 (api_key, client)，子类可加锁保证两者一致"""
+        return getattr(self, "api_key", None), self.client
+
+    def _release_key(self, api_key: Optional[str]) -> None:
+        """请求结束后归还 _current_client 选出的密钥（子类可覆盖）"""
+        return
+
+    def _get_rate_limiter(self, api_key: Optional[str]) -> Optional[KeyRateLimiter]:
+        """返回密钥对应的限流器，未配置限流时返回 None（子类可覆盖）"""
+        return None
+
+    def _get_key_quota(self, api_key: Optional[str]) -> Optional[KeyQuota]:
+        """返回密钥的每日额度，未配置额度时返回 None（子类可覆盖）"""
+        return None
+
+    def _key_index(self, api_key: Optional[str]) -> int:
+        """密钥在配置中的序号（用于追踪属性，不暴露密钥本身），未知时返回 -1（子类可覆盖）"""
+        return -1
+
+    def _record_quota(self, quota: Optional[KeyQuota], used_key: Optional[str], tokens: Optional[int] = None) -> None:
+        """把请求数（tokens 为 None 时）或 token 用量计入密钥的每日额度，刚接近额度时报告密钥轮换"""
+        if quota is None:
+            return
+        reached = quota.record_request() if tokens is None else (bool(tokens) and quota.record_tokens(tokens))
+        if reached:
+            log_event(
+                "api_key_quota_reached",
+                f"密钥 {mask_key(used_key)} 接近当天额度，后续请求切换到其他密钥",
+                "warning",
+                model=f"{self.platform}:{self.model_name}",
+                key=mask_key(used_key),
+                **quota.remaining(),
+            )
+
+    def _send_span(self, messages, used_key: Optional[str]):
+        """打开网络请求的 span，只在追踪启用时计算请求大小"""
+        span = start_span("llmakits.send")
+        if span.is_recording():
+            span.set_attributes(
+                {
+                    "llmakits.model": f"{self.platform}:{self.model_name}",
+                    "llmakits.key_index": self._key_index(used_key),
+                    "llmakits.request_bytes": len(str(messages).encode("utf-8")),
+                }
+            )
+        return span
+
+    def _record_key_request(self, used_key: Optional[str], latency: float, success: bool) -> None:
+        """记录单个密钥的请求数和耗时"""
+        metrics = get_metrics_registry()
+        model = f"{self.platform}:{self.model_name}"
+        key = mask_key(used_key)
+        status = "success" if success else "error"
+        metrics.inc("llmakits_key_requests_total", model=model, key=key, status=status)
+        metrics.observe("llmakits_key_latency_seconds", latency, model=model, key=key)
+
+    def _record_retry(self, used_key: Optional[str], action: str) -> None:
+        """记录 send_message 内部的一次重试或密钥切换"""
+        get_metrics_registry().inc(
+            "llmakits_retries_total", model=f"{self.platform}:{self.model_name}", key=mask_key(used_key), action=action
+        )
+
+    def _send_once(
+        self,
+        messages,
+        used_key: Optional[str],
+        client: Any,
+        deadline: Optional[Deadline] = None,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+    ) -> Tuple[Any, int]:
+        """在限流名额内发出一次请求并处理响应，排队和超时时间都收缩到调用时限的剩余时间以内"""
+        limiter = self._get_rate_limiter(used_key)
+        permit: Optional[RatePermit] = None
+        quota = self._get_key_quota(used_key)
+        total_tokens = 0
+        success = False
+        start_time = time.monotonic()
+        try:
+            if limiter is not None:
+                permit = limiter.acquire(estimate_tokens(messages), deadline)
+                start_time = time.monotonic()  # 请求耗时不含排队时间
+            self._record_quota(quota, used_key)
+            total_timeout = self._total_timeout(deadline)
+            with self._send_span(messages, used_key) as span:
+                # 创建聊天完成请求（超时由 httpx 传输层执行，到时关闭连接）
+                with request_timeouts(self.timeouts, self.stream, total_timeout):
+                    response = self._create_chat_completion(messages, client=client)
+
+                # 处理响应（流式接收同样受总时限限制）
+                result, total_tokens = self._handle_response(
+                    response,
+                    self.stream,
+                    self.stream_real,
+                    total_timeout,
+                    stream_validator,
+                    stream_json_fields,
+                    request_start=start_time,
+                )
+                span.set_attribute("llmakits.tokens", total_tokens)
+            success = True
+            return result, total_tokens
+        except Exception as e:
+            if deadline is not None and (deadline.expired() or isinstance(e, DeadlineExceededError)):
+                # 因调用时限收缩的超时、或限流排队超出调用时限，不计为模型超时
+                raise deadline.exceeded(self.platform, self.model_name) from e
+            timeout_error = self._timeout_error(e, start_time)
+            if timeout_error is not None:
+                raise timeout_error from e
+            raise
+        finally:
+            if permit is not None:
+                permit.release(total_tokens)
+            self._record_quota(quota, used_key, total_tokens)
+            self._release_key(used_key)
+            self._record_key_request(used_key, time.monotonic() - start_time, success)
+
+    async def _send_once_async(
+        self,
+        messages,
+        used_key: Optional[str],
+        deadline: Optional[Deadline] = None,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+    ) -> Tuple[Any, int]:
+        """_send_once 的异步版本，排队等待不阻塞事件循环"""
+        limiter = self._get_rate_limiter(used_key)
+        permit: Optional[RatePermit] = None
+        quota = self._get_key_quota(used_key)
+        total_tokens = 0
+        success = False
+        start_time = time.monotonic()
+        try:
+            if limiter is not None:
+                permit = await limiter.acquire_async(estimate_tokens(messages), deadline)
+                start_time = time.monotonic()
+            self._record_quota(quota, used_key)
+            total_timeout = self._total_timeout(deadline)
+            with self._send_span(messages, used_key) as span:
+                with request_timeouts(self.timeouts, self.stream, total_timeout):
+                    response = await self._create_chat_completion_async(messages, api_key=used_key)
+                result, total_tokens = await self._handle_response_async(
+                    response,
+                    self.stream,
+                    self.stream_real,
+                    total_timeout,
+                    stream_validator,
+                    stream_json_fields,
+                    request_start=start_time,
+                )
+                span.set_attribute("llmakits.tokens", total_tokens)
+            success = True
+            return result, total_tokens
+        except Exception as e:
+            if deadline is not None and (deadline.expired() or isinstance(e, DeadlineExceededError)):
+                raise deadline.exceeded(self.platform, self.model_name) from e
+            timeout_error = self._timeout_error(e, start_time)
+            if timeout_error is not None:
+                raise timeout_error from e
+            raise
+        finally:
+            if permit is not None:
+                permit.release(total_tokens)
+            self._record_quota(quota, used_key, total_tokens)
+            self._release_key(used_key)
+            self._record_key_request(used_key, time.monotonic() - start_time, success)
+
+    def _total_timeout(self, deadline: Optional[Deadline]) -> float:
+        """本次请求的总时限：模型的 total 超时，设置了调用时限时不超过剩余时间"""
+        return deadline.timeout(self.timeouts.total) if deadline is not None else self.timeouts.total
+
+    def _timeout_error(self, e: Exception, start_time: float) -> Optional[ResponseError]:
+        """httpx 的超时（含 SDK 包装后的超时）转换为 TimeoutError，其他异常返回 None"""
+        if isinstance(e, ResponseError):
+            return None
+        phase = timeout_phase(e)
+        if phase is None:
+            return None
+        exception = Exception(timeout_message(phase, time.monotonic() - start_time))
+        return ResponseError(self.platform, self.model_name, exception=exception, error_tag="TimeoutError")
+
+    def _stream_error(self, e: Exception, request_start: Optional[float]) -> ResponseError:
+        """流式接收中的异常：超时为“流式响应_超时”，其余为“流式响应_异常”"""
+        phase = timeout_phase(e)
+        if phase is not None:
+            elapsed = time.monotonic() - request_start if request_start is not None else 0.0
+            exception: Exception = Exception(timeout_message(phase, elapsed))
+            error_tag = "流式响应_超时"
+        else:
+            exception = e
+            error_tag = "流式响应_异常"
+        response_error = ResponseError(self.platform, self.model_name, exception=exception, error_tag=error_tag)
+        response_error.skip_report = True
+        return response_error
+
+    def _prepare_request(self, messages, message_info):
+        """预处理图片并构建请求数据"""
         if message_info is not None:
             message_info = self.retry_handler.preprocess_message_info(message_info)
+        return prepare_request_data(self.platform, messages, message_info)
+
+    def _resolve_send_error(
+        self,
+        e: Exception,
+        api_retry_count: int,
+        messages,
+        request_data,
+        wait: bool = True,
+        deadline: Optional[Deadline] = None,
+    ):
+        """
+        处理单次请求的异常，决定后续动作
+
+        Returns:
+            Tuple[str, Any]: (动作 "retry" 或 "switch_key", 更新后的messages对象)
+
+        Raises:
+            ResponseError: 不可重试的异常
+        """
+        if isinstance(e, (DeadlineExceededError, StreamAbortedError)):
+            # 调用时限用完、增量校验提前终止都不是请求错误，不重试
+            raise e
+
+        if not isinstance(e, ResponseError):
+            if "TimeoutError" in str(e):
+                error_tag = "TimeoutError"
+            else:
+                error_tag = "响应异常"
+            response_error = ResponseError(self.platform, self.model_name, exception=e, error_tag=error_tag)
+        else:
+            response_error = e
+
+        # 处理异常和重试逻辑
+        should_retry, messages, should_switch_key = self.retry_handler.handle_exception(
+            response_error, api_retry_count, messages, request_data, wait=wait, deadline=deadline
+        )
+
+        if should_switch_key:
+            return "switch_key", messages
+
+        if should_retry:
+            return "retry", messages
+
+        raise response_error
+
+    def _raise_api_key_exhausted(self):
+        if len(self.key_pool.exhausted_keys()) < len(self.key_pool.keys):
+            # 还有未用尽的密钥，只是都已接近当天额度（或被其他进程标记）：只跳过本次调用，跨天后自动恢复
+            error_tag = "所有API密钥都已接近当天额度"
+            exception = Exception("API_KEY_QUOTA_RESERVED")
+        else:
+            error_tag = "所有API密钥都已用尽"
+            exception = Exception("API_KEY_EXHAUSTED")
+        response_error = ResponseError(self.platform, self.model_name, exception=exception, error_tag=error_tag)
+        response_error.skip_report = True
+        raise response_error
+
+    def _raise_retry_reached(self, max_retries: int):
+        error_tag = "api_retry达到最大重试次数"
+        exception = Exception(f"API_RETRY_REACHED, MAXIMUM_RETRIES: {max_retries}")
+        response_error = ResponseError(self.platform, self.model_name, exception=exception, error_tag=error_tag)
+        response_error.skip_report = True
+        raise response_error
+
+    def send_message(
+        self,
+        messages,
+        message_info=None,
+        deadline: Optional[Deadline] = None,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+    ):
+        """
+        发送消息的主方法
+
+        Args:
+            messages: 消息列表
+            message_info: 消息信息
+            deadline: 调用时限，每次请求的超时时间和限流等待都收缩到剩余时间以内，
+                用完后抛出 DeadlineExceededError
+            stream_validator: 流式输出的增量校验器（仅 stream=True 时生效），
+                判定输出不合格时关闭流并抛出 StreamAbortedError
+            stream_json_fields: 流式输出时，包含这些字段的顶层 JSON 对象完整后即关闭流并返回该对象的文本
+                （空元组表示第一个完整的 JSON 对象），None 表示接收全部输出
+        """
+        debug = bool(self.debug) or bool((message_info or {}).get("debug", False))
 
         # 准备请求数据
-        messages, request_data = prepare_request_data(self.platform, messages, message_info)
+        messages, request_data = self._prepare_request(messages, message_info)
 
         # 执行重试逻辑
         self.retry_handler.api_key_error_reported = False
         max_retries = 4  # 考虑到 需要切换api key , 以及可能面临图片异常，设置为 4 比较合理
         api_retry_count = 0
 
-
         while api_retry_count < max_retries:
+            if deadline is not None:
+                deadline.check(self.platform, self.model_name)
 
-            try:
-                # 创建聊天完成请求
-                response = timeout_handler(self._create_chat_completion, args=(messages,), execution_timeout=180)
+            # 记录本次请求使用的密钥，切换时只淘汰这个密钥，避免并发线程重复切换
+            used_key, client = self._current_client()
 
-                # 处理响应
-                result, total_tokens = self._handle_response(response, self.stream, self.stream_real)
-                return result, total_tokens
+            try:
+                return self._send_once(messages, used_key, client, deadline, stream_validator, stream_json_fields)
 
             except Exception as e:
                 if debug:
                     trigger_breakpoint(e)
                     raise
 
-                if not isinstance(e, ResponseError):
-                    if "TimeoutError" in str(e):
-                        error_tag = "TimeoutError"
-                    else:
-                        error_tag = "响应异常"
-                    response_error = ResponseError(self.platform, self.model_name, exception=e, error_tag=error_tag)
-                else:
-                    response_error = e
-
-                # 处理异常和重试逻辑
-                should_retry, messages, should_switch_key = self.retry_handler.handle_exception(
-                    response_error, api_retry_count, messages, request_data
+                action, messages = self._resolve_send_error(
+                    e, api_retry_count, messages, request_data, deadline=deadline
                 )
+                self._record_retry(used_key, action)
 
-                if should_switch_key:
+                if action == "switch_key":
                     # 切换API密钥
-                    if not self.switch_api_key():
-                        error_tag = "所有API密钥都已用尽"
-                        exception = Exception("API_KEY_EXHAUSTED")
-                        response_error = ResponseError(
-                            self.platform, self.model_name, exception=exception, error_tag=error_tag
-                        )
-                        response_error.skip_report = True
-                        raise response_error
+                    if not self.switch_api_key(used_key):
+                        self._raise_api_key_exhausted()
                     api_retry_count = 0
                     continue
 
-                if should_retry:
-                    api_retry_count += 1
+                api_retry_count += 1
+
+        self._raise_retry_reached(max_retries)
+
+    async def send_message_async(
+        self,
+        messages,
+        message_info=None,
+        deadline: Optional[Deadline] = None,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+    ):
+        """
+        发送消息的异步版本，重试、切换密钥、图片降级和调用时限逻辑与 send_message 一致
+
+        网络请求使用 AsyncOpenAI，超时由 httpx 传输层执行，到时关闭连接；
+        图片下载/转换等阻塞操作放到线程中执行，避免阻塞事件循环。
+        """
+        if not self.supports_async():
+            # SDK 不支持异步客户端时，退回到线程中执行同步调用
+            return await asyncio.to_thread(
+                self.send_message, messages, message_info, deadline, stream_validator, stream_json_fields
+            )
+
+        debug = bool(self.debug) or bool((message_info or {}).get("debug", False))
+        include_img = bool((message_info or {}).get("include_img", False))
+
+        # 准备请求数据（含图片时可能需要下载，放到线程中执行）
+        if include_img:
+            messages, request_data = await asyncio.to_thread(self._prepare_request, messages, message_info)
+        else:
+            messages, request_data = self._prepare_request(messages, message_info)
+
+        self.retry_handler.api_key_error_reported = False
+        max_retries = 4
+        api_retry_count = 0
+
+        while api_retry_count < max_retries:
+            if deadline is not None:
+                deadline.check(self.platform, self.model_name)
+
+            used_key, _ = self._current_client()
+
+            try:
+                return await self._send_once_async(messages, used_key, deadline, stream_validator, stream_json_fields)
+
+            except Exception as e:
+                if debug:
+                    trigger_breakpoint(e)
+                    raise
+
+                # 限流等待改为异步 sleep，图片重试可能触发下载，放到线程中执行
+                if include_img:
+                    action, messages = await asyncio.to_thread(
+                        self._resolve_send_error, e, api_retry_count, messages, request_data, False, deadline
+                    )
+                else:
+                    action, messages = self._resolve_send_error(
+                        e, api_retry_count, messages, request_data, False, deadline
+                    )
+                self._record_retry(used_key, action)
+
+                if action == "switch_key":
+                    if not self.switch_api_key(used_key):
+                        self._raise_api_key_exhausted()
+                    api_retry_count = 0
                     continue
 
-                raise response_error
+                error_message = e.get_error_message() if isinstance(e, ResponseError) else str(e)
+                wait_seconds = self.retry_handler.get_rate_limit_wait_seconds(error_message, api_retry_count, request_data)
+                if wait_seconds > 0:
+                    if deadline is not None:
+                        deadline.ensure(wait_seconds, self.platform, self.model_name)
+                    await asyncio.sleep(wait_seconds)
+                api_retry_count += 1
 
-        error_tag = "api_retry达到最大重试次数"
-        exception = Exception(f"API_RETRY_REACHED, MAXIMUM_RETRIES: {max_retries}")
-        response_error = ResponseError(self.platform, self.model_name, exception=exception, error_tag=error_tag)
+        self._raise_retry_reached(max_retries)
+
+    def _stream_stalled(self, waited: float) -> ResponseError:
+        """流式请求在 first_token_timeout 内没有收到首个 token（消息保留“执行时间超过”字样，调度器据此计入熔断）"""
+        exception = Exception(f"TimeoutError：_stream_once 执行时间超过 {round(waited, 2)} 秒，未收到首个 token")
+        response_error = ResponseError(self.platform, self.model_name, exception=exception, error_tag="流式响应_超时")
         response_error.skip_report = True
-        raise response_error
+        return response_error
 
-    def _create_chat_completion(self, messages):
-        """创建聊天完成请求"""
-        if self.client is None:
+    def _stream_once(
+        self,
+        messages,
+        used_key: Optional[str],
+        client: Any,
+        deadline: Optional[Deadline] = None,
+        first_token_timeout: Optional[float] = None,
+    ) -> Generator[str, None, Tuple[str, TokenUsage]]:
+        """
+        在限流名额内发出一次真流式请求，逐块产出文本增量，结束时返回 (完整文本, 带计时的 token 用量)
+
+        首个 token 的等待交给 httpx 传输层：等待响应头和读取响应体的超时都收缩到 first_token_timeout 以内，
+        到时关闭连接，不需要后台线程。SDK 内部不再重试，卡住的模型由调度器切换。
+        """
+        limiter = self._get_rate_limiter(used_key)
+        permit: Optional[RatePermit] = None
+        quota = self._get_key_quota(used_key)
+        total_tokens = 0
+        success = False
+        start_time = time.monotonic()
+        response: Any = None
+        stream = StreamAccumulator(start_time)
+        usage: Optional[TokenUsage] = None
+        try:
+            if limiter is not None:
+                permit = limiter.acquire(estimate_tokens(messages), deadline)
+                start_time = time.monotonic()
+                stream = StreamAccumulator(start_time)
+            self._record_quota(quota, used_key)
+            stream_timeout = self._total_timeout(deadline)
+            timeouts = self.timeouts
+            first_token_at = start_time + stream_timeout
+            if first_token_timeout:
+                timeouts = timeouts._replace(
+                    first_byte=min(timeouts.first_byte, first_token_timeout),
+                    read=min(timeouts.read, first_token_timeout),
+                )
+                first_token_at = start_time + min(first_token_timeout, stream_timeout)
+            with_options = getattr(client, "with_options", None)
+            if with_options is not None:
+                client = with_options(max_retries=0)
+
+            with request_timeouts(timeouts, True, stream_timeout):
+                response = self._create_chat_completion(messages, client=client, stream=True)
+            for chunk in response:
+                now = time.monotonic()
+                if now - start_time > stream_timeout:
+                    raise TotalTimeout(f"stream exceeded total timeout of {stream_timeout:.2f}s")
+                chunk_usage = getattr(chunk, "usage", None)
+                if chunk_usage:
+                    usage = TokenUsage.from_usage(chunk_usage)
+                content = self._chunk_content(chunk)
+                if content:
+                    stream.add(content)
+                    yield content
+                elif not stream.chunks and now > first_token_at:
+                    # 只收到角色、心跳等空块，首个 token 仍未到达
+                    raise self._stream_stalled(now - start_time)
+            result, total_tokens = self._stream_completed("stream ended without content", stream, usage)
+            success = True
+            return result, total_tokens
+        except Exception as e:
+            if deadline is not None and (deadline.expired() or isinstance(e, DeadlineExceededError)):
+                raise deadline.exceeded(self.platform, self.model_name) from e
+            if stream.chunks and not isinstance(e, ResponseError):
+                # 调用方已收到部分输出，不再重试
+                raise self._stream_error(e, start_time) from e
+            if first_token_timeout and timeout_phase(e) == "read":
+                raise self._stream_stalled(time.monotonic() - start_time) from e
+            timeout_error = self._timeout_error(e, start_time)
+            if timeout_error is not None:
+                raise timeout_error from e
+            raise
+        finally:
+            # 正常结束、出错或调用方提前关闭：关闭连接，服务端随即停止生成
+            if response is not None:
+                self._close_stream(response)
+            if permit is not None:
+                permit.release(total_tokens)
+            self._record_quota(quota, used_key, total_tokens)
+            self._release_key(used_key)
+            self._record_key_request(used_key, time.monotonic() - start_time, success)
+
+    def stream_message(
+        self,
+        messages,
+        message_info=None,
+        deadline: Optional[Deadline] = None,
+        first_token_timeout: Optional[float] = None,
+    ) -> Generator[str, None, Tuple[str, TokenUsage]]:
+        """
+        真流式发送消息：逐块产出文本增量，结束时返回 (完整文本, 带计时的 token 用量)（即 StopIteration.value）
+
+        无论模型是否配置了 stream，都以流式请求发出。首个 token 之前的错误按 send_message 的规则重试、
+        切换密钥；首个 token 之后的错误直接抛出（调用方已收到部分输出）。
+
+        Args:
+            messages: 消息列表
+            message_info: 消息信息
+            deadline: 调用时限，同 send_message
+            first_token_timeout: 等待首个 token 的最长时间（秒，从发出请求算起），超时后关闭连接并抛出
+                ResponseError（不重试，由调度器切换模型）；None 表示只受 180 秒和调用时限限制
+        """
+        debug = bool(self.debug) or bool((message_info or {}).get("debug", False))
+        messages, request_data = self._prepare_request(messages, message_info)
+
+        self.retry_handler.api_key_error_reported = False
+        max_retries = 4
+        api_retry_count = 0
+
+        while api_retry_count < max_retries:
+            if deadline is not None:
+                deadline.check(self.platform, self.model_name)
+
+            used_key, client = self._current_client()
+            deltas = self._stream_once(messages, used_key, client, deadline, first_token_timeout)
+
+            try:
+                first_delta = next(deltas)
+
+            except Exception as e:
+                if debug:
+                    trigger_breakpoint(e)
+                    raise
+
+                action, messages = self._resolve_send_error(
+                    e, api_retry_count, messages, request_data, deadline=deadline
+                )
+                self._record_retry(used_key, action)
+
+                if action == "switch_key":
+                    if not self.switch_api_key(used_key):
+                        self._raise_api_key_exhausted()
+                    api_retry_count = 0
+                    continue
+
+                api_retry_count += 1
+                continue
+
+            # 已收到首个 token，之后的错误不再重试
+            yield first_delta
+            return (yield from deltas)
+
+        self._raise_retry_reached(max_retries)
+
+    def supports_async(self) -> bool:
+        """是否支持原生异步请求（子类可覆盖）"""
+        return False
+
+    async def _create_chat_completion_async(self, messages, api_key: Optional[str] = None):
+        """创建异步聊天完成请求（子类实现）"""
+        raise NotImplementedError
+
+    def _create_chat_completion(self, messages, client=None, stream: Optional[bool] = None):
+        """创建聊天完成请求，stream 为 None 时使用模型配置的 stream"""
+        if client is None:
+            client = self.client
+        if client is None:
             error_tag = "客户端未初始化"
             error_message = f"client 客户端未初始化，无法执行 _create_chat_completion ：{self.platform}"
             response_error = ResponseError(
@@ -118,15 +654,29 @@ class BaseClient:
             )
             raise response_error
 
-        return self.client.chat.completions.create(
+        stream = self.stream if stream is None else stream
+        return client.chat.completions.create(
                 messages=messages,  # type: ignore
                 model=self.model_name,
                 temperature=self.temperature,
                 top_p=self.top_p,
-                stream=self.stream,
+                stream=stream,
+                **self._stream_options(stream),
                 **self.extra_body,  # 传递额外的参数
             )
 
+    def _stream_options(self, stream: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        流式请求的 stream_options：请求平台在最后一块中返回 usage，流式输出也能统计 token。
+        stream_real 直接把原始流交给调用方，不改变其内容；extra_body 中已配置 stream_options 时以配置为准。
+        stream 显式传入时（stream_message 的真流式请求）不受 stream / stream_real 配置影响
+        """
+        if stream is None:
+            stream = self.stream and not self.stream_real
+        if not stream or not self.stream_usage or "stream_options" in self.extra_body:
+            return {}
+        return {"stream_options": {"include_usage": True}}
+
     def _extract_response_content(self, response: Any) -> Any:
         choices = getattr(response, "choices", None)
         if not choices:
@@ -155,15 +705,71 @@ class BaseClient:
         )
         raise response_error
 
-    def _process_stream_response(self, response):
-        result = ""
-        for chunk in response:
-            try:
-                content = self._extract_response_content(chunk)
-            except ResponseError:
-                continue
-            if content:
-                result += content
+    def _record_stream_cut(self, early_stop: bool, chars: int, elapsed: float) -> Dict[str, Any]:
+        """记录一次提前终止 / 提前结束，估算节省的 token 和时间，返回事件日志字段"""
+        model = f"{self.platform}:{self.model_name}"
+        stats = get_stream_stats(model)
+        if early_stop:
+            saved_tokens, saved_seconds = stats.record_early_stop(chars, elapsed)
+        else:
+            saved_tokens, saved_seconds = stats.record_abort(chars, elapsed)
+        metrics = get_metrics_registry()
+        metrics.inc("llmakits_stream_early_stops_total" if early_stop else "llmakits_stream_aborts_total", model=model)
+        if saved_tokens:
+            metrics.inc("llmakits_stream_saved_tokens_total", saved_tokens, model=model)
+        if saved_seconds:
+            metrics.inc("llmakits_stream_saved_seconds_total", saved_seconds, model=model)
+        return {
+            "model": model,
+            "chars": chars,
+            "elapsed": round(elapsed, 3),
+            "saved_tokens": saved_tokens,
+            "saved_seconds": round(saved_seconds, 3),
+        }
+
+    def _stream_aborted(self, reason: str, stream: StreamAccumulator) -> StreamAbortedError:
+        """记录一次增量校验提前终止，返回要抛出的异常"""
+        elapsed = stream.elapsed()
+        fields = self._record_stream_cut(False, stream.length, elapsed)
+        log_event(
+            "stream_aborted",
+            f"{fields['model']} 流式输出未通过增量校验（{reason}），已提前终止",
+            "warning",
+            reason=reason,
+            **fields,
+        )
+        return StreamAbortedError(self.platform, self.model_name, reason, stream.length, elapsed)
+
+    def _stream_result(self, stream: StreamAccumulator, usage: Optional[TokenUsage]) -> TokenUsage:
+        """结束计时并记录首 token 耗时、块间隔和解码吞吐，返回带计时的 token 用量"""
+        usage = usage if usage is not None else TokenUsage(0)
+        timing = stream.timing(usage.completion_tokens)
+        model = f"{self.platform}:{self.model_name}"
+        metrics = get_metrics_registry()
+        if timing.ttft is not None:
+            metrics.observe("llmakits_stream_ttft_seconds", timing.ttft, model=model)
+            metrics.observe("llmakits_stream_max_chunk_gap_seconds", timing.max_chunk_gap, model=model)
+        if timing.output_tokens and timing.tokens_per_second:
+            # 吞吐以两个计数器之比给出：rate(output_tokens) / rate(decode_seconds)
+            metrics.inc("llmakits_stream_output_tokens_total", timing.output_tokens, model=model)
+            metrics.inc(
+                "llmakits_stream_decode_seconds_total", timing.output_tokens / timing.tokens_per_second, model=model
+            )
+        return TokenUsage(int(usage), usage.prompt_tokens, usage.completion_tokens, stream_timing=timing)
+
+    def _stream_json_completed(
+        self, scanner: JsonObjectScanner, stream: StreamAccumulator, usage: Optional[TokenUsage]
+    ) -> Tuple[str, TokenUsage]:
+        """JSON 对象已完整：记录提前结束，返回对象文本"""
+        fields = self._record_stream_cut(True, stream.length, stream.elapsed())
+        log_event("stream_json_completed", f"{fields['model']} JSON 对象已完整，提前结束接收", "debug", **fields)
+        return scanner.text, self._stream_result(stream, usage)  # type: ignore[return-value]
+
+    def _stream_completed(
+        self, response, stream: StreamAccumulator, usage: Optional[TokenUsage]
+    ) -> Tuple[str, TokenUsage]:
+        """流式输出接收完毕：记录长度和耗时（作为估算提前终止节省量的基准），返回 (文本, token 用量)"""
+        result = stream.text()
         if not result:
             error_tag = "流式响应_内容为空"
             exception = ValueError(str(response))
@@ -171,13 +777,87 @@ class BaseClient:
                 self.platform, self.model_name, exception=exception, error_tag=error_tag
             )
             raise response_error
-        return result
+        get_stream_stats(f"{self.platform}:{self.model_name}").record_completed(len(result), stream.elapsed())
+        return result, self._stream_result(stream, usage)
+
+    def _chunk_content(self, chunk: Any) -> Any:
+        """流式块的文本内容（include_usage 的最后一块没有 choices，只带 usage，返回 None）"""
+        try:
+            return self._extract_response_content(chunk)
+        except ResponseError:
+            return None
+
+    def _consume_stream_chunk(
+        self,
+        chunk: Any,
+        stream: StreamAccumulator,
+        stream_validator: Optional[StreamValidator],
+        scanner: Optional[JsonObjectScanner],
+    ) -> Tuple[Optional[str], bool]:
+        """
+        处理一个流式块：累积内容、增量校验、增量提取 JSON
+
+        Returns:
+            (提前终止的原因, JSON 对象是否已完整)
+        """
+        content = self._chunk_content(chunk)
+        if not content:
+            return None, False
+        previous_length = stream.length
+        stream.add(content)
+        # 累积长度每跨过 check_chars 的一个整数倍校验一次
+        if stream_validator is not None and stream_validator.should_check(
+            previous_length - previous_length % stream_validator.check_chars, stream.length
+        ):
+            reason = stream_validator.check(stream.text())
+            if reason is not None:
+                return reason, False
+        return None, scanner is not None and scanner.feed(content)
+
+    def _process_stream_response(
+        self,
+        response,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+        request_start: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[str, TokenUsage]:
+        stream = StreamAccumulator(request_start)
+        scanner = JsonObjectScanner(stream_json_fields) if stream_json_fields is not None else None
+        usage: Optional[TokenUsage] = None
+        for chunk in response:
+            if timeout is not None and stream.elapsed() > timeout:
+                # 每块之间的等待由 read 超时限制，这里限制接收的总时间
+                self._close_stream(response)
+                raise TotalTimeout("total timeout exceeded while reading the stream")
+            chunk_usage = getattr(chunk, "usage", None)
+            if chunk_usage:
+                usage = TokenUsage.from_usage(chunk_usage)
+            reason, json_completed = self._consume_stream_chunk(chunk, stream, stream_validator, scanner)
+            if reason is not None:
+                # 关闭流，服务端随即停止生成
+                self._close_stream(response)
+                raise self._stream_aborted(reason, stream)
+            if json_completed:
+                self._close_stream(response)
+                return self._stream_json_completed(scanner, stream, usage)  # type: ignore[arg-type]
+        return self._stream_completed(response, stream, usage)
+
+    @staticmethod
+    def _close_stream(response) -> None:
+        close = getattr(response, "close", None)
+        if close is not None:
+            close()
 
     def _handle_response(
         self,
         response: Any,
         stream: bool,
         stream_real: bool,
+        timeout: float = 180,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+        request_start: Optional[float] = None,
     ) -> Tuple[Any, int]:
         """处理响应"""
 
@@ -196,38 +876,133 @@ class BaseClient:
                 result = response
             else:
                 try:
-                    # 使用 funcguard 处理超时，超时会抛出异常 TimeoutError
-                    result = timeout_handler(self._process_stream_response, args=(response,), execution_timeout=180)
+                    # 块之间的等待由 httpx 的 read 超时限制，接收的总时间不超过 timeout
+                    result, total_tokens = self._process_stream_response(
+                        response, stream_validator, stream_json_fields, request_start, timeout
+                    )
+                except StreamAbortedError:
+                    raise
                 except Exception as e:
-                    if "TimeoutError" in str(e):
-                        error_tag = "流式响应_超时"
-                    else:
-                        error_tag = "流式响应_异常"
-                    response_error = ResponseError(self.platform, self.model_name, exception=e, error_tag=error_tag)
-                    response_error.skip_report = True
-                    raise response_error
+                    raise self._stream_error(e, request_start) from e
         else:
             result = self._extract_response_content(response)
             usage = getattr(response, "usage", None)
             if usage:
-                total_tokens = getattr(usage, "total_tokens", 0)
+                total_tokens = TokenUsage.from_usage(usage)
 
         return result, total_tokens
 
 
+    async def _process_stream_response_async(
+        self,
+        response,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+        request_start: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[str, TokenUsage]:
+        stream = StreamAccumulator(request_start)
+        scanner = JsonObjectScanner(stream_json_fields) if stream_json_fields is not None else None
+        usage: Optional[TokenUsage] = None
+        async for chunk in response:
+            if timeout is not None and stream.elapsed() > timeout:
+                await self._close_stream_async(response)
+                raise TotalTimeout("total timeout exceeded while reading the stream")
+            chunk_usage = getattr(chunk, "usage", None)
+            if chunk_usage:
+                usage = TokenUsage.from_usage(chunk_usage)
+            reason, json_completed = self._consume_stream_chunk(chunk, stream, stream_validator, scanner)
+            if reason is not None:
+                await self._close_stream_async(response)
+                raise self._stream_aborted(reason, stream)
+            if json_completed:
+                await self._close_stream_async(response)
+                return self._stream_json_completed(scanner, stream, usage)  # type: ignore[arg-type]
+        return self._stream_completed(response, stream, usage)
+
+    @staticmethod
+    async def _close_stream_async(response) -> None:
+        close = getattr(response, "close", None)
+        if close is not None:
+            closing = close()
+            if inspect.isawaitable(closing):
+                await closing
+
+    async def _handle_response_async(
+        self,
+        response: Any,
+        stream: bool,
+        stream_real: bool,
+        timeout: float = 180,
+        stream_validator: Optional[StreamValidator] = None,
+        stream_json_fields: Optional[Tuple[str, ...]] = None,
+        request_start: Optional[float] = None,
+    ) -> Tuple[Any, int]:
+        """处理异步响应"""
+        if not stream or stream_real:
+            return self._handle_response(response, stream, stream_real)
+
+        try:
+            return await self._process_stream_response_async(
+                response, stream_validator, stream_json_fields, request_start, timeout
+            )
+        except StreamAbortedError:
+            raise
+        except Exception as e:
+            raise self._stream_error(e, request_start) from e
+
+
 # 定义 BaseOpenai 类
 class BaseOpenai(BaseClient):
 
-    def __init__(self, platform, base_url, api_keys, model_name, stream=False, stream_real=False, extra_body=None):
+    def __init__(
+        self,
+        platform,
+        base_url,
+        api_keys,
+        model_name,
+        stream=False,
+        stream_real=False,
+        extra_body=None,
+        rate_limits=None,
+        key_strategy="round_robin",
+        input_price=None,
+        output_price=None,
+        quota_limits=None,
+        stream_usage=None,
+        timeouts=None,
+        http_pool=None,
+    ):
         super().__init__(platform, model_name)
         self.base_url = base_url
-        self.api_keys = api_keys
-        self.request_timeout = 150  # 新增：API 请求超时时间
+        # api_keys 的每一项可以是密钥字符串，或带 key 字段和限流、权重等配置的字典
+        self.api_keys, self.key_options = normalize_api_keys(api_keys)
+        self.rate_limits = pick_rate_limits(rate_limits)  # 平台级限流配置：rpm / tpm / max_concurrency
+        self.quota_limits = pick_quota_limits(quota_limits)  # 平台级每日额度：daily_tokens / daily_requests
+        # 密钥池：按 round_robin / weighted / least_in_flight 把请求分摊到所有密钥，用尽的密钥只做标记，
+        # 接近当天额度、或已被其他进程标记为用尽的密钥暂时跳过
+        self._shared_key_names: Dict[str, str] = {}  # 密钥在共享状态中的名称（平台:密钥指纹）
+        key_weights = {key: options["weight"] for key, options in self.key_options.items() if options.get("weight")}
+        self.key_pool = KeyPool(
+            self.api_keys, strategy=key_strategy, weights=key_weights, quota_check=self._key_usable
+        )
+        # 每个密钥对应的同步 / 异步客户端：只保存密钥，HTTP 连接池由同一 base_url 的所有模型共用
+        self._clients: Dict[str, Any] = {}
+        self._async_clients: Dict[str, Tuple[httpx.AsyncClient, AsyncOpenAI]] = {}
+        # 连接 / 首字节 / 读取 / 总超时：connect_timeout / first_byte_timeout / read_timeout / total_timeout
+        self.timeouts = make_http_timeouts(timeouts)
+        # 连接池：max_connections / max_keepalive_connections / keepalive_expiry / http2
+        self.pool_options: HttpPoolOptions = make_pool_options(http_pool)
         self.max_retries = 3  # 新增：API 请求超时时间
 
         self.platform = platform
         self.stream = stream
         self.stream_real = stream_real
+        # 默认只对已知支持 stream_options 的平台请求流式 usage，避免不认识该参数的平台拒绝请求
+        self.stream_usage = (platform in STREAM_USAGE_PLATFORMS) if stream_usage is None else bool(stream_usage)
+        self.input_price = input_price
+        self.output_price = output_price
+        self._key_lock = threading.RLock()  # 保护 api_key / client 以及各密钥客户端的创建
 
         # 配置 extra_body 参数
         if extra_body is not None:
@@ -237,8 +1012,9 @@ class BaseOpenai(BaseClient):
         self._init_client()
 
     def _init_client(self):
-        """初始化客户端，使用第1个密钥"""
-        if not self.api_keys:
+        """初始化客户端，api_key / client 指向第1个未用尽的密钥"""
+        api_key = self.key_pool.primary_key()
+        if api_key is None:
             error_tag = "没有可用的API密钥"
             error_message = f"没有可用的API密钥，无法执行 _init_client ：{self.platform}"
             response_error = ResponseError(
@@ -246,26 +1022,182 @@ class BaseOpenai(BaseClient):
             )
             raise response_error
 
-        self.api_key = self.api_keys[0]
-        if self.platform == "zhipu":
-            # 新版 zai-sdk 使用 httpx 客户端配置超时
-            httpx_client = httpx.Client(timeout=self.request_timeout)
-            self.client = ZhipuAiClient(api_key=self.api_key, http_client=httpx_client)
-        else:
-            self.client = OpenAI(
-                api_key=self.api_key, base_url=self.base_url, timeout=self.request_timeout, max_retries=self.max_retries
-            )
+        with self._key_lock:
+            self.api_key = api_key
+            self.client = self._get_client(api_key)
+            async_entry = self._async_clients.get(api_key)
+            self.async_client = async_entry[1] if async_entry else None
 
-    def switch_api_key(self):
-        """切换API密钥并重新初始化客户端"""
-        api_keys_num = len(self.api_keys)
-        if api_keys_num >= 2:
-            self.api_keys.pop(0)  # 移除第一个密钥
-            print(f"移除已用完的密钥，剩余 {api_keys_num - 1} 个密钥")
-            self._init_client()
-            # print_line()
+    def _get_client(self, api_key: str) -> Any:
+        """获取（必要时创建）密钥对应的同步客户端"""
+        with self._key_lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                http_client = get_http_client(self.base_url, self.pool_options)
+                if self.platform == "zhipu":
+                    # 新版 zai-sdk 使用 httpx 客户端配置超时
+                    client = ZhipuAiClient(api_key=api_key, http_client=http_client)
+                else:
+                    client = OpenAI(
+                        api_key=api_key,
+                        base_url=self.base_url,
+                        timeout=default_timeout(self.timeouts),
+                        max_retries=self.max_retries,
+                        http_client=http_client,
+                    )
+                self._clients[api_key] = client
+            return client
+
+    def supports_async(self) -> bool:
+        """zai-sdk 没有异步客户端，其余平台使用 AsyncOpenAI"""
+        return self.platform != "zhipu"
+
+    def _current_client(self) -> Tuple[Optional[str], Any]:
+        """
+        从密钥池中为本次请求选出密钥
+
+        所有密钥都已用尽时抛出 API_KEY_EXHAUSTED；还有未用尽的密钥、只是都已接近当天额度时抛出 API_KEY_QUOTA_RESERVED
+        """
+        api_key = self.key_pool.select()
+        if api_key is None:
+            self._raise_api_key_exhausted()
+        return api_key, self._get_client(api_key)
+
+    def _release_key(self, api_key: Optional[str]) -> None:
+        self.key_pool.release(api_key)
+
+    def _key_index(self, api_key: Optional[str]) -> int:
+        keys = self.key_pool.keys
+        return keys.index(api_key) if api_key in keys else -1
+
+    def _get_rate_limiter(self, api_key: Optional[str]) -> Optional[KeyRateLimiter]:
+        """密钥级限流配置覆盖平台级配置；同一密钥在所有模型间共用一个限流器"""
+        if api_key is None:
+            return None
+        limits = {**self.rate_limits, **pick_rate_limits(self.key_options.get(api_key))}
+        return get_rate_limiter(self.platform, api_key, limits)
+
+    def _get_key_quota(self, api_key: Optional[str]) -> Optional[KeyQuota]:
+        """密钥级额度配置覆盖平台级配置；同一密钥在所有模型间共用一份额度"""
+        if api_key is None:
+            return None
+        limits = {**self.quota_limits, **pick_quota_limits(self.key_options.get(api_key))}
+        return get_key_quota(self.platform, api_key, limits)
+
+    def _shared_key_name(self, api_key: str) -> str:
+        name = self._shared_key_names.get(api_key)
+        if name is None:
+            name = self._shared_key_names[api_key] = f"{self.platform}:{fingerprint_key(api_key)}"
+        return name
+
+    def _key_usable(self, api_key: str) -> bool:
+        """
+        密钥当天还有额度，且没有被其他进程标记为用尽（启用共享状态时）
+
+        每次选择密钥都会调用：共享的用尽标记读取短时缓存（最多延迟 1 秒看到其他进程的标记），只做字典查找
+        """
+        quota = self._get_key_quota(api_key)
+        if quota is not None and not quota.has_quota():
+            return False
+        shared = get_shared_state()
+        return shared is None or self._shared_key_name(api_key) not in shared.cached_items(EXHAUSTED_KEYS)
+
+    def get_key_quotas(self) -> Dict[str, Dict[str, Any]]:
+        """各密钥当天的用量和剩余额度（密钥只显示末 4 位，未配置额度的密钥不返回）"""
+        quotas = {}
+        for api_key in self.api_keys:
+            quota = self._get_key_quota(api_key)
+            if quota is not None:
+                quotas[mask_key(api_key)] = quota.remaining()
+        return quotas
+
+    def _get_async_client(self, api_key: Optional[str] = None) -> AsyncOpenAI:
+        """获取（必要时创建）密钥对应的异步客户端，默认使用 api_key 指向的密钥；事件循环变化时换用新循环的连接池"""
+        with self._key_lock:
+            api_key = api_key or self.api_key
+            http_client = get_async_http_client(self.base_url, self.pool_options)
+            async_entry = self._async_clients.get(api_key)
+            if async_entry is not None and async_entry[0] is http_client:
+                async_client = async_entry[1]
+            else:
+                async_client = AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=self.base_url,
+                    timeout=default_timeout(self.timeouts),
+                    max_retries=self.max_retries,
+                    http_client=http_client,
+                )
+                self._async_clients[api_key] = (http_client, async_client)
+            if api_key == self.api_key:
+                self.async_client = async_client
+            return async_client
+
+    async def _create_chat_completion_async(self, messages, api_key: Optional[str] = None):
+        """创建异步聊天完成请求"""
+        return await self._get_async_client(api_key).chat.completions.create(
+            messages=messages,  # type: ignore
+            model=self.model_name,
+            temperature=self.temperature,
+            top_p=self.top_p,
+            stream=self.stream,
+            **self._stream_options(),
+            **self.extra_body,  # 传递额外的参数
+        )
+
+    def switch_api_key(self, failed_key: Optional[str] = None):
+        """
+        把用尽的密钥标记出密钥池，后续请求只使用剩余的密钥
+
+        Args:
+            failed_key: 触发切换的密钥，默认为 api_key。并发场景下同一密钥被重复标记时
+                不会产生副作用。
+
+        Returns:
+            bool: 是否还有可用的密钥
+        """
+        with self._key_lock:
+            failed_key = failed_key if failed_key is not None else self.api_key
+            newly_exhausted = failed_key not in self.key_pool.exhausted_keys()
+            shared = get_shared_state()
+            if shared is not None and failed_key in self.key_pool.keys:
+                # 通知其他进程：该密钥当天不再使用
+                shared.set(EXHAUSTED_KEYS, self._shared_key_name(failed_key), True, ttl=seconds_until_midnight())
+                shared.invalidate_cache(EXHAUSTED_KEYS)
+            has_available = self.key_pool.mark_exhausted(failed_key)
+            if not has_available:
+                return False
+            if newly_exhausted:
+                remaining = len(self.key_pool.available_keys())
+                log_event(
+                    "api_key_switched",
+                    f"标记已用完的密钥，剩余 {remaining} 个密钥",
+                    "warning",
+                    model=f"{self.platform}:{self.model_name}",
+                    key=mask_key(failed_key),
+                    remaining=remaining,
+                )
+            if self.api_key != self.key_pool.primary_key():
+                self._init_client()
             return True
-        return False
+
+    def restore_exhausted_keys(self, api_keys) -> int:
+        """
+        把（从持久化状态恢复的）密钥标记为用尽，不输出切换日志
+
+        Returns:
+            int: 新标记的密钥数量
+        """
+        with self._key_lock:
+            exhausted = set(self.key_pool.exhausted_keys())
+            restored = 0
+            for api_key in api_keys:
+                if api_key in self.key_pool.keys and api_key not in exhausted:
+                    self.key_pool.mark_exhausted(api_key)
+                    restored += 1
+            primary_key = self.key_pool.primary_key()
+            if primary_key is not None and primary_key != self.api_key:
+                self._init_client()
+            return restored
 
     def models_df(self):
         if self.client is None:
@@ -3,6 +3,10 @@ import pandas as pd
 from fnmatch import fnmatch
 from typing import Dict, Any, Optional
 from .llm_client import BaseOpenai
+from .utils.rate_limiter import pick_rate_limits
+from .utils.key_quota import pick_quota_limits
+from .utils.http_timeouts import TIMEOUT_FIELDS, pick_timeouts
+from .utils.http_pool import pick_pool_options
 
 
 def load_global_config(global_config_path: str) -> pd.DataFrame:
@@ -107,7 +111,8 @@ def parse_model_config(config_dict: Dict[str, Any]) -> Dict[str, Any]:
     解析模型配置，构建extra_body等参数
 
     参数处理规则：
-    1. stream, stream_real -> 直接放入params顶层
+    1. stream, stream_real, stream_usage, input_price, output_price -> 直接放入params顶层
+       connect_timeout, read_timeout, first_byte_timeout, total_timeout -> 放入params.timeouts
     2. extra_enable_thinking -> 放入extra_body.extra_body.enable_thinking
     3. reasoning_effort, response_format, thinking -> 直接放入extra_body
 
@@ -134,10 +139,20 @@ def parse_model_config(config_dict: Dict[str, Any]) -> Dict[str, Any]:
             continue
 
         # 处理流式输出参数
-        if key in ('stream', 'stream_real'):
+        if key in ('stream', 'stream_real', 'stream_usage'):
             params[key] = value
             continue
 
+        # 处理单价参数（每百万 token），用于成本统计和成本路由，不传给API
+        if key in ('input_price', 'output_price'):
+            params[key] = float(value)
+            continue
+
+        # 处理请求超时参数（秒），不传给API
+        if key in TIMEOUT_FIELDS:
+            params.setdefault('timeouts', {})[key] = float(value)
+            continue
+
         # 处理extra_前缀的参数（需要嵌套在extra_body中）
         if key.startswith('extra_'):
             real_key = key[len('extra_') :]
@@ -220,6 +235,11 @@ def load_models(models_config, model_keys, global_config=None):
             model_name = model_info["model_name"]
             base_url = model_keys[sdk_name]["base_url"]
             api_keys = model_keys[sdk_name]["api_keys"]
+            rate_limits = pick_rate_limits(model_keys[sdk_name])  # 平台级 rpm / tpm / max_concurrency
+            quota_limits = pick_quota_limits(model_keys[sdk_name])  # 平台级 daily_tokens / daily_requests
+            key_strategy = model_keys[sdk_name].get("key_strategy", "round_robin")  # 密钥选择策略
+            timeouts = pick_timeouts(model_keys[sdk_name])  # 平台级 connect / read / first_byte / total 超时
+            http_pool = pick_pool_options(model_keys[sdk_name])  # 同一 base_url 共用的连接池配置
 
             # 使用模型名称作为唯一标识符
             model_key = f"{sdk_name}:{model_name}"
@@ -236,11 +256,22 @@ def load_models(models_config, model_keys, global_config=None):
                     config_dict = find_model_config(global_config_df, sdk_name, model_name)
                     if config_dict:
                         model_params = parse_model_config(config_dict)
+                # 模型级超时（global_model_config）覆盖平台级超时
+                model_timeouts = {**timeouts, **model_params.pop("timeouts", {})}
 
                 # 创建新的模型实例，传入配置参数
                 # 注意：api_keys需要创建副本，避免多个模型共享同一个列表对象
                 mini_model = BaseOpenai(
-                    platform=sdk_name, base_url=base_url, api_keys=api_keys.copy(), model_name=model_name, **model_params
+                    platform=sdk_name,
+                    base_url=base_url,
+                    api_keys=api_keys.copy(),
+                    model_name=model_name,
+                    rate_limits=rate_limits,
+                    key_strategy=key_strategy,
+                    quota_limits=quota_limits,
+                    timeouts=model_timeouts,
+                    http_pool=http_pool,
+                    **model_params,
                 )
 
                 # 将新创建的模型实例添加到全局缓存
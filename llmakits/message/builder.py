@@ -8,6 +8,8 @@ from urllib.parse import urlparse
 from filekits.base_io import download_encode_base64
 from .validator import validate_base64_content, detect_base64_image_mime_type
 from ..utils.normalize_error import ResponseError
+from ..utils.tracing import start_span
+from ..utils.event_log import log_event
 
 
 def prepare_messages(
@@ -249,9 +251,13 @@ def resolve_images_with_cache(
 
             if successful_images :
                 if failed_urls :
-                    print( f"已从图片组缓存获取可用图片，跳过失败图片 {len(failed_urls)} 张" )
+                    message = f"已从图片组缓存获取可用图片，跳过失败图片 {len(failed_urls)} 张"
                 else :
-                    print( "已从图片组缓存获取可用图片" )
+                    message = "已从图片组缓存获取可用图片"
+                log_event(
+                    "image_group_cache_hit", message,
+                    images = len( successful_images ), failed = len( failed_urls ),
+                )
                 return list( successful_images )
 
             if all_failed :
@@ -289,7 +295,7 @@ def resolve_images_with_cache(
             message = f"已跳过失败缓存图片: {normalized_img_url}"
             if reason :
                 message = f"{message}, 原因: {reason}"
-            print( message )
+            log_event( "image_skipped", message, "warning", url = normalized_img_url, reason = reason )
             failed_urls.append( normalized_img_url )
             failure_errors.append( message )
             continue
@@ -298,12 +304,12 @@ def resolve_images_with_cache(
         if cached_base64 :
             is_valid, error_msg = validate_base64_content( cached_base64, expected_type = "image" )
             if is_valid :
-                print( f"已从缓存中获取图片base64: {normalized_img_url}" )
+                log_event( "image_cache_hit", f"已从缓存中获取图片base64: {normalized_img_url}", url = normalized_img_url )
                 resolved_img_list.append( _build_base64_image_url( cached_base64, normalized_img_url ) )
                 continue
 
             message = f"缓存中的base64内容无效，已跳过: {normalized_img_url}, 原因: {error_msg}"
-            print( message )
+            log_event( "image_invalid", message, "warning", url = normalized_img_url, reason = error_msg )
             failed_urls.append( normalized_img_url )
             failure_errors.append( message )
             _mark_image_conversion_failed( image_cache, normalized_img_url, error_msg )
@@ -340,6 +346,25 @@ def convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> Lis
     if not img_list :
         raise ValueError( "图片 img_list 不能为空!" )
 
+    with start_span( "llmakits.convert_images_to_base64" ) as span :
+        span.set_attribute( "llmakits.image_count", len( img_list ) )
+        processed_img_list = _convert_images_to_base64( img_list, image_cache )
+        span.set_attribute( "llmakits.converted_count", len( processed_img_list ) )
+    return processed_img_list
+
+
+def _download_image_base64( img_url: str ) -> str :
+    """下载单张图片并编码为 base64（打开图片下载的 span）"""
+    with start_span( "llmakits.image_download" ) as span :
+        if span.is_recording() :
+            span.set_attribute( "url.domain", urlparse( img_url ).netloc )
+        base64_str = download_encode_base64( img_url )
+        span.set_attribute( "llmakits.bytes", len( base64_str or "" ) )
+    return base64_str
+
+
+def _convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> List[ str ] :
+    """convert_images_to_base64 的实现"""
     image_cache = _get_image_cache( image_cache )
 
     if image_cache is not None and hasattr( image_cache, "get_group_result" ) :
@@ -351,9 +376,13 @@ def convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> Lis
 
             if successful_images :
                 if failed_urls :
-                    print( f"已从图片组缓存获取可用图片，跳过失败图片 {len(failed_urls)} 张" )
+                    message = f"已从图片组缓存获取可用图片，跳过失败图片 {len(failed_urls)} 张"
                 else :
-                    print( "已从图片组缓存获取可用图片" )
+                    message = "已从图片组缓存获取可用图片"
+                log_event(
+                    "image_group_cache_hit", message,
+                    images = len( successful_images ), failed = len( failed_urls ),
+                )
                 return list( successful_images )
 
             if all_failed :
@@ -392,7 +421,7 @@ def convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> Lis
                 message = f"已跳过失败缓存图片: {normalized_img_url}"
                 if reason :
                     message = f"{message}, 原因: {reason}"
-                print( message )
+                log_event( "image_skipped", message, "warning", url = normalized_img_url, reason = reason )
                 failure_errors.append( message )
                 failed_urls.append( normalized_img_url )
                 continue
@@ -402,12 +431,12 @@ def convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> Lis
             if cached_base64 :
                 is_valid, error_msg = validate_base64_content( cached_base64, expected_type = "image" )
                 if is_valid :
-                    success_logs.append( f"已从缓存中获取图片base64: {normalized_img_url}" )
+                    success_logs.append( ( f"已从缓存中获取图片base64: {normalized_img_url}", normalized_img_url ) )
                     processed_img_list.append( _build_base64_image_url( cached_base64, normalized_img_url ) )
                     successful_conversions += 1
                     continue
                 message = f"缓存中的base64内容无效，已跳过: {normalized_img_url}, 原因: {error_msg}"
-                print( message )
+                log_event( "image_invalid", message, "warning", url = normalized_img_url, reason = error_msg )
                 failure_errors.append( message )
                 failed_urls.append( normalized_img_url )
                 _mark_image_conversion_failed( image_cache, normalized_img_url, error_msg )
@@ -415,10 +444,10 @@ def convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> Lis
 
         try :
             # 不依赖URL后缀，直接按URL下载并探测真实内容类型。
-            base64_str = download_encode_base64( normalized_img_url )
+            base64_str = _download_image_base64( normalized_img_url )
             if not base64_str :
                 message = f"转换后, base64_str 为空，: {normalized_img_url}"
-                print( message )
+                log_event( "image_invalid", message, "warning", url = normalized_img_url, reason = "base64_str 为空" )
                 failure_errors.append( message )
                 failed_urls.append( normalized_img_url )
                 _mark_image_conversion_failed( image_cache, normalized_img_url, "base64_str 为空" )
@@ -428,7 +457,7 @@ def convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> Lis
             is_valid, error_msg = validate_base64_content( base64_str, expected_type = "image" )
             if not is_valid :
                 message = f"转换后，base64 验证失败，已跳过: {normalized_img_url}, 原因: {error_msg}"
-                print( message )
+                log_event( "image_invalid", message, "warning", url = normalized_img_url, reason = error_msg )
                 failure_errors.append( message )
                 failed_urls.append( normalized_img_url )
                 _mark_image_conversion_failed( image_cache, normalized_img_url, error_msg )
@@ -441,11 +470,14 @@ def convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> Lis
             processed_img_list.append( _build_base64_image_url( base64_str, normalized_img_url ) )
 
             successful_conversions += 1
-            success_logs.append( f"已将图片转换为base64格式: {normalized_img_url}" )
+            success_logs.append( ( f"已将图片转换为base64格式: {normalized_img_url}", normalized_img_url ) )
 
         except Exception as e :
             message = f"图片下载转base64失败: {normalized_img_url}\n{e}"
-            print( message )
+            log_event(
+                "image_download_failed", message, "warning",
+                url = normalized_img_url, error_tag = type( e ).__name__, reason = str( e ),
+            )
             failure_errors.append( message )
             failed_urls.append( normalized_img_url )
             _mark_image_conversion_failed( image_cache, normalized_img_url, str( e ) )
@@ -456,10 +488,14 @@ def convert_images_to_base64( img_list: List[ str ], image_cache = None ) -> Lis
             image_cache.put_group_result( img_list, [ ], failed_urls, True )
         _raise_all_images_failed( img_list, failure_errors )
 
-    for success_log in success_logs :
-        print( success_log )
+    for success_log, img_url in success_logs :
+        log_event( "image_converted", success_log, url = img_url )
     if failure_errors :
-        print( f"图片组base64转换部分成功：成功 {successful_conversions} 张，失败 {len(failure_errors)} 张" )
+        log_event(
+            "image_group_partial",
+            f"图片组base64转换部分成功：成功 {successful_conversions} 张，失败 {len(failure_errors)} 张",
+            "warning", converted = successful_conversions, failed = len( failure_errors ),
+        )
 
     if image_cache is not None and hasattr( image_cache, "put_group_result" ) :
         image_cache.put_group_result( img_list, processed_img_list, failed_urls, False )
@@ -6,6 +6,7 @@
 import re
 import json
 from typing import Any, Union, Tuple
+from ..utils.event_log import log_event
 
 
 def remove_think_section(text: str) -> str:
@@ -61,7 +62,7 @@ def extract_json_from_string(text_with_json: str) -> str:
                 json.loads(json_string)
                 return json_string
             except json.JSONDecodeError:
-                print(f"提取的json代码块无效: {json_string}")
+                log_event("json_block_invalid", f"提取的json代码块无效: {json_string}", "debug")
                 continue
 
     # print(text_with_json)
@@ -117,9 +118,12 @@ def convert_to_json(text: str) -> Any:
             else:
                 return converted_json
 
-    print("无法解析为json格式:")
-    print("原始文本:", text)
-    print("处理后文本:", processed_text)
+    log_event(
+        "json_parse_failed",
+        f"无法解析为json格式:\n原始文本: {text}\n处理后文本: {processed_text}",
+        "warning",
+        length=len(str(text)),
+    )
     raise Exception("format_json_error,无法解析为json格式")
 
 
@@ -147,5 +151,5 @@ def extract_field(message: Union[str, dict], *target_fields: str) -> Union[Any,
             return result[target_fields[0]]  # 只有一个字段时，直接返回该字段的值
         return tuple(result[field] for field in target_fields)  # 多个字段时，返回元组
     except KeyError as e:
-        print(message)
+        log_event("field_missing", str(message), "warning", field=str(e))
         raise KeyError(f"字段 {e} 不存在于消息中") from e
@@ -0,0 +1,184 @@
+"""
+模型组舱壁（Bulkhead）
+为每个模型组限制同时执行的调用数，超出的调用排队等待，排队超时则失败。
+慢的多模态模型组因此无法占满所有工作线程和连接，不会拖垮廉价的文本模型组。
+
+排队的调用数、排队超时次数、排队时间和当前排队数同时写入指标注册表（llmakits_bulkhead_*）。
+"""
+
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+from .metrics import MetricsRegistry, get_metrics_registry
+
+# asyncio 任务轮询空闲名额的间隔（秒）
+_POLL_INTERVAL = 0.01
+
+
+class BulkheadTimeoutError(TimeoutError):
+    """在模型组舱壁中排队超时"""
+
+    def __init__(self, group_name: str, queue_timeout: float):
+        self.group_name = group_name
+        self.queue_timeout = queue_timeout
+        super().__init__(f"BULKHEAD_QUEUE_TIMEOUT: 模型组 {group_name} 排队超过 {queue_timeout} 秒")
+
+
+class Bulkhead:
+    """
+    单个模型组的并发限制（线程和 asyncio 任务共用）
+
+    Args:
+        group_name: 模型组名称
+        max_concurrency: 同时执行的最大调用数
+        queue_timeout: 排队超时时间（秒），None 表示一直等待
+        metrics: 记录排队指标的注册表，默认为进程级注册表
+    """
+
+    def __init__(
+        self,
+        group_name: str,
+        max_concurrency: int,
+        queue_timeout: Optional[float] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency 必须大于等于 1")
+        self.group_name = group_name
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.metrics = metrics or get_metrics_registry()
+        self._condition = threading.Condition()
+        self.in_flight = 0  # 正在执行的调用数
+        self.queue_depth = 0  # 正在排队的调用数
+        self.max_queue_depth = 0  # 排队数峰值
+        self.admitted = 0  # 累计放行的调用数
+        self.queued = 0  # 需要排队的调用数
+        self.timeouts = 0  # 排队超时的调用数
+        self.total_wait = 0.0  # 累计排队时间（秒）
+        self.max_wait = 0.0  # 最长排队时间（秒）
+
+    def _try_admit(self) -> bool:
+        """尝试占用一个名额（调用方需持有锁）"""
+        if self.in_flight < self.max_concurrency:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        return False
+
+    def _enter_queue(self) -> None:
+        self.queue_depth += 1
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        self.metrics.inc("llmakits_bulkhead_queued_total", group=self.group_name)
+        self.metrics.set_gauge("llmakits_bulkhead_queue_depth", self.queue_depth, group=self.group_name)
+
+    def _leave_queue(self, waited: float, admitted: bool) -> None:
+        self.queue_depth -= 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if not admitted:
+            self.timeouts += 1
+            self.metrics.inc("llmakits_bulkhead_timeouts_total", group=self.group_name)
+        self.metrics.observe("llmakits_bulkhead_wait_seconds", waited, group=self.group_name)
+        self.metrics.set_gauge("llmakits_bulkhead_queue_depth", self.queue_depth, group=self.group_name)
+
+    def _effective_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """本次排队的超时时间：queue_timeout 与调用方指定的 timeout 中较小的一个"""
+        if timeout is None:
+            return self.queue_timeout
+        if self.queue_timeout is None:
+            return timeout
+        return min(self.queue_timeout, timeout)
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        占用一个名额，排队超时抛出 BulkheadTimeoutError
+
+        Args:
+            timeout: 本次排队的超时时间（例如调用时限的剩余时间），不会超过 queue_timeout
+        """
+        queue_timeout = self._effective_timeout(timeout)
+        with self._condition:
+            if self._try_admit():
+                return
+            self._enter_queue()
+            start_time = time.monotonic()
+            deadline = None if queue_timeout is None else start_time + queue_timeout
+            admitted = False
+            try:
+                while True:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                    if self._try_admit():
+                        admitted = True
+                        break
+            finally:
+                self._leave_queue(time.monotonic() - start_time, admitted)
+        if not admitted:
+            raise BulkheadTimeoutError(self.group_name, queue_timeout)  # type: ignore[arg-type]
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> None:
+        """acquire 的异步版本，排队时不阻塞事件循环"""
+        queue_timeout = self._effective_timeout(timeout)
+        with self._condition:
+            if self._try_admit():
+                return
+            self._enter_queue()
+        start_time = time.monotonic()
+        admitted = False
+        try:
+            while True:
+                await asyncio.sleep(_POLL_INTERVAL)
+                with self._condition:
+                    if self._try_admit():
+                        admitted = True
+                        break
+                if queue_timeout is not None and time.monotonic() - start_time >= queue_timeout:
+                    break
+        finally:
+            with self._condition:
+                self._leave_queue(time.monotonic() - start_time, admitted)
+        if not admitted:
+            raise BulkheadTimeoutError(self.group_name, queue_timeout)  # type: ignore[arg-type]
+
+    def release(self) -> None:
+        """释放名额，唤醒一个排队的线程"""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, timeout: Optional[float] = None):
+        await self.acquire_async(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "timeouts": self.timeouts,
+                "avg_wait": round(self.total_wait / self.queued, 4) if self.queued else 0.0,
+                "max_wait": round(self.max_wait, 4),
+            }
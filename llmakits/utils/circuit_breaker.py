@@ -0,0 +1,190 @@
+"""
+模型熔断器
+模型在失败窗口内多次超时/达到最大重试次数后熔断（open），冷却期内不再发送请求；
+冷却期结束后进入半开（half-open）状态，只放行一个探测请求，探测成功则恢复（closed），失败则重新熔断
+
+启用共享状态后端时，熔断会同步给其他进程：其他进程在剩余的冷却期内同样不再向该模型发送请求。
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from .shared_state import CIRCUIT_OPEN, get_shared_state
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个模型的熔断器（线程安全）"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        failure_window: float = 600.0,
+        cooldown: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        name: Optional[str] = None,
+    ):
+        """
+        Args:
+            failure_threshold: 失败窗口内触发熔断的失败次数
+            failure_window: 失败窗口（秒），超出窗口的失败不再计数
+            cooldown: 熔断后的冷却时间（秒），之后放行一个探测请求
+            clock: 时钟函数，便于测试
+            name: 模型标识（sdk_name:model_name），用于在进程间共享熔断状态
+        """
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.cooldown = cooldown
+        self._clock = clock
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures: List[float] = []  # 失败窗口内的失败时间
+        self._opened_at = 0.0
+        self._probe_started_at = None  # 半开状态下探测请求的发出时间，None 表示没有探测请求
+        self.times_opened = 0  # 累计熔断次数
+
+    def _refresh_state(self, now: float) -> None:
+        """冷却期结束后由 open 转为 half_open；其他进程熔断的模型同步为 open（调用方需持有锁）"""
+        if self._state == CLOSED and self.name is not None:
+            shared = get_shared_state()
+            open_until = shared.get(CIRCUIT_OPEN, self.name) if shared is not None else None
+            if open_until is not None:
+                remaining = float(open_until) - time.time()
+                if remaining > 0:
+                    self._state = OPEN
+                    self._opened_at = now - max(self.cooldown - remaining, 0.0)
+                    self._probe_started_at = None
+                    self._failures.clear()
+        if self._state == OPEN and now - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probe_started_at = None
+
+    def _probe_in_flight(self, now: float) -> bool:
+        """半开状态下是否有探测请求在进行（超过冷却时间未返回的探测视为已丢失）"""
+        return self._probe_started_at is not None and now - self._probe_started_at < self.cooldown
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state(self._clock())
+            return self._state
+
+    def is_available(self) -> bool:
+        """模型当前是否可以参与路由（不占用探测名额）"""
+        with self._lock:
+            now = self._clock()
+            self._refresh_state(now)
+            if self._state == CLOSED:
+                return True
+            return self._state == HALF_OPEN and not self._probe_in_flight(now)
+
+    def allow_request(self) -> bool:
+        """请求发出前调用：closed 放行；half_open 只放行一个探测请求；open 拒绝"""
+        with self._lock:
+            now = self._clock()
+            self._refresh_state(now)
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight(now):
+                self._probe_started_at = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """模型正常响应（端点可用）：半开状态下恢复为 closed"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._failures.clear()
+                self._probe_started_at = None
+
+    def record_failure(self) -> bool:
+        """
+        记录一次超时/达到最大重试次数的失败
+
+        Returns:
+            bool: 本次失败是否导致熔断
+        """
+        with self._lock:
+            now = self._clock()
+            self._refresh_state(now)
+            if self._state == OPEN:
+                return False
+
+            if self._state == HALF_OPEN:
+                # 探测失败，重新熔断
+                self._trip(now)
+                return True
+
+            self._failures = [t for t in self._failures if now - t < self.failure_window]
+            self._failures.append(now)
+            if len(self._failures) >= self.failure_threshold:
+                self._trip(now)
+                return True
+            return False
+
+    def _trip(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_started_at = None
+        self._failures.clear()
+        self.times_opened += 1
+        shared = get_shared_state()
+        if shared is not None and self.name is not None:
+            # 共享的是熔断结束的墙上时间，各进程的单调时钟不可比较
+            shared.set(CIRCUIT_OPEN, self.name, time.time() + self.cooldown, ttl=self.cooldown)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            self._refresh_state(now)
+            remaining = max(self.cooldown - (now - self._opened_at), 0.0) if self._state == OPEN else 0.0
+            return {
+                "state": self._state,
+                "recent_failures": len([t for t in self._failures if now - t < self.failure_window]),
+                "times_opened": self.times_opened,
+                "cooldown_remaining": round(remaining, 2),
+            }
+
+
+class CircuitBreakerRegistry:
+    """按模型标识（sdk_name:model_name）管理熔断器"""
+
+    def __init__(self, failure_threshold: int = 3, failure_window: float = 600.0, cooldown: float = 60.0):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.configure(failure_threshold, failure_window, cooldown)
+
+    def configure(self, failure_threshold: int = 3, failure_window: float = 600.0, cooldown: float = 60.0) -> None:
+        """修改熔断参数，已创建的熔断器同步生效"""
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold 必须大于等于 1")
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.failure_window = failure_window
+            self.cooldown = cooldown
+            for breaker in self._breakers.values():
+                breaker.failure_threshold = failure_threshold
+                breaker.failure_window = failure_window
+                breaker.cooldown = cooldown
+
+    def get(self, model_key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model_key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(model_key)
+                if breaker is None:
+                    breaker = CircuitBreaker(
+                        self.failure_threshold, self.failure_window, self.cooldown, name=model_key
+                    )
+                    self._breakers[model_key] = breaker
+        return breaker
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            items = list(self._breakers.items())
+        return {model_key: breaker.snapshot() for model_key, breaker in items}
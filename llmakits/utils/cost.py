@@ -0,0 +1,182 @@
+"""
+调用成本统计
+按 global_model_config 中的 input_price / output_price（每百万 token 的单价）和响应中的 usage
+计算每次调用的成本，并按模型组、kit 和模型汇总。
+
+kit 标签通过 contextvars 传递：e_commerce 中的各个 kit 在调用调度器时会设置自己的名称，
+自定义流程可以使用 cost_scope("my_kit") 标记。
+"""
+
+import math
+import threading
+import contextvars
+import functools
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# 价格单位：每百万 token
+PRICE_UNIT = 1_000_000
+
+# 当前调用所属的 kit，未设置时为空字符串
+_CURRENT_KIT: contextvars.ContextVar = contextvars.ContextVar("llmakits_cost_kit", default="")
+
+
+class TokenUsage(int):
+    """
+    token 用量：数值上等于 total_tokens（与原来的返回值兼容），同时保留输入、输出 token 数
+
+    Attributes:
+        prompt_tokens: 输入 token 数，未知时为 None
+        completion_tokens: 输出 token 数，未知时为 None
+        stream_timing: 流式请求的首 token 耗时、块间隔和解码吞吐（StreamTiming），非流式请求为 None
+    """
+
+    prompt_tokens: Optional[int]
+    completion_tokens: Optional[int]
+    stream_timing: Any
+
+    def __new__(
+        cls,
+        total_tokens: int = 0,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        stream_timing: Any = None,
+    ):
+        usage = super().__new__(cls, total_tokens or 0)
+        usage.prompt_tokens = prompt_tokens
+        usage.completion_tokens = completion_tokens
+        usage.stream_timing = stream_timing  # 流式请求的计时（StreamTiming），非流式请求为 None
+        return usage
+
+    @classmethod
+    def from_usage(cls, usage: Any) -> "TokenUsage":
+        """从 OpenAI 兼容响应的 usage 对象（或字典）构建"""
+        if usage is None:
+            return cls(0)
+        if isinstance(usage, dict):
+            get = usage.get
+        else:
+            get = lambda name: getattr(usage, name, None)  # noqa: E731
+        prompt_tokens = get("prompt_tokens")
+        completion_tokens = get("completion_tokens")
+        total_tokens = get("total_tokens")
+        if not total_tokens:
+            total_tokens = (prompt_tokens or 0) + (completion_tokens or 0)
+        return cls(total_tokens, prompt_tokens, completion_tokens)
+
+    def __reduce__(self):
+        return (TokenUsage, (int(self), self.prompt_tokens, self.completion_tokens, self.stream_timing))
+
+    def __repr__(self) -> str:
+        return f"TokenUsage({int(self)}, prompt_tokens={self.prompt_tokens}, completion_tokens={self.completion_tokens})"
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """解析配置中的单价，空值返回 None"""
+    if value is None or value == "":
+        return None
+    price = float(value)
+    return None if math.isnan(price) else price
+
+
+def get_model_price(model_info: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    获取模型的 (输入单价, 输出单价)，优先使用模型组配置中的 input_price / output_price，
+    其次使用模型实例上的同名属性（由 global_model_config 加载）
+    """
+    model = model_info.get("model")
+    input_price = model_info.get("input_price", getattr(model, "input_price", None))
+    output_price = model_info.get("output_price", getattr(model, "output_price", None))
+    return parse_price(input_price), parse_price(output_price)
+
+
+def compute_cost(tokens: int, input_price: Optional[float], output_price: Optional[float]) -> float:
+    """
+    计算一次调用的成本
+
+    无法区分输入、输出 token 时（如普通 int 或流式响应），全部按输出单价计算，作为成本上限。
+    没有配置单价的部分按 0 计算。
+    """
+    if not tokens:
+        return 0.0
+    prompt_tokens = getattr(tokens, "prompt_tokens", None)
+    completion_tokens = getattr(tokens, "completion_tokens", None)
+    if prompt_tokens is None and completion_tokens is None:
+        return int(tokens) * (output_price or input_price or 0.0) / PRICE_UNIT
+    return ((prompt_tokens or 0) * (input_price or 0.0) + (completion_tokens or 0) * (output_price or 0.0)) / PRICE_UNIT
+
+
+def current_kit() -> str:
+    """当前调用所属的 kit 名称，未设置时为空字符串"""
+    return _CURRENT_KIT.get()
+
+
+@contextmanager
+def cost_scope(kit: str) -> Iterator[None]:
+    """
+    在 with 代码块内发起的调度器调用，成本都计入 kit
+
+    Example:
+        >>> with cost_scope("translate"):
+        ...     dispatcher.execute_with_group(message_info, "translate")
+    """
+    token = _CURRENT_KIT.set(kit)
+    try:
+        yield
+    finally:
+        _CURRENT_KIT.reset(token)
+
+
+def track_kit(kit: str) -> Callable:
+    """装饰器：函数内发起的调度器调用，成本都计入 kit"""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with cost_scope(kit):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class CostTracker:
+    """按模型组、kit 和模型汇总调用成本（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, Dict[str, float]]] = {"groups": {}, "kits": {}, "models": {}}
+
+    def record(self, group: str, kit: str, model: str, tokens: int, cost: float) -> None:
+        """记录一次成功调用的 token 和成本"""
+        prompt_tokens = getattr(tokens, "prompt_tokens", None) or 0
+        completion_tokens = getattr(tokens, "completion_tokens", None) or 0
+        with self._lock:
+            for dimension, name in (("groups", group), ("kits", kit), ("models", model)):
+                entry = self._totals[dimension].get(name)
+                if entry is None:
+                    entry = {"calls": 0, "tokens": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+                    self._totals[dimension][name] = entry
+                entry["calls"] += 1
+                entry["tokens"] += int(tokens)
+                entry["prompt_tokens"] += prompt_tokens
+                entry["completion_tokens"] += completion_tokens
+                entry["cost"] += cost
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """返回 {"groups": {...}, "kits": {...}, "models": {...}}，未设置 kit 的调用计入空字符串"""
+        with self._lock:
+            return {
+                dimension: {name: {**entry, "cost": round(entry["cost"], 6)} for name, entry in entries.items()}
+                for dimension, entries in self._totals.items()
+            }
+
+    def total_cost(self) -> float:
+        with self._lock:
+            return round(sum(entry["cost"] for entry in self._totals["groups"].values()), 6)
+
+    def reset(self) -> None:
+        with self._lock:
+            for entries in self._totals.values():
+                entries.clear()
@@ -0,0 +1,81 @@
+"""
+调用时限（deadline）
+一次 execute_with_group 调用的总时间预算，贯穿模型切换、send_message 重试、限流等待和 JSON 修复。
+每次请求的超时时间会收缩到剩余预算以内，预算用完后以 DeadlineExceededError 快速失败。
+"""
+
+import time
+from typing import Optional, Union
+from .normalize_error import ResponseError
+
+
+class DeadlineExceededError(ResponseError):
+    """调用时限已用完"""
+
+    def __init__(self, platform: str, model_name: str, budget: float):
+        self.budget = budget
+        exception = TimeoutError(f"DEADLINE_EXCEEDED: 调用时限已用完（预算 {budget:g} 秒）")
+        super().__init__(platform, model_name, exception=exception, error_tag="DEADLINE_EXCEEDED")
+        self.skip_report = True
+
+
+class Deadline:
+    """
+    调用时限，基于 time.monotonic 计算剩余时间
+
+    Args:
+        budget: 从现在开始的时间预算（秒）
+    """
+
+    def __init__(self, budget: float):
+        self.budget = float(budget)
+        self.expires_at = time.monotonic() + self.budget
+
+    @classmethod
+    def resolve(
+        cls, deadline: Union["Deadline", float, None] = None, timeout_budget: Optional[float] = None
+    ) -> Optional["Deadline"]:
+        """
+        根据调用参数构建时限，两者都指定时取更早的一个
+
+        Args:
+            deadline: Deadline 实例，或绝对时间戳（time.time() 的返回值）
+            timeout_budget: 从现在开始的时间预算（秒）
+
+        Returns:
+            Deadline，两者都未指定时返回 None
+        """
+        candidates = []
+        if isinstance(deadline, Deadline):
+            candidates.append(deadline)
+        elif deadline is not None:
+            candidates.append(cls(deadline - time.time()))
+        if timeout_budget is not None:
+            candidates.append(cls(timeout_budget))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: candidate.expires_at)
+
+    def remaining(self) -> float:
+        """剩余时间（秒），不会小于 0"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, default: float) -> float:
+        """单次操作的超时时间：默认超时与剩余时间中较小的一个"""
+        return min(default, self.remaining())
+
+    def exceeded(self, platform: str = "", model_name: str = "") -> DeadlineExceededError:
+        return DeadlineExceededError(platform, model_name, self.budget)
+
+    def check(self, platform: str = "", model_name: str = "") -> None:
+        """时限已用完时抛出 DeadlineExceededError"""
+        if self.expired():
+            raise self.exceeded(platform, model_name)
+
+    def ensure(self, seconds: float, platform: str = "", model_name: str = "") -> None:
+        """剩余时间不足 seconds 秒时抛出 DeadlineExceededError（用于等待前的检查，避免等到时限结束）"""
+        if self.remaining() <= seconds:
+            raise self.exceeded(platform, model_name)
@@ -0,0 +1,278 @@
+"""
+结构化事件日志
+调度器、图片转换、重试处理和各个 kit 的运行信息统一通过 log_event 输出：
+控制台输出保持原来的文本（可以关闭），同时可以写入 JSONL 文件，
+每条记录包含事件类型、级别、模型、耗时、错误标签等字段。
+
+控制台文本和 JSONL 记录都通过同一个队列交给后台线程输出，请求线程只负责入队；
+需要立即看到输出时（例如测试中捕获 stdout）调用 flush_event_log。
+"""
+
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Union
+
+LEVELS: Dict[str, int] = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+
+def _to_level(level: Union[str, int]) -> int:
+    if isinstance(level, int):
+        return level
+    if level.lower() not in LEVELS:
+        raise ValueError(f"未知的日志级别: {level}，可选: {list(LEVELS)}")
+    return LEVELS[level.lower()]
+
+
+class JsonlFormatter(logging.Formatter):
+    """把事件记录格式化为一行 JSON（在后台线程中执行）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "event": getattr(record, "event", ""),
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.msg is not None:
+            payload["message"] = str(record.msg)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _ConsoleHandler(logging.Handler):
+    """在后台线程中输出控制台文本：写到入队时的 sys.stdout，或者交给指定的 logger"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        console_logger = getattr(record, "console_logger", None)
+        if console_logger is not None:
+            getattr(console_logger, record.levelname.lower())(record.msg)
+            return
+        stream = getattr(record, "stream", None)
+        if stream is None or stream.closed:
+            stream = sys.stdout
+        stream.write(f"{record.msg}\n")
+        stream.flush()
+
+
+def _console_record(record: logging.LogRecord) -> bool:
+    return getattr(record, "to_console", False)
+
+
+def _file_record(record: logging.LogRecord) -> bool:
+    return getattr(record, "to_file", False)
+
+
+class _EnqueueOnlyHandler(QueueHandler):
+    """只入队不格式化，序列化留给后台线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class EventLog:
+    """
+    事件日志（线程安全）
+
+    Attributes:
+        level: 最低输出级别，低于该级别的事件直接丢弃（默认 debug，与原来的控制台输出一致）
+        console: 是否把事件的文本输出到控制台
+    """
+
+    def __init__(self, level: Union[str, int] = "debug", console: bool = True):
+        self.level = _to_level(level)
+        self.console = console
+        self.path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._queue: Optional["queue.Queue[logging.LogRecord]"] = None
+        self._handler: Optional[QueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+
+    def configure(
+        self, path: Optional[str] = None, level: Union[str, int] = "debug", console: bool = True
+    ) -> None:
+        """
+        配置事件日志
+
+        Args:
+            path: JSONL 文件路径（追加写入），None 表示不写文件
+            level: 最低输出级别（debug / info / warning / error）
+            console: 是否输出到控制台；高并发时可以关闭，只写 JSONL
+        """
+        with self._lock:
+            self._stop_listener()
+            self.level = _to_level(level)
+            self.console = console
+            self.path = path
+
+    def _get_handler(self) -> Optional[QueueHandler]:
+        """返回入队用的 handler，后台线程未启动时按当前配置启动"""
+        handler = self._handler
+        if handler is not None:
+            return handler
+        with self._lock:
+            if self._handler is None:
+                self._start_listener()
+            return self._handler
+
+    def _start_listener(self) -> None:
+        """启动后台线程，控制台和 JSONL 文件共用同一个队列（调用方需持有锁）"""
+        console_handler = _ConsoleHandler()
+        console_handler.addFilter(_console_record)
+        handlers: List[logging.Handler] = [console_handler]
+        if self.path:
+            file_handler = logging.FileHandler(self.path, encoding="utf-8")
+            file_handler.setFormatter(JsonlFormatter())
+            file_handler.addFilter(_file_record)
+            handlers.append(file_handler)
+        event_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+        listener = QueueListener(event_queue, *handlers)
+        try:
+            listener.start()
+        except RuntimeError:
+            # 解释器退出阶段无法再启动线程，由调用线程直接输出
+            for handler in handlers:
+                handler.close()
+            return
+        self._queue = event_queue
+        self._handler = _EnqueueOnlyHandler(event_queue)
+        self._listener = listener
+
+    def _stop_listener(self) -> None:
+        """停止后台线程（输出完队列中剩余的记录）并关闭文件（调用方需持有锁）"""
+        listener = self._listener
+        self._queue = None
+        self._handler = None
+        self._listener = None
+        if listener is not None:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+
+    def flush(self) -> None:
+        """等待队列中已有的记录全部输出（控制台和 JSONL）"""
+        event_queue = self._queue
+        if event_queue is not None:
+            event_queue.join()
+
+    def close(self) -> None:
+        """输出完队列中的记录并关闭 JSONL 文件，之后的控制台输出不受影响"""
+        with self._lock:
+            self._stop_listener()
+            self.path = None
+
+    def is_enabled_for(self, level: Union[str, int]) -> bool:
+        return _to_level(level) >= self.level
+
+    def _enqueue(
+        self,
+        event: str,
+        message: Any,
+        levelno: int,
+        to_console: bool,
+        to_file: bool,
+        console_logger: Optional[logging.Logger] = None,
+        fields: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        handler = self._get_handler()
+        if handler is None:
+            if to_console:
+                print(message)
+            return
+        record = logging.LogRecord("llmakits.events", levelno, "", 0, message, None, None)
+        record.event = event
+        record.fields = fields or {}
+        record.to_console = to_console
+        record.to_file = to_file
+        record.console_logger = console_logger
+        record.stream = sys.stdout
+        handler.handle(record)
+
+    def emit(
+        self,
+        event: str,
+        message: Optional[str] = None,
+        level: Union[str, int] = "info",
+        console_logger: Optional[logging.Logger] = None,
+        **fields: Any,
+    ) -> None:
+        """
+        记录一个事件
+
+        Args:
+            event: 事件类型，例如 model_failed / image_converted / rate_limited
+            message: 控制台输出的文本（None 表示只写 JSONL）
+            level: 事件级别
+            console_logger: 指定时通过该 logger 输出控制台文本，否则打印到 stdout
+            **fields: 结构化字段（model、latency、error_tag 等）
+        """
+        levelno = _to_level(level)
+        if levelno < self.level:
+            return
+        to_console = self.console and message is not None
+        to_file = self.path is not None
+        if to_console or to_file:
+            self._enqueue(event, message, levelno, to_console, to_file, console_logger, fields)
+
+    def console_text(self, message: Any, level: Union[str, int] = "info") -> None:
+        """只输出到控制台的文本（模型信息标题等排版内容），不写入 JSONL"""
+        levelno = _to_level(level)
+        if self.console and levelno >= self.level:
+            self._enqueue("console", message, levelno, True, False)
+
+    def separator(self, char: str = "-", length: int = 40, level: Union[str, int] = "info") -> None:
+        """控制台分隔线（与 funcguard.print_line 相同），不写入 JSONL"""
+        self.console_text(char * length, level)
+
+
+# 进程级的事件日志
+_EVENT_LOG = EventLog()
+atexit.register(_EVENT_LOG.close)
+
+
+def get_event_log() -> EventLog:
+    return _EVENT_LOG
+
+
+def configure_event_log(path: Optional[str] = None, level: Union[str, int] = "debug", console: bool = True) -> None:
+    """配置进程级事件日志，参数见 EventLog.configure"""
+    _EVENT_LOG.configure(path, level, console)
+
+
+def flush_event_log() -> None:
+    """等待已记录的事件全部输出，参数见 EventLog.flush"""
+    _EVENT_LOG.flush()
+
+
+def close_event_log() -> None:
+    """写完并关闭 JSONL 文件"""
+    _EVENT_LOG.close()
+
+
+def log_event(
+    event: str,
+    message: Optional[str] = None,
+    level: Union[str, int] = "info",
+    console_logger: Optional[logging.Logger] = None,
+    **fields: Any,
+) -> None:
+    """记录一个事件，参数见 EventLog.emit"""
+    _EVENT_LOG.emit(event, message, level, console_logger, **fields)
+
+
+def log_console(message: Any, level: Union[str, int] = "info") -> None:
+    """只输出到控制台的文本，参数见 EventLog.console_text"""
+    _EVENT_LOG.console_text(message, level)
+
+
+def log_separator(char: str = "-", length: int = 40, level: Union[str, int] = "info") -> None:
+    """控制台分隔线，参数见 EventLog.separator"""
+    _EVENT_LOG.separator(char, length, level)
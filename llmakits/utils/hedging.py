@@ -0,0 +1,98 @@
+"""
+对冲请求（Hedged Requests）策略
+当组内当前模型在指定延迟内没有返回时，把同一请求并行发给下一个模型，取先通过校验的结果
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class HedgeStats:
+    """对冲统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0  # 经过对冲策略的请求数
+        self.hedged_requests = 0  # 至少触发过一次对冲的请求数
+        self.hedges_fired = 0  # 发出的对冲请求总数
+        self.hedge_wins = 0  # 最终采用了对冲请求结果的次数
+        self.wasted_tokens = 0  # 被放弃的请求消耗的 token 数
+
+    def record_request(self, hedges_fired: int, hedge_won: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.hedges_fired += hedges_fired
+            if hedges_fired:
+                self.hedged_requests += 1
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def add_wasted_tokens(self, tokens: int) -> None:
+        if not tokens:
+            return
+        with self._lock:
+            self.wasted_tokens += int(tokens)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            hedge_rate = self.hedged_requests / self.requests if self.requests else 0.0
+            return {
+                "requests": self.requests,
+                "hedged_requests": self.hedged_requests,
+                "hedge_rate": round(hedge_rate, 4),
+                "hedges_fired": self.hedges_fired,
+                "hedge_wins": self.hedge_wins,
+                "wasted_tokens": self.wasted_tokens,
+            }
+
+
+class HedgePolicy:
+    """
+    模型组的对冲配置
+
+    Args:
+        delay: 固定对冲延迟（秒）。同时指定 percentile 时，作为样本不足时的后备延迟
+        percentile: 按最近观测到的响应耗时的百分位数（0~100）计算对冲延迟，如 95
+        min_samples: 使用百分位延迟所需的最少样本数
+        window_size: 保留的最近耗时样本数量
+    """
+
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        percentile: Optional[float] = None,
+        min_samples: int = 20,
+        window_size: int = 200,
+    ):
+        if delay is None and percentile is None:
+            raise ValueError("对冲策略必须指定 delay 或 percentile")
+        if percentile is not None and not 0 < percentile <= 100:
+            raise ValueError("percentile 必须在 (0, 100] 范围内")
+
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._latencies: deque = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self.stats = HedgeStats()
+
+    def observe(self, latency: float) -> None:
+        """记录一次成功响应的耗时（秒）"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def get_delay(self) -> Optional[float]:
+        """返回当前对冲延迟（秒），None 表示暂不对冲"""
+        if self.percentile is None:
+            return self.delay
+
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.delay
+
+        # nearest-rank 百分位
+        rank = max(math.ceil(self.percentile / 100 * len(samples)), 1)
+        return samples[rank - 1]
@@ -0,0 +1,165 @@
+"""
+共享 HTTP 连接池
+同一个 base_url 的所有模型、所有密钥共用一个 httpx 客户端（连接池），密钥只是请求头的一部分：
+切换密钥、新增模型都不再新建连接池，已经建立的 TLS 连接（keep-alive）可以继续复用。
+
+连接池按平台配置（keys_config）调整：
+- max_connections：连接池的最大连接数
+- max_keepalive_connections：保持空闲的最大连接数
+- keepalive_expiry：空闲连接保留的秒数
+- http2：是否启用 HTTP/2（需要安装 h2：pip install "llmakits[http2]"，未安装时回退到 HTTP/1.1）
+
+异步客户端的连接绑定在创建它的事件循环上，因此异步连接池按 (base_url, 事件循环) 共享。
+"""
+
+import asyncio
+import threading
+import importlib.util
+from weakref import WeakKeyDictionary
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import httpx
+
+from .event_log import log_event
+from .http_timeouts import HttpTimeouts, create_async_http_client, create_http_client
+
+POOL_FIELDS = ("max_connections", "max_keepalive_connections", "keepalive_expiry", "http2")
+
+
+class HttpPoolOptions(NamedTuple):
+    """连接池配置"""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+def pick_pool_options(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """从平台配置中取出非空的连接池字段"""
+    if not config:
+        return {}
+    return {field: config[field] for field in POOL_FIELDS if config.get(field) is not None}
+
+
+def make_pool_options(config: Optional[Dict[str, Any]] = None) -> HttpPoolOptions:
+    """把 max_connections / max_keepalive_connections / keepalive_expiry / http2 配置转换为 HttpPoolOptions"""
+    values = pick_pool_options(config)
+    casts = {"max_connections": int, "max_keepalive_connections": int, "keepalive_expiry": float, "http2": bool}
+    return HttpPoolOptions(**{field: casts[field](value) for field, value in values.items()})
+
+
+def _pool_key(base_url: Optional[str], options: HttpPoolOptions) -> Tuple[str, HttpPoolOptions]:
+    return (base_url or "").rstrip("/"), options
+
+
+_HTTP2_AVAILABLE: Optional[bool] = None
+
+
+def _use_http2(base_url: str, options: HttpPoolOptions) -> bool:
+    """配置了 http2 且已安装 h2 时启用 HTTP/2，否则回退到 HTTP/1.1"""
+    global _HTTP2_AVAILABLE
+    if not options.http2:
+        return False
+    if _HTTP2_AVAILABLE is None:
+        _HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+    if not _HTTP2_AVAILABLE:
+        log_event(
+            "http2_unavailable",
+            f"未安装 h2，{base_url} 回退到 HTTP/1.1（pip install \"llmakits[http2]\"）",
+            level="warning",
+            base_url=base_url,
+        )
+    return _HTTP2_AVAILABLE
+
+
+class _NoLoop:
+    """在事件循环之外创建异步客户端时使用的占位键"""
+
+
+_NO_LOOP = _NoLoop()
+
+
+_HTTP_CLIENTS: Dict[Tuple[str, HttpPoolOptions], httpx.Client] = {}
+_ASYNC_HTTP_CLIENTS: "WeakKeyDictionary[Any, Dict[Tuple[str, HttpPoolOptions], httpx.AsyncClient]]" = (
+    WeakKeyDictionary()
+)
+_HTTP2_ENABLED: Dict[Tuple[str, HttpPoolOptions], bool] = {}
+_HTTP_CLIENTS_LOCK = threading.Lock()
+
+
+def _http2_enabled(registry_key: Tuple[str, HttpPoolOptions]) -> bool:
+    http2 = _HTTP2_ENABLED.get(registry_key)
+    if http2 is None:
+        http2 = _use_http2(*registry_key)
+        _HTTP2_ENABLED[registry_key] = http2
+    return http2
+
+
+def get_http_client(base_url: Optional[str], options: Optional[HttpPoolOptions] = None) -> httpx.Client:
+    """获取（必要时创建）base_url 共享的同步 httpx 客户端，连接池配置不同的模型使用各自的客户端"""
+    registry_key = _pool_key(base_url, options or HttpPoolOptions())
+    with _HTTP_CLIENTS_LOCK:
+        client = _HTTP_CLIENTS.get(registry_key)
+        if client is None or client.is_closed:
+            limits = registry_key[1].limits()
+            client = create_http_client(HttpTimeouts(), limits=limits, http2=_http2_enabled(registry_key))
+            _HTTP_CLIENTS[registry_key] = client
+        return client
+
+
+def get_async_http_client(base_url: Optional[str], options: Optional[HttpPoolOptions] = None) -> httpx.AsyncClient:
+    """获取（必要时创建）base_url 在当前事件循环中共享的异步 httpx 客户端（事件循环结束后随之释放）"""
+    registry_key = _pool_key(base_url, options or HttpPoolOptions())
+    try:
+        loop: Any = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = _NO_LOOP
+    with _HTTP_CLIENTS_LOCK:
+        clients = _ASYNC_HTTP_CLIENTS.setdefault(loop, {})
+        client = clients.get(registry_key)
+        if client is None or client.is_closed:
+            limits = registry_key[1].limits()
+            client = create_async_http_client(HttpTimeouts(), limits=limits, http2=_http2_enabled(registry_key))
+            clients[registry_key] = client
+        return client
+
+
+def get_http_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """各 base_url 连接池的配置、实际是否启用了 HTTP/2，以及共享它的事件循环数量（同一 base_url 有多份配置时加 #序号）"""
+    with _HTTP_CLIENTS_LOCK:
+        sync_keys = set(_HTTP_CLIENTS)
+        async_keys = [key for clients in _ASYNC_HTTP_CLIENTS.values() for key in clients]
+        http2 = dict(_HTTP2_ENABLED)
+
+    stats: Dict[str, Dict[str, Any]] = {}
+    counts: Dict[str, int] = {}
+    for registry_key in sorted(sync_keys | set(async_keys), key=repr):
+        base_url, options = registry_key
+        counts[base_url] = counts.get(base_url, 0) + 1
+        label = base_url if counts[base_url] == 1 else f"{base_url}#{counts[base_url]}"
+        stats[label] = {
+            **options._asdict(),
+            "http2_enabled": http2.get(registry_key, False),
+            "sync_client": registry_key in sync_keys,
+            "async_loops": async_keys.count(registry_key),
+        }
+    return stats
+
+
+def close_http_pools() -> None:
+    """关闭并清空所有同步连接池（主要用于测试或重新加载配置；异步连接池随事件循环释放）"""
+    with _HTTP_CLIENTS_LOCK:
+        clients = list(_HTTP_CLIENTS.values())
+        _HTTP_CLIENTS.clear()
+        _ASYNC_HTTP_CLIENTS.clear()
+        _HTTP2_ENABLED.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,194 @@
+"""
+请求超时（httpx 原生实现）
+超时直接交给 httpx 传输层，到时关闭连接，不再用线程包装请求（线程超时后请求仍在后台运行，继续占用连接）。
+
+- connect：建立 TCP / TLS 连接、从连接池取连接的最长时间
+- first_byte：请求发出后等待响应头的最长时间；非流式响应在生成结束后才返回，即整个生成过程
+- read：读取响应体时两次读取之间的最长间隔；流式响应的首个 token 和相邻块之间的等待都受它限制
+- total：整个请求的总时限（含 SDK 内部的重试和流式接收），各阶段的超时都收缩到剩余时间以内
+
+超时配置通过 request_timeouts 绑定到当前请求（上下文变量），由 TimeoutTransport / AsyncTimeoutTransport
+在发出请求时读取，同一个 httpx 客户端可以服务超时配置不同的模型。
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+import httpx
+
+TIMEOUT_FIELDS = ("connect_timeout", "read_timeout", "first_byte_timeout", "total_timeout")
+
+# 各阶段超时的中文名称，用于错误信息
+_PHASE_LABELS = {
+    "connect": "建立连接",
+    "pool": "连接池排队",
+    "write": "发送请求",
+    "read": "读取响应",
+    "total": "请求总时限",
+}
+
+
+class HttpTimeouts(NamedTuple):
+    """单个模型的请求超时（秒）"""
+
+    connect: float = 10.0
+    read: float = 60.0
+    first_byte: float = 150.0
+    total: float = 180.0
+
+
+class TotalTimeout(httpx.TimeoutException):
+    """请求总时限已用完"""
+
+
+class _RequestScope(NamedTuple):
+    timeouts: HttpTimeouts
+    stream: bool
+    expires_at: float
+
+
+_REQUEST_SCOPE: ContextVar[Optional[_RequestScope]] = ContextVar("llmakits_request_timeouts", default=None)
+
+
+def pick_timeouts(config: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """从平台或模型配置中取出非空的超时字段"""
+    if not config:
+        return {}
+    return {field: float(config[field]) for field in TIMEOUT_FIELDS if config.get(field) is not None}
+
+
+def make_http_timeouts(config: Optional[Dict[str, Any]] = None) -> HttpTimeouts:
+    """把 connect_timeout / read_timeout / first_byte_timeout / total_timeout 配置转换为 HttpTimeouts"""
+    values = pick_timeouts(config)
+    return HttpTimeouts(**{field[: -len("_timeout")]: value for field, value in values.items()})
+
+
+@contextmanager
+def request_timeouts(timeouts: HttpTimeouts, stream: bool, total: Optional[float] = None) -> Iterator[None]:
+    """
+    在当前上下文中发出的请求使用这组超时
+
+    Args:
+        timeouts: 模型的超时配置
+        stream: 是否为流式请求（非流式请求读取响应体时仍使用 first_byte 超时）
+        total: 本次请求的总时限，默认 timeouts.total（调用时限更短时传入剩余时间）
+    """
+    total = timeouts.total if total is None else total
+    token = _REQUEST_SCOPE.set(_RequestScope(timeouts, stream, time.monotonic() + total))
+    try:
+        yield
+    finally:
+        _REQUEST_SCOPE.reset(token)
+
+
+def _phase_timeouts(scope: _RequestScope, body: bool, request: httpx.Request) -> Dict[str, float]:
+    """当前阶段的 httpx 超时：等待响应头使用 first_byte，读取流式响应体使用 read，都不超过剩余总时限"""
+    remaining = scope.expires_at - time.monotonic()
+    if remaining <= 0:
+        if not body:
+            raise TotalTimeout("total timeout exceeded before sending the request", request=request)
+        remaining = 0.001
+    timeouts = scope.timeouts
+    read = timeouts.read if body and scope.stream else timeouts.first_byte
+    return {
+        "connect": min(timeouts.connect, remaining),
+        "read": min(read, remaining),
+        "write": min(timeouts.read, remaining),
+        "pool": min(timeouts.connect, remaining),
+    }
+
+
+class TimeoutTransport(httpx.BaseTransport):
+    """
+    按请求的超时配置设置各阶段超时的传输层（没有绑定超时配置的请求使用客户端的默认超时）
+
+    httpcore 在收到响应头之后、开始读取响应体时才读取 read 超时，因此响应头返回后把 read 超时
+    换成读取响应体的超时，不需要额外的线程。
+    """
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        scope = _REQUEST_SCOPE.get()
+        if scope is None:
+            return self._transport.handle_request(request)
+        request.extensions["timeout"] = _phase_timeouts(scope, False, request)
+        response = self._transport.handle_request(request)
+        request.extensions["timeout"] = _phase_timeouts(scope, True, request)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncTimeoutTransport(httpx.AsyncBaseTransport):
+    """TimeoutTransport 的异步版本"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        scope = _REQUEST_SCOPE.get()
+        if scope is None:
+            return await self._transport.handle_async_request(request)
+        request.extensions["timeout"] = _phase_timeouts(scope, False, request)
+        response = await self._transport.handle_async_request(request)
+        request.extensions["timeout"] = _phase_timeouts(scope, True, request)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def default_timeout(timeouts: HttpTimeouts) -> httpx.Timeout:
+    """客户端的默认超时（用于没有绑定超时配置的请求，如 models_df）"""
+    return httpx.Timeout(timeouts.first_byte, connect=timeouts.connect)
+
+
+def create_http_client(
+    timeouts: HttpTimeouts, limits: Optional[httpx.Limits] = None, http2: bool = False
+) -> httpx.Client:
+    transport = httpx.HTTPTransport(http2=http2) if limits is None else httpx.HTTPTransport(limits=limits, http2=http2)
+    return httpx.Client(transport=TimeoutTransport(transport), timeout=default_timeout(timeouts))
+
+
+def create_async_http_client(
+    timeouts: HttpTimeouts, limits: Optional[httpx.Limits] = None, http2: bool = False
+) -> httpx.AsyncClient:
+    transport = (
+        httpx.AsyncHTTPTransport(http2=http2) if limits is None else httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+    )
+    return httpx.AsyncClient(transport=AsyncTimeoutTransport(transport), timeout=default_timeout(timeouts))
+
+
+def timeout_phase(error: BaseException) -> Optional[str]:
+    """
+    异常（或其 __cause__ / __context__ 链）是否为 httpx 超时
+
+    Returns:
+        超时阶段 connect / pool / write / read / total，不是超时返回 None
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, TotalTimeout):
+            return "total"
+        if isinstance(current, httpx.ConnectTimeout):
+            return "connect"
+        if isinstance(current, httpx.PoolTimeout):
+            return "pool"
+        if isinstance(current, httpx.WriteTimeout):
+            return "write"
+        if isinstance(current, httpx.TimeoutException):
+            return "read"
+        current = current.__cause__ or current.__context__
+    return None
+
+
+def timeout_message(phase: str, elapsed: float) -> str:
+    """超时的错误信息（保留“执行时间超过”字样，调度器据此把超时计入熔断）"""
+    return f"TimeoutError：{_PHASE_LABELS.get(phase, phase)}超时（{phase}），执行时间超过 {round(elapsed, 2)} 秒"
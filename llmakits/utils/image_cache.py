@@ -3,6 +3,7 @@
 使用LRU策略缓存最多10张图片的base64编码，并记录失败URL避免重复下载
 """
 
+import threading
 from collections import OrderedDict
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -11,6 +12,8 @@ class ImageBase64Cache:
     """
     图片Base64缓存管理器
     使用LRU（最近最少使用）策略管理缓存
+
+    线程安全：所有读写（包括 move_to_end 这类读操作中的顺序调整）都在同一把锁内完成。
     """
 
     def __init__(self, max_size: int = 10):
@@ -24,6 +27,7 @@ class ImageBase64Cache:
         self.cache = OrderedDict()  # 使用OrderedDict实现LRU
         self.failed_cache = OrderedDict()
         self.group_cache = OrderedDict()
+        self._lock = threading.RLock()
 
     def get(self, url: str) -> Optional[str]:
         """
@@ -35,12 +39,13 @@ class ImageBase64Cache:
         Returns:
             base64字符串，如果不存在则返回None
         """
-        if url not in self.cache:
-            return None
+        with self._lock:
+            if url not in self.cache:
+                return None
 
-        # 移动到末尾（标记为最近使用）
-        self.cache.move_to_end(url)
-        return self.cache[url]
+            # 移动到末尾（标记为最近使用）
+            self.cache.move_to_end(url)
+            return self.cache[url]
 
     def put(self, url: str, base64_str: str) -> None:
         """
@@ -50,17 +55,18 @@ class ImageBase64Cache:
             url: 图片URL
             base64_str: base64编码字符串
         """
-        if url in self.cache:
-            # 如果已存在，移动到末尾
-            self.cache.move_to_end(url)
-            self.cache[url] = base64_str
-        else:
-            # 新增条目
-            self.cache[url] = base64_str
-            # 如果超过容量，删除最旧的条目
-            if len(self.cache) > self.max_size:
-                self.cache.popitem(last=False)
-        self.failed_cache.pop(url, None)
+        with self._lock:
+            if url in self.cache:
+                # 如果已存在，移动到末尾
+                self.cache.move_to_end(url)
+                self.cache[url] = base64_str
+            else:
+                # 新增条目
+                self.cache[url] = base64_str
+                # 如果超过容量，删除最旧的条目
+                if len(self.cache) > self.max_size:
+                    self.cache.popitem(last=False)
+            self.failed_cache.pop(url, None)
 
     def mark_failed(self, url: str, reason: str = "") -> None:
         """
@@ -70,46 +76,53 @@ class ImageBase64Cache:
             url: 图片URL
             reason: 失败原因
         """
-        if not url:
-            return
+        with self._lock:
+            if not url:
+                return
 
-        if url in self.failed_cache:
-            self.failed_cache.move_to_end(url)
-        self.failed_cache[url] = reason
-        if len(self.failed_cache) > self.max_size:
-            self.failed_cache.popitem(last=False)
+            if url in self.failed_cache:
+                self.failed_cache.move_to_end(url)
+            self.failed_cache[url] = reason
+            if len(self.failed_cache) > self.max_size:
+                self.failed_cache.popitem(last=False)
 
     def is_failed(self, url: str) -> bool:
         """检查URL是否已记录为失败。"""
-        if url not in self.failed_cache:
-            return False
-        self.failed_cache.move_to_end(url)
-        return True
+        with self._lock:
+            if url not in self.failed_cache:
+                return False
+            self.failed_cache.move_to_end(url)
+            return True
 
     def get_failed_reason(self, url: str) -> str:
         """获取失败缓存中的失败原因。"""
-        if url not in self.failed_cache:
-            return ""
-        self.failed_cache.move_to_end(url)
-        return self.failed_cache[url]
+        with self._lock:
+            if url not in self.failed_cache:
+                return ""
+            self.failed_cache.move_to_end(url)
+            return self.failed_cache[url]
 
     def clear(self) -> None:
         """清空缓存"""
-        self.cache.clear()
-        self.failed_cache.clear()
-        self.group_cache.clear()
+        with self._lock:
+            self.cache.clear()
+            self.failed_cache.clear()
+            self.group_cache.clear()
 
     def size(self) -> int:
         """返回当前缓存大小"""
-        return len(self.cache)
+        with self._lock:
+            return len(self.cache)
 
     def contains(self, url: str) -> bool:
         """检查URL是否在缓存中"""
-        return url in self.cache
+        with self._lock:
+            return url in self.cache
 
     def failed_size(self) -> int:
         """返回当前失败缓存大小"""
-        return len(self.failed_cache)
+        with self._lock:
+            return len(self.failed_cache)
 
     def _make_group_key(self, img_list: List[str]) -> Tuple[str, ...]:
         """生成图片组稳定key。"""
@@ -117,16 +130,17 @@ class ImageBase64Cache:
 
     def get_group_result(self, img_list: List[str]) -> Optional[Dict[str, Any]]:
         """获取图片组处理结果。"""
-        key = self._make_group_key(img_list)
-        if key not in self.group_cache:
-            return None
-        self.group_cache.move_to_end(key)
-        result = self.group_cache[key]
-        return {
-            "successful_images": list(result.get("successful_images", [])),
-            "failed_urls": list(result.get("failed_urls", [])),
-            "all_failed": bool(result.get("all_failed", False)),
-        }
+        with self._lock:
+            key = self._make_group_key(img_list)
+            if key not in self.group_cache:
+                return None
+            self.group_cache.move_to_end(key)
+            result = self.group_cache[key]
+            return {
+                "successful_images": list(result.get("successful_images", [])),
+                "failed_urls": list(result.get("failed_urls", [])),
+                "all_failed": bool(result.get("all_failed", False)),
+            }
 
     def put_group_result(
         self,
@@ -136,21 +150,23 @@ class ImageBase64Cache:
         all_failed: bool,
     ) -> None:
         """记录图片组处理结果。"""
-        if not img_list:
-            return
-
-        key = self._make_group_key(img_list)
-        if key in self.group_cache:
-            self.group_cache.move_to_end(key)
-
-        self.group_cache[key] = {
-            "successful_images": list(successful_images),
-            "failed_urls": list(failed_urls),
-            "all_failed": all_failed,
-        }
-        if len(self.group_cache) > self.max_size:
-            self.group_cache.popitem(last=False)
+        with self._lock:
+            if not img_list:
+                return
+
+            key = self._make_group_key(img_list)
+            if key in self.group_cache:
+                self.group_cache.move_to_end(key)
+
+            self.group_cache[key] = {
+                "successful_images": list(successful_images),
+                "failed_urls": list(failed_urls),
+                "all_failed": all_failed,
+            }
+            if len(self.group_cache) > self.max_size:
+                self.group_cache.popitem(last=False)
 
     def group_size(self) -> int:
         """返回当前图片组缓存大小。"""
-        return len(self.group_cache)
+        with self._lock:
+            return len(self.group_cache)
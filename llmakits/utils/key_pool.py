@@ -0,0 +1,144 @@
+"""
+API 密钥池
+把并发请求分摊到所有配置的 api_keys 上，支持轮询（round_robin）、加权轮询（weighted）、
+最少在途请求（least_in_flight）三种策略。用尽的密钥只做标记，不从列表中删除。
+配置了每日额度的密钥在接近额度时会被跳过，跨天后自动恢复。
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+KEY_STRATEGIES = ("round_robin", "weighted", "least_in_flight")
+
+
+class KeyPool:
+    """线程安全的 API 密钥池"""
+
+    def __init__(
+        self,
+        keys: List[str],
+        strategy: str = "round_robin",
+        weights: Optional[Dict[str, float]] = None,
+        quota_check: Optional[Callable[[str], bool]] = None,
+    ):
+        """
+        Args:
+            keys: 密钥列表（保持配置顺序）
+            strategy: 选择策略，round_robin / weighted / least_in_flight
+            weights: 各密钥权重（weighted 策略使用），未配置的密钥权重为 1
+            quota_check: 判断密钥当天是否还有额度的函数，返回 False 的密钥暂时不参与选择
+        """
+        if strategy not in KEY_STRATEGIES:
+            raise ValueError(f"未知的密钥选择策略: {strategy}，可选: {list(KEY_STRATEGIES)}")
+        self.keys = list(dict.fromkeys(keys))  # 去重并保持顺序
+        self.strategy = strategy
+        self.weights = {key: float((weights or {}).get(key, 1) or 1) for key in self.keys}
+        self.quota_check = quota_check
+        self._lock = threading.Lock()
+        self._exhausted: List[str] = []
+        self._in_flight: Dict[str, int] = {key: 0 for key in self.keys}
+        self._requests: Dict[str, int] = {key: 0 for key in self.keys}
+        self._current_weights: Dict[str, float] = {key: 0.0 for key in self.keys}
+        self._cursor = 0
+
+    def _usable_keys(self) -> Optional[Set[str]]:
+        """
+        还有当天额度的密钥，在持有锁之前计算（quota_check 可能读取共享状态），None 表示未配置额度检查
+
+        锁内只做集合查找，选择密钥的线程不会排在额度检查的 I/O 后面
+        """
+        if self.quota_check is None:
+            return None
+        return {key for key in self.keys if self.quota_check(key)}
+
+    def _available(self, usable: Optional[Set[str]]) -> List[str]:
+        return [key for key in self.keys if key not in self._exhausted and (usable is None or key in usable)]
+
+    def available_keys(self) -> List[str]:
+        """未用尽且还有当天额度的密钥（配置顺序）"""
+        usable = self._usable_keys()
+        with self._lock:
+            return self._available(usable)
+
+    def exhausted_keys(self) -> List[str]:
+        """已标记为用尽的密钥"""
+        with self._lock:
+            return list(self._exhausted)
+
+    def primary_key(self) -> Optional[str]:
+        """第一个可用的密钥；所有密钥都已接近当天额度时，返回第一个未用尽的密钥"""
+        usable = self._usable_keys()
+        with self._lock:
+            available = self._available(usable) or self._available(None)
+            return available[0] if available else None
+
+    def select(self) -> Optional[str]:
+        """按策略选出下一个请求使用的密钥，并计入在途请求；没有可用密钥时返回 None"""
+        usable = self._usable_keys()
+        with self._lock:
+            available = self._available(usable)
+            if not available:
+                return None
+
+            if self.strategy == "weighted":
+                # 平滑加权轮询：每轮所有密钥加上自身权重，选出当前权重最大的并减去总权重
+                total_weight = 0.0
+                for key in available:
+                    self._current_weights[key] += self.weights[key]
+                    total_weight += self.weights[key]
+                key = max(available, key=lambda k: self._current_weights[k])
+                self._current_weights[key] -= total_weight
+            elif self.strategy == "least_in_flight":
+                # 在途请求最少的密钥，相同时从游标位置开始轮询，避免总是选中第一个
+                start = self._cursor % len(available)
+                rotated = available[start:] + available[:start]
+                key = min(rotated, key=lambda k: self._in_flight[k])
+                self._cursor += 1
+            else:
+                key = available[self._cursor % len(available)]
+                self._cursor += 1
+
+            self._in_flight[key] += 1
+            self._requests[key] += 1
+            return key
+
+    def release(self, key: Optional[str]) -> None:
+        """请求结束，减少密钥的在途请求数"""
+        if key is None:
+            return
+        with self._lock:
+            if self._in_flight.get(key, 0) > 0:
+                self._in_flight[key] -= 1
+
+    def mark_exhausted(self, key: Optional[str]) -> bool:
+        """
+        标记密钥已用尽（重复标记无副作用）
+
+        Returns:
+            bool: 是否还有可用的密钥
+        """
+        usable = self._usable_keys()
+        with self._lock:
+            if key in self._in_flight and key not in self._exhausted:
+                self._exhausted.append(key)
+            return bool(self._available(usable))
+
+    def reset(self) -> None:
+        """清除用尽标记（例如每日额度重置后）"""
+        with self._lock:
+            self._exhausted.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """各密钥的状态（密钥只显示末 4 位）"""
+        usable = self._usable_keys()
+        with self._lock:
+            return {
+                f"***{key[-4:]}": {
+                    "exhausted": key in self._exhausted,
+                    "has_quota": usable is None or key in usable,
+                    "in_flight": self._in_flight[key],
+                    "requests": self._requests[key],
+                    "weight": self.weights[key],
+                }
+                for key in self.keys
+            }
@@ -0,0 +1,158 @@
+"""
+API 密钥每日额度
+按密钥统计当天的请求数和 total_tokens，与 keys_config.yaml 中声明的 daily_requests / daily_tokens 比较，
+密钥接近额度时由密钥池主动跳过，而不是等平台返回额度错误后再切换。
+
+额度按（平台, 密钥）在进程内共享，同一密钥被多个模型使用时合并计算；每天（本地时间）零点自动清零。
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+QUOTA_FIELDS = ("daily_tokens", "daily_requests", "quota_reserve")
+
+# 默认预留比例：用量达到额度的 95% 时切换到下一个密钥，留出并发请求和 token 估计误差的余量
+DEFAULT_QUOTA_RESERVE = 0.05
+
+
+def pick_quota_limits(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """从平台或密钥配置中取出非空的额度字段"""
+    if not config:
+        return {}
+    return {field: config[field] for field in QUOTA_FIELDS if config.get(field) is not None}
+
+
+class KeyQuota:
+    """
+    单个密钥的每日额度（线程安全）
+
+    Args:
+        daily_tokens: 每日 token 额度，None 表示不限制
+        daily_requests: 每日请求数额度，None 表示不限制
+        quota_reserve: 预留比例，用量达到 额度 * (1 - quota_reserve) 时视为接近额度
+        clock: 时间函数（测试时可替换）
+    """
+
+    def __init__(
+        self,
+        daily_tokens: Optional[int] = None,
+        daily_requests: Optional[int] = None,
+        quota_reserve: float = DEFAULT_QUOTA_RESERVE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.daily_tokens = int(daily_tokens) if daily_tokens else None
+        self.daily_requests = int(daily_requests) if daily_requests else None
+        self.quota_reserve = float(quota_reserve)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._day = self._today()
+        self.tokens_used = 0
+        self.requests_used = 0
+        self._reported = False  # 当天是否已报告过接近额度
+
+    def _today(self) -> str:
+        return time.strftime("%Y-%m-%d", time.localtime(self._clock()))
+
+    def _roll(self) -> None:
+        """跨天时清零用量（调用方需持有锁）"""
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self.tokens_used = 0
+            self.requests_used = 0
+            self._reported = False
+
+    def _near_limit(self) -> bool:
+        threshold = 1 - self.quota_reserve
+        if self.daily_requests is not None and self.requests_used >= self.daily_requests * threshold:
+            return True
+        if self.daily_tokens is not None and self.tokens_used >= self.daily_tokens * threshold:
+            return True
+        return False
+
+    def _check_reached(self) -> bool:
+        """刚刚接近额度时返回 True（每天只返回一次），用于报告密钥切换"""
+        if self._reported or not self._near_limit():
+            return False
+        self._reported = True
+        return True
+
+    def has_quota(self) -> bool:
+        """密钥今天是否还可以继续使用"""
+        with self._lock:
+            self._roll()
+            return not self._near_limit()
+
+    def record_request(self) -> bool:
+        """
+        记录一次发出的请求
+
+        Returns:
+            bool: 本次请求是否使密钥刚好接近额度
+        """
+        with self._lock:
+            self._roll()
+            self.requests_used += 1
+            return self._check_reached()
+
+    def record_tokens(self, tokens: int) -> bool:
+        """
+        记录响应返回的 total_tokens
+
+        Returns:
+            bool: 本次用量是否使密钥刚好接近额度
+        """
+        with self._lock:
+            self._roll()
+            self.tokens_used += int(tokens or 0)
+            return self._check_reached()
+
+    def remaining(self) -> Dict[str, Any]:
+        """当天的用量和剩余额度（未限制的字段剩余额度为 None）"""
+        with self._lock:
+            self._roll()
+            return {
+                "day": self._day,
+                "tokens_used": self.tokens_used,
+                "tokens_remaining": (
+                    max(self.daily_tokens - self.tokens_used, 0) if self.daily_tokens is not None else None
+                ),
+                "requests_used": self.requests_used,
+                "requests_remaining": (
+                    max(self.daily_requests - self.requests_used, 0) if self.daily_requests is not None else None
+                ),
+                "has_quota": not self._near_limit(),
+            }
+
+
+# 进程级注册表：(平台, 密钥) -> KeyQuota
+_KEY_QUOTAS: Dict[Tuple[str, str], KeyQuota] = {}
+_KEY_QUOTAS_LOCK = threading.Lock()
+
+
+def get_key_quota(platform: str, api_key: str, limits: Optional[Dict[str, Any]]) -> Optional[KeyQuota]:
+    """获取（必要时创建）密钥的每日额度，未配置 daily_tokens / daily_requests 时返回 None"""
+    limits = pick_quota_limits(limits)
+    if not limits.get("daily_tokens") and not limits.get("daily_requests"):
+        return None
+    registry_key = (platform, api_key)
+    with _KEY_QUOTAS_LOCK:
+        quota = _KEY_QUOTAS.get(registry_key)
+        if quota is None:
+            quota = KeyQuota(**limits)
+            _KEY_QUOTAS[registry_key] = quota
+        return quota
+
+
+def get_key_quota_stats() -> Dict[str, Dict[str, Any]]:
+    """所有配置了额度的密钥当天的用量和剩余额度（密钥只显示末 4 位）"""
+    with _KEY_QUOTAS_LOCK:
+        items = list(_KEY_QUOTAS.items())
+    return {f"{platform}:***{str(api_key)[-4:]}": quota.remaining() for (platform, api_key), quota in items}
+
+
+def reset_key_quotas() -> None:
+    """清空额度注册表（主要用于测试或重新加载配置）"""
+    with _KEY_QUOTAS_LOCK:
+        _KEY_QUOTAS.clear()
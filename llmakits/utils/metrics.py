@@ -0,0 +1,260 @@
+"""
+进程内指标注册表
+按模型组、模型和密钥记录请求数、耗时分布、token、重试、错误类型、缓存命中和对冲次数，
+并以 Prometheus 文本格式导出（可选启动本地 HTTP 端点供 Prometheus 抓取）。
+
+记录指标时每个线程写入自己的分片，不需要加锁；导出时再合并所有分片。
+仪表（gauge，如舱壁排队数）只保留最新值，写入时加锁，只用于不在请求快路径上的指标。
+线程结束后，它的分片会并入公共的基础分片，分片数量只与存活的线程数有关。
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 默认的耗时分桶（秒），覆盖从缓存命中到 180 秒超时的范围
+DEFAULT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180)
+
+# 指标名称 -> (类型, 说明)
+METRIC_DEFINITIONS: Dict[str, Tuple[str, str]] = {
+    "llmakits_requests_total": ("counter", "模型调用次数（按结果 status 区分）"),
+    "llmakits_request_latency_seconds": ("histogram", "模型调用耗时（含 send_message 内部重试）"),
+    "llmakits_tokens_total": ("counter", "模型调用消耗的 token 数"),
+    "llmakits_cost_total": ("counter", "模型调用成本（按 global_model_config 的单价计算）"),
+    "llmakits_errors_total": ("counter", "模型调用失败次数（按错误类型 error_tag 区分）"),
+    "llmakits_cache_hits_total": ("counter", "响应缓存命中次数"),
+    "llmakits_cache_misses_total": ("counter", "响应缓存未命中次数"),
+    "llmakits_hedges_total": ("counter", "发出的对冲请求数"),
+    "llmakits_hedge_wins_total": ("counter", "对冲请求胜出次数"),
+    "llmakits_bulkhead_queued_total": ("counter", "在模型组舱壁中排队的调用数"),
+    "llmakits_bulkhead_timeouts_total": ("counter", "在模型组舱壁中排队超时的调用数"),
+    "llmakits_bulkhead_wait_seconds": ("histogram", "在模型组舱壁中的排队时间"),
+    "llmakits_bulkhead_queue_depth": ("gauge", "模型组舱壁当前的排队数"),
+    "llmakits_key_requests_total": ("counter", "各密钥发出的请求数（按结果 status 区分）"),
+    "llmakits_key_latency_seconds": ("histogram", "各密钥单次请求的耗时"),
+    "llmakits_retries_total": ("counter", "send_message 内部的重试次数（action 为 retry 或 switch_key）"),
+    "llmakits_group_stream_ttft_seconds": ("histogram", "stream_with_group 从调用到产出首个文本增量的耗时（含模型切换）"),
+    "llmakits_stream_ttft_seconds": ("histogram", "流式请求的首 token 耗时（从发出请求算起）"),
+    "llmakits_stream_max_chunk_gap_seconds": ("histogram", "流式请求中相邻内容块的最大间隔"),
+    "llmakits_stream_output_tokens_total": ("counter", "流式请求的输出 token 数（解码吞吐的分子）"),
+    "llmakits_stream_decode_seconds_total": ("counter", "流式请求首 token 之后的解码耗时（解码吞吐的分母）"),
+    "llmakits_stream_aborts_total": ("counter", "流式输出被增量校验提前终止的次数"),
+    "llmakits_stream_early_stops_total": ("counter", "JSON 对象完整后提前结束流式接收的次数"),
+    "llmakits_stream_saved_tokens_total": ("counter", "提前终止 / 提前结束估算节省的输出 token 数"),
+    "llmakits_stream_saved_seconds_total": ("counter", "提前终止 / 提前结束估算节省的生成时间（秒）"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+SeriesKey = Tuple[str, LabelKey]
+Shard = Dict[str, Dict[SeriesKey, Any]]
+
+
+def mask_key(api_key: Optional[str]) -> str:
+    """指标和日志中的密钥标签（只保留末 4 位）"""
+    return f"***{api_key[-4:]}" if api_key else "none"
+
+
+class MetricsRegistry:
+    """
+    线程安全的指标注册表
+
+    Args:
+        latency_buckets: 耗时直方图的分桶上界（秒）
+    """
+
+    def __init__(self, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.latency_buckets = tuple(sorted(float(bucket) for bucket in latency_buckets))
+        self._local = threading.local()
+        self._lock = threading.Lock()  # 只在登记新线程的分片、合并和清空时使用
+        self._shards: List[Tuple[threading.Thread, Shard]] = []
+        self._base: Shard = {"counters": {}, "histograms": {}}  # 已结束线程的分片合并到这里
+        self._gauges: Dict[SeriesKey, float] = {}
+
+    def _shard(self) -> Shard:
+        """当前线程的分片，首次使用时登记（顺便回收已结束线程的分片）"""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {"counters": {}, "histograms": {}}
+            with self._lock:
+                self._fold_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+        return shard
+
+    def _fold_dead_shards(self) -> None:
+        """把已结束线程的分片并入基础分片（调用方需持有锁；线程结束后不会再写入，合并是安全的）"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                _merge_shard(self._base["counters"], self._base["histograms"], shard)
+        self._shards = alive
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """计数器增加 value"""
+        counters = self._shard()["counters"]
+        series = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        counters[series] = counters.get(series, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        """仪表设置为 value（保留最新值）"""
+        series = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._gauges[series] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """直方图记录一个观测值"""
+        histograms = self._shard()["histograms"]
+        series = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        entry = histograms.get(series)
+        if entry is None:
+            # [各分桶计数（最后一个为 +Inf）, 总和, 总数]
+            entry = [[0] * (len(self.latency_buckets) + 1), 0.0, 0]
+            histograms[series] = entry
+        entry[0][bisect.bisect_left(self.latency_buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def _collect(self) -> Tuple[Dict[SeriesKey, float], Dict[SeriesKey, list]]:
+        """合并基础分片和所有存活线程的分片（仪表的值与计数器一起返回）"""
+        counters: Dict[SeriesKey, float] = {}
+        histograms: Dict[SeriesKey, list] = {}
+        with self._lock:
+            self._fold_dead_shards()
+            shards = [shard for _, shard in self._shards]
+            _merge_shard(counters, histograms, self._base)
+            counters.update(self._gauges)
+        for shard in shards:
+            _merge_shard(counters, histograms, shard)
+        return counters, histograms
+
+    def get_value(self, name: str, **labels: Any) -> float:
+        """读取计数器或仪表的当前值（labels 为部分标签时，对所有匹配的序列求和）"""
+        counters, _ = self._collect()
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        return sum(value for (series_name, label_key), value in counters.items()
+                   if series_name == name and wanted.issubset(label_key))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """所有序列的当前值，直方图给出 count / sum"""
+        counters, histograms = self._collect()
+        result: Dict[str, Dict[str, Any]] = {}
+        for (name, label_key), value in counters.items():
+            result.setdefault(name, {})[_format_labels(label_key)] = value
+        for (name, label_key), (_, total, count) in histograms.items():
+            result.setdefault(name, {})[_format_labels(label_key)] = {"count": count, "sum": round(total, 4)}
+        return result
+
+    def reset(self) -> None:
+        """清空所有指标（主要用于测试）"""
+        with self._lock:
+            self._gauges.clear()
+            for shard in [self._base] + [shard for _, shard in self._shards]:
+                shard["counters"].clear()
+                shard["histograms"].clear()
+
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式（0.0.4）导出所有指标"""
+        counters, histograms = self._collect()
+        lines: List[str] = []
+
+        names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+        for name in names:
+            metric_type, help_text = METRIC_DEFINITIONS.get(name, ("counter", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (series_name, label_key), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_format_labels(label_key)} {_format_value(value)}")
+            for (series_name, label_key), (buckets, total, count) in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for upper, bucket_count in zip(self.latency_buckets + (float("inf"),), buckets):
+                    cumulative += bucket_count
+                    le = "+Inf" if upper == float("inf") else _format_value(upper)
+                    lines.append(f"{name}_bucket{_format_labels(label_key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(label_key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(label_key)} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _merge_shard(counters: Dict[SeriesKey, float], histograms: Dict[SeriesKey, list], shard: Shard) -> None:
+    """把一个分片累加到 counters / histograms（分片可能正在被所属线程写入，先复制再读）"""
+    for series, value in shard["counters"].copy().items():
+        counters[series] = counters.get(series, 0) + value
+    for series, (buckets, total, count) in shard["histograms"].copy().items():
+        merged = histograms.setdefault(series, [[0] * len(buckets), 0.0, 0])
+        for i, bucket_count in enumerate(list(buckets)):
+            merged[0][i] += bucket_count
+        merged[1] += total
+        merged[2] += count
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_key: LabelKey) -> str:
+    if not label_key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in label_key) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# 进程级的指标注册表，调度器和客户端共用
+_REGISTRY = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取进程级的指标注册表"""
+    return _REGISTRY
+
+
+def render_prometheus(registry: Optional[MetricsRegistry] = None) -> str:
+    """以 Prometheus 文本格式导出指标（默认为进程级注册表）"""
+    return (registry or _REGISTRY).render_prometheus()
+
+
+def start_metrics_server(
+    port: int = 9464, host: str = "127.0.0.1", registry: Optional[MetricsRegistry] = None
+) -> ThreadingHTTPServer:
+    """
+    在后台线程启动 HTTP 端点，GET /metrics 返回 Prometheus 文本格式的指标
+
+    Args:
+        port: 监听端口，0 表示由系统分配（通过 server.server_address 获取）
+        host: 监听地址，默认只监听本机
+        registry: 指标注册表，默认为进程级注册表
+
+    Returns:
+        ThreadingHTTPServer，调用 shutdown() 停止
+    """
+    target = registry or _REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = target.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 不把每次抓取写到 stderr
+            return
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="llmakits-metrics", daemon=True)
+    thread.start()
+    return server
@@ -1,4 +1,5 @@
 from .normalize_error import ResponseError
+from .deadline import DeadlineExceededError
 
 
 def should_stop_model_fallback(response_error: ResponseError, error_message: str) -> bool:
@@ -12,6 +13,9 @@ def should_stop_model_fallback(response_error: ResponseError, error_message: str
         "强制base64域名图片转换失败",
     )
 
+    if isinstance(response_error, DeadlineExceededError):
+        # 调用时限已用完，切换模型也没有意义
+        return True
     if response_error.error_tag in non_fallback_error_tags:
         return True
     return any(keyword in error_message for keyword in non_fallback_keywords)
@@ -0,0 +1,101 @@
+"""
+模型运行统计
+按模型记录 EWMA 响应耗时、错误率和校验通过率，供路由策略和报告使用
+"""
+
+import threading
+from typing import Any, Dict
+
+# 失败调用计入 EWMA 耗时的最小值（秒），约等于一次超时的代价
+DEFAULT_FAILURE_LATENCY = 30.0
+
+
+class ModelStats:
+    """单个模型的 EWMA 统计（线程安全）"""
+
+    def __init__(self, alpha: float = 0.2, failure_latency: float = DEFAULT_FAILURE_LATENCY):
+        """
+        Args:
+            alpha: EWMA 平滑系数，越大越偏向最近的观测值
+            failure_latency: 失败调用按 max(实际耗时, failure_latency) 计入 EWMA 耗时
+        """
+        self.alpha = alpha
+        self.failure_latency = failure_latency
+        self._lock = threading.Lock()
+        self.calls = 0  # 调用次数（含失败）
+        self.ewma_latency = 0.0  # EWMA 耗时（秒），失败调用按 failure_latency 惩罚计入
+        self.error_rate = 0.0  # EWMA 错误率
+        self.validations = 0  # 校验次数
+        self.validation_pass_rate = 1.0  # EWMA 校验通过率
+
+    def _ewma(self, current: float, value: float, first: bool) -> float:
+        if first:
+            return value
+        return self.alpha * value + (1 - self.alpha) * current
+
+    def record_call(self, latency: float, success: bool) -> None:
+        """记录一次调用结果"""
+        with self._lock:
+            first = self.calls == 0
+            self.calls += 1
+            self.error_rate = self._ewma(self.error_rate, 0.0 if success else 1.0, first)
+            # 快速失败（如连接被拒绝）的耗时很短，按超时代价计入，避免一直失败的模型因为"快"而被优先选择
+            observed = latency if success else max(latency, self.failure_latency)
+            self.ewma_latency = self._ewma(self.ewma_latency, observed, first)
+
+    def record_validation(self, passed: bool) -> None:
+        """记录一次 format_json / validate_func 校验结果"""
+        with self._lock:
+            first = self.validations == 0
+            self.validations += 1
+            self.validation_pass_rate = self._ewma(self.validation_pass_rate, 1.0 if passed else 0.0, first)
+
+    def success_rate(self) -> float:
+        """请求成功且通过校验的估计概率"""
+        with self._lock:
+            return (1 - self.error_rate) * self.validation_pass_rate
+
+    def score(self, failure_penalty: float = 2.0) -> float:
+        """
+        路由得分（越小越好）：期望耗时按失败概率加权惩罚
+
+        没有任何观测的模型得分为 0，会被优先尝试一次以获得样本。
+        """
+        with self._lock:
+            if self.calls == 0:
+                return 0.0
+            success_rate = (1 - self.error_rate) * self.validation_pass_rate
+            latency = self.ewma_latency
+        return latency * (1 + failure_penalty * (1 - success_rate))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "ewma_latency": round(self.ewma_latency, 4),
+                "error_rate": round(self.error_rate, 4),
+                "validations": self.validations,
+                "validation_pass_rate": round(self.validation_pass_rate, 4),
+            }
+
+
+class ModelStatsRegistry:
+    """按模型标识（sdk_name:model_name）管理 ModelStats"""
+
+    def __init__(self, alpha: float = 0.2, failure_latency: float = DEFAULT_FAILURE_LATENCY):
+        self.alpha = alpha
+        self.failure_latency = failure_latency
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ModelStats] = {}
+
+    def get(self, model_key: str) -> ModelStats:
+        stats = self._stats.get(model_key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(model_key, ModelStats(self.alpha, self.failure_latency))
+        return stats
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            items = list(self._stats.items())
+        return {model_key: stats.snapshot() for model_key, stats in items}
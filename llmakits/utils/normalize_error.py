@@ -1,5 +1,5 @@
 from typing import Dict
-from funcguard import print_line
+from .event_log import log_event, log_separator
 
 
 class ResponseError( Exception ) :
@@ -29,14 +29,19 @@ class ResponseError( Exception ) :
         if self.skip_report or self.reported :
             return
 
-        print_line()
-        print( self.base_model_info )
-
+        lines = [ self.base_model_info ]
         if print_tag and self.error_tag:
-            print( self.error_tag )
-
+            lines.append( self.error_tag )
         if print_message :
-            print( self.error_message )
+            lines.append( self.error_message )
+
+        log_separator( level = "error" )
+        log_event(
+            "response_error", "\n".join( lines ), "error",
+            model = f"{self.platform}:{self.model_name}",
+            error_tag = self.error_tag,
+            error_message = self.error_message,
+        )
 
         self.reported = True
 
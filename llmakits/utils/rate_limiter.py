@@ -0,0 +1,299 @@
+"""
+API 密钥的客户端限流
+按 keys_config.yaml 中声明的 rpm（每分钟请求数）、tpm（每分钟 token 数）、max_concurrency（最大并发数），
+在请求发出前用令牌桶主动排队，使请求速率始终低于平台限制，而不是等到被拒绝后再 sleep 重试。
+
+keys_config.yaml 示例：
+    dashscope:
+      base_url: "https://dashscope.aliyuncs.com/compatible-mode/v1"
+      rpm: 60                # 平台级默认值，对该平台的每个密钥生效
+      tpm: 100000
+      max_concurrency: 4
+      api_keys:
+        - "sk-xxx"           # 使用平台级默认值
+        - key: "sk-yyy"      # 单独为某个密钥设置
+          rpm: 120
+"""
+
+import time
+import json
+import math
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .deadline import Deadline
+
+# 可以在平台级或密钥级声明的限流字段
+RATE_LIMIT_FIELDS = ("rpm", "tpm", "max_concurrency")
+
+# 轮询并发名额时的等待间隔（秒）
+_POLL_INTERVAL = 0.05
+
+# 每张图片按固定的 token 数估计（base64 数据不按文本长度计）
+_IMAGE_TOKENS = 1000
+_IMAGE_PART_TYPES = ("image_url", "image", "input_image")
+
+
+def normalize_api_keys(api_keys: List[Any]) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+    """
+    解析 api_keys 配置，每一项可以是密钥字符串，也可以是带 key 字段和额外配置的字典
+
+    Returns:
+        (密钥列表, {密钥: 该密钥的额外配置})
+    """
+    keys: List[str] = []
+    key_options: Dict[str, Dict[str, Any]] = {}
+    for item in api_keys or []:
+        if isinstance(item, dict):
+            key = item.get("key") or item.get("api_key")
+            if not key:
+                raise ValueError(f"api_keys 中的字典配置必须包含 key 字段: {item}")
+            keys.append(key)
+            key_options[key] = {k: v for k, v in item.items() if k not in ("key", "api_key")}
+        else:
+            keys.append(item)
+    return keys, key_options
+
+
+def pick_rate_limits(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """从平台或密钥配置中取出非空的限流字段"""
+    if not config:
+        return {}
+    return {field: config[field] for field in RATE_LIMIT_FIELDS if config.get(field)}
+
+
+def _is_image_part(part: Dict[str, Any]) -> bool:
+    """OpenAI 格式的 {"type": "image_url", ...} 或 DashScope 格式的 {"image": ...}"""
+    return part.get("type") in _IMAGE_PART_TYPES or set(part) == {"image"}
+
+
+def _strip_images(value: Any) -> Tuple[Any, int]:
+    """去掉消息中的图片内容，返回 (只含文本的消息, 图片数量)"""
+    if isinstance(value, dict):
+        if _is_image_part(value):
+            return None, 1
+        images = 0
+        stripped = {}
+        for key, item in value.items():
+            stripped[key], count = _strip_images(item)
+            images += count
+        return stripped, images
+    if isinstance(value, (list, tuple)):
+        images = 0
+        items = []
+        for item in value:
+            item, count = _strip_images(item)
+            items.append(item)
+            images += count
+        return items, images
+    return value, 0
+
+
+def estimate_tokens(messages: Any) -> int:
+    """粗略估计请求消耗的 token 数（文本约 2 个字符 1 个 token，每张图片按固定的 _IMAGE_TOKENS 计）"""
+    messages, images = _strip_images(messages)
+    try:
+        text = json.dumps(messages, ensure_ascii=False)
+    except (TypeError, ValueError):
+        text = str(messages)
+    return max(math.ceil(len(text) / 2) + images * _IMAGE_TOKENS, 1)
+
+
+class TokenBucket:
+    """
+    令牌桶：令牌按 rate_per_minute / 60 的速度匀速补充（线程安全）
+
+    桶容量默认只有 1 秒的配额，请求被均匀地摊开，任意一分钟内的用量最多超出配额 1 秒的量，
+    不会出现把整分钟配额在开头一次性打满的突发。
+    """
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None, clock=time.monotonic):
+        self.rate = float(rate_per_minute) / 60.0
+        self.capacity = float(burst) if burst else max(self.rate, 1.0)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        预占 amount 个令牌，令牌可以透支，透支部分由后续请求排队偿还
+
+        Returns:
+            float: 调用方需要等待的秒数（0 表示可以立即发出请求）
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= float(amount)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """根据实际消耗修正令牌（正数为退还，负数为补扣）"""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RatePermit:
+    """一次请求占用的限流名额，请求结束后必须调用 release"""
+
+    def __init__(self, limiter: "KeyRateLimiter", estimated_tokens: int):
+        self._limiter = limiter
+        self._estimated_tokens = estimated_tokens
+        self._released = False
+
+    def release(self, actual_tokens: int = 0) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._limiter._release(self._estimated_tokens, actual_tokens)
+
+
+class KeyRateLimiter:
+    """单个 API 密钥的限流器：rpm / tpm 令牌桶 + 并发数限制"""
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_concurrency: Optional[int] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self._concurrency = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._lock = threading.Lock()
+        self.in_flight = 0  # 正在进行的请求数
+        self.throttled = 0  # 需要排队等待的请求数
+        self.total_wait = 0.0  # 累计排队时间（秒）
+
+    def _reserve_wait(self, estimated_tokens: int) -> float:
+        wait_seconds = 0.0
+        if self.request_bucket is not None:
+            wait_seconds = max(wait_seconds, self.request_bucket.reserve(1))
+        if self.token_bucket is not None:
+            wait_seconds = max(wait_seconds, self.token_bucket.reserve(estimated_tokens))
+        return wait_seconds
+
+    def _record_acquired(self, waited: float) -> None:
+        with self._lock:
+            self.in_flight += 1
+            if waited > 0:
+                self.throttled += 1
+                self.total_wait += waited
+
+    def _cancel(self, estimated_tokens: int, reserved: bool) -> None:
+        """排队期间被取消或中断：退还并发名额和已预占的令牌"""
+        if reserved:
+            if self.request_bucket is not None:
+                self.request_bucket.adjust(1)
+            if self.token_bucket is not None:
+                self.token_bucket.adjust(estimated_tokens)
+        if self._concurrency is not None:
+            self._concurrency.release()
+
+    def acquire(self, estimated_tokens: int = 0, deadline: Optional[Deadline] = None) -> RatePermit:
+        """
+        阻塞直到可以发出请求
+
+        Raises:
+            DeadlineExceededError: 在调用时限内排不到名额（需要等待的时间超过剩余时间时立即抛出，不会等到时限结束）
+        """
+        start_time = time.monotonic()
+        if self._concurrency is not None:
+            if deadline is None:
+                self._concurrency.acquire()
+            elif not self._concurrency.acquire(timeout=deadline.remaining()):
+                raise deadline.exceeded()
+        reserved = False
+        try:
+            wait_seconds = self._reserve_wait(estimated_tokens)
+            reserved = True
+            if wait_seconds > 0:
+                if deadline is not None:
+                    deadline.ensure(wait_seconds)
+                time.sleep(wait_seconds)
+        except BaseException:
+            self._cancel(estimated_tokens, reserved)
+            raise
+        self._record_acquired(time.monotonic() - start_time)
+        return RatePermit(self, estimated_tokens)
+
+    async def acquire_async(self, estimated_tokens: int = 0, deadline: Optional[Deadline] = None) -> RatePermit:
+        """acquire 的异步版本，等待期间不阻塞事件循环；任务在排队时被取消会退还名额和令牌"""
+        start_time = time.monotonic()
+        if self._concurrency is not None:
+            # 并发名额同时被线程和协程使用，这里以非阻塞方式轮询
+            while not self._concurrency.acquire(blocking=False):
+                if deadline is not None:
+                    deadline.ensure(_POLL_INTERVAL)
+                await asyncio.sleep(_POLL_INTERVAL)
+        reserved = False
+        try:
+            wait_seconds = self._reserve_wait(estimated_tokens)
+            reserved = True
+            if wait_seconds > 0:
+                if deadline is not None:
+                    deadline.ensure(wait_seconds)
+                await asyncio.sleep(wait_seconds)
+        except BaseException:
+            self._cancel(estimated_tokens, reserved)
+            raise
+        self._record_acquired(time.monotonic() - start_time)
+        return RatePermit(self, estimated_tokens)
+
+    def _release(self, estimated_tokens: int, actual_tokens: int) -> None:
+        if self.token_bucket is not None and actual_tokens:
+            # 按实际消耗修正预估值
+            self.token_bucket.adjust(estimated_tokens - actual_tokens)
+        with self._lock:
+            self.in_flight -= 1
+        if self._concurrency is not None:
+            self._concurrency.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "total_wait": round(self.total_wait, 3),
+            }
+
+
+# 进程级限流器注册表：同一平台的同一密钥被多个模型共享时，共用一个限流器
+_RATE_LIMITERS: Dict[Tuple[str, str], KeyRateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(platform: str, api_key: str, limits: Optional[Dict[str, Any]]) -> Optional[KeyRateLimiter]:
+    """获取（必要时创建）密钥的限流器，未配置任何限流字段时返回 None"""
+    limits = pick_rate_limits(limits)
+    if not limits:
+        return None
+    registry_key = (platform, api_key)
+    with _RATE_LIMITERS_LOCK:
+        limiter = _RATE_LIMITERS.get(registry_key)
+        if limiter is None:
+            limiter = KeyRateLimiter(**limits)
+            _RATE_LIMITERS[registry_key] = limiter
+        return limiter
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有密钥限流器的统计（密钥只显示末 4 位）"""
+    with _RATE_LIMITERS_LOCK:
+        items = list(_RATE_LIMITERS.items())
+    return {f"{platform}:***{str(api_key)[-4:]}": limiter.snapshot() for (platform, api_key), limiter in items}
+
+
+def reset_rate_limiters() -> None:
+    """清空限流器注册表（主要用于测试或重新加载配置）"""
+    with _RATE_LIMITERS_LOCK:
+        _RATE_LIMITERS.clear()
@@ -0,0 +1,162 @@
+"""
+模型响应缓存
+以 模型 + 消息内容 + 采样参数（以及 stream_json 字段）的哈希为 key，缓存模型的原始响应文本。
+内存层为 LRU + TTL，可选的 SQLite 层保存在磁盘上，可在多个进程间共享。
+"""
+
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# 不影响模型输出、不参与缓存 key 的 message_info 字段
+_IGNORED_MESSAGE_FIELDS = ("debug",)
+
+
+def make_cache_key(
+    model_info: Dict[str, Any],
+    message_info: Dict[str, Any],
+    stream_json_fields: Optional[Sequence[str]] = None,
+) -> str:
+    """
+    计算请求的缓存 key
+
+    Args:
+        model_info: 模型组中的模型信息（sdk_name / model_name / model）
+        message_info: 消息信息（system_prompt / user_text / img_list 等）
+        stream_json_fields: stream_json 的字段（会提前结束接收，只返回 JSON 对象），None 表示未使用
+
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    model = model_info.get("model")
+    payload = {
+        "sdk_name": model_info.get("sdk_name"),
+        "model_name": model_info.get("model_name"),
+        "base_url": getattr(model, "base_url", None),
+        "temperature": getattr(model, "temperature", None),
+        "top_p": getattr(model, "top_p", None),
+        "extra_body": getattr(model, "extra_body", None),
+        "message": {k: v for k, v in (message_info or {}).items() if k not in _IGNORED_MESSAGE_FIELDS},
+    }
+    if stream_json_fields is not None:
+        payload["stream_json"] = list(stream_json_fields)
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    响应缓存（线程安全）
+
+    Args:
+        max_size: 内存层最多缓存的响应数量
+        ttl: 缓存有效期（秒），None 表示不过期
+        sqlite_path: SQLite 文件路径，指定后启用磁盘层（多进程共享）
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: Optional[float] = None, sqlite_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0  # 命中 SQLite 层的次数（包含在 hits 中）
+
+        if sqlite_path:
+            self._execute("PRAGMA journal_mode=WAL")
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "cache_key TEXT PRIMARY KEY, message TEXT NOT NULL, tokens INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _execute(self, sql: str, params: tuple = ()) -> Optional[tuple]:
+        """执行一条 SQL 并提交，返回第一行结果。每次操作使用独立连接，避免跨线程共享连接"""
+        conn = sqlite3.connect(self.sqlite_path, timeout=30)  # type: ignore[arg-type]
+        try:
+            row = conn.execute(sql, params).fetchone()
+            conn.commit()
+            return row
+        finally:
+            conn.close()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, cache_key: str) -> Optional[Tuple[str, int]]:
+        """
+        查询缓存
+
+        Returns:
+            (原始响应文本, 生成该响应时消耗的 token 数)，未命中返回 None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry is not None:
+                if self._is_expired(entry[2], now):
+                    del self._memory[cache_key]
+                else:
+                    self._memory.move_to_end(cache_key)
+                    self.hits += 1
+                    return entry[0], entry[1]
+
+        if self.sqlite_path:
+            row = self._execute(
+                "SELECT message, tokens, created_at FROM response_cache WHERE cache_key = ?", (cache_key,)
+            )
+            if row is not None and not self._is_expired(row[2], now):
+                message, tokens, created_at = row
+                with self._lock:
+                    self._put_memory(cache_key, message, tokens, created_at)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return message, tokens
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put_memory(self, cache_key: str, message: str, tokens: int, created_at: float) -> None:
+        """写入内存层（调用方需持有锁）"""
+        self._memory[cache_key] = (message, tokens, created_at)
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def put(self, cache_key: str, message: Any, tokens: int = 0) -> None:
+        """写入缓存，只缓存字符串响应（流式生成器等无法缓存）"""
+        if not isinstance(message, str):
+            return
+        created_at = time.time()
+        with self._lock:
+            self._put_memory(cache_key, message, int(tokens or 0), created_at)
+        if self.sqlite_path:
+            self._execute(
+                "INSERT OR REPLACE INTO response_cache (cache_key, message, tokens, created_at) VALUES (?, ?, ?, ?)",
+                (cache_key, message, int(tokens or 0), created_at),
+            )
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        with self._lock:
+            self._memory.clear()
+        if self.sqlite_path:
+            self._execute("DELETE FROM response_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "memory_size": len(self._memory),
+                "max_size": self.max_size,
+            }
@@ -4,11 +4,15 @@
 """
 
 from funcguard import time_wait
-from typing import Dict, Tuple, Any, List, Set
+from typing import Dict, Tuple, Any, List, Set, Optional
 from urllib.parse import urlparse
 from ..message import rebuild_messages_single_image, convert_images_to_base64, resolve_images_with_cache
 from .normalize_error import ResponseError
-from .retry_state import get_retry_state
+from .deadline import Deadline
+from .tracing import start_span
+from .event_log import log_event
+from .retry_state import get_retry_state, get_retry_state_lock
+from .shared_state import DOMAIN_FAILURES, FORCE_BASE64_DOMAINS, get_shared_state, seconds_until_midnight
 from .retry_config import (
     IMAGE_DOWNLOAD_ERROR_KEYWORDS,
     DEFAULT_RETRY_KEYWORDS,
@@ -89,35 +93,59 @@ class RetryHandler :
         if not domain :
             return
 
-        if domain not in self.domain_failure_stats :
-            self.domain_failure_stats[ domain ] = { "consecutive" : 0, "cumulative" : 0 }
+        newly_forced = False
+        with get_retry_state_lock() :
+            if domain not in self.domain_failure_stats :
+                self.domain_failure_stats[ domain ] = { "consecutive" : 0, "cumulative" : 0 }
 
-        stats = self.domain_failure_stats[ domain ]
-        stats[ "cumulative" ] += 1
+            stats = self.domain_failure_stats[ domain ]
+            stats[ "cumulative" ] += 1
 
-        last_failed_domain = self._retry_state[ "last_failed_domain" ]
-        self._last_failed_domain = last_failed_domain
+            last_failed_domain = self._retry_state[ "last_failed_domain" ]
+            self._last_failed_domain = last_failed_domain
 
-        if domain == last_failed_domain :
-            stats[ "consecutive" ] += 1
-        else :
-            stats[ "consecutive" ] = 1
-            self._last_failed_domain = domain
-            self._retry_state[ "last_failed_domain" ] = domain
-
-        if stats[ "consecutive" ] >= 3 or stats[ "cumulative" ] >= 5 :
-            if domain not in self.force_base64_domains :
-                print( f"域名 {domain} 已触发阈值，后续将强制使用base64图片" )
-            self.force_base64_domains.add( domain )
+            if domain == last_failed_domain :
+                stats[ "consecutive" ] += 1
+            else :
+                stats[ "consecutive" ] = 1
+                self._last_failed_domain = domain
+                self._retry_state[ "last_failed_domain" ] = domain
+
+            if stats[ "consecutive" ] >= 3 or stats[ "cumulative" ] >= 5 :
+                newly_forced = domain not in self.force_base64_domains
+                self.force_base64_domains.add( domain )
+
+        shared = get_shared_state()
+        if shared is not None and not newly_forced and domain not in self.force_base64_domains :
+            # 累计失败次数在所有进程间合并计算
+            shared_cumulative = shared.incr( DOMAIN_FAILURES, domain, ttl = seconds_until_midnight() )
+            if shared_cumulative >= 5 :
+                with get_retry_state_lock() :
+                    newly_forced = domain not in self.force_base64_domains
+                    self.force_base64_domains.add( domain )
+        if newly_forced and shared is not None :
+            # 通知其他进程：该域名后续强制使用base64图片
+            shared.set( FORCE_BASE64_DOMAINS, domain, True, ttl = seconds_until_midnight() )
+
+        if newly_forced :
+            log_event( "force_base64_domain", f"域名 {domain} 已触发阈值，后续将强制使用base64图片", "warning", domain = domain )
 
 
     def _get_force_domains_from_img_list( self, img_list: List[ str ] ) -> Set[ str ] :
         """从图片列表中提取命中的强制base64域名。"""
         matched_domains = set()
-        for img_url in img_list :
-            domain = self._extract_domain( img_url )
-            if domain and domain in self.force_base64_domains :
-                matched_domains.add( domain )
+        shared = get_shared_state()
+        shared_domains = shared.items( FORCE_BASE64_DOMAINS ) if shared is not None else { }
+        with get_retry_state_lock() :
+            for img_url in img_list :
+                domain = self._extract_domain( img_url )
+                if not domain :
+                    continue
+                if domain in shared_domains :
+                    # 其他进程强制的域名，同步到本进程
+                    self.force_base64_domains.add( domain )
+                if domain in self.force_base64_domains :
+                    matched_domains.add( domain )
         return matched_domains
 
 
@@ -208,18 +236,35 @@ class RetryHandler :
         if not message_info.get( "include_img" ) or not message_info.get( "img_list" ) :
             return message_info
 
-        img_list = resolve_images_with_cache(
-            message_info[ "img_list" ],
-            self.image_cache,
-            convert_uncached = False,
-        )
-        img_list = self._convert_force_domains_to_base64( img_list )
-        message_info[ "img_list" ] = img_list
+        with start_span( "llmakits.preprocess_message_info" ) as span :
+            span.set_attribute( "llmakits.model", f"{self.platform}:{self.model_name}" )
+            span.set_attribute( "llmakits.image_count", len( message_info[ "img_list" ] ) )
+            img_list = resolve_images_with_cache(
+                message_info[ "img_list" ],
+                self.image_cache,
+                convert_uncached = False,
+            )
+            img_list = self._convert_force_domains_to_base64( img_list )
+            message_info[ "img_list" ] = img_list
         return message_info
 
 
+    def get_rate_limit_wait_seconds( self, error_message: str, api_retry_count: int, message_config: Dict ) -> int :
+        """计算限流重试前需要等待的秒数（图片下载错误和非限流错误不等待）"""
+        if not should_retry_for_rate_limit( error_message ) :
+            return 0
+        if any( keyword in error_message for keyword in IMAGE_DOWNLOAD_ERROR_KEYWORDS ) and message_config.get(
+            "include_img", False
+        ) :
+            return 0
+        if any( keyword in error_message for keyword in MIN_LIMIT_ERROR_KEYWORDS ) :
+            return 60 * (api_retry_count + 1)
+        return 10 * (api_retry_count + 1)
+
+
     def handle_rate_limit_error(
-            self, error_message: str, api_retry_count: int, messages: Any, message_config: Dict
+            self, error_message: str, api_retry_count: int, messages: Any, message_config: Dict,
+            wait: bool = True, deadline: Optional[ Deadline ] = None
     ) -> Tuple[ bool, Any ] :
         """处理限流错误
 
@@ -228,11 +273,16 @@ class RetryHandler :
             api_retry_count: 当前API重试次数（从0开始计数）
             messages: 请求消息对象
             message_config: 消息配置数据字典
+            wait: 是否在此阻塞等待（异步调用方传 False，自行 await asyncio.sleep）
+            deadline: 调用时限，剩余时间不足以完成等待时直接抛出 DeadlineExceededError
 
         返回:
             Tuple[bool, Any]: (是否继续重试, 更新后的messages对象)
         """
-        print( f"请求被限流 或者 网络连接失败，正在第 {api_retry_count + 1} 次重试……" )
+        log_event(
+            "rate_limited", f"请求被限流 或者 网络连接失败，正在第 {api_retry_count + 1} 次重试……", "warning",
+            model = f"{self.platform}:{self.model_name}", retry = api_retry_count + 1,
+        )
         # 如果图片：下载或读取 出现问题
         if any( keyword in error_message for keyword in IMAGE_DOWNLOAD_ERROR_KEYWORDS ) and message_config.get(
             "include_img", False
@@ -240,7 +290,7 @@ class RetryHandler :
 
             img_list = message_config[ "img_list" ]
             if api_retry_count < 2 :
-                print( f"img_list: {img_list}" )
+                log_event( "image_retry", f"img_list: {img_list}", "debug", images = len( img_list ) )
 
             failed_domains = set()
             for img_url in img_list :
@@ -285,11 +335,12 @@ class RetryHandler :
                 img_list = img_list,
             )
 
-        else :
-            if any( keyword in error_message for keyword in MIN_LIMIT_ERROR_KEYWORDS ) :
-                time_wait( 60 * (api_retry_count + 1) )  # 等待一段时间后重试
-            else :
-                time_wait( 10 * (api_retry_count + 1) )  # 等待一段时间后重试
+        elif wait :
+            # 等待一段时间后重试
+            wait_seconds = self.get_rate_limit_wait_seconds( error_message, api_retry_count, message_config )
+            if deadline is not None and wait_seconds > 0 :
+                deadline.ensure( wait_seconds, self.platform, self.model_name )
+            time_wait( wait_seconds )
 
         return True, messages
 
@@ -304,7 +355,10 @@ class RetryHandler :
             Tuple[bool, Any]: (是否继续重试, 更新后的messages对象)
         """
 
-        print( "输入图片数量超过限制 或 图片输入格式/解析错误，正在（ 限制图片数量 = 1 ）然后重试..." )
+        log_event(
+            "image_error_retry", "输入图片数量超过限制 或 图片输入格式/解析错误，正在（ 限制图片数量 = 1 ）然后重试...",
+            "warning", model = f"{self.platform}:{self.model_name}",
+        )
 
         # 图片数量超限时，也沿用相同的单图选择策略，避免把已经转好的 base64 图丢掉。
         img_list = self._select_single_retry_img_list( message_config[ "img_list" ] )
@@ -324,7 +378,9 @@ class RetryHandler :
     def handle_exception(
             self, response_error: ResponseError,
             api_retry_count: int,
-            messages: Any, message_config: Dict
+            messages: Any, message_config: Dict,
+            wait: bool = True,
+            deadline: Optional[ Deadline ] = None
     ) -> Tuple[ bool, Any, bool ] :
         """处理异常和重试逻辑
 
@@ -333,7 +389,8 @@ class RetryHandler :
             api_retry_count: 当前API重试次数（从0开始计数）
             messages: 请求消息对象
             message_config: 消息配置数据字典
-            model_name: 模型名称
+            wait: 限流时是否在此阻塞等待
+            deadline: 调用时限（限流等待前检查剩余时间）
 
         返回:
             Tuple[bool, Any, bool]: (是否继续重试, 更新后的messages对象, 是否需要切换API密钥)
@@ -346,7 +403,7 @@ class RetryHandler :
         if should_retry_for_rate_limit( error_message ) :
             response_error.report_error( print_tag = False, print_message = False )
             should_retry, updated_messages = self.handle_rate_limit_error(
-                error_message, api_retry_count, messages, message_config
+                error_message, api_retry_count, messages, message_config, wait = wait, deadline = deadline
             )
             return should_retry, updated_messages, False
 
@@ -357,7 +414,10 @@ class RetryHandler :
 
         elif any( keyword in error_message for keyword in DEFAULT_RETRY_API_KEYWORDS ) :
             self._report_api_key_error( response_error )
-            print( "模型每日请求超过限制 或 免费额度已用完" )
+            log_event(
+                "api_key_quota_exceeded", "模型每日请求超过限制 或 免费额度已用完", "warning",
+                model = f"{self.platform}:{self.model_name}", error_tag = response_error.error_tag,
+            )
             return True, messages, True  # 需要重试且需要切换API密钥
 
         else :
@@ -366,11 +426,11 @@ class RetryHandler :
                     is_silent_error = response_error.error_tag in SILENT_ERROR_TAGS
                     # 只有不在静默列表中的错误才打印提示
                     if not is_silent_error :
-                        print( "已提取到报错信息，但未匹配到任何重试场景:" )
+                        log_event( "unhandled_error", "已提取到报错信息，但未匹配到任何重试场景:", "error" )
                     response_error.report_error( print_tag = not is_silent_error )
 
                 else :
-                    print( "注意：未提取到报错信息！" )
+                    log_event( "unhandled_error", "注意：未提取到报错信息！", "error" )
                     response_error.report_error( print_tag = False )
 
             # 直接重新抛出原始异常，保持异常对象的完整性
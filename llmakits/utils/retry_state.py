@@ -1,5 +1,6 @@
 """共享的重试状态容器。"""
 
+import threading
 from typing import Any, Dict
 
 _GLOBAL_RETRY_STATE: Dict[str, Any] = {
@@ -8,18 +9,27 @@ _GLOBAL_RETRY_STATE: Dict[str, Any] = {
     "last_failed_domain": "",
 }
 
+# 保护 _GLOBAL_RETRY_STATE 的读改写（域名失败计数、强制base64域名集合）
+_RETRY_STATE_LOCK = threading.RLock()
+
 
 def get_retry_state() -> Dict[str, Any]:
     """返回重试策略共享状态（可变引用）。"""
     return _GLOBAL_RETRY_STATE
 
 
+def get_retry_state_lock() -> threading.RLock:
+    """返回保护重试共享状态的锁，修改共享状态时需要持有。"""
+    return _RETRY_STATE_LOCK
+
+
 def get_retry_state_snapshot() -> Dict[str, Any]:
     """返回重试状态快照，避免外部直接修改。"""
-    retry_state = _GLOBAL_RETRY_STATE
-    domain_stats = retry_state["domain_failure_stats"]
-    return {
-        "force_base64_domains": sorted(list(retry_state["force_base64_domains"])),
-        "domain_failure_stats": {domain: stats.copy() for domain, stats in domain_stats.items()},
-        "last_failed_domain": retry_state["last_failed_domain"],
-    }
+    with _RETRY_STATE_LOCK:
+        retry_state = _GLOBAL_RETRY_STATE
+        domain_stats = retry_state["domain_failure_stats"]
+        return {
+            "force_base64_domains": sorted(list(retry_state["force_base64_domains"])),
+            "domain_failure_stats": {domain: stats.copy() for domain, stats in domain_stats.items()},
+            "last_failed_domain": retry_state["last_failed_domain"],
+        }
@@ -0,0 +1,160 @@
+"""
+模型组内的路由策略
+决定每次调用时组内候选模型的尝试顺序，默认保持 YAML 配置顺序
+"""
+
+import random
+from typing import Any, Dict, List, Optional, Union
+from .model_stats import ModelStatsRegistry
+from .cost import get_model_price
+
+
+def get_model_key(model_info: Dict[str, Any]) -> str:
+    """模型统计使用的标识，与 load_models 的实例缓存 key 一致"""
+    return f"{model_info.get('sdk_name', 'unknown_sdk')}:{model_info.get('model_name', 'unknown_model')}"
+
+
+class RoutingPolicy:
+    """路由策略基类"""
+
+    name = "base"
+
+    def order(
+        self, candidates: List[int], llm_models: List[Dict[str, Any]], model_stats: ModelStatsRegistry
+    ) -> List[int]:
+        """
+        返回候选模型的尝试顺序
+
+        Args:
+            candidates: 候选模型索引（已按配置顺序排列）
+            llm_models: 模型组列表
+            model_stats: 模型统计
+
+        Returns:
+            重新排列后的模型索引列表（必须是 candidates 的一个排列）
+        """
+        raise NotImplementedError
+
+
+class StaticRouting(RoutingPolicy):
+    """静态路由：始终按配置顺序尝试（默认）"""
+
+    name = "static"
+
+    def order(self, candidates, llm_models, model_stats):
+        return list(candidates)
+
+
+class ScoreRouting(RoutingPolicy):
+    """
+    得分路由：按 EWMA 耗时和成功率计算的得分升序尝试，得分相同保持配置顺序
+
+    Args:
+        failure_penalty: 失败概率的惩罚系数，越大越偏向稳定的模型
+    """
+
+    name = "score"
+
+    def __init__(self, failure_penalty: float = 2.0):
+        self.failure_penalty = failure_penalty
+
+    def order(self, candidates, llm_models, model_stats):
+        scores = {idx: model_stats.get(get_model_key(llm_models[idx])).score(self.failure_penalty) for idx in candidates}
+        return sorted(candidates, key=lambda idx: scores[idx])
+
+
+class PowerOfTwoRouting(ScoreRouting):
+    """
+    二选一路由（power of two choices）：随机抽取两个候选模型，得分更好的排在首位，
+    其余模型保持配置顺序作为故障转移。相比完全按得分排序，能避免所有流量同时涌向同一个模型。
+    """
+
+    name = "p2c"
+
+    def __init__(self, failure_penalty: float = 2.0, rng: Union[random.Random, None] = None):
+        super().__init__(failure_penalty)
+        self.rng = rng or random.Random()
+
+    def order(self, candidates, llm_models, model_stats):
+        if len(candidates) < 2:
+            return list(candidates)
+        first, second = self.rng.sample(list(candidates), 2)
+        best = min((first, second), key=lambda idx: (
+            model_stats.get(get_model_key(llm_models[idx])).score(self.failure_penalty),
+            candidates.index(idx),
+        ))
+        return [best] + [idx for idx in candidates if idx != best]
+
+
+class CostRouting(ScoreRouting):
+    """
+    成本路由：在满足 SLO（EWMA 耗时、成功率）的模型中优先尝试单价最低的模型，
+    不满足 SLO 的模型按得分排在后面作为故障转移。
+
+    单价为 global_model_config 中 input_price 与 output_price 之和，没有配置单价的模型排在有单价的模型之后；
+    观测次数不足 min_samples 的模型视为满足 SLO，以便获得样本。
+
+    Args:
+        max_latency: SLO 耗时上限（秒），None 表示不限制
+        min_success_rate: SLO 成功率下限（请求成功且通过校验）
+        min_samples: 判断 SLO 所需的最少调用次数
+        failure_penalty: 不满足 SLO 的模型排序时使用的失败惩罚系数
+    """
+
+    name = "cost"
+
+    def __init__(
+        self,
+        max_latency: Optional[float] = None,
+        min_success_rate: float = 0.9,
+        min_samples: int = 5,
+        failure_penalty: float = 2.0,
+    ):
+        super().__init__(failure_penalty)
+        self.max_latency = max_latency
+        self.min_success_rate = min_success_rate
+        self.min_samples = min_samples
+
+    def meets_slo(self, model_key: str, model_stats: ModelStatsRegistry) -> bool:
+        """模型的观测耗时和成功率是否满足 SLO"""
+        stats = model_stats.get(model_key)
+        if stats.calls < self.min_samples:
+            return True
+        if self.max_latency is not None and stats.ewma_latency > self.max_latency:
+            return False
+        return stats.success_rate() >= self.min_success_rate
+
+    @staticmethod
+    def unit_price(model_info: Dict[str, Any]) -> float:
+        """路由使用的单价（输入单价 + 输出单价），没有配置单价时为无穷大"""
+        input_price, output_price = get_model_price(model_info)
+        if input_price is None and output_price is None:
+            return float("inf")
+        return (input_price or 0.0) + (output_price or 0.0)
+
+    def order(self, candidates, llm_models, model_stats):
+        eligible, fallback = [], []
+        for idx in candidates:
+            if self.meets_slo(get_model_key(llm_models[idx]), model_stats):
+                eligible.append(idx)
+            else:
+                fallback.append(idx)
+        eligible.sort(key=lambda idx: self.unit_price(llm_models[idx]))
+        return eligible + super().order(fallback, llm_models, model_stats)
+
+
+ROUTING_POLICIES = {
+    StaticRouting.name: StaticRouting,
+    ScoreRouting.name: ScoreRouting,
+    PowerOfTwoRouting.name: PowerOfTwoRouting,
+    CostRouting.name: CostRouting,
+}
+
+
+def get_routing_policy(policy: Union[str, RoutingPolicy]) -> RoutingPolicy:
+    """根据名称（static / score / p2c / cost）或实例获取路由策略"""
+    if isinstance(policy, RoutingPolicy):
+        return policy
+    if policy not in ROUTING_POLICIES:
+        raise ValueError(f"未知的路由策略: {policy}，可选: {list(ROUTING_POLICIES)}")
+    return ROUTING_POLICIES[policy]()
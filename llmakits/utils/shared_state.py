@@ -0,0 +1,261 @@
+"""
+跨进程共享的调度状态
+多进程部署时，每个进程默认各自维护用尽的密钥、强制 base64 的图片域名和熔断状态，
+同一个失败要在每个进程里各付出一次代价。设置共享状态后端后，这些状态在所有进程间共享：
+任何一个进程发现密钥用尽、域名需要强制 base64 或模型熔断，其他进程的下一次请求就能看到。
+
+后端接口是类 Redis 的键值子集（set / get / delete / items / incr，支持 TTL），内置：
+- MemoryStateBackend：进程内字典，可作为单进程或测试时的替身
+- SQLiteStateBackend：本地 SQLite 文件（WAL 模式），同一台机器上的多个进程共享
+
+自定义后端（如 Redis）继承 SharedStateBackend 并实现这几个方法即可。
+"""
+
+import json
+import time
+import sqlite3
+import datetime
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# 状态命名空间
+EXHAUSTED_KEYS = "exhausted_keys"  # 用尽的密钥：平台:密钥指纹
+FORCE_BASE64_DOMAINS = "force_base64_domains"  # 强制 base64 的图片域名
+DOMAIN_FAILURES = "domain_failures"  # 图片域名的累计失败次数
+CIRCUIT_OPEN = "circuit_open"  # 熔断中的模型：sdk_name:model_name -> 熔断结束的时间戳
+
+
+def seconds_until_midnight(now: Optional[float] = None) -> float:
+    """距离本地时间下一个零点的秒数（每日状态的 TTL）"""
+    current = datetime.datetime.fromtimestamp(now if now is not None else time.time())
+    midnight = (current + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max((midnight - current).total_seconds(), 1.0)
+
+
+class SharedStateBackend:
+    """共享状态后端基类（所有方法必须线程安全、进程安全）"""
+
+    name = "base"
+
+    def set(self, namespace: str, name: str, value: Any, ttl: Optional[float] = None) -> None:
+        """写入一个值，ttl 秒后过期（None 表示不过期）"""
+        raise NotImplementedError
+
+    def get(self, namespace: str, name: str, default: Any = None) -> Any:
+        """读取一个值，不存在或已过期时返回 default"""
+        raise NotImplementedError
+
+    def delete(self, namespace: str, name: str) -> None:
+        raise NotImplementedError
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        """命名空间下所有未过期的值"""
+        raise NotImplementedError
+
+    def incr(self, namespace: str, name: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """原子地增加计数并返回新值；ttl 只在创建计数时生效"""
+        raise NotImplementedError
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """清空命名空间（None 表示全部）"""
+        raise NotImplementedError
+
+    def cached_items(self, namespace: str, max_age: float = 1.0) -> Dict[str, Any]:
+        """
+        items 的短时缓存，供每次请求都要读取的热路径使用（如选择密钥时检查用尽标记），避免每次都读取后端
+
+        其他进程的写入最多延迟 max_age 秒可见；本进程写入后调用 invalidate_cache 立即生效
+        """
+        cache: Optional[Dict[str, Tuple[float, Dict[str, Any]]]] = getattr(self, "_items_cache", None)
+        if cache is None:
+            cache = self._items_cache = {}
+        now = time.monotonic()
+        entry = cache.get(namespace)
+        if entry is None or now - entry[0] > max_age:
+            entry = (now, self.items(namespace))
+            cache[namespace] = entry
+        return entry[1]
+
+    def invalidate_cache(self, namespace: Optional[str] = None) -> None:
+        """丢弃 cached_items 的缓存（None 表示全部）"""
+        cache = getattr(self, "_items_cache", None)
+        if not cache:
+            return
+        if namespace is None:
+            cache.clear()
+        else:
+            cache.pop(namespace, None)
+
+
+class MemoryStateBackend(SharedStateBackend):
+    """进程内的共享状态后端（单进程部署或测试时使用）"""
+
+    name = "memory"
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: Dict[Tuple[str, str], Tuple[Any, Optional[float]]] = {}
+
+    def _alive(self, entry: Tuple[Any, Optional[float]], now: float) -> bool:
+        return entry[1] is None or entry[1] > now
+
+    def set(self, namespace, name, value, ttl=None):
+        expires_at = self._clock() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[(namespace, name)] = (value, expires_at)
+        self.invalidate_cache(namespace)
+
+    def get(self, namespace, name, default=None):
+        with self._lock:
+            entry = self._data.get((namespace, name))
+            if entry is None or not self._alive(entry, self._clock()):
+                return default
+            return entry[0]
+
+    def delete(self, namespace, name):
+        with self._lock:
+            self._data.pop((namespace, name), None)
+        self.invalidate_cache(namespace)
+
+    def items(self, namespace):
+        now = self._clock()
+        with self._lock:
+            return {
+                name: entry[0]
+                for (entry_namespace, name), entry in self._data.items()
+                if entry_namespace == namespace and self._alive(entry, now)
+            }
+
+    def incr(self, namespace, name, amount=1, ttl=None):
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get((namespace, name))
+            if entry is None or not self._alive(entry, now):
+                entry = (0, now + ttl if ttl is not None else None)
+            value = int(entry[0]) + amount
+            self._data[(namespace, name)] = (value, entry[1])
+            return value
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+            else:
+                for key in [key for key in self._data if key[0] == namespace]:
+                    del self._data[key]
+        self.invalidate_cache(namespace)
+
+
+class SQLiteStateBackend(SharedStateBackend):
+    """
+    SQLite 共享状态后端（WAL 模式，读不阻塞写），同一台机器上的多个进程共享一个文件
+
+    Args:
+        path: SQLite 文件路径
+        clock: 时间函数（测试时可替换）
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()  # 每个线程复用自己的连接
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state ("
+            "namespace TEXT NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL, "
+            "PRIMARY KEY (namespace, name))"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def set(self, namespace, name, value, ttl=None):
+        expires_at = self._clock() + ttl if ttl is not None else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO shared_state (namespace, name, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, name, json.dumps(value, ensure_ascii=False), expires_at),
+        )
+        self.invalidate_cache(namespace)
+
+    def get(self, namespace, name, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM shared_state WHERE namespace = ? AND name = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, name, self._clock()),
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def delete(self, namespace, name):
+        self._conn().execute("DELETE FROM shared_state WHERE namespace = ? AND name = ?", (namespace, name))
+        self.invalidate_cache(namespace)
+
+    def items(self, namespace):
+        rows = self._conn().execute(
+            "SELECT name, value FROM shared_state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, self._clock()),
+        ).fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def incr(self, namespace, name, amount=1, ttl=None):
+        conn = self._conn()
+        now = self._clock()
+        # BEGIN IMMEDIATE 取得写锁，保证多个进程的读改写不会互相覆盖
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM shared_state WHERE namespace = ? AND name = ?", (namespace, name)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                value, expires_at = amount, (now + ttl if ttl is not None else None)
+            else:
+                value, expires_at = int(json.loads(row[0])) + amount, row[1]
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_state (namespace, name, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, name, json.dumps(value), expires_at),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def clear(self, namespace=None):
+        if namespace is None:
+            self._conn().execute("DELETE FROM shared_state")
+        else:
+            self._conn().execute("DELETE FROM shared_state WHERE namespace = ?", (namespace,))
+        self.invalidate_cache(namespace)
+
+
+# 当前生效的共享状态后端，None 表示各进程独立维护状态（默认）
+_SHARED_STATE: Optional[SharedStateBackend] = None
+
+
+def set_shared_state(backend: Optional[SharedStateBackend]) -> None:
+    """设置进程级共享状态后端，传 None 关闭共享"""
+    global _SHARED_STATE
+    _SHARED_STATE = backend
+
+
+def get_shared_state() -> Optional[SharedStateBackend]:
+    """当前生效的共享状态后端，未启用时返回 None"""
+    return _SHARED_STATE
+
+
+def create_shared_state(backend: Any) -> SharedStateBackend:
+    """根据 "memory"、SQLite 文件路径或后端实例创建共享状态后端"""
+    if isinstance(backend, SharedStateBackend):
+        return backend
+    if backend == "memory":
+        return MemoryStateBackend()
+    if isinstance(backend, str):
+        return SQLiteStateBackend(backend)
+    raise ValueError(f"不支持的共享状态后端: {backend!r}，可选: 'memory'、SQLite 文件路径或 SharedStateBackend 实例")
@@ -0,0 +1,67 @@
+"""
+相同请求合并（singleflight）
+同一个 key 的请求正在进行时，其他调用方等待这次请求的结果，而不是各自再发出请求。
+基于 concurrent.futures.Future 实现，线程和 asyncio 任务都可以等待同一个请求。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Tuple
+
+
+class SingleFlight:
+    """线程安全的请求合并器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.leaders = 0  # 实际发出的请求数
+        self.coalesced = 0  # 被合并（等待他人结果）的请求数
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """
+        加入 key 对应的请求
+
+        Returns:
+            (Future, 是否为发起方)。发起方执行请求后必须调用 complete；
+            等待方通过 Future.result() 或 wait_async 获取结果
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def complete(self, key: str, future: Future, result: Any = None, error: BaseException = None) -> None:
+        """发起方结束请求：移除 key 并把结果（或异常）通知所有等待方"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    @staticmethod
+    async def wait_async(future: Future) -> Any:
+        """
+        在 asyncio 任务中等待其他线程或任务发起的请求
+
+        等待方超时或被取消时只取消自己的等待（shield），不会取消共享的 Future，发起方和其他等待方不受影响
+        """
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
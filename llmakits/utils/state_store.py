@@ -0,0 +1,159 @@
+"""
+调度器运行状态的持久化
+把用尽的密钥、移除的模型、重试失败计数和图片域名策略（强制 base64 的域名、域名失败统计）
+保存到本地 JSON 文件或 SQLite，进程重启后恢复，不必再用失败的请求重新“学习”一遍。
+
+每条记录带有首次记录的时间戳，按本地日期每日过期（平台额度通常在零点重置）。
+密钥只保存哈希指纹，不把密钥明文写入磁盘。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# 持久化的状态分区
+STATE_SECTIONS = (
+    "exhausted_keys",
+    "exhausted_models",
+    "retry_fail_count",
+    "force_base64_domains",
+    "domain_failure_stats",
+)
+
+_SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def fingerprint_key(api_key: str) -> str:
+    """密钥的哈希指纹（用于持久化和匹配，不可还原出密钥）"""
+    return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:16]
+
+
+def _local_day(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+class StateStore:
+    """
+    运行状态存储（线程安全）
+
+    Args:
+        path: 文件路径，后缀为 .db / .sqlite / .sqlite3 时使用 SQLite（WAL 模式），否则使用 JSON 文件
+        clock: 时间函数（测试时可替换）
+    """
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+        self.use_sqlite = path.lower().endswith(_SQLITE_SUFFIXES)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (分区, 名称) -> 首次记录时间，保存时沿用，保证过期时间不因重复保存而延后
+        self._first_seen: Dict[Tuple[str, str], float] = {}
+        if self.use_sqlite:
+            self._execute("PRAGMA journal_mode=WAL")
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS dispatcher_state ("
+                "section TEXT NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL, ts REAL NOT NULL, "
+                "PRIMARY KEY (section, name))"
+            )
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        """执行一条 SQL 并提交。每次操作使用独立连接，避免跨线程共享连接"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def _read_entries(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """读取所有记录：{分区: {名称: {"value": ..., "ts": ...}}}"""
+        if self.use_sqlite:
+            entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for section, name, value, ts in self._execute("SELECT section, name, value, ts FROM dispatcher_state"):
+                entries.setdefault(section, {})[name] = {"value": json.loads(value), "ts": ts}
+            return entries
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f).get("sections", {})
+
+    def _write_entries(self, entries: Dict[str, Dict[str, Dict[str, Any]]]) -> None:
+        if self.use_sqlite:
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                with conn:
+                    conn.execute("DELETE FROM dispatcher_state")
+                    conn.executemany(
+                        "INSERT INTO dispatcher_state (section, name, value, ts) VALUES (?, ?, ?, ?)",
+                        [
+                            (section, name, json.dumps(entry["value"], ensure_ascii=False), entry["ts"])
+                            for section, items in entries.items()
+                            for name, entry in items.items()
+                        ],
+                    )
+            finally:
+                conn.close()
+            return
+        # 先写临时文件再替换，避免进程中途退出留下损坏的文件
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": self._clock(), "sections": entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        读取当天仍然有效的状态
+
+        Returns:
+            {分区: {名称: 值}}，非当天记录的条目已被丢弃
+        """
+        today = _local_day(self._clock())
+        with self._lock:
+            entries = self._read_entries()
+            state: Dict[str, Dict[str, Any]] = {section: {} for section in STATE_SECTIONS}
+            for section, items in entries.items():
+                if section not in state:
+                    continue
+                for name, entry in items.items():
+                    if _local_day(entry["ts"]) != today:
+                        continue
+                    self._first_seen[(section, name)] = entry["ts"]
+                    state[section][name] = entry["value"]
+            return state
+
+    def save(self, state: Dict[str, Dict[str, Any]]) -> None:
+        """
+        保存状态（整体替换），每个条目沿用首次记录的时间戳，已过期的条目重新计时
+
+        Args:
+            state: {分区: {名称: 值}}，值需要可以 JSON 序列化
+        """
+        now = self._clock()
+        today = _local_day(now)
+        with self._lock:
+            entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            first_seen: Dict[Tuple[str, str], float] = {}
+            for section, items in state.items():
+                for name, value in items.items():
+                    ts = self._first_seen.get((section, name))
+                    if ts is None or _local_day(ts) != today:
+                        ts = now
+                    first_seen[(section, name)] = ts
+                    entries.setdefault(section, {})[name] = {"value": value, "ts": ts}
+            self._first_seen = first_seen
+            self._write_entries(entries)
+
+    def clear(self) -> None:
+        """删除所有保存的状态"""
+        with self._lock:
+            self._first_seen.clear()
+            self._write_entries({})
+
+    def stats(self) -> Dict[str, Optional[Any]]:
+        with self._lock:
+            return {"path": self.path, "backend": "sqlite" if self.use_sqlite else "json", "entries": len(self._first_seen)}
@@ -0,0 +1,125 @@
+"""
+流式输出的增量 JSON 提取
+generate_title、fill_attr 等 kit 只需要 JSON 中的一两个字段，模型却常在 JSON 对象结束后继续输出解释说明。
+JsonObjectScanner 随着文本块到达增量地跟踪括号深度和字符串状态，顶层 JSON 对象在语法上完整
+（并包含所需字段）时立即交回该对象的文本，调用方随即关闭流，不再接收后续输出。
+
+- <think> 思考段落中的括号不计入
+- 完整的候选对象无法解析为 JSON，或缺少所需字段时，继续寻找下一个对象；
+  始终找不到时流照常接收完毕，由 convert_to_json 按原有逻辑解析全文
+"""
+
+import json
+from typing import Any, Iterable, List, Optional, Sequence, Tuple, Union
+
+_THINK_START = "<think>"
+_THINK_END = "</think>"
+_TAIL_SIZE = len(_THINK_END)
+
+
+def normalize_json_fields(stream_json: Union[bool, Sequence[str], None]) -> Optional[Tuple[str, ...]]:
+    """
+    把 stream_json 参数转换为所需字段的元组
+
+    Returns:
+        None 表示不启用；空元组表示第一个完整的 JSON 对象即可；否则为对象必须包含的字段
+    """
+    if not stream_json:
+        return None
+    if stream_json is True:
+        return ()
+    if isinstance(stream_json, str):
+        return (stream_json,)
+    return tuple(stream_json)
+
+
+def has_fields(obj: Any, fields: Iterable[str]) -> bool:
+    """对象是否包含所有字段（兼容把结果包在 answer 字段中的模型）"""
+    if not isinstance(obj, dict):
+        return False
+    answer = obj.get("answer")
+    if isinstance(answer, dict):
+        obj = answer
+    return all(field in obj for field in fields)
+
+
+class JsonObjectScanner:
+    """
+    增量扫描流式文本中的顶层 JSON 对象（非线程安全，每个流使用一个实例）
+
+    Args:
+        required_fields: 对象必须包含的字段，为空时第一个可以解析的对象即可
+    """
+
+    def __init__(self, required_fields: Sequence[str] = ()):
+        self.required_fields = tuple(required_fields)
+        self.text: Optional[str] = None  # 找到的 JSON 对象文本
+        self.value: Any = None  # 解析后的对象
+        self._parts: List[str] = []  # 当前候选对象已接收的文本片段
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._in_think = False
+        self._tail = ""  # 对象外最近的几个字符，用于识别跨文本块的 <think> 标签
+
+    def feed(self, chunk: str) -> bool:
+        """
+        送入新的文本块
+
+        Returns:
+            找到完整且满足字段要求的 JSON 对象时返回 True（结果在 text / value 中）
+        """
+        if self.text is not None:
+            return True
+        start: Optional[int] = 0 if self._depth else None
+        for index, char in enumerate(chunk):
+            if self._depth == 0:
+                self._tail = (self._tail + char)[-_TAIL_SIZE:]
+                if self._in_think:
+                    if self._tail.endswith(_THINK_END):
+                        self._in_think = False
+                elif self._tail.endswith(_THINK_START):
+                    self._in_think = True
+                elif char == "{":
+                    self._depth = 1
+                    start = index
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[start:index + 1])
+                    candidate = "".join(self._parts)
+                    self._parts = []
+                    start = None
+                    self._tail = ""
+                    if self._accept(candidate):
+                        return True
+
+        if self._depth and start is not None:
+            self._parts.append(chunk[start:])
+        return False
+
+    def _accept(self, candidate: str) -> bool:
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            return False
+        if not has_fields(value, self.required_fields):
+            return False
+        self.text = candidate
+        self.value = value
+        return True
@@ -0,0 +1,88 @@
+"""
+流式输出的累积与计时
+StreamAccumulator 把收到的文本块追加到列表中，只在需要完整文本时拼接一次（线性时间，
+不再逐块 result += content），同时记录首 token 耗时（从发出请求算起）、块间隔和解码吞吐。
+"""
+
+import math
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+
+class StreamTiming(NamedTuple):
+    """单次流式请求的计时"""
+
+    ttft: Optional[float] = None  # 首 token 耗时（秒，从发出请求算起），没有收到内容时为 None
+    duration: float = 0.0  # 从发出请求到接收结束的总耗时（秒）
+    chunks: int = 0  # 收到的内容块数
+    avg_chunk_gap: float = 0.0  # 相邻内容块的平均间隔（秒）
+    max_chunk_gap: float = 0.0  # 相邻内容块的最大间隔（秒）
+    output_tokens: int = 0  # 输出 token 数（平台未返回 usage 时按字符数估算）
+    tokens_per_second: float = 0.0  # 解码吞吐：输出 token 数 / 首 token 之后的耗时
+    usage_reported: bool = False  # output_tokens 是否来自平台返回的 usage
+
+
+class StreamAccumulator:
+    """
+    流式输出的累积器（非线程安全，每个流使用一个实例）
+
+    Args:
+        start_time: 发出请求的时间（clock 的读数），None 表示从创建累积器时开始计时
+        clock: 时间函数（测试时可替换）
+    """
+
+    def __init__(self, start_time: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.start_time = start_time if start_time is not None else clock()
+        self.parts: List[str] = []
+        self.length = 0  # 已累积的字符数
+        self.chunks = 0
+        self.first_chunk_at: Optional[float] = None
+        self.last_chunk_at: Optional[float] = None
+        self.max_gap = 0.0
+
+    def add(self, content: str) -> None:
+        """追加一个内容块并记录到达时间"""
+        now = self._clock()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        else:
+            self.max_gap = max(self.max_gap, now - self.last_chunk_at)  # type: ignore[operator]
+        self.last_chunk_at = now
+        self.parts.append(content)
+        self.length += len(content)
+        self.chunks += 1
+
+    def text(self) -> str:
+        """已累积的完整文本（拼接后合并为一个块，未新增内容时不再重复拼接）"""
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+    def elapsed(self) -> float:
+        return self._clock() - self.start_time
+
+    def timing(self, completion_tokens: Optional[int] = None) -> StreamTiming:
+        """
+        结束计时
+
+        Args:
+            completion_tokens: 平台返回的输出 token 数，None 时按约 2 个字符 1 个 token 估算
+        """
+        now = self._clock()
+        usage_reported = bool(completion_tokens)
+        output_tokens = int(completion_tokens) if usage_reported else int(math.ceil(self.length / 2))
+        if self.first_chunk_at is None:
+            return StreamTiming(duration=now - self.start_time, output_tokens=output_tokens, usage_reported=usage_reported)
+        decode_seconds = (self.last_chunk_at or now) - self.first_chunk_at
+        gaps = self.chunks - 1
+        return StreamTiming(
+            ttft=self.first_chunk_at - self.start_time,
+            duration=now - self.start_time,
+            chunks=self.chunks,
+            avg_chunk_gap=decode_seconds / gaps if gaps > 0 else 0.0,
+            max_chunk_gap=self.max_gap,
+            output_tokens=output_tokens,
+            tokens_per_second=output_tokens / decode_seconds if decode_seconds > 0 else 0.0,
+            usage_reported=usage_reported,
+        )
@@ -0,0 +1,218 @@
+"""
+流式输出的增量校验
+stream=True 时，模型输出默认要全部接收完才交给 validate_func 校验，注定不合格的长输出也要等到生成结束。
+增量校验器在接收过程中检查已累积的文本，一旦判定输出已经不可能合格（如出现过多中文、不允许的 HTML 标签），
+立即关闭流并抛出 StreamAbortedError，调度器按“条件校验失败”切换到下一个模型。
+
+校验函数接收已累积的文本（已去除 <think> 思考段落），返回 True 表示继续接收，
+返回 False 或 (False, 原因) 表示提前终止。为避免长输出时反复扫描全文，每新增 check_chars 个字符才校验一次。
+
+提前终止（以及 stream_json 的提前结束）节省的 token 和时间，按同一模型完整接收的流式输出的平均长度和耗时估算。
+"""
+
+import math
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from .normalize_error import ResponseError
+
+# 默认每新增 64 个字符校验一次
+DEFAULT_CHECK_CHARS = 64
+
+StreamCheck = Callable[[str], Union[bool, Tuple[bool, Any]]]
+
+
+def visible_text(text: str) -> str:
+    """去除 <think> 思考段落后的文本；思考段落尚未结束时返回空字符串"""
+    start_index = text.find("<think>")
+    if start_index == -1:
+        return text
+    end_index = text.find("</think>", start_index)
+    if end_index == -1:
+        return text[:start_index]
+    return text[:start_index] + text[end_index + len("</think>") :]
+
+
+def partial_json_string(text: str, field: str) -> str:
+    """
+    从尚未接收完的 JSON 文本中取出字符串字段已生成的部分（不做转义还原）
+
+    Args:
+        text: 已累积的文本
+        field: 字段名
+
+    Returns:
+        字段值已生成的部分，字段尚未出现时返回空字符串
+    """
+    marker = f'"{field}"'
+    key_index = text.find(marker)
+    if key_index == -1:
+        return ""
+    index = key_index + len(marker)
+    length = len(text)
+    while index < length and text[index] in " \t\r\n:":
+        index += 1
+    if index >= length or text[index] != '"':
+        return ""
+    index += 1
+    end = index
+    while end < length:
+        char = text[end]
+        if char == "\\":
+            end += 2
+            continue
+        if char == '"':
+            break
+        end += 1
+    return text[index:min(end, length)]
+
+
+class StreamAbortedError(ResponseError):
+    """增量校验判定输出不合格，流式接收被提前终止"""
+
+    def __init__(self, platform: str, model_name: str, reason: str, chars: int, elapsed: float):
+        super().__init__(
+            platform, model_name, exception=Exception(f"STREAM_ABORTED: {reason}"), error_tag="流式响应_增量校验失败"
+        )
+        self.reason = reason
+        self.chars = chars
+        self.elapsed = elapsed
+        self.skip_report = True
+
+
+class StreamValidator:
+    """
+    增量校验器：按字符增量节流调用校验函数
+
+    Args:
+        *checks: 校验函数，任意一个判定不合格即提前终止
+        check_chars: 新增多少个字符后再校验一次
+    """
+
+    def __init__(self, *checks: StreamCheck, check_chars: int = DEFAULT_CHECK_CHARS):
+        self.checks = [check for check in checks if check is not None]
+        self.check_chars = max(int(check_chars), 1)
+
+    def should_check(self, checked_length: int, length: int) -> bool:
+        """上次校验后新增的字符是否达到 check_chars"""
+        return length - checked_length >= self.check_chars
+
+    def check(self, text: str) -> Optional[str]:
+        """
+        校验已累积的文本
+
+        Returns:
+            需要提前终止时返回原因，否则返回 None
+        """
+        text = visible_text(text)
+        if not text:
+            return None
+        for check in self.checks:
+            result = check(text)
+            if isinstance(result, tuple):
+                is_valid, reason = result[0], result[1] if len(result) > 1 else ""
+            else:
+                is_valid, reason = result, ""
+            if not is_valid:
+                return str(reason or getattr(check, "__name__", "stream check failed"))
+        return None
+
+
+def as_stream_validator(validator: Union[StreamValidator, StreamCheck, None]) -> Optional[StreamValidator]:
+    """把单个校验函数包装为 StreamValidator（None 原样返回）"""
+    if validator is None or isinstance(validator, StreamValidator):
+        return validator
+    return StreamValidator(validator)
+
+
+def _estimate_tokens(chars: float) -> int:
+    """按约 2 个字符 1 个 token 估算（与限流的估算一致）"""
+    return int(math.ceil(chars / 2)) if chars > 0 else 0
+
+
+class StreamAbortStats:
+    """
+    单个模型的流式接收统计（线程安全）：完整接收的输出长度和耗时，
+    增量校验提前终止、JSON 对象完整后提前结束的次数，以及估算的节省量
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.completed_chars = 0
+        self.completed_seconds = 0.0
+        self.aborts = 0
+        self.early_stops = 0
+        self.saved_tokens = 0
+        self.saved_seconds = 0.0
+
+    def record_completed(self, chars: int, seconds: float) -> None:
+        with self._lock:
+            self.completed += 1
+            self.completed_chars += chars
+            self.completed_seconds += seconds
+
+    def record_abort(self, chars: int, seconds: float) -> Tuple[int, float]:
+        """
+        记录一次增量校验提前终止
+
+        Returns:
+            (估算节省的 token, 估算节省的秒数)，尚无完整接收的样本时为 (0, 0.0)
+        """
+        with self._lock:
+            self.aborts += 1
+            return self._record_saving(chars, seconds)
+
+    def record_early_stop(self, chars: int, seconds: float) -> Tuple[int, float]:
+        """记录一次 JSON 对象完整后的提前结束，返回值同 record_abort"""
+        with self._lock:
+            self.early_stops += 1
+            return self._record_saving(chars, seconds)
+
+    def _record_saving(self, chars: int, seconds: float) -> Tuple[int, float]:
+        """按完整接收的平均长度和耗时估算节省量（调用方需持有锁）"""
+        if not self.completed:
+            return 0, 0.0
+        saved_tokens = _estimate_tokens(self.completed_chars / self.completed - chars)
+        saved_seconds = max(self.completed_seconds / self.completed - seconds, 0.0)
+        self.saved_tokens += saved_tokens
+        self.saved_seconds += saved_seconds
+        return saved_tokens, saved_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "completed": self.completed,
+                "aborts": self.aborts,
+                "early_stops": self.early_stops,
+                "avg_chars": self.completed_chars / self.completed if self.completed else 0.0,
+                "avg_seconds": self.completed_seconds / self.completed if self.completed else 0.0,
+                "saved_tokens": self.saved_tokens,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+# 进程内的流式接收统计：平台:模型名 -> StreamAbortStats
+_STREAM_STATS: Dict[str, StreamAbortStats] = {}
+_STREAM_STATS_LOCK = threading.Lock()
+
+
+def get_stream_stats(model_key: str) -> StreamAbortStats:
+    with _STREAM_STATS_LOCK:
+        stats = _STREAM_STATS.get(model_key)
+        if stats is None:
+            stats = StreamAbortStats()
+            _STREAM_STATS[model_key] = stats
+        return stats
+
+
+def get_stream_abort_stats() -> Dict[str, Dict[str, Any]]:
+    """各模型的流式接收统计快照"""
+    with _STREAM_STATS_LOCK:
+        items = list(_STREAM_STATS.items())
+    return {model_key: stats.snapshot() for model_key, stats in items}
+
+
+def reset_stream_stats() -> None:
+    with _STREAM_STATS_LOCK:
+        _STREAM_STATS.clear()
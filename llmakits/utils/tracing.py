@@ -0,0 +1,151 @@
+"""
+调用链追踪（tracing）
+在调度流程的各个阶段（模型尝试、图片预处理、图片下载转换、网络请求、JSON 解析、结果校验）打开 span，
+接口与 OpenTelemetry 的 Tracer 一致，可以直接传入 opentelemetry.trace.get_tracer(...)。
+
+未设置 tracer 时，start_span 返回一个共享的空 span，不产生额外的开销。
+"""
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空 span，同时充当自身的上下文管理器"""
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        return
+
+    def record_exception(self, exception: BaseException, attributes: Optional[Dict[str, Any]] = None) -> None:
+        return
+
+    def is_recording(self) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+# 当前生效的 tracer，None 表示未启用追踪
+_TRACER: Any = None
+
+
+def set_tracer(tracer: Any) -> None:
+    """
+    设置全局 tracer
+
+    Args:
+        tracer: 实现了 start_as_current_span(name, attributes=...) 的对象，
+            例如 opentelemetry.trace.get_tracer("llmakits") 或 CallbackTracer；传 None 关闭追踪
+    """
+    global _TRACER
+    _TRACER = tracer
+
+
+def get_tracer() -> Any:
+    """当前生效的 tracer，未启用时返回 None"""
+    return _TRACER
+
+
+def tracing_enabled() -> bool:
+    return _TRACER is not None
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """
+    打开一个 span（上下文管理器），未启用追踪时返回空 span
+
+    Example:
+        >>> with start_span("llmakits.send", {"llmakits.model": "openai:gpt-4o"}) as span:
+        ...     span.set_attribute("llmakits.tokens", 128)
+    """
+    tracer = _TRACER
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+class SpanRecord:
+    """CallbackTracer 记录的一个 span"""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]], parent: Optional["SpanRecord"]):
+        self.name = name
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.parent = parent
+        self.start_time = time.monotonic()
+        self.end_time: Optional[float] = None
+        self.exception: Optional[BaseException] = None
+        self.thread_name = threading.current_thread().name
+
+    @property
+    def duration(self) -> float:
+        end_time = self.end_time if self.end_time is not None else time.monotonic()
+        return end_time - self.start_time
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exception: BaseException, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.exception = exception
+        if attributes:
+            self.attributes.update(attributes)
+
+    def is_recording(self) -> bool:
+        return self.end_time is None
+
+    def __repr__(self) -> str:
+        return f"SpanRecord({self.name!r}, duration={self.duration:.4f}s, attributes={self.attributes!r})"
+
+
+class CallbackTracer:
+    """
+    不依赖 OpenTelemetry 的简单 tracer：每个 span 结束时调用回调
+
+    Args:
+        on_end: span 结束时的回调，参数为 SpanRecord；默认只保存在 spans 列表中
+        max_spans: spans 列表最多保留的条数
+    """
+
+    def __init__(self, on_end: Optional[Callable[[SpanRecord], None]] = None, max_spans: int = 10000):
+        self.on_end = on_end
+        self.max_spans = max_spans
+        self.spans: List[SpanRecord] = []
+        self._lock = threading.Lock()
+        self._current: contextvars.ContextVar = contextvars.ContextVar("llmakits_current_span", default=None)
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[SpanRecord]:
+        span = SpanRecord(name, attributes, self._current.get())
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            self._current.reset(token)
+            span.end_time = time.monotonic()
+            with self._lock:
+                self.spans.append(span)
+                if len(self.spans) > self.max_spans:
+                    del self.spans[: len(self.spans) - self.max_spans]
+            if self.on_end is not None:
+                self.on_end(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
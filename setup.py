@@ -50,6 +50,9 @@ setup(
             'flake8>=3.8',
             'mypy>=0.812',
         ],
+        'http2': [
+            'httpx[http2]',
+        ],
     },
     include_package_data=True,
     zip_safe=False,
@@ -0,0 +1,109 @@
+import io
+import os
+import sys
+import time
+import asyncio
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.async_dispatcher import AsyncModelDispatcher
+from llmakits.utils.normalize_error import ResponseError
+
+
+class AsyncModel:
+    def __init__(self, reply, delay=0.0, error=None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def send_message_async(self, messages, message_info):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise ResponseError("openai", "failing", exception=Exception(self.error), error_tag="响应异常")
+        return self.reply, 7
+
+
+class SyncOnlyModel:
+    def send_message(self, messages, message_info):
+        return '{"title": "sync"}', 3
+
+
+class AsyncDispatcherTest(unittest.TestCase):
+    def _dispatcher(self, models):
+        dispatcher = AsyncModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [
+                {"sdk_name": "openai", "model_name": f"model-{idx}", "model": model}
+                for idx, model in enumerate(models)
+            ]
+        }
+        return dispatcher
+
+    def test_fails_over_and_validates_like_execute_task(self):
+        failing = AsyncModel(None, error="boom")
+        invalid = AsyncModel('{"title": ""}')
+        valid = AsyncModel('{"title": "ok"}')
+        dispatcher = self._dispatcher([failing, invalid, valid])
+
+        def validate_func(message):
+            return bool(message["title"]), message["title"]
+
+        with redirect_stdout(io.StringIO()):
+            result = asyncio.run(
+                dispatcher.execute_with_group_async(
+                    {"user_text": "x", "system_prompt": ""},
+                    "group",
+                    format_json=True,
+                    validate_func=validate_func,
+                    return_detailed=True,
+                )
+            )
+
+        self.assertTrue(result.success)
+        self.assertEqual("ok", result.return_message)
+        self.assertEqual(2, result.last_tried_index)
+        self.assertEqual(2, dispatcher.model_switch_count)
+
+    def test_all_models_failed_raises_in_traditional_mode(self):
+        dispatcher = self._dispatcher([AsyncModel(None, error="last failed")])
+
+        with redirect_stdout(io.StringIO()):
+            with self.assertRaises(ResponseError) as context:
+                asyncio.run(dispatcher.execute_with_group_async({"user_text": "x", "system_prompt": ""}, "group"))
+
+        self.assertIn("All models failed", context.exception.get_error_message())
+
+    def test_sync_only_model_runs_in_thread(self):
+        dispatcher = self._dispatcher([SyncOnlyModel()])
+
+        result, tokens = asyncio.run(
+            dispatcher.execute_with_group_async({"user_text": "x", "system_prompt": ""}, "group", format_json=True)
+        )
+
+        self.assertEqual({"title": "sync"}, result)
+        self.assertEqual(3, tokens)
+
+    def test_concurrent_calls_share_one_event_loop(self):
+        dispatcher = self._dispatcher([AsyncModel('{"title": "ok"}', delay=0.2)])
+
+        async def run_all():
+            return await asyncio.gather(
+                *(
+                    dispatcher.execute_with_group_async({"user_text": str(i), "system_prompt": ""}, "group")
+                    for i in range(500)
+                )
+            )
+
+        start = time.monotonic()
+        results = asyncio.run(run_all())
+
+        self.assertEqual(500, len(results))
+        self.assertLess(time.monotonic() - start, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
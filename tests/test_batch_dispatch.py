@@ -0,0 +1,69 @@
+import io
+import os
+import sys
+import time
+import threading
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.normalize_error import ResponseError
+
+
+class EchoModel:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def send_message(self, messages, message_info):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            user_text = message_info["user_text"]
+            time.sleep(self.delay / (int(user_text) + 1) if user_text.isdigit() else self.delay)
+            if user_text == "fail":
+                raise ResponseError("openai", "echo", exception=Exception("boom"), error_tag="响应异常")
+            return f'{{"text": "{user_text}"}}', 1
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class BatchDispatchTest(unittest.TestCase):
+    def _dispatcher(self, model):
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {"group": [{"sdk_name": "openai", "model_name": "echo", "model": model}]}
+        return dispatcher
+
+    def test_execute_batch_keeps_input_order_and_isolates_failures(self):
+        dispatcher = self._dispatcher(EchoModel(delay=0.05))
+        message_infos = [{"user_text": text, "system_prompt": ""} for text in ["0", "fail", "2", "3"]]
+
+        with redirect_stdout(io.StringIO()):
+            results = dispatcher.execute_batch(message_infos, "group", format_json=True, max_workers=4)
+
+        self.assertEqual(4, len(results))
+        self.assertEqual({"text": "0"}, results[0].return_message)
+        self.assertFalse(results[1].success)
+        self.assertIn("All models failed", str(results[1].error))
+        self.assertEqual({"text": "3"}, results[3].return_message)
+
+    def test_imap_unordered_yields_as_completed_within_concurrency_limit(self):
+        model = EchoModel(delay=0.2)
+        dispatcher = self._dispatcher(model)
+        message_infos = ({"user_text": str(i), "system_prompt": ""} for i in range(8))
+
+        indices = [index for index, _ in dispatcher.imap_with_group(message_infos, "group", max_workers=3, ordered=False)]
+
+        self.assertEqual(set(range(8)), set(indices))
+        self.assertNotEqual(list(range(8)), indices)
+        self.assertLessEqual(model.max_active, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
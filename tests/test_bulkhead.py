@@ -0,0 +1,119 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.async_dispatcher import AsyncModelDispatcher
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.bulkhead import Bulkhead, BulkheadTimeoutError
+from llmakits.utils.metrics import MetricsRegistry
+
+
+class TrackingModel:
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def send_message(self, messages, message_info):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return '{"ok": true}', 1
+
+
+def _dispatcher(cls, **groups):
+    dispatcher = cls()
+    dispatcher.model_groups = {
+        name: [{"sdk_name": "openai", "model_name": name, "model": model}] for name, model in groups.items()
+    }
+    return dispatcher
+
+
+class BulkheadTest(unittest.TestCase):
+    def test_queue_timeout_raises_and_is_counted(self):
+        bulkhead = Bulkhead("group", 1, queue_timeout=0.05)
+        bulkhead.acquire()
+
+        with self.assertRaises(BulkheadTimeoutError):
+            bulkhead.acquire()
+
+        bulkhead.release()
+        stats = bulkhead.snapshot()
+        self.assertEqual(1, stats["timeouts"])
+        self.assertEqual(0, stats["queue_depth"])
+        self.assertGreaterEqual(stats["max_wait"], 0.05)
+
+    def test_queue_metrics_are_exported(self):
+        metrics = MetricsRegistry()
+        bulkhead = Bulkhead("with_image", 1, queue_timeout=0.2, metrics=metrics)
+        bulkhead.acquire()
+
+        waiter = threading.Thread(target=lambda: self.assertRaises(BulkheadTimeoutError, bulkhead.acquire))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertIn('llmakits_bulkhead_queue_depth{group="with_image"} 1', metrics.render_prometheus())
+        waiter.join()
+        bulkhead.release()
+
+        text = metrics.render_prometheus()
+        self.assertIn("# TYPE llmakits_bulkhead_queue_depth gauge", text)
+        self.assertIn('llmakits_bulkhead_queue_depth{group="with_image"} 0', text)
+        self.assertIn('llmakits_bulkhead_queued_total{group="with_image"} 1', text)
+        self.assertIn('llmakits_bulkhead_timeouts_total{group="with_image"} 1', text)
+        self.assertIn('llmakits_bulkhead_wait_seconds_count{group="with_image"} 1', text)
+
+    def test_group_cap_does_not_starve_other_groups(self):
+        image_model = TrackingModel(0.2)
+        text_model = TrackingModel(0.01)
+        dispatcher = _dispatcher(ModelDispatcher, with_image=image_model, text=text_model)
+        dispatcher.set_group_concurrency("with_image", 2)
+        message_info = {"user_text": "x", "system_prompt": ""}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            image_futures = [executor.submit(dispatcher.execute_with_group, message_info, "with_image") for _ in range(6)]
+            time.sleep(0.05)
+            start = time.monotonic()
+            dispatcher.execute_with_group(message_info, "text")
+            text_elapsed = time.monotonic() - start
+            for future in image_futures:
+                future.result()
+
+        self.assertEqual(2, image_model.peak)
+        self.assertLess(text_elapsed, 0.15)
+        stats = dispatcher.get_bulkhead_stats()["with_image"]
+        self.assertEqual(4, stats["queued"])
+        self.assertEqual(4, stats["max_queue_depth"])
+        self.assertGreater(stats["avg_wait"], 0)
+
+    def test_async_calls_respect_group_cap(self):
+        model = TrackingModel(0.05)
+        dispatcher = _dispatcher(AsyncModelDispatcher, with_image=model)
+        dispatcher.set_group_concurrency("with_image", 1, queue_timeout=1)
+
+        async def run():
+            return await asyncio.gather(
+                *(
+                    dispatcher.execute_with_group_async({"user_text": str(i), "system_prompt": ""}, "with_image")
+                    for i in range(3)
+                )
+            )
+
+        results = asyncio.run(run())
+
+        self.assertEqual(3, len(results))
+        self.assertEqual(1, model.peak)
+        self.assertEqual(2, dispatcher.get_bulkhead_stats()["with_image"]["queued"])
+
+
+if __name__ == "__main__":
+    unittest.main()
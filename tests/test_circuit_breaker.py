@@ -0,0 +1,124 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TimeoutModel:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.healthy = False
+
+    def send_message(self, messages, message_info):
+        self.calls += 1
+        if not self.healthy:
+            raise Exception("TimeoutError：_create_chat_completion 执行时间超过 180 秒")
+        return f'{{"model": "{self.name}"}}', 1
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold_within_window(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, failure_window=60, cooldown=30, clock=clock)
+
+        self.assertFalse(breaker.record_failure())
+        clock.now += 61  # 第一次失败移出窗口
+        self.assertFalse(breaker.record_failure())
+        self.assertFalse(breaker.record_failure())
+        self.assertEqual(CLOSED, breaker.state)
+        self.assertTrue(breaker.record_failure())
+        self.assertEqual(OPEN, breaker.state)
+        self.assertFalse(breaker.allow_request())
+
+    def test_half_open_admits_single_probe(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now += 30
+        self.assertEqual(HALF_OPEN, breaker.state)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        self.assertFalse(breaker.is_available())
+
+        breaker.record_success()
+        self.assertEqual(CLOSED, breaker.state)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 30
+        self.assertTrue(breaker.allow_request())
+        self.assertTrue(breaker.record_failure())
+        self.assertEqual(OPEN, breaker.state)
+        self.assertEqual(2, breaker.times_opened)
+
+
+class DispatcherCircuitBreakerTest(unittest.TestCase):
+    def test_timeouts_open_circuit_without_removing_model_and_probe_recovers(self):
+        flaky = TimeoutModel("flaky")
+        backup = TimeoutModel("backup")
+        backup.healthy = True
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [
+                {"sdk_name": "openai", "model_name": "flaky", "model": flaky},
+                {"sdk_name": "openai", "model_name": "backup", "model": backup},
+            ]
+        }
+        dispatcher.configure_circuit_breaker(failure_threshold=2, cooldown=30)
+        clock = FakeClock()
+        dispatcher.circuit_breakers.get("openai:flaky")._clock = clock
+
+        with patch.object(dispatcher.logger, "disabled", True):
+            for _ in range(3):
+                result, _ = dispatcher.execute_with_group({"user_text": "x"}, "group", format_json=True)
+                self.assertEqual({"model": "backup"}, result)
+
+            # 熔断后不再请求 flaky，但模型仍保留在组内
+            self.assertEqual(2, flaky.calls)
+            self.assertEqual(2, len(dispatcher.model_groups["group"]))
+            self.assertEqual("open", dispatcher.get_circuit_states()["openai:flaky"]["state"])
+
+            # 冷却结束后放行一个探测请求，成功则恢复
+            flaky.healthy = True
+            clock.now += 30
+            result, _ = dispatcher.execute_with_group({"user_text": "x"}, "group", format_json=True)
+
+        self.assertEqual({"model": "flaky"}, result)
+        self.assertEqual("closed", dispatcher.get_circuit_states()["openai:flaky"]["state"])
+
+    def test_all_models_open_fails_fast(self):
+        model = TimeoutModel("only")
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {"group": [{"sdk_name": "openai", "model_name": "only", "model": model}]}
+        dispatcher.configure_circuit_breaker(failure_threshold=1, cooldown=60)
+
+        with patch.object(dispatcher.logger, "disabled", True):
+            first = dispatcher.execute_with_group({"user_text": "x"}, "group", return_detailed=True)
+            second = dispatcher.execute_with_group({"user_text": "x"}, "group", return_detailed=True)
+
+        self.assertFalse(first.success)
+        self.assertFalse(second.success)
+        self.assertIn("熔断", str(second.error))
+        self.assertEqual(1, model.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.load_model import parse_model_config
+from llmakits.utils.cost import TokenUsage, compute_cost, cost_scope
+from llmakits.utils.model_stats import ModelStatsRegistry
+from llmakits.utils.routing import CostRouting, get_routing_policy
+
+
+class FakeModel:
+    def __init__(self, input_price=None, output_price=None, usage=None, fail=False):
+        self.input_price = input_price
+        self.output_price = output_price
+        self.usage = usage if usage is not None else TokenUsage(300, 200, 100)
+        self.fail = fail
+        self.calls = 0
+
+    def send_message(self, messages, message_info):
+        self.calls += 1
+        if self.fail:
+            raise Exception("boom")
+        return '{"ok": true}', self.usage
+
+
+def _models(*prices):
+    return [
+        {"sdk_name": "openai", "model_name": f"m{i}", "input_price": price, "output_price": price}
+        for i, price in enumerate(prices)
+    ]
+
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class CostTest(unittest.TestCase):
+    def test_token_usage_keeps_split_and_behaves_like_int(self):
+        usage = TokenUsage.from_usage({"prompt_tokens": 1000, "completion_tokens": 500})
+
+        self.assertEqual(1500, usage)
+        self.assertEqual(1502, usage + 2)
+        self.assertEqual((1000, 500), (usage.prompt_tokens, usage.completion_tokens))
+        self.assertAlmostEqual((1000 * 2 + 500 * 8) / 1_000_000, compute_cost(usage, 2, 8))
+
+    def test_plain_tokens_are_charged_at_output_price(self):
+        self.assertAlmostEqual(1000 * 8 / 1_000_000, compute_cost(1000, 2, 8))
+        self.assertEqual(0.0, compute_cost(1000, None, None))
+
+    def test_price_columns_are_not_sent_to_api(self):
+        params = parse_model_config({"platform": "openai", "model_name": "m", "input_price": "2", "output_price": 8.0})
+
+        self.assertEqual({"input_price": 2.0, "output_price": 8.0}, params)
+
+
+class CostRoutingTest(unittest.TestCase):
+    def test_cheapest_model_meeting_slo_comes_first(self):
+        stats = ModelStatsRegistry()
+        for _ in range(5):
+            stats.get("openai:m0").record_call(1.0, True)
+            stats.get("openai:m1").record_call(9.0, True)  # 最便宜但太慢
+            stats.get("openai:m2").record_call(1.0, True)
+
+        order = CostRouting(max_latency=5, min_samples=3).order([0, 1, 2], _models(10, 1, 3), stats)
+
+        self.assertEqual([2, 0, 1], order)
+
+    def test_unpriced_and_unobserved_models(self):
+        stats = ModelStatsRegistry()
+        for _ in range(5):
+            stats.get("openai:m0").record_call(1.0, False)  # 成功率不达标
+
+        order = CostRouting().order([0, 1, 2], _models(1, None, 5), stats)
+
+        self.assertEqual([2, 1, 0], order)
+        self.assertIsInstance(get_routing_policy("cost"), CostRouting)
+
+
+class DispatcherCostTest(unittest.TestCase):
+    def test_cost_is_reported_per_group_and_kit(self):
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [
+                {"sdk_name": "openai", "model_name": "bad", "model": FakeModel(1, 1, fail=True)},
+                {"sdk_name": "openai", "model_name": "good", "model": FakeModel(2, 8)},
+            ]
+        }
+
+        with cost_scope("title"):
+            dispatcher.execute_with_group(MESSAGE_INFO, "group")
+        dispatcher.execute_with_group(MESSAGE_INFO, "group")
+
+        report = dispatcher.get_cost_report()
+        expected = (200 * 2 + 100 * 8) / 1_000_000
+        self.assertEqual(2, report["groups"]["group"]["calls"])
+        self.assertAlmostEqual(expected * 2, report["groups"]["group"]["cost"])
+        self.assertAlmostEqual(expected, report["kits"]["title"]["cost"])
+        self.assertEqual(1, report["kits"][""]["calls"])
+        self.assertEqual(400, report["models"]["openai:good"]["prompt_tokens"])
+        self.assertNotIn("openai:bad", report["models"])
+
+    def test_cost_routing_prefers_cheap_model(self):
+        cheap, expensive = FakeModel(1, 1), FakeModel(10, 10)
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [
+                {"sdk_name": "openai", "model_name": "expensive", "model": expensive},
+                {"sdk_name": "openai", "model_name": "cheap", "model": cheap},
+            ]
+        }
+        dispatcher.set_routing_policy("group", "cost")
+
+        dispatcher.execute_with_group(MESSAGE_INFO, "group")
+
+        self.assertEqual((1, 0), (cheap.calls, expensive.calls))
+
+
+if __name__ == "__main__":
+    unittest.main()
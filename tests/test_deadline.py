@@ -0,0 +1,142 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.async_dispatcher import AsyncModelDispatcher
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.deadline import Deadline, DeadlineExceededError
+from llmakits.utils.retry_handler import RetryHandler
+
+
+class SlowModel:
+    """模拟遵守调用时限的慢模型：每次请求最多等待到时限结束"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+        self.deadlines = []
+
+    def send_message(self, messages, message_info, deadline=None):
+        self.calls += 1
+        self.deadlines.append(deadline)
+        if deadline is not None and deadline.remaining() < self.delay:
+            time.sleep(deadline.remaining())
+            raise deadline.exceeded("openai", "slow")
+        time.sleep(self.delay)
+        return '{"ok": true}', 1
+
+    async def send_message_async(self, messages, message_info, deadline=None):
+        self.calls += 1
+        self.deadlines.append(deadline)
+        if deadline is not None and deadline.remaining() < self.delay:
+            await asyncio.sleep(deadline.remaining())
+            raise deadline.exceeded("openai", "slow")
+        await asyncio.sleep(self.delay)
+        return '{"ok": true}', 1
+
+
+class PlainModel:
+    """不接受 deadline 参数的旧式模型"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def send_message(self, messages, message_info):
+        self.calls += 1
+        return '{"ok": true}', 1
+
+
+def _dispatcher(cls, *models):
+    dispatcher = cls()
+    dispatcher.model_groups = {
+        "group": [
+            {"sdk_name": "openai", "model_name": f"model-{i}", "model": model} for i, model in enumerate(models)
+        ]
+    }
+    return dispatcher
+
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class DeadlineTest(unittest.TestCase):
+    def test_resolve_takes_earliest_deadline(self):
+        self.assertIsNone(Deadline.resolve())
+        deadline = Deadline.resolve(time.time() + 60, timeout_budget=1)
+        self.assertLessEqual(deadline.remaining(), 1)
+        self.assertLessEqual(Deadline(1).timeout(5), 1)
+
+    def test_expired_budget_fails_fast_without_fallback(self):
+        slow = SlowModel(0.5)
+        fallback = PlainModel()
+        dispatcher = _dispatcher(ModelDispatcher, slow, fallback)
+
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceededError):
+            dispatcher.execute_with_group(MESSAGE_INFO, "group", timeout_budget=0.1)
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.3)
+        self.assertEqual(1, slow.calls)
+        self.assertEqual(0, fallback.calls)
+        # 时限用完不计入模型的失败统计
+        self.assertEqual(0, dispatcher.get_model_stats().get("openai:model-0", {}).get("calls", 0))
+
+    def test_deadline_is_passed_to_send_message(self):
+        slow = SlowModel(0.01)
+        dispatcher = _dispatcher(ModelDispatcher, slow)
+
+        dispatcher.execute_with_group(MESSAGE_INFO, "group", timeout_budget=5)
+
+        self.assertIsInstance(slow.deadlines[0], Deadline)
+
+    def test_models_without_deadline_support_still_work(self):
+        model = PlainModel()
+        dispatcher = _dispatcher(ModelDispatcher, model)
+
+        self.assertEqual(('{"ok": true}', 1), dispatcher.execute_with_group(MESSAGE_INFO, "group"))
+        self.assertEqual(1, model.calls)
+
+    def test_async_dispatcher_respects_deadline(self):
+        slow = SlowModel(0.5)
+        dispatcher = _dispatcher(AsyncModelDispatcher, slow, PlainModel())
+
+        async def run():
+            return await dispatcher.execute_with_group_async(MESSAGE_INFO, "group", timeout_budget=0.1)
+
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceededError):
+            asyncio.run(run())
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    def test_bulkhead_queue_wait_is_bounded_by_deadline(self):
+        slow = SlowModel(0.3)
+        dispatcher = _dispatcher(ModelDispatcher, slow)
+        dispatcher.set_group_concurrency("group", 1)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            holder = executor.submit(dispatcher.execute_with_group, MESSAGE_INFO, "group")
+            time.sleep(0.05)
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceededError):
+                dispatcher.execute_with_group(MESSAGE_INFO, "group", timeout_budget=0.1)
+            self.assertLess(time.monotonic() - start, 0.25)
+            holder.result()
+
+    def test_rate_limit_wait_longer_than_remaining_budget_raises(self):
+        handler = RetryHandler("openai", "model")
+        deadline = Deadline(1)
+
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceededError):
+            handler.handle_rate_limit_error("Too many requests", 0, [], {}, deadline=deadline)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.event_log import EventLog, configure_event_log, close_event_log, log_event
+
+
+class FakeModel:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def send_message(self, messages, message_info):
+        if self.fail:
+            raise Exception("boom")
+        return '{"ok": true}', 3
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class EventLogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "events.jsonl")
+
+    def tearDown(self):
+        configure_event_log()
+        close_event_log()
+        self.tmpdir.cleanup()
+
+    def test_events_are_written_as_jsonl_by_background_thread(self):
+        event_log = EventLog()
+        event_log.configure(self.path, level="info", console=False)
+
+        def work(n):
+            for i in range(50):
+                event_log.emit("model_call", f"call {n}-{i}", model="openai:gpt", latency=0.1)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        event_log.close()
+
+        records = _read_jsonl(self.path)
+        self.assertEqual(200, len(records))
+        self.assertEqual({"model_call"}, {record["event"] for record in records})
+        self.assertEqual("openai:gpt", records[0]["model"])
+        self.assertEqual(0.1, records[0]["latency"])
+        self.assertEqual("info", records[0]["level"])
+
+    def test_level_gate_and_console_switch(self):
+        event_log = EventLog()
+        event_log.configure(self.path, level="warning", console=True)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            event_log.emit("noise", "debug text", "debug")
+            event_log.emit("image_download_failed", "warning text", "warning")
+        event_log.close()
+
+        self.assertNotIn("debug text", output.getvalue())
+        self.assertIn("warning text", output.getvalue())
+        self.assertEqual(["image_download_failed"], [record["event"] for record in _read_jsonl(self.path)])
+
+    def test_console_text_is_written_by_background_thread(self):
+        class ThreadRecordingStream(io.StringIO):
+            def write(self, text):
+                writers.add(threading.current_thread())
+                return super().write(text)
+
+        writers = set()
+        output = ThreadRecordingStream()
+        event_log = EventLog()
+        with redirect_stdout(output):
+            event_log.emit("model_switch", "switch text", "info")
+            event_log.separator()
+        event_log.flush()
+
+        self.assertEqual("switch text\n" + "-" * 40 + "\n", output.getvalue())
+        self.assertNotIn(threading.current_thread(), writers)
+        event_log.close()
+
+    def test_console_disabled_keeps_stdout_quiet(self):
+        configure_event_log(self.path, console=False)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            log_event("rate_limited", "请求被限流", "warning")
+        close_event_log()
+
+        self.assertEqual("", output.getvalue())
+        self.assertEqual("rate_limited", _read_jsonl(self.path)[0]["event"])
+
+    def test_dispatcher_failures_are_logged_with_model_and_error_tag(self):
+        configure_event_log(self.path, console=False)
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [
+                {"sdk_name": "openai", "model_name": "bad", "model": FakeModel(fail=True)},
+                {"sdk_name": "openai", "model_name": "good", "model": FakeModel()},
+            ]
+        }
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            dispatcher.execute_with_group({"user_text": "x", "system_prompt": ""}, "group")
+        close_event_log()
+
+        self.assertEqual("", output.getvalue())
+        records = _read_jsonl(self.path)
+        error = next(record for record in records if record["event"] == "model_error")
+        self.assertEqual("openai:bad", error["model"])
+        self.assertEqual("Exception", error["error_tag"])
+        calls = [record for record in records if record["event"] == "model_call"]
+        self.assertEqual(["error", "success"], [record["status"] for record in calls])
+        self.assertIn("latency", calls[0])
+        self.assertTrue(any(record["event"] == "model_switch" for record in records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.normalize_error import ResponseError
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+def content_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+
+def usage_chunk(prompt_tokens, completion_tokens):
+    usage = SimpleNamespace(
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens
+    )
+    return SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeStream:
+    def __init__(self, chunks, delay=0.0, error=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        time.sleep(self.delay)
+        for chunk in self.chunks:
+            if self.closed:
+                return
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+class StallingSSEHandler(BaseHTTPRequestHandler):
+    """/<响应头延迟>/<首个 token 延迟>/v1/chat/completions：按延迟返回响应头和唯一的 token"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        header_delay, token_delay = (float(part) for part in self.path.strip("/").split("/")[:2])
+        chunk = {
+            "id": "chatcmpl-1",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt",
+            "choices": [{"index": 0, "delta": {"content": "late"}, "finish_reason": None}],
+        }
+        try:
+            time.sleep(header_delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.flush()
+            time.sleep(token_delay)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode())
+        except OSError:
+            pass  # 客户端超时后关闭了连接
+
+    def log_message(self, *args):
+        pass
+
+
+class StreamWithGroupTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StallingSSEHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.server_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _dispatcher(self, count=2):
+        models = [BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], f"gpt-{idx}") for idx in range(count)]
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "chat": [{"sdk_name": "openai", "model_name": f"gpt-{idx}", "model": model} for idx, model in enumerate(models)]
+        }
+        return dispatcher, models
+
+    def test_fails_over_before_first_token_and_reports_usage(self):
+        dispatcher, (failing, healthy) = self._dispatcher()
+        stream = FakeStream([content_chunk("Hel"), content_chunk("lo"), usage_chunk(3, 5)])
+        create_calls = []
+
+        def create(messages, client=None, stream=None):
+            create_calls.append(stream)
+            raise Exception("Internal Server Error")
+
+        with redirect_stdout(io.StringIO()):
+            with patch.object(failing, "_create_chat_completion", side_effect=create):
+                with patch.object(healthy, "_create_chat_completion", return_value=stream):
+                    group_stream = dispatcher.stream_with_group(MESSAGE_INFO, "chat")
+                    deltas = list(group_stream)
+
+        self.assertEqual(["Hel", "lo"], deltas)
+        self.assertEqual([True], create_calls)  # 不论模型是否配置 stream，都以流式请求发出
+        result = group_stream.result
+        self.assertTrue(result.success)
+        self.assertEqual("Hello", result.return_message)
+        self.assertEqual(1, result.last_tried_index)
+        self.assertEqual(8, result.total_tokens)
+        self.assertEqual(5, result.stream_timing.output_tokens)
+        self.assertTrue(stream.closed)
+        self.assertEqual(1, dispatcher.model_switch_count)
+
+    def test_stalled_model_is_abandoned_after_first_token_timeout(self):
+        # 响应头迟迟不返回 / 响应头立即返回但首个 token 迟迟不到，都由传输层超时关闭连接
+        for delays in ("1/0", "0/1"):
+            with self.subTest(delays=delays):
+                dispatcher, (_, healthy) = self._dispatcher()
+                stalled = BaseOpenai("openai", f"{self.server_url}/{delays}/v1", ["k1"], "gpt-0")
+                dispatcher.model_groups["chat"][0]["model"] = stalled
+
+                start = time.monotonic()
+                with redirect_stdout(io.StringIO()):
+                    with patch.object(healthy, "_create_chat_completion", return_value=FakeStream([content_chunk("ok")])):
+                        group_stream = dispatcher.stream_with_group(MESSAGE_INFO, "chat", first_token_timeout=0.1)
+                        deltas = list(group_stream)
+
+                self.assertEqual(["ok"], deltas)
+                self.assertLess(time.monotonic() - start, 0.9)
+                self.assertEqual(1, group_stream.result.last_tried_index)
+
+    def test_first_token_timeout_is_reported_as_stream_timeout(self):
+        model = BaseOpenai("openai", f"{self.server_url}/0/1/v1", ["k1"], "gpt")
+
+        start = time.monotonic()
+        with redirect_stdout(io.StringIO()):
+            with self.assertRaises(ResponseError) as context:
+                next(model.stream_message([], MESSAGE_INFO, first_token_timeout=0.1))
+
+        self.assertLess(time.monotonic() - start, 0.9)  # SDK 内部不再重试
+        self.assertEqual("流式响应_超时", context.exception.error_tag)
+        self.assertIn("执行时间超过", context.exception.get_error_message())
+
+    def test_error_after_first_token_is_raised_without_failover(self):
+        dispatcher, (broken, healthy) = self._dispatcher()
+        broken_stream = FakeStream([content_chunk("partial")], error=RuntimeError("connection reset"))
+
+        with patch.object(broken, "_create_chat_completion", return_value=broken_stream):
+            with patch.object(healthy, "_create_chat_completion") as healthy_create:
+                group_stream = dispatcher.stream_with_group(MESSAGE_INFO, "chat")
+                self.assertEqual("partial", next(group_stream))
+                with self.assertRaises(ResponseError) as context:
+                    next(group_stream)
+
+        self.assertEqual("流式响应_异常", context.exception.error_tag)
+        healthy_create.assert_not_called()
+        self.assertIsNone(group_stream.result)
+
+    def test_close_stops_the_underlying_stream(self):
+        dispatcher, (model, _) = self._dispatcher()
+        stream = FakeStream([content_chunk(str(idx)) for idx in range(100)])
+
+        with patch.object(model, "_create_chat_completion", return_value=stream):
+            with dispatcher.stream_with_group(MESSAGE_INFO, "chat") as group_stream:
+                self.assertEqual("0", next(group_stream))
+
+        self.assertTrue(stream.closed)
+        self.assertIsNone(group_stream.result)
+
+    def test_all_models_failed_raises_on_first_iteration(self):
+        dispatcher, models = self._dispatcher()
+
+        with redirect_stdout(io.StringIO()):
+            with patch.object(models[0], "_create_chat_completion", side_effect=Exception("boom")):
+                with patch.object(models[1], "_create_chat_completion", side_effect=Exception("boom again")):
+                    group_stream = dispatcher.stream_with_group(MESSAGE_INFO, "chat")
+                    with self.assertRaises(ResponseError) as context:
+                        next(group_stream)
+
+        self.assertIn("All models failed", context.exception.get_error_message())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import io
+import os
+import sys
+import time
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.async_dispatcher import AsyncModelDispatcher
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.hedging import HedgePolicy
+
+
+class SleepyModel:
+    def __init__(self, name, delay, tokens=10, reply=None):
+        self.name = name
+        self.delay = delay
+        self.tokens = tokens
+        self.reply = reply or f'{{"model": "{name}"}}'
+
+    def send_message(self, messages, message_info):
+        time.sleep(self.delay)
+        return self.reply, self.tokens
+
+
+class SleepyAsyncModel(SleepyModel):
+    def __init__(self, name, delay, tokens=10, reply=None):
+        super().__init__(name, delay, tokens, reply)
+        self.cancelled = False
+
+    async def send_message_async(self, messages, message_info):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.reply, self.tokens
+
+
+class HedgingTest(unittest.TestCase):
+    def _dispatcher(self, *models):
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [{"sdk_name": "openai", "model_name": model.name, "model": model} for model in models]
+        }
+        return dispatcher
+
+    def test_slow_model_is_hedged_to_next_model(self):
+        dispatcher = self._dispatcher(SleepyModel("slow", 0.6, tokens=5), SleepyModel("fast", 0.05, tokens=3))
+        dispatcher.enable_hedging("group", delay=0.1)
+
+        start = time.monotonic()
+        result = dispatcher.execute_with_group(
+            {"user_text": "x", "system_prompt": ""}, "group", format_json=True, return_detailed=True
+        )
+        elapsed = time.monotonic() - start
+
+        self.assertTrue(result.success)
+        self.assertEqual({"model": "fast"}, result.return_message)
+        self.assertEqual(1, result.last_tried_index)
+        self.assertLess(elapsed, 0.5)
+
+        time.sleep(0.7)  # 等待被放弃的慢请求完成，统计浪费的 token
+        stats = dispatcher.get_hedge_stats()["group"]
+        self.assertEqual(1.0, stats["hedge_rate"])
+        self.assertEqual(1, stats["hedge_wins"])
+        self.assertEqual(5, stats["wasted_tokens"])
+
+    def test_hedge_result_must_pass_validation(self):
+        dispatcher = self._dispatcher(
+            SleepyModel("slow-valid", 0.3), SleepyModel("fast-invalid", 0.01, reply='{"model": ""}')
+        )
+        dispatcher.enable_hedging("group", delay=0.05)
+
+        def validate_func(message):
+            return bool(message["model"]), message["model"]
+
+        with redirect_stdout(io.StringIO()):
+            result, _ = dispatcher.execute_with_group(
+                {"user_text": "x", "system_prompt": ""}, "group", format_json=True, validate_func=validate_func
+            )
+
+        self.assertEqual("slow-valid", result)
+        self.assertEqual(0, dispatcher.get_hedge_stats()["group"]["hedge_wins"])
+
+    def test_fast_model_does_not_hedge(self):
+        dispatcher = self._dispatcher(SleepyModel("fast", 0.01), SleepyModel("unused", 0.01))
+        dispatcher.enable_hedging("group", delay=0.5)
+
+        dispatcher.execute_with_group({"user_text": "x", "system_prompt": ""}, "group")
+
+        self.assertEqual(0.0, dispatcher.get_hedge_stats()["group"]["hedge_rate"])
+
+    def test_async_slow_model_is_hedged_and_loser_cancelled(self):
+        slow, fast = SleepyAsyncModel("slow", 0.6, tokens=5), SleepyAsyncModel("fast", 0.05, tokens=3)
+        dispatcher = AsyncModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [{"sdk_name": "openai", "model_name": model.name, "model": model} for model in (slow, fast)]
+        }
+        dispatcher.enable_hedging("group", delay=0.1)
+
+        async def run():
+            result = await dispatcher.execute_with_group_async(
+                {"user_text": "x", "system_prompt": ""}, "group", format_json=True, return_detailed=True
+            )
+            await asyncio.sleep(0)  # 让被取消的任务处理取消
+            return result
+
+        start = time.monotonic()
+        result = asyncio.run(run())
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual({"model": "fast"}, result.return_message)
+        self.assertEqual(1, result.last_tried_index)
+        self.assertTrue(slow.cancelled)
+        stats = dispatcher.get_hedge_stats()["group"]
+        self.assertEqual(1.0, stats["hedge_rate"])
+        self.assertEqual(1, stats["hedge_wins"])
+
+    def test_percentile_delay_uses_observed_latency(self):
+        policy = HedgePolicy(percentile=90, delay=5, min_samples=10)
+        self.assertEqual(5, policy.get_delay())
+
+        for latency in range(1, 11):
+            policy.observe(float(latency))
+
+        self.assertEqual(9.0, policy.get_delay())
+
+
+if __name__ == "__main__":
+    unittest.main()
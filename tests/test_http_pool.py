@@ -0,0 +1,148 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils import http_pool
+from llmakits.utils.http_pool import (
+    HttpPoolOptions,
+    close_http_pools,
+    get_async_http_client,
+    get_http_client,
+    get_http_pool_stats,
+    make_pool_options,
+)
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    """返回固定的 chat.completion，并记录每个请求的客户端端口和密钥"""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        ChatHandler.requests.append((self.client_address[1], self.headers.get("Authorization")))
+        body = json.dumps(
+            {
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SharedHttpPoolTest(unittest.TestCase):
+    def setUp(self):
+        close_http_pools()
+
+    def tearDown(self):
+        close_http_pools()
+
+    def test_models_and_keys_share_one_pool_per_base_url(self):
+        first = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1", "k2"], "gpt-a")
+        second = BaseOpenai("openai", "http://127.0.0.1:9/v1/", ["k3"], "gpt-b")
+        other = BaseOpenai("openai", "http://127.0.0.1:10/v1", ["k1"], "gpt-a")
+
+        shared = get_http_client("http://127.0.0.1:9/v1")
+        self.assertIs(shared, first.client._client)
+        self.assertIs(shared, second.client._client)
+        self.assertIsNot(shared, other.client._client)
+
+        # 切换密钥只换请求头，连接池不变
+        first.switch_api_key("k1")
+        self.assertEqual("k2", first.api_key)
+        self.assertIs(shared, first.client._client)
+        self.assertEqual(2, len(get_http_pool_stats()))
+
+    def test_pool_options_select_separate_pool(self):
+        options = make_pool_options({"max_connections": "8", "keepalive_expiry": 90, "rpm": 10})
+        self.assertEqual(HttpPoolOptions(max_connections=8, keepalive_expiry=90.0), options)
+
+        tuned = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt", http_pool={"max_connections": 8})
+        default = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt")
+        self.assertIsNot(tuned.client._client, default.client._client)
+        self.assertEqual({"http://127.0.0.1:9/v1", "http://127.0.0.1:9/v1#2"}, set(get_http_pool_stats()))
+
+    def test_http2_falls_back_without_h2(self):
+        with patch.object(http_pool, "_HTTP2_AVAILABLE", False):
+            with redirect_stdout(io.StringIO()):
+                get_http_client("http://127.0.0.1:9/v1", make_pool_options({"http2": True}))
+
+        stats = get_http_pool_stats()["http://127.0.0.1:9/v1"]
+        self.assertTrue(stats["http2"])
+        self.assertFalse(stats["http2_enabled"])
+
+    def test_async_pool_is_shared_within_an_event_loop(self):
+        async def clients():
+            return get_async_http_client("http://127.0.0.1:9/v1"), get_async_http_client("http://127.0.0.1:9/v1")
+
+        first, again = asyncio.run(clients())
+        self.assertIs(first, again)
+        second, _ = asyncio.run(clients())
+        self.assertIsNot(first, second)
+
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt")
+
+        async def model_clients():
+            return model._get_async_client(), model._get_async_client()
+
+        client, cached = asyncio.run(model_clients())
+        self.assertIs(client, cached)
+        self.assertIsNot(client, asyncio.run(model_clients())[0])
+
+
+class KeepAliveTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ChatHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        close_http_pools()
+
+    def test_key_switch_reuses_the_warm_connection(self):
+        ChatHandler.requests = []
+        first = BaseOpenai("openai", self.base_url, ["k1", "k2"], "gpt-a")
+        second = BaseOpenai("openai", self.base_url, ["k3"], "gpt-b")
+
+        first.send_message([{"role": "user", "content": "x"}], MESSAGE_INFO)
+        first.switch_api_key("k1")
+        first.send_message([{"role": "user", "content": "x"}], MESSAGE_INFO)
+        second.send_message([{"role": "user", "content": "x"}], MESSAGE_INFO)
+
+        ports = {port for port, _ in ChatHandler.requests}
+        keys = [auth for _, auth in ChatHandler.requests]
+        self.assertEqual(["Bearer k1", "Bearer k2", "Bearer k3"], keys)
+        self.assertEqual(1, len(ports))
+
+
+if __name__ == "__main__":
+    unittest.main()
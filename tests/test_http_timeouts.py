@@ -0,0 +1,156 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+import openai
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.llm_client import BaseOpenai
+from llmakits.load_model import parse_model_config
+from llmakits.utils.http_timeouts import (
+    HttpTimeouts,
+    create_http_client,
+    make_http_timeouts,
+    request_timeouts,
+    timeout_phase,
+)
+from llmakits.utils.normalize_error import ResponseError
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """/<响应头延迟>/<每块延迟>：延迟后返回响应头，再分 3 块返回响应体"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        header_delay, chunk_delay = (float(part) for part in self.path.strip("/").split("/"))
+        try:
+            time.sleep(header_delay)
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.flush()
+            for _ in range(3):
+                time.sleep(chunk_delay)
+                self.wfile.write(b"2\r\nab\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass  # 客户端超时后关闭了连接
+
+    def log_message(self, *args):
+        pass
+
+
+class TimeoutTransportTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _get(self, client, path, timeouts, stream):
+        start = time.monotonic()
+        with request_timeouts(timeouts, stream):
+            with client.stream("GET", self.base_url + path) as response:
+                body = b"".join(response.iter_bytes())
+        return body, time.monotonic() - start
+
+    def test_first_byte_and_read_phases(self):
+        timeouts = HttpTimeouts(connect=1.0, read=0.2, first_byte=0.6, total=5.0)
+        client = create_http_client(timeouts)
+
+        # 响应头等待受 first_byte 限制，响应体每块之间受 read 限制
+        self.assertEqual(b"ababab", self._get(client, "/0.3/0.05", timeouts, stream=True)[0])
+        with self.assertRaises(httpx.ReadTimeout):
+            self._get(client, "/0.05/0.4", timeouts, stream=True)
+        with self.assertRaises(httpx.ReadTimeout):
+            self._get(client, "/0.9/0", timeouts, stream=True)
+        # 非流式请求读取响应体同样使用 first_byte
+        self.assertEqual(b"ababab", self._get(client, "/0/0.3", timeouts, stream=False)[0])
+
+    def test_total_timeout_caps_every_phase(self):
+        timeouts = HttpTimeouts(connect=1.0, read=5.0, first_byte=5.0, total=0.3)
+        client = create_http_client(timeouts)
+
+        start = time.monotonic()
+        with self.assertRaises(httpx.ReadTimeout):
+            self._get(client, "/2/0", timeouts, stream=True)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_requests_without_scope_use_client_default(self):
+        client = create_http_client(HttpTimeouts(read=0.1))
+        response = client.get(self.base_url + "/0.2/0")
+        self.assertEqual(b"ababab", response.content)
+
+
+class TimeoutErrorTest(unittest.TestCase):
+    def test_timeout_phase(self):
+        request = httpx.Request("POST", "http://127.0.0.1:9/v1/chat/completions")
+        try:
+            try:
+                raise httpx.ConnectTimeout("connect", request=request)
+            except httpx.TimeoutException as err:
+                raise openai.APITimeoutError(request=request) from err
+        except openai.APITimeoutError as e:
+            self.assertEqual("connect", timeout_phase(e))
+        self.assertIsNone(timeout_phase(ValueError("boom")))
+
+    def test_request_timeout_is_reported_as_timeout_error(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt")
+        request = httpx.Request("POST", "http://127.0.0.1:9/v1/chat/completions")
+
+        def create(messages, client=None):
+            try:
+                raise httpx.ReadTimeout("read", request=request)
+            except httpx.TimeoutException as err:
+                raise openai.APITimeoutError(request=request) from err
+
+        with patch.object(model, "_create_chat_completion", side_effect=create) as create_mock:
+            with self.assertRaises(ResponseError) as context:
+                model.send_message([], MESSAGE_INFO)
+
+        self.assertEqual(1, create_mock.call_count)
+        self.assertEqual("TimeoutError", context.exception.error_tag)
+        self.assertIn("执行时间超过", context.exception.get_error_message())
+
+    def test_stream_read_timeout_is_reported_as_stream_timeout(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt", stream=True)
+
+        def stalled_stream():
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="a"))], usage=None)
+            raise httpx.ReadTimeout("read")
+
+        with patch.object(model, "_create_chat_completion", return_value=stalled_stream()):
+            with self.assertRaises(ResponseError) as context:
+                model.send_message([], MESSAGE_INFO)
+
+        self.assertEqual("流式响应_超时", context.exception.error_tag)
+        self.assertIn("执行时间超过", context.exception.get_error_message())
+
+    def test_timeouts_config(self):
+        self.assertEqual(HttpTimeouts(), make_http_timeouts(None))
+        params = parse_model_config({"platform": "openai", "model_name": "gpt", "read_timeout": 30, "stream": True})
+        self.assertEqual({"read_timeout": 30.0}, params["timeouts"])
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt", timeouts=params["timeouts"])
+        self.assertEqual(30.0, model.timeouts.read)
+        self.assertEqual(HttpTimeouts().total, model.timeouts.total)
+
+
+if __name__ == "__main__":
+    unittest.main()
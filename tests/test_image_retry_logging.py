@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from llmakits.dispatcher import ModelDispatcher
 from llmakits.message import builder
+from llmakits.utils.event_log import flush_event_log
 from llmakits.utils.image_cache import ImageBase64Cache
 from llmakits.utils.retry_state import get_retry_state
 from llmakits.utils.retry_handler import RetryHandler
@@ -37,6 +38,7 @@ class ImageRetryLoggingTest(unittest.TestCase):
                     image_cache=None,
                 )
 
+        flush_event_log()
         stdout = output.getvalue()
         self.assertEqual(1, len(converted))
         self.assertTrue(converted[0].startswith("data:image/jpeg;base64,"))
@@ -86,6 +88,7 @@ class ImageRetryLoggingTest(unittest.TestCase):
         self.assertEqual(1, calls["https://example.com/ok.jpg"])
         self.assertEqual(1, calls["https://example.com/missing.jpg"])
         self.assertTrue(image_cache.is_failed("https://example.com/missing.jpg"))
+        flush_event_log()
         self.assertIn("已从图片组缓存获取可用图片", output.getvalue())
 
     def test_image_group_cache_reuses_successful_images(self):
@@ -109,6 +112,7 @@ class ImageRetryLoggingTest(unittest.TestCase):
         self.assertEqual(1, calls["https://example.com/ok.jpg"])
         self.assertEqual(1, calls["https://example.com/missing.jpg"])
         self.assertEqual(1, image_cache.group_size())
+        flush_event_log()
         self.assertIn("已从图片组缓存获取可用图片", output.getvalue())
 
     def test_image_group_cache_all_failed_raises_without_retrying_download(self):
@@ -185,6 +189,7 @@ class ImageRetryLoggingTest(unittest.TestCase):
         self.assertEqual(1, calls["https://example.com/missing.jpg"])
         self.assertEqual(1, len(resolved_info["img_list"]))
         self.assertTrue(resolved_info["img_list"][0].startswith("data:image/jpeg;base64,"))
+        flush_event_log()
         self.assertIn("已从图片组缓存获取可用图片", output.getvalue())
 
     def test_missing_choices_error_is_reported_without_printing_silent_tag(self):
@@ -201,6 +206,7 @@ class ImageRetryLoggingTest(unittest.TestCase):
             with self.assertRaises(ResponseError):
                 handler.handle_exception(response_error, 0, [], {})
 
+        flush_event_log()
         stdout = output.getvalue()
         self.assertTrue(response_error.reported)
         self.assertIn("Model modelscope : moonshotai/Kimi-K2.5", stdout)
@@ -233,6 +239,7 @@ class ImageRetryLoggingTest(unittest.TestCase):
             with self.assertRaises(ResponseError):
                 dispatcher.execute_task({"user_text": "x", "system_prompt": ""}, llm_models)
 
+        flush_event_log()
         self.assertNotIn(
             "Model modelscope : Qwen/Qwen3-VL-235B-A22B-Instruct",
             output.getvalue(),
@@ -317,6 +324,7 @@ class ImageRetryLoggingTest(unittest.TestCase):
                         llm_models,
                         validate_func=always_invalid,
                     )
+            flush_event_log()
 
         stdout = output.getvalue()
         self.assertIn("1/2 Model openrouter : first-model", stdout)
@@ -0,0 +1,119 @@
+import io
+import os
+import sys
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.key_pool import KeyPool
+from llmakits.utils.normalize_error import ResponseError
+
+
+def fake_response():
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+        usage=SimpleNamespace(total_tokens=1),
+    )
+
+
+class KeyPoolTest(unittest.TestCase):
+    def test_round_robin_spreads_requests(self):
+        pool = KeyPool(["k1", "k2", "k3"])
+        selected = []
+        for _ in range(6):
+            key = pool.select()
+            selected.append(key)
+            pool.release(key)
+        self.assertEqual(["k1", "k2", "k3", "k1", "k2", "k3"], selected)
+
+    def test_weighted_selection_follows_weights(self):
+        pool = KeyPool(["k1", "k2"], strategy="weighted", weights={"k1": 3})
+        selected = [pool.select() for _ in range(8)]
+        self.assertEqual(6, selected.count("k1"))
+        self.assertEqual(2, selected.count("k2"))
+
+    def test_least_in_flight_prefers_idle_key(self):
+        pool = KeyPool(["k1", "k2"], strategy="least_in_flight")
+        first = pool.select()
+        second = pool.select()
+        self.assertNotEqual(first, second)
+        pool.release(second)
+        self.assertEqual(second, pool.select())
+
+    def test_quota_check_runs_outside_the_pool_lock(self):
+        checked = []
+
+        def quota_check(key):
+            checked.append(pool._lock.locked())
+            return key != "k1"
+
+        pool = KeyPool(["k1", "k2"], quota_check=quota_check)
+        self.assertEqual("k2", pool.select())
+        self.assertEqual(["k2"], pool.available_keys())
+        self.assertTrue(checked)
+        self.assertFalse(any(checked))
+
+    def test_exhausted_keys_are_marked_not_removed(self):
+        pool = KeyPool(["k1", "k2"])
+        self.assertTrue(pool.mark_exhausted("k1"))
+        self.assertEqual(["k2", "k2", "k2"], [pool.select() for _ in range(3)])
+        self.assertEqual(["k1", "k2"], pool.keys)
+        self.assertFalse(pool.mark_exhausted("k2"))
+        self.assertIsNone(pool.select())
+
+        pool.reset()
+        self.assertEqual(["k1", "k2"], pool.available_keys())
+
+
+class BaseOpenaiKeyPoolTest(unittest.TestCase):
+    def test_concurrent_requests_use_all_keys(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1", "k2", "k3"], "model")
+        used = []
+        lock = threading.Lock()
+
+        def create(messages, client=None):
+            with lock:
+                used.append(client.api_key)
+            time.sleep(0.01)
+            return fake_response()
+
+        with patch.object(model, "_create_chat_completion", side_effect=create):
+            threads = [
+                threading.Thread(target=model.send_message, args=([], {"user_text": "x", "system_prompt": ""}))
+                for _ in range(9)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual({"k1": 3, "k2": 3, "k3": 3}, {key: used.count(key) for key in set(used)})
+
+    def test_exhausted_key_is_skipped_by_later_requests(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1", "k2"], "model")
+        used = []
+
+        def create(messages, client=None):
+            used.append(client.api_key)
+            if client.api_key == "k1":
+                raise ResponseError("openai", "model", exception=Exception("insufficient_quota"), error_tag="")
+            return fake_response()
+
+        with patch.object(model.retry_handler, "handle_exception", side_effect=lambda e, *args, **kwargs: (False, args[1], True)):
+            with patch.object(model, "_create_chat_completion", side_effect=create):
+                with redirect_stdout(io.StringIO()):
+                    for _ in range(3):
+                        self.assertEqual(("ok", 1), model.send_message([], {"user_text": "x", "system_prompt": ""}))
+
+        self.assertEqual(["k1", "k2", "k2", "k2"], used)
+        self.assertEqual(["k1"], model.key_pool.exhausted_keys())
+
+
+if __name__ == "__main__":
+    unittest.main()
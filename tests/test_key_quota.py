@@ -0,0 +1,136 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.key_pool import KeyPool
+from llmakits.utils.key_quota import KeyQuota, reset_key_quotas
+from llmakits.utils.normalize_error import ResponseError
+
+
+def fake_response(total_tokens):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+        usage=SimpleNamespace(total_tokens=total_tokens, prompt_tokens=total_tokens, completion_tokens=0),
+    )
+
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class KeyQuotaTest(unittest.TestCase):
+    def test_quota_reached_before_limit_and_reset_next_day(self):
+        now = [1_700_000_000.0]
+        quota = KeyQuota(daily_tokens=1000, quota_reserve=0.1, clock=lambda: now[0])
+
+        self.assertFalse(quota.record_tokens(800))
+        self.assertTrue(quota.has_quota())
+        self.assertTrue(quota.record_tokens(100))  # 达到 90%，刚接近额度
+        self.assertFalse(quota.record_tokens(50))  # 同一天只报告一次
+        self.assertFalse(quota.has_quota())
+        self.assertEqual(50, quota.remaining()["tokens_remaining"])
+
+        now[0] += 24 * 3600
+        self.assertTrue(quota.has_quota())
+        self.assertEqual(0, quota.remaining()["tokens_used"])
+
+    def test_request_quota(self):
+        quota = KeyQuota(daily_requests=2, quota_reserve=0)
+        quota.record_request()
+        self.assertTrue(quota.has_quota())
+        quota.record_request()
+        self.assertFalse(quota.has_quota())
+        self.assertEqual(0, quota.remaining()["requests_remaining"])
+        self.assertIsNone(quota.remaining()["tokens_remaining"])
+
+    def test_key_pool_skips_keys_without_quota(self):
+        blocked = {"k1"}
+        pool = KeyPool(["k1", "k2"], quota_check=lambda key: key not in blocked)
+
+        self.assertEqual(["k2", "k2"], [pool.select() for _ in range(2)])
+        self.assertEqual([], pool.exhausted_keys())
+        blocked.clear()
+        self.assertEqual(["k1", "k2"], pool.available_keys())
+
+
+class BaseOpenaiQuotaTest(unittest.TestCase):
+    def setUp(self):
+        reset_key_quotas()
+
+    def tearDown(self):
+        reset_key_quotas()
+
+    def test_keys_rotate_before_provider_rejects(self):
+        model = BaseOpenai(
+            "openai",
+            "http://127.0.0.1:9/v1",
+            [{"key": "k1", "daily_tokens": 100}, "k2"],
+            "model",
+            quota_limits={"daily_requests": 1000, "quota_reserve": 0},
+        )
+        used = []
+
+        def create(messages, client=None):
+            used.append(client.api_key)
+            return fake_response(60)
+
+        with patch.object(model, "_create_chat_completion", side_effect=create):
+            for _ in range(5):
+                model.send_message([], MESSAGE_INFO)
+
+        # k1 的额度为 100 token：第 2 次请求后（120 token）不再被选中
+        self.assertEqual(["k1", "k2", "k1", "k2", "k2"], used)
+        quotas = model.get_key_quotas()
+        self.assertEqual(120, quotas["***k1"]["tokens_used"])
+        self.assertFalse(quotas["***k1"]["has_quota"])
+        self.assertEqual(997, quotas["***k2"]["requests_remaining"])
+        self.assertIn("openai:***k1", ModelDispatcher.get_key_quotas())
+
+    def test_all_keys_over_quota_raise_quota_reserved(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "model", quota_limits={"daily_requests": 1})
+
+        with patch.object(model, "_create_chat_completion", return_value=fake_response(1)) as create:
+            model.send_message([], MESSAGE_INFO)
+            with self.assertRaises(ResponseError) as context:
+                model.send_message([], MESSAGE_INFO)
+
+        self.assertEqual(1, create.call_count)
+        self.assertIn("API_KEY_QUOTA_RESERVED", str(context.exception))
+        self.assertEqual([], model.key_pool.exhausted_keys())
+
+    def test_quota_reserve_skips_model_without_removing_it(self):
+        clock = [1_000_000.0]
+        quota = KeyQuota(daily_requests=1, clock=lambda: clock[0])
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "limited", quota_limits={"daily_requests": 1})
+        model.key_pool.quota_check = lambda key: quota.has_quota()
+        backup = BaseOpenai("openai", "http://127.0.0.1:10/v1", ["k2"], "backup")
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [
+                {"sdk_name": "openai", "model_name": "limited", "model": model},
+                {"sdk_name": "openai", "model_name": "backup", "model": backup},
+            ]
+        }
+
+        with patch.object(model, "_create_chat_completion", return_value=fake_response(1)) as limited_create, \
+                patch.object(backup, "_create_chat_completion", return_value=fake_response(1)) as backup_create:
+            quota.record_request()
+            dispatcher.execute_with_group(MESSAGE_INFO, "group")
+            self.assertEqual(0, limited_create.call_count)
+            self.assertEqual(1, backup_create.call_count)
+            self.assertEqual(["limited", "backup"], [m["model_name"] for m in dispatcher.model_groups["group"]])
+            self.assertEqual([], dispatcher.exhausted_models)
+
+            # 跨天后额度恢复，模型重新被使用
+            clock[0] += 86400
+            dispatcher.execute_with_group(MESSAGE_INFO, "group")
+            self.assertEqual(1, limited_create.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import sys
+import threading
+import unittest
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.metrics import MetricsRegistry, start_metrics_server
+
+
+class FakeModel:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def send_message(self, messages, message_info):
+        if self.fail:
+            raise Exception("boom")
+        return '{"ok": true}', 7
+
+
+def _dispatcher(*models):
+    dispatcher = ModelDispatcher()
+    dispatcher.metrics = MetricsRegistry()
+    dispatcher.model_groups = {
+        "group": [
+            {"sdk_name": "openai", "model_name": f"model-{i}", "model": model} for i, model in enumerate(models)
+        ]
+    }
+    return dispatcher
+
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    def test_counters_from_many_threads_are_merged(self):
+        registry = MetricsRegistry()
+
+        def work():
+            for _ in range(1000):
+                registry.inc("llmakits_requests_total", group="g", model="m", status="success")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8000, registry.get_value("llmakits_requests_total", group="g"))
+
+    def test_shards_of_finished_threads_are_folded(self):
+        registry = MetricsRegistry(latency_buckets=(1,))
+
+        def work():
+            registry.inc("llmakits_requests_total", group="g", status="success")
+            registry.observe("llmakits_request_latency_seconds", 0.5, group="g")
+
+        # 模拟 execute_batch 每次调用都新建线程池
+        for _ in range(20):
+            threads = [threading.Thread(target=work) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            registry.snapshot()
+
+        self.assertEqual([], registry._shards)
+        self.assertEqual(80, registry.get_value("llmakits_requests_total", group="g"))
+        self.assertEqual({"count": 80, "sum": 40.0}, registry.snapshot()["llmakits_request_latency_seconds"]['{group="g"}'])
+
+        registry.reset()
+        self.assertEqual({}, registry.snapshot())
+
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = MetricsRegistry(latency_buckets=(0.5, 1))
+        registry.observe("llmakits_request_latency_seconds", 0.2, group="g", model="m")
+        registry.observe("llmakits_request_latency_seconds", 0.7, group="g", model="m")
+        registry.observe("llmakits_request_latency_seconds", 3, group="g", model="m")
+
+        text = registry.render_prometheus()
+
+        self.assertIn("# TYPE llmakits_request_latency_seconds histogram", text)
+        self.assertIn('llmakits_request_latency_seconds_bucket{group="g",model="m",le="0.5"} 1', text)
+        self.assertIn('llmakits_request_latency_seconds_bucket{group="g",model="m",le="1"} 2', text)
+        self.assertIn('llmakits_request_latency_seconds_bucket{group="g",model="m",le="+Inf"} 3', text)
+        self.assertIn('llmakits_request_latency_seconds_count{group="g",model="m"} 3', text)
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.inc("llmakits_errors_total", error_tag='bad "tag"\n')
+
+        self.assertIn('error_tag="bad \\"tag\\"\\n"', registry.render_prometheus())
+
+    def test_http_endpoint_serves_metrics(self):
+        registry = MetricsRegistry()
+        registry.inc("llmakits_hedges_total", group="g")
+        server = start_metrics_server(port=0, registry=registry)
+        try:
+            host, port = server.server_address[:2]
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertIn('llmakits_hedges_total{group="g"} 1', body)
+
+
+class DispatcherMetricsTest(unittest.TestCase):
+    def test_dispatcher_records_requests_tokens_and_errors(self):
+        dispatcher = _dispatcher(FakeModel(fail=True), FakeModel())
+
+        dispatcher.execute_with_group(MESSAGE_INFO, "group")
+        metrics = dispatcher.metrics
+
+        self.assertEqual(1, metrics.get_value("llmakits_requests_total", model="openai:model-0", status="error"))
+        self.assertEqual(1, metrics.get_value("llmakits_requests_total", model="openai:model-1", status="success"))
+        self.assertEqual(7, metrics.get_value("llmakits_tokens_total", group="group"))
+        self.assertEqual(1, metrics.get_value("llmakits_errors_total", model="openai:model-0", error_tag="Exception"))
+        self.assertIn("llmakits_request_latency_seconds_bucket", dispatcher.export_metrics())
+
+    def test_cache_hits_are_counted(self):
+        dispatcher = _dispatcher(FakeModel())
+        dispatcher.enable_response_cache()
+
+        dispatcher.execute_with_group(MESSAGE_INFO, "group")
+        dispatcher.execute_with_group(MESSAGE_INFO, "group")
+
+        self.assertEqual(1, dispatcher.metrics.get_value("llmakits_cache_misses_total", group="group"))
+        self.assertEqual(1, dispatcher.metrics.get_value("llmakits_cache_hits_total", group="group"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.deadline import Deadline, DeadlineExceededError
+from llmakits.utils.rate_limiter import (
+    KeyRateLimiter,
+    TokenBucket,
+    estimate_tokens,
+    normalize_api_keys,
+    reset_rate_limiters,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fake_response(tokens=10):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+        usage=SimpleNamespace(total_tokens=tokens),
+    )
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_requests_are_paced_at_configured_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock=clock)  # 每秒 1 个
+
+        self.assertEqual(0.0, bucket.reserve(1))
+        self.assertAlmostEqual(1.0, bucket.reserve(1))
+        self.assertAlmostEqual(2.0, bucket.reserve(1))
+
+        clock.now += 10
+        self.assertEqual(0.0, bucket.reserve(1))
+
+    def test_adjust_refunds_overestimated_tokens(self):
+        clock = FakeClock()
+        bucket = TokenBucket(6000, clock=clock)  # 每秒 100 个
+
+        self.assertEqual(0.0, bucket.reserve(100))
+        self.assertAlmostEqual(1.0, bucket.reserve(100))
+        bucket.adjust(100)  # 实际只用了预估的一半
+        self.assertAlmostEqual(1.0, bucket.reserve(100))
+
+
+class KeyRateLimiterTest(unittest.TestCase):
+    def test_cancelled_wait_returns_slot_and_tokens(self):
+        limiter = KeyRateLimiter(rpm=60, max_concurrency=1)
+        limiter.acquire().release()  # 用掉桶里的令牌，下一次需要排队约 1 秒
+
+        async def cancelled():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(limiter.acquire_async(), timeout=0.05)
+
+        asyncio.run(cancelled())
+
+        # 并发名额和预占的令牌都已退还：不再卡死，排队时间也没有因被取消的请求而变长
+        self.assertTrue(limiter._concurrency.acquire(blocking=False))
+        limiter._concurrency.release()
+        self.assertLess(limiter.request_bucket.reserve(1), 1.0)
+        self.assertEqual(0, limiter.in_flight)
+
+    def test_image_parts_use_fixed_estimate(self):
+        image = "data:image/png;base64," + "A" * 1_000_000
+        messages = [
+            {"role": "user", "content": [{"type": "text", "text": "hi"}, {"type": "image_url", "image_url": {"url": image}}]}
+        ]
+        dashscope_messages = [{"role": "user", "content": [{"image": image}, {"text": "hi"}]}]
+
+        self.assertLess(estimate_tokens(messages), 2000)
+        self.assertLess(estimate_tokens(dashscope_messages), 2000)
+        self.assertGreater(estimate_tokens(messages), estimate_tokens([{"role": "user", "content": "hi"}]))
+
+
+class KeyConfigTest(unittest.TestCase):
+    def test_api_keys_accept_strings_and_dicts(self):
+        keys, options = normalize_api_keys(["k1", {"key": "k2", "rpm": 30}])
+
+        self.assertEqual(["k1", "k2"], keys)
+        self.assertEqual({"k2": {"rpm": 30}}, options)
+
+
+class BaseOpenaiRateLimitTest(unittest.TestCase):
+    def setUp(self):
+        reset_rate_limiters()
+
+    def tearDown(self):
+        reset_rate_limiters()
+
+    def test_max_concurrency_is_enforced_across_threads(self):
+        model = BaseOpenai(
+            "openai", "http://127.0.0.1:9/v1", [{"key": "k1", "max_concurrency": 2}], "model", rate_limits={"rpm": 6000}
+        )
+        lock = threading.Lock()
+        state = {"in_flight": 0, "peak": 0}
+
+        def create(messages, client=None):
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            time.sleep(0.05)
+            with lock:
+                state["in_flight"] -= 1
+            return fake_response()
+
+        with patch.object(model, "_create_chat_completion", side_effect=create):
+            threads = [threading.Thread(target=model.send_message, args=([], {"user_text": "x", "system_prompt": ""})) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(2, state["peak"])
+        limiter = model._get_rate_limiter("k1")
+        self.assertEqual(6000, limiter.rpm)
+        self.assertEqual(0, limiter.in_flight)
+
+    def test_rate_limit_wait_is_bounded_by_deadline_and_releases_key(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "model", rate_limits={"rpm": 6, "max_concurrency": 1})
+        message_info = {"user_text": "x", "system_prompt": ""}
+        with patch.object(model, "_create_chat_completion", return_value=fake_response()) as create_mock:
+            model.send_message([], message_info)  # 用掉桶里的令牌，下一次需要排队约 10 秒
+
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceededError) as context:
+                model.send_message([], message_info, deadline=Deadline(1))
+            self.assertLess(time.monotonic() - start, 0.5)
+
+        self.assertEqual(1, create_mock.call_count)
+        self.assertEqual("model", context.exception.model_name)
+        self.assertEqual({"k1": 0}, model.key_pool._in_flight)
+        limiter = model._get_rate_limiter("k1")
+        self.assertEqual(0, limiter.in_flight)
+        self.assertTrue(limiter._concurrency.acquire(blocking=False))
+
+    def test_key_without_limits_is_not_throttled(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "model")
+
+        self.assertIsNone(model._get_rate_limiter("k1"))
+        with patch.object(model, "_create_chat_completion", return_value=fake_response(12)):
+            self.assertEqual(("ok", 12), model.send_message([], {"user_text": "x", "system_prompt": ""}))
+
+
+if __name__ == "__main__":
+    unittest.main()
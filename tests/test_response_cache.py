@@ -0,0 +1,104 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.response_cache import ResponseCache, make_cache_key
+
+
+class CountingModel:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+        self.temperature = 0.4
+
+    def send_message(self, messages, message_info):
+        self.calls += 1
+        return self.reply, 9
+
+
+def _model_info(model, name="m"):
+    return {"sdk_name": "openai", "model_name": name, "model": model}
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_cache_key_depends_on_model_message_and_sampling_params(self):
+        model = CountingModel("x")
+        base = make_cache_key(_model_info(model), {"user_text": "a", "system_prompt": "s"})
+
+        self.assertEqual(base, make_cache_key(_model_info(model), {"system_prompt": "s", "user_text": "a", "debug": True}))
+        self.assertNotEqual(base, make_cache_key(_model_info(model, "other"), {"user_text": "a", "system_prompt": "s"}))
+        self.assertNotEqual(base, make_cache_key(_model_info(model), {"user_text": "b", "system_prompt": "s"}))
+        self.assertNotEqual(base, make_cache_key(_model_info(model), {"user_text": "a", "system_prompt": "s"}, ("title",)))
+        model.temperature = 0.9
+        self.assertNotEqual(base, make_cache_key(_model_info(model), {"user_text": "a", "system_prompt": "s"}))
+
+    def test_lru_and_ttl_eviction(self):
+        cache = ResponseCache(max_size=2, ttl=0.05)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")  # 淘汰最久未使用的 b
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(("1", 0), cache.get("a"))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("a"))
+
+    def test_sqlite_tier_is_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cache.db")
+            ResponseCache(sqlite_path=path).put("key", '{"a": 1}', 12)
+
+            other = ResponseCache(sqlite_path=path)
+            self.assertEqual(('{"a": 1}', 12), other.get("key"))
+            self.assertEqual(1, other.stats()["disk_hits"])
+
+
+class DispatcherResponseCacheTest(unittest.TestCase):
+    def test_cache_hit_skips_network_and_still_validates(self):
+        model = CountingModel('{"title": "ok"}')
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {"group": [_model_info(model)]}
+        dispatcher.enable_response_cache()
+        validated = []
+
+        def validate_func(message):
+            validated.append(message)
+            return True, message["title"]
+
+        message_info = {"user_text": "x", "system_prompt": ""}
+        first = dispatcher.execute_with_group(message_info, "group", format_json=True, validate_func=validate_func)
+        second = dispatcher.execute_with_group(message_info, "group", format_json=True, validate_func=validate_func)
+
+        self.assertEqual(("ok", 9), first)
+        self.assertEqual(("ok", 0), second)
+        self.assertEqual(1, model.calls)
+        self.assertEqual(2, len(validated))
+        self.assertEqual({"hits": 1, "misses": 1}, {k: dispatcher.get_response_cache_stats()[k] for k in ("hits", "misses")})
+
+    def test_invalid_responses_are_not_cached(self):
+        model = CountingModel('{"title": ""}')
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {"group": [_model_info(model)]}
+        dispatcher.enable_response_cache()
+
+        for _ in range(2):
+            result = dispatcher.execute_with_group(
+                {"user_text": "x", "system_prompt": ""},
+                "group",
+                format_json=True,
+                validate_func=lambda message: (bool(message["title"]), message),
+                return_detailed=True,
+            )
+            self.assertFalse(result.success)
+
+        self.assertEqual(2, model.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
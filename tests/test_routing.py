@@ -0,0 +1,117 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.model_stats import ModelStatsRegistry
+from llmakits.utils.routing import PowerOfTwoRouting, ScoreRouting, StaticRouting, get_routing_policy
+
+
+class FakeModel:
+    def __init__(self, name, reply=None, error=None):
+        self.name = name
+        self.reply = reply or f'{{"model": "{name}"}}'
+        self.error = error
+        self.calls = 0
+
+    def send_message(self, messages, message_info):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.reply, 1
+
+
+def _models(*names):
+    return [{"sdk_name": "openai", "model_name": name} for name in names]
+
+
+class RoutingPolicyTest(unittest.TestCase):
+    def test_score_routing_prefers_fast_and_reliable_models(self):
+        stats = ModelStatsRegistry()
+        for _ in range(5):
+            stats.get("openai:slow").record_call(5.0, True)
+            stats.get("openai:flaky").record_call(0.5, False)
+            stats.get("openai:fast").record_call(1.0, True)
+
+        order = ScoreRouting().order([0, 1, 2], _models("slow", "flaky", "fast"), stats)
+        self.assertEqual(2, order[0])
+        self.assertEqual([0, 1, 2], sorted(order))
+
+    def test_always_failing_model_ranks_below_slow_healthy_model(self):
+        stats = ModelStatsRegistry()
+        for _ in range(5):
+            stats.get("openai:dead").record_call(0.01, False)
+            stats.get("openai:slow").record_call(5.0, True)
+            stats.get("openai:flaky").record_call(2.0, True)
+        stats.get("openai:flaky").record_call(2.0, False)
+
+        self.assertGreater(stats.get("openai:dead").score(), stats.get("openai:slow").score())
+        order = ScoreRouting().order([0, 1, 2], _models("dead", "slow", "flaky"), stats)
+        self.assertEqual(0, order[-1])
+
+    def test_models_without_samples_are_tried_first(self):
+        stats = ModelStatsRegistry()
+        stats.get("openai:known").record_call(1.0, True)
+        order = ScoreRouting().order([0, 1], _models("known", "new"), stats)
+        self.assertEqual([1, 0], order)
+
+    def test_p2c_keeps_remaining_models_in_config_order(self):
+        stats = ModelStatsRegistry()
+        stats.get("openai:a").record_call(9.0, True)
+        stats.get("openai:b").record_call(1.0, True)
+        stats.get("openai:c").record_call(1.0, True)
+        policy = PowerOfTwoRouting(rng=random.Random(0))
+        for _ in range(20):
+            order = policy.order([0, 1, 2], _models("a", "b", "c"), stats)
+            self.assertEqual([0, 1, 2], sorted(order))
+            self.assertEqual([idx for idx in [0, 1, 2] if idx != order[0]], order[1:])
+            self.assertNotEqual(0, order[0])
+
+    def test_get_routing_policy(self):
+        self.assertIsInstance(get_routing_policy("static"), StaticRouting)
+        self.assertIsInstance(get_routing_policy("p2c"), PowerOfTwoRouting)
+        with self.assertRaises(ValueError):
+            get_routing_policy("unknown")
+
+
+class DispatcherRoutingTest(unittest.TestCase):
+    def _dispatcher(self, *models):
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "group": [{"sdk_name": "openai", "model_name": model.name, "model": model} for model in models]
+        }
+        return dispatcher
+
+    def test_static_order_is_default(self):
+        first, second = FakeModel("first"), FakeModel("second")
+        dispatcher = self._dispatcher(first, second)
+        dispatcher.model_stats.get("openai:first").record_call(30.0, True)
+
+        result, _ = dispatcher.execute_with_group({"user_text": "x"}, "group", format_json=True)
+
+        self.assertEqual({"model": "first"}, result)
+        self.assertEqual(0, second.calls)
+
+    def test_score_routing_reorders_and_falls_back_in_routed_order(self):
+        slow, broken, fast = FakeModel("slow"), FakeModel("broken", reply="not json"), FakeModel("fast")
+        dispatcher = self._dispatcher(slow, broken, fast)
+        dispatcher.set_routing_policy("group", "score")
+        dispatcher.model_stats.get("openai:slow").record_call(20.0, True)
+        dispatcher.model_stats.get("openai:broken").record_call(0.1, True)
+        dispatcher.model_stats.get("openai:fast").record_call(1.0, True)
+
+        result = dispatcher.execute_with_group({"user_text": "x"}, "group", format_json=True, return_detailed=False)
+
+        self.assertEqual({"model": "fast"}, result[0])
+        self.assertEqual(1, broken.calls)
+        self.assertEqual(0, slow.calls)
+        stats = dispatcher.get_model_stats()
+        self.assertLess(stats["openai:broken"]["validation_pass_rate"], 1.0)
+        self.assertEqual(2, stats["openai:fast"]["calls"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.circuit_breaker import CircuitBreakerRegistry
+from llmakits.utils.retry_handler import RetryHandler
+from llmakits.utils.retry_state import get_retry_state
+from llmakits.utils.shared_state import (
+    FORCE_BASE64_DOMAINS,
+    MemoryStateBackend,
+    SQLiteStateBackend,
+    get_shared_state,
+)
+
+
+def _clear_retry_state():
+    retry_state = get_retry_state()
+    retry_state["force_base64_domains"].clear()
+    retry_state["domain_failure_stats"].clear()
+    retry_state["last_failed_domain"] = ""
+
+
+class SQLiteStateBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "shared.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_values_are_visible_to_other_connections_and_expire(self):
+        now = [1000.0]
+        writer = SQLiteStateBackend(self.path, clock=lambda: now[0])
+        reader = SQLiteStateBackend(self.path, clock=lambda: now[0])
+
+        writer.set("ns", "a", {"x": 1}, ttl=10)
+        writer.set("ns", "b", True)
+        self.assertEqual({"x": 1}, reader.get("ns", "a"))
+        self.assertEqual({"a": {"x": 1}, "b": True}, reader.items("ns"))
+
+        now[0] += 11
+        self.assertIsNone(reader.get("ns", "a"))
+        reader.delete("ns", "b")
+        self.assertEqual({}, writer.items("ns"))
+
+    def test_cached_items_reads_backend_at_most_once_per_max_age(self):
+        writer = SQLiteStateBackend(self.path)
+        reader = SQLiteStateBackend(self.path)
+        writer.set("ns", "a", True)
+        self.assertEqual({"a": True}, reader.cached_items("ns", max_age=0.2))
+
+        writer.set("ns", "b", True)
+        with patch.object(reader, "items", side_effect=AssertionError("cached")):
+            self.assertEqual({"a": True}, reader.cached_items("ns", max_age=0.2))
+        time.sleep(0.25)
+        self.assertEqual({"a": True, "b": True}, reader.cached_items("ns", max_age=0.2))
+
+        # 本进程的写入立即生效
+        reader.delete("ns", "a")
+        self.assertEqual({"b": True}, reader.cached_items("ns", max_age=60))
+
+    def test_incr_is_atomic_across_connections(self):
+        backends = [SQLiteStateBackend(self.path) for _ in range(4)]
+
+        def work(backend):
+            for _ in range(25):
+                backend.incr("ns", "counter")
+
+        threads = [threading.Thread(target=work, args=(backend,)) for backend in backends]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(100, backends[0].get("ns", "counter"))
+
+
+class SharedDispatcherStateTest(unittest.TestCase):
+    def setUp(self):
+        ModelDispatcher.enable_shared_state("memory")
+        _clear_retry_state()
+
+    def tearDown(self):
+        ModelDispatcher.disable_shared_state()
+        _clear_retry_state()
+
+    def test_key_exhaustion_is_seen_by_other_workers(self):
+        worker_a = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1", "k2"], "gpt")
+        worker_b = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1", "k2"], "gpt")
+
+        worker_a.switch_api_key("k1")
+
+        self.assertEqual(["k2", "k2", "k2"], [worker_b.key_pool.select() for _ in range(3)])
+        self.assertEqual([], worker_b.key_pool.exhausted_keys())
+
+    def test_circuit_trip_is_shared(self):
+        worker_a = CircuitBreakerRegistry(failure_threshold=1, cooldown=60)
+        worker_b = CircuitBreakerRegistry(failure_threshold=1, cooldown=60)
+        self.assertTrue(worker_b.get("openai:gpt").is_available())
+
+        self.assertTrue(worker_a.get("openai:gpt").record_failure())
+
+        self.assertFalse(worker_b.get("openai:gpt").is_available())
+        self.assertEqual("open", worker_b.get("openai:gpt").state)
+        self.assertTrue(worker_b.get("openai:other").is_available())
+
+    def test_forced_domains_are_shared(self):
+        handler = RetryHandler("openai", "gpt")
+        get_shared_state().set(FORCE_BASE64_DOMAINS, "img.example.com", True)
+
+        matched = handler._get_force_domains_from_img_list(["https://img.example.com/a.jpg", "https://b.com/b.jpg"])
+
+        self.assertEqual({"img.example.com"}, matched)
+
+    def test_domain_failures_are_counted_across_workers(self):
+        workers = [RetryHandler("openai", "gpt") for _ in range(5)]
+        for handler in workers:
+            # 模拟各进程各自的重试状态：每个进程只失败一次，达不到本地阈值
+            _clear_retry_state()
+            handler._record_domain_failure("img.example.com")
+
+        self.assertIn("img.example.com", get_shared_state().items(FORCE_BASE64_DOMAINS))
+
+    def test_backend_instance_and_invalid_value(self):
+        backend = MemoryStateBackend()
+        self.assertIs(backend, ModelDispatcher.enable_shared_state(backend))
+        with self.assertRaises(ValueError):
+            ModelDispatcher.enable_shared_state(123)  # type: ignore[arg-type]
+
+
+if __name__ == "__main__":
+    unittest.main()
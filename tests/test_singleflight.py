@@ -0,0 +1,179 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.async_dispatcher import AsyncModelDispatcher
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.utils.singleflight import SingleFlight
+
+
+class SlowModel:
+    def __init__(self, delay=0.1, reply='{"title": "ok"}'):
+        self.delay = delay
+        self.reply = reply
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send_message(self, messages, message_info):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.reply, 5
+
+
+class SlowAsyncModel(SlowModel):
+    async def send_message_async(self, messages, message_info):
+        with self._lock:
+            self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.reply, 5
+
+
+class SlowStreamModel(SlowModel):
+    """接受 stream_validator / stream_json_fields 参数，记录每次调用使用的参数"""
+
+    def __init__(self, delay=0.1, reply='{"title": "ok"}'):
+        super().__init__(delay, reply)
+        self.kwargs = []
+
+    def send_message(self, messages, message_info, **kwargs):
+        with self._lock:
+            self.kwargs.append(kwargs)
+        return super().send_message(messages, message_info)
+
+
+def _dispatcher(cls, model):
+    dispatcher = cls()
+    dispatcher.model_groups = {"group": [{"sdk_name": "openai", "model_name": "m", "model": model}]}
+    dispatcher.enable_request_coalescing()
+    return dispatcher
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_join_marks_only_first_caller_as_leader(self):
+        flight = SingleFlight()
+        future, leader = flight.join("k")
+        same_future, follower = flight.join("k")
+
+        self.assertTrue(leader)
+        self.assertFalse(follower)
+        self.assertIs(future, same_future)
+        flight.complete("k", future, result=1)
+        self.assertEqual(1, same_future.result())
+        self.assertTrue(flight.join("k")[1])
+
+    def test_identical_concurrent_calls_share_one_request_across_threads(self):
+        model = SlowModel()
+        dispatcher = _dispatcher(ModelDispatcher, model)
+        message_info = {"user_text": "same", "system_prompt": ""}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(
+                    lambda _: dispatcher.execute_with_group(message_info, "group", format_json=True), range(8)
+                )
+            )
+
+        self.assertEqual(1, model.calls)
+        self.assertEqual(1, sum(1 for _, tokens in results if tokens == 5))
+        self.assertTrue(all(result == {"title": "ok"} for result, _ in results))
+        self.assertEqual(7, dispatcher.singleflight.stats()["coalesced"])
+
+    def test_different_messages_are_not_coalesced(self):
+        model = SlowModel(delay=0.05)
+        dispatcher = _dispatcher(ModelDispatcher, model)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(
+                executor.map(
+                    lambda i: dispatcher.execute_with_group({"user_text": str(i), "system_prompt": ""}, "group"),
+                    range(4),
+                )
+            )
+
+        self.assertEqual(4, model.calls)
+
+    def test_calls_with_different_stream_options_are_not_coalesced(self):
+        model = SlowStreamModel()
+        dispatcher = _dispatcher(ModelDispatcher, model)
+        message_info = {"user_text": "same", "system_prompt": ""}
+        variants = [
+            {},
+            {"stream_validator": lambda text: True},
+            {"stream_validator": lambda text: True},
+            {"stream_json": "title"},
+        ]
+
+        with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+            list(
+                executor.map(
+                    lambda options: dispatcher.execute_with_group(message_info, "group", **options), variants
+                )
+            )
+
+        self.assertEqual(4, model.calls)
+        self.assertEqual(0, dispatcher.singleflight.stats()["coalesced"])
+
+    def test_asyncio_tasks_share_one_request(self):
+        model = SlowAsyncModel()
+        dispatcher = _dispatcher(AsyncModelDispatcher, model)
+        message_info = {"user_text": "same", "system_prompt": ""}
+
+        async def run():
+            return await asyncio.gather(
+                *(dispatcher.execute_with_group_async(message_info, "group", format_json=True) for _ in range(5))
+            )
+
+        results = asyncio.run(run())
+
+        self.assertEqual(1, model.calls)
+        self.assertTrue(all(result == {"title": "ok"} for result, _ in results))
+
+    def test_follower_timeout_does_not_cancel_the_shared_request(self):
+        flight = SingleFlight()
+        future, _ = flight.join("k")
+        flight.join("k")
+
+        async def follower():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(flight.wait_async(future), timeout=0.01)
+
+        asyncio.run(follower())
+        self.assertFalse(future.cancelled())
+        flight.complete("k", future, result=1)
+        self.assertEqual(1, future.result())
+        flight.complete("k", future, error=RuntimeError("late"))  # 重复结束不抛出 InvalidStateError
+
+    def test_async_follower_deadline_leaves_leader_result_intact(self):
+        model = SlowAsyncModel(delay=0.2)
+        dispatcher = _dispatcher(AsyncModelDispatcher, model)
+        message_info = {"user_text": "same", "system_prompt": ""}
+
+        async def follower():
+            await asyncio.sleep(0.01)
+            return await dispatcher.execute_with_group_async(message_info, "group", timeout_budget=0.05)
+
+        async def run():
+            return await asyncio.gather(
+                dispatcher.execute_with_group_async(message_info, "group", format_json=True),
+                follower(),
+                dispatcher.execute_with_group_async(message_info, "group", format_json=True),
+                return_exceptions=True,
+            )
+
+        leader, timed_out, other = asyncio.run(run())
+
+        self.assertEqual(({"title": "ok"}, 5), leader)
+        self.assertIsInstance(timed_out, Exception)
+        self.assertEqual({"title": "ok"}, other[0])
+        self.assertEqual(1, model.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
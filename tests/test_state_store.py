@@ -0,0 +1,137 @@
+import gc
+import json
+import os
+import sys
+import tempfile
+import unittest
+import weakref
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits import dispatcher as dispatcher_module
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.retry_state import get_retry_state
+from llmakits.utils.state_store import StateStore
+
+
+def _clear_retry_state():
+    retry_state = get_retry_state()
+    retry_state["force_base64_domains"].clear()
+    retry_state["domain_failure_stats"].clear()
+
+
+def _dispatcher():
+    model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["secret-key-1", "secret-key-2"], "gpt")
+    other = BaseOpenai("zhipu", "http://127.0.0.1:9/v1", ["secret-key-3"], "glm")
+    dispatcher = ModelDispatcher()
+    dispatcher.model_groups = {
+        "group": [
+            {"sdk_name": "openai", "model_name": "gpt", "model": model},
+            {"sdk_name": "zhipu", "model_name": "glm", "model": other},
+        ]
+    }
+    return dispatcher, model
+
+
+class StateStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_entries_expire_on_next_day_and_keep_first_seen_time(self):
+        now = [1_700_000_000.0]
+        path = os.path.join(self.tmpdir.name, "state.json")
+        store = StateStore(path, clock=lambda: now[0])
+        store.save({"exhausted_models": {"openai_gpt": True}})
+
+        now[0] += 60
+        store.save({"exhausted_models": {"openai_gpt": True}, "force_base64_domains": {"a.com": True}})
+        with open(path, encoding="utf-8") as f:
+            sections = json.load(f)["sections"]
+        self.assertEqual(1_700_000_000.0, sections["exhausted_models"]["openai_gpt"]["ts"])
+
+        self.assertEqual({"openai_gpt": True}, StateStore(path, clock=lambda: now[0]).load()["exhausted_models"])
+        now[0] += 24 * 3600
+        self.assertEqual({}, StateStore(path, clock=lambda: now[0]).load()["exhausted_models"])
+
+    def test_sqlite_backend_round_trip(self):
+        path = os.path.join(self.tmpdir.name, "state.db")
+        StateStore(path).save({"domain_failure_stats": {"a.com": {"consecutive": 2, "cumulative": 5}}})
+
+        state = StateStore(path).load()
+
+        self.assertEqual({"consecutive": 2, "cumulative": 5}, state["domain_failure_stats"]["a.com"])
+
+
+class DispatcherStatePersistenceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "state.json")
+        _clear_retry_state()
+
+    def tearDown(self):
+        _clear_retry_state()
+        self.tmpdir.cleanup()
+
+    def test_state_survives_restart(self):
+        dispatcher, model = _dispatcher()
+        model.switch_api_key("secret-key-1")
+        dispatcher.exhausted_models.append("zhipu_glm")
+        dispatcher._retry_fail_count["openai_gpt"] = 2
+        get_retry_state()["force_base64_domains"].add("img.example.com")
+        get_retry_state()["domain_failure_stats"]["img.example.com"] = {"consecutive": 3, "cumulative": 3}
+        dispatcher.save_state(self.path)
+
+        with open(self.path, encoding="utf-8") as f:
+            self.assertNotIn("secret-key-1", f.read())
+
+        _clear_retry_state()
+        restarted, restarted_model = _dispatcher()
+        restored = restarted.restore_state(self.path)
+
+        self.assertEqual(1, restored["exhausted_keys"])
+        self.assertEqual(["secret-key-1"], restarted_model.key_pool.exhausted_keys())
+        self.assertEqual("secret-key-2", restarted_model.api_key)
+        self.assertEqual(["openai"], [model_info["sdk_name"] for model_info in restarted.model_groups["group"]])
+        self.assertEqual(["zhipu_glm"], restarted.exhausted_models)
+        self.assertEqual(2, restarted._retry_fail_count["openai_gpt"])
+        self.assertIn("img.example.com", get_retry_state()["force_base64_domains"])
+        self.assertEqual(3, get_retry_state()["domain_failure_stats"]["img.example.com"]["cumulative"])
+
+    def test_enable_state_persistence_restores_immediately(self):
+        dispatcher, model = _dispatcher()
+        model.switch_api_key("secret-key-2")
+        dispatcher.save_state(self.path)
+
+        restarted, restarted_model = _dispatcher()
+        restored = restarted.enable_state_persistence(self.path)
+        restarted.disable_state_persistence()
+
+        self.assertEqual(1, restored["exhausted_keys"])
+        self.assertEqual(["secret-key-2"], restarted_model.key_pool.exhausted_keys())
+
+    def test_exit_hook_saves_each_dispatcher_once_without_keeping_it_alive(self):
+        dispatcher, _ = _dispatcher()
+        dispatcher.enable_state_persistence(self.path)
+        dispatcher.enable_state_persistence(self.path)
+        other, _ = _dispatcher()
+        other.enable_state_persistence(self.path)
+        other.disable_state_persistence()
+
+        with patch.object(ModelDispatcher, "save_state") as save_state:
+            dispatcher_module._save_states_at_exit()
+        self.assertEqual(1, save_state.call_count)
+
+        dispatcher_ref = weakref.ref(dispatcher)
+        del dispatcher
+        gc.collect()
+        self.assertIsNone(dispatcher_ref())
+        self.assertEqual(0, len(dispatcher_module._PERSISTENT_DISPATCHERS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.stream_json import JsonObjectScanner, normalize_json_fields
+from llmakits.utils.stream_validator import reset_stream_stats
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class FakeStream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if self.closed:
+                return
+            self.consumed += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    def close(self):
+        self.closed = True
+
+
+def feed_all(scanner, pieces):
+    return any(scanner.feed(piece) for piece in pieces)
+
+
+class JsonObjectScannerTest(unittest.TestCase):
+    def test_object_split_across_chunks_with_braces_in_strings(self):
+        scanner = JsonObjectScanner(["title"])
+        pieces = ['好的：{"ti', 'tle": "a } \\" {b", "tags": [1, ', '{"x": 2}]', "}\n以上是结果 {"]
+
+        self.assertTrue(feed_all(scanner, pieces))
+        self.assertEqual('{"title": "a } \\" {b", "tags": [1, {"x": 2}]}', scanner.text)
+        self.assertEqual({"x": 2}, scanner.value["tags"][1])
+
+    def test_think_section_and_objects_without_fields_are_skipped(self):
+        scanner = JsonObjectScanner(["values"])
+        pieces = ["<thi", 'nk>{"values": "draft"}</th', 'ink>{"note": 1} {not json} ', '{"values": ["red"]}']
+
+        self.assertTrue(feed_all(scanner, pieces))
+        self.assertEqual(["red"], scanner.value["values"])
+
+    def test_answer_wrapper_and_incomplete_object(self):
+        scanner = JsonObjectScanner(["title"])
+        self.assertTrue(scanner.feed('{"answer": {"title": "t"}}'))
+        self.assertFalse(JsonObjectScanner().feed('{"title": "never closed'))
+
+    def test_normalize_json_fields(self):
+        self.assertIsNone(normalize_json_fields(False))
+        self.assertEqual((), normalize_json_fields(True))
+        self.assertEqual(("title",), normalize_json_fields("title"))
+        self.assertEqual(("a", "b"), normalize_json_fields(["a", "b"]))
+
+
+class StreamJsonEarlyStopTest(unittest.TestCase):
+    def setUp(self):
+        reset_stream_stats()
+
+    def tearDown(self):
+        reset_stream_stats()
+
+    def test_dispatcher_stops_reading_once_json_is_complete(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt", stream=True)
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {"title": [{"sdk_name": "openai", "model_name": "gpt", "model": model}]}
+        stream = FakeStream(['```json\n{"title": "Red', ' Shoes"}\n```', "\n说明："] + ["trailing noise "] * 100)
+
+        with patch.object(model, "_create_chat_completion", return_value=stream):
+            result, _ = dispatcher.execute_with_group(MESSAGE_INFO, "title", format_json=True, stream_json=["title"])
+
+        self.assertEqual({"title": "Red Shoes"}, result)
+        self.assertTrue(stream.closed)
+        self.assertEqual(2, stream.consumed)
+        self.assertEqual(1, dispatcher.get_stream_abort_stats()["openai:gpt"]["early_stops"])
+
+    def test_stream_is_read_fully_when_disabled_or_no_match(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt", stream=True)
+        pieces = ['{"title": "a"}', " tail"]
+
+        with patch.object(model, "_create_chat_completion", return_value=FakeStream(pieces)):
+            self.assertEqual(('{"title": "a"} tail', 0), model.send_message([], MESSAGE_INFO))
+        with patch.object(model, "_create_chat_completion", return_value=FakeStream(pieces)):
+            result = model.send_message([], MESSAGE_INFO, stream_json_fields=("values",))
+        self.assertEqual('{"title": "a"} tail', result[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.metrics import get_metrics_registry
+from llmakits.utils.stream_timing import StreamAccumulator
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+def content_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+
+def usage_chunk(prompt_tokens, completion_tokens):
+    usage = SimpleNamespace(
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens
+    )
+    return SimpleNamespace(choices=[], usage=usage)
+
+
+class StreamAccumulatorTest(unittest.TestCase):
+    def test_text_and_timing(self):
+        now = [10.0]
+        stream = StreamAccumulator(start_time=9.0, clock=lambda: now[0])
+        for delay, piece in ((1.0, "ab"), (0.5, "cd"), (1.5, "ef")):
+            now[0] += delay
+            stream.add(piece)
+            self.assertEqual(stream.length, len(stream.text()))
+        self.assertEqual("abcdef", stream.text())
+        self.assertEqual(["abcdef"], stream.parts)
+
+        timing = stream.timing(completion_tokens=40)
+        self.assertEqual(2.0, timing.ttft)
+        self.assertEqual(1.5, timing.max_chunk_gap)
+        self.assertEqual(1.0, timing.avg_chunk_gap)
+        self.assertEqual(20.0, timing.tokens_per_second)
+        self.assertTrue(timing.usage_reported)
+        self.assertEqual(3, stream.timing().output_tokens)  # 没有 usage 时按字符估算
+
+    def test_no_content(self):
+        timing = StreamAccumulator(start_time=0.0, clock=lambda: 2.0).timing()
+        self.assertIsNone(timing.ttft)
+        self.assertEqual(2.0, timing.duration)
+
+
+class StreamUsageTest(unittest.TestCase):
+    def test_stream_options_requested_only_where_supported(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt", stream=True)
+        self.assertEqual({"stream_options": {"include_usage": True}}, model._stream_options())
+        self.assertEqual({}, BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt")._stream_options())
+        self.assertEqual(
+            {}, BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt", stream=True, stream_real=True)._stream_options()
+        )
+        self.assertEqual(
+            {}, BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "gpt", stream=True, stream_usage=False)._stream_options()
+        )
+        # 不在已知支持列表中的平台需要显式开启
+        self.assertEqual({}, BaseOpenai("modelscope", "http://127.0.0.1:9/v1", ["k1"], "m", stream=True)._stream_options())
+        self.assertEqual(
+            {"stream_options": {"include_usage": True}},
+            BaseOpenai("modelscope", "http://127.0.0.1:9/v1", ["k1"], "m", stream=True, stream_usage=True)._stream_options(),
+        )
+
+    def test_stream_usage_and_timing_reach_execution_result_and_metrics(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], "timing-gpt", stream=True)
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {"g": [{"sdk_name": "openai", "model_name": "timing-gpt", "model": model}]}
+        chunks = [content_chunk("hello "), content_chunk("world"), usage_chunk(7, 5)]
+
+        with patch.object(model, "_create_chat_completion", return_value=iter(chunks)):
+            result = dispatcher.execute_with_group(MESSAGE_INFO, "g", return_detailed=True)
+
+        self.assertEqual("hello world", result.return_message)
+        self.assertEqual(12, result.total_tokens)
+        self.assertEqual(5, result.total_tokens.completion_tokens)
+        self.assertEqual(2, result.stream_timing.chunks)
+        self.assertEqual(5, result.stream_timing.output_tokens)
+        self.assertIsNotNone(result.stream_timing.ttft)
+        metrics = get_metrics_registry()
+        ttft_series = metrics.snapshot()["llmakits_stream_ttft_seconds"]
+        self.assertTrue(any("timing-gpt" in labels for labels in ttft_series))
+        self.assertEqual(12, metrics.get_value("llmakits_tokens_total", model="openai:timing-gpt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
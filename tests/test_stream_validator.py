@@ -0,0 +1,117 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.e_commerce.validators import allowed_tags_stream_check, chinese_stream_check
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.stream_validator import (
+    StreamAbortedError,
+    StreamValidator,
+    partial_json_string,
+    reset_stream_stats,
+    visible_text,
+)
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class FakeStream:
+    """按块产出 delta 的流式响应，记录已读取的块数和是否被关闭"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if self.closed:
+                return
+            self.consumed += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    def close(self):
+        self.closed = True
+
+
+def stream_model(model_name):
+    return BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1"], model_name, stream=True)
+
+
+class StreamValidatorHelpersTest(unittest.TestCase):
+    def test_partial_json_string_and_visible_text(self):
+        self.assertEqual("<p>ab", partial_json_string('{"html": "<p>ab', "html"))
+        self.assertEqual('a\\"b', partial_json_string('{"html":"a\\"b", "x": 1}', "html"))
+        self.assertEqual("", partial_json_string('{"title"', "title"))
+        self.assertEqual("", visible_text("<think>思考中"))
+        self.assertEqual("ok", visible_text("<think>思考</think>ok"))
+
+    def test_checks_are_throttled_and_report_reason(self):
+        validator = StreamValidator(allowed_tags_stream_check({"p"}), check_chars=10)
+        self.assertFalse(validator.should_check(0, 9))
+        self.assertTrue(validator.should_check(0, 10))
+        self.assertIsNone(validator.check("<p>ok</p>"))
+        self.assertIn("div", validator.check("<p>ok</p><div>"))
+
+
+class StreamAbortTest(unittest.TestCase):
+    def setUp(self):
+        reset_stream_stats()
+
+    def tearDown(self):
+        reset_stream_stats()
+
+    def test_invalid_stream_is_closed_early_without_retry(self):
+        model = stream_model("gpt")
+        stream = FakeStream(['{"html": "<p>', "中文" * 20, "</p>"] + ["<p>more</p>"] * 50 + ['"}'])
+        validator = StreamValidator(chinese_stream_check(field="html"), check_chars=1)
+
+        with patch.object(model, "_create_chat_completion", return_value=stream) as create:
+            with self.assertRaises(StreamAbortedError) as context:
+                model.send_message([], MESSAGE_INFO, stream_validator=validator)
+
+        self.assertEqual(1, create.call_count)
+        self.assertTrue(stream.closed)
+        self.assertEqual(2, stream.consumed)
+        self.assertIn("中文字符数量", context.exception.reason)
+
+    def test_dispatcher_fails_over_and_measures_savings(self):
+        bad, good = stream_model("bad"), stream_model("good")
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "html": [
+                {"sdk_name": "openai", "model_name": "bad", "model": bad},
+                {"sdk_name": "openai", "model_name": "good", "model": good},
+            ]
+        }
+        long_html = ['{"html": "<p>'] + ["text " * 10] * 40 + ['</p>"}']
+        with patch.object(bad, "_create_chat_completion", return_value=FakeStream(long_html)):
+            bad.send_message([], MESSAGE_INFO)  # 完整接收一次，作为估算节省量的基准
+
+        chinese_html = ['{"html": "<p>', "中文" * 5] + ["text " * 10] * 40 + ['</p>"}']
+        with patch.object(bad, "_create_chat_completion", return_value=FakeStream(chinese_html)), patch.object(
+            good, "_create_chat_completion", return_value=FakeStream(long_html)
+        ):
+            result, _ = dispatcher.execute_with_group(
+                MESSAGE_INFO,
+                "html",
+                format_json=True,
+                stream_validator=chinese_stream_check(max_count=5, field="html"),
+            )
+
+        self.assertTrue(result["html"].startswith("<p>text"))
+        stats = dispatcher.get_stream_abort_stats()["openai:bad"]
+        self.assertEqual(1, stats["aborts"])
+        self.assertGreater(stats["saved_tokens"], 0)
+        self.assertEqual(1.0, dispatcher.get_model_stats()["openai:good"]["validation_pass_rate"])
+        self.assertEqual(0.0, dispatcher.get_model_stats()["openai:bad"]["validation_pass_rate"])
+        self.assertEqual("closed", dispatcher.circuit_breakers.get("openai:bad").state)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import io
+import os
+import sys
+import random
+import threading
+import unittest
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.llm_client import BaseOpenai
+from llmakits.utils.event_log import flush_event_log
+from llmakits.utils.image_cache import ImageBase64Cache
+from llmakits.utils.retry_handler import RetryHandler
+from llmakits.utils.retry_state import get_retry_state
+from llmakits.utils.normalize_error import ResponseError
+
+THREADS = 32
+
+
+def run_concurrently(func, calls):
+    # 使用 Barrier 让所有线程尽量同时开始，放大竞争窗口
+    barrier = threading.Barrier(THREADS)
+
+    def worker(worker_id):
+        barrier.wait()
+        for call_id in range(calls):
+            func(worker_id, call_id)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(worker, range(THREADS)))
+
+
+class InvalidModel:
+    def send_message(self, messages, message_info):
+        return "invalid", 0
+
+
+class ExhaustedModel:
+    def send_message(self, messages, message_info):
+        error = ResponseError("openai", "exhausted", exception=Exception("API_KEY_EXHAUSTED"), error_tag="")
+        error.skip_report = True
+        raise error
+
+
+class ThreadSafetyStressTest(unittest.TestCase):
+    def setUp(self):
+        retry_state = get_retry_state()
+        retry_state["force_base64_domains"].clear()
+        retry_state["domain_failure_stats"].clear()
+        retry_state["last_failed_domain"] = ""
+
+    def test_switch_count_is_exact_under_contention(self):
+        dispatcher = ModelDispatcher()
+        llm_models = [
+            {"sdk_name": "openai", "model_name": "first", "model": InvalidModel()},
+            {"sdk_name": "openai", "model_name": "second", "model": InvalidModel()},
+        ]
+        calls = 50
+
+        def call(worker_id, call_id):
+            dispatcher.execute_task(
+                {"user_text": "x", "system_prompt": ""},
+                llm_models,
+                validate_func=lambda message: (False, None),
+                return_detailed=True,
+            )
+
+        with redirect_stdout(io.StringIO()):
+            run_concurrently(call, calls)
+
+        self.assertEqual(THREADS * calls * 2, dispatcher.model_switch_count)
+
+    def test_exhausted_model_is_removed_once(self):
+        dispatcher = ModelDispatcher()
+        dispatcher.model_groups = {
+            "a": [
+                {"sdk_name": "openai", "model_name": "exhausted", "model": ExhaustedModel()},
+                {"sdk_name": "openai", "model_name": "ok", "model": InvalidModel()},
+            ],
+            "b": [{"sdk_name": "openai", "model_name": "exhausted", "model": ExhaustedModel()}],
+        }
+        llm_models = list(dispatcher.model_groups["a"])
+
+        def call(worker_id, call_id):
+            dispatcher.execute_task({"user_text": "x", "system_prompt": ""}, llm_models, return_detailed=True)
+
+        with redirect_stdout(io.StringIO()):
+            with patch.object(dispatcher.logger, "disabled", True):
+                run_concurrently(call, 5)
+
+        self.assertEqual(["openai_exhausted"], dispatcher.exhausted_models)
+        self.assertEqual(["ok"], [model["model_name"] for model in dispatcher.model_groups["a"]])
+        self.assertEqual([], dispatcher.model_groups["b"])
+
+    def test_concurrent_key_switch_marks_failed_key_once(self):
+        model = BaseOpenai("openai", "http://127.0.0.1:9/v1", ["k1", "k2", "k3"], "model")
+        output = io.StringIO()
+
+        with redirect_stdout(output):
+            run_concurrently(lambda worker_id, call_id: model.switch_api_key("k1"), 3)
+
+        self.assertEqual(["k1"], model.key_pool.exhausted_keys())
+        self.assertEqual(["k2", "k3"], model.key_pool.available_keys())
+        self.assertEqual(["k1", "k2", "k3"], model.api_keys)
+        self.assertEqual("k2", model.api_key)
+        flush_event_log()
+        self.assertEqual(1, output.getvalue().count("标记已用完的密钥"))
+
+    def test_image_cache_survives_concurrent_lru_updates(self):
+        cache = ImageBase64Cache(max_size=8)
+        urls = [f"https://example.com/{i}.jpg" for i in range(32)]
+        errors = []
+
+        def call(worker_id, call_id):
+            rng = random.Random(worker_id * 1000 + call_id)
+            url = rng.choice(urls)
+            try:
+                operation = rng.randrange(6)
+                if operation == 0:
+                    cache.put(url, "/9j/valid")
+                elif operation == 1:
+                    cache.get(url)
+                elif operation == 2:
+                    cache.mark_failed(url, "404")
+                elif operation == 3:
+                    cache.get_failed_reason(url)
+                elif operation == 4:
+                    cache.put_group_result([url], ["data:image/jpeg;base64,/9j/valid"], [], False)
+                else:
+                    cache.get_group_result([url])
+            except Exception as e:  # pragma: no cover - 失败时记录异常
+                errors.append(e)
+
+        run_concurrently(call, 300)
+
+        self.assertEqual([], errors)
+        self.assertLessEqual(cache.size(), 8)
+        self.assertLessEqual(cache.failed_size(), 8)
+        self.assertLessEqual(cache.group_size(), 8)
+
+    def test_domain_failure_stats_are_counted_exactly(self):
+        handler = RetryHandler("modelscope", "model")
+
+        with redirect_stdout(io.StringIO()):
+            run_concurrently(lambda worker_id, call_id: handler._record_domain_failure("example.com"), 20)
+
+        stats = get_retry_state()["domain_failure_stats"]["example.com"]
+        self.assertEqual(THREADS * 20, stats["cumulative"])
+        self.assertIn("example.com", get_retry_state()["force_base64_domains"])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llmakits.dispatcher import ModelDispatcher
+from llmakits.message import builder
+from llmakits.utils import tracing
+from llmakits.utils.tracing import CallbackTracer, set_tracer, start_span
+
+
+class FakeModel:
+    def __init__(self, response):
+        self.response = response
+
+    def send_message(self, messages, message_info):
+        return self.response, 5
+
+
+def _dispatcher(*models):
+    dispatcher = ModelDispatcher()
+    dispatcher.model_groups = {
+        "group": [
+            {"sdk_name": "openai", "model_name": f"model-{i}", "model": model} for i, model in enumerate(models)
+        ]
+    }
+    return dispatcher
+
+
+MESSAGE_INFO = {"user_text": "x", "system_prompt": ""}
+
+
+class TracingTest(unittest.TestCase):
+    def tearDown(self):
+        set_tracer(None)
+
+    def test_disabled_tracing_returns_shared_noop_span(self):
+        self.assertIs(start_span("a"), start_span("b", {"k": 1}))
+        self.assertFalse(start_span("a").is_recording())
+
+    def test_attempt_json_and_validate_spans_are_recorded(self):
+        tracer = CallbackTracer()
+        set_tracer(tracer)
+        dispatcher = _dispatcher(FakeModel("not json"), FakeModel('{"ok": true}'))
+
+        dispatcher.execute_with_group(
+            MESSAGE_INFO, "group", format_json=True, validate_func=lambda value: (True, value)
+        )
+
+        names = [span.name for span in tracer.spans]
+        self.assertEqual(2, names.count("llmakits.attempt"))
+        self.assertEqual(2, names.count("llmakits.convert_to_json"))
+        self.assertEqual(1, names.count("llmakits.validate"))
+
+        attempts = [span for span in tracer.spans if span.name == "llmakits.attempt"]
+        self.assertEqual("openai:model-0", attempts[0].attributes["llmakits.model"])
+        self.assertFalse(attempts[0].attributes["llmakits.success"])
+        self.assertTrue(attempts[1].attributes["llmakits.success"])
+        self.assertEqual(5, attempts[1].attributes["llmakits.tokens"])
+
+        failed_json = next(span for span in tracer.spans if span.name == "llmakits.convert_to_json")
+        self.assertIsNotNone(failed_json.exception)
+        self.assertIs(attempts[0], failed_json.parent)
+
+    def test_image_conversion_spans_carry_bytes(self):
+        ended = []
+        set_tracer(CallbackTracer(on_end=ended.append))
+
+        with patch.object(builder, "download_encode_base64", return_value="/9j/valid"), patch.object(
+            builder, "validate_base64_content", return_value=(True, "")
+        ):
+            builder.convert_images_to_base64(["https://img.example.com/a.jpg"])
+
+        download, convert = ended
+        self.assertEqual("llmakits.image_download", download.name)
+        self.assertEqual("img.example.com", download.attributes["url.domain"])
+        self.assertEqual(len("/9j/valid"), download.attributes["llmakits.bytes"])
+        self.assertEqual("llmakits.convert_images_to_base64", convert.name)
+        self.assertEqual(1, convert.attributes["llmakits.converted_count"])
+        self.assertIs(convert, download.parent)
+
+    def test_set_tracer_none_disables_tracing(self):
+        set_tracer(CallbackTracer())
+        set_tracer(None)
+        self.assertIsNone(tracing.get_tracer())
+        self.assertFalse(tracing.tracing_enabled())
+
+
+if __name__ == "__main__":
+    unittest.main()